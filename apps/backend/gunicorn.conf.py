@@ -0,0 +1,76 @@
+"""
+Gunicorn configuration for production.
+
+Used by Dockerfile.prod: ``gunicorn -c gunicorn.conf.py``.
+"""
+
+import gc
+import importlib
+import os
+import shutil
+
+bind = "0.0.0.0:8000"
+workers = int(os.environ.get("GUNICORN_WORKERS", "4"))
+# Threads per worker (gthread) share that worker's database connection pool.
+threads = int(os.environ.get("GUNICORN_THREADS", "1"))
+
+# SERVER_MODE=asgi serves src.config.asgi with uvicorn workers: each worker
+# takes many requests at once, and the async views give it back while they
+# wait on S3 (see src/gallery/async_views.py). Their synchronous parts run
+# in a thread per request, so DB_POOL_MAX_SIZE bounds how many touch the
+# database at once. The default serves src.config.wsgi with sync (or,
+# with GUNICORN_THREADS, gthread) workers.
+if os.environ.get("SERVER_MODE", "wsgi") == "asgi":
+    wsgi_app = "src.config.asgi:application"
+    worker_class = "uvicorn.workers.UvicornWorker"
+else:
+    wsgi_app = "src.config.wsgi:application"
+timeout = 120
+
+# Load the app in the master before forking, so workers start without
+# importing anything and share the imported code copy-on-write. Nothing
+# holding a socket may be created at import time: the S3 client and the
+# database connections are created on first use in each worker (the S3
+# client singleton is also dropped after fork, see src/uploads/storage.py).
+preload_app = os.environ.get("GUNICORN_PRELOAD", "True") == "True"
+
+# The app imports these lazily so management commands do not pay for them
+# (see src/config/tests/test_import_time.py), but every worker needs them.
+PRELOAD_MODULES = (
+    "PIL.Image",
+    "PIL.JpegImagePlugin",
+    "PIL.PngImagePlugin",
+    "boto3",
+    "botocore.client",
+    "s3transfer.manager",
+    "magic",
+)
+
+# Each worker writes its Prometheus samples here so /api/metrics/ can
+# aggregate across all workers. Must be set before the app is imported.
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/prometheus-multiproc")
+
+
+def on_starting(server):
+    """Start every deployment with an empty metrics directory."""
+    path = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def when_ready(server):
+    """Import the lazily imported dependencies once, in the master."""
+    if not preload_app:
+        return
+    for module in PRELOAD_MODULES:
+        importlib.import_module(module)
+    # Everything allocated so far lives as long as the workers; keep the
+    # garbage collector from writing to (and so copying) those pages.
+    gc.freeze()
+
+
+def child_exit(server, worker):
+    """Drop live gauges of workers that have exited."""
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
@@ -8,5 +8,7 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'src.config.settings')
 
-application = get_asgi_application()
+from src.config.early_hints import EarlyHintsMiddleware  # noqa: E402
+
+application = EarlyHintsMiddleware(get_asgi_application())
 
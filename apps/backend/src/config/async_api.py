@@ -0,0 +1,80 @@
+"""
+Async views with REST framework requests and responses.
+
+REST framework 3.14 dispatches views synchronously: ``@api_view`` on a
+coroutine function would return the coroutine without awaiting it.
+``async_api_view`` gives async views what they rely on from ``api_view``:
+
+* a REST framework ``Request`` (``request.data``, ``request.query_params``,
+  JSON, form and multipart bodies);
+* method checks (405 with ``Allow``);
+* ``APIException`` handling (``NotFound``, ``ParseError``, ...) through
+  REST framework's exception handler;
+* rendering of ``Response`` objects;
+* CSRF exemption.
+
+The JSON is rendered by ``ORJSONRenderer``, so responses are byte-identical
+to the sync views'. Authentication and permission classes are not run: the
+gallery authorizes by event token (``require_event_token``), which works
+on async views.
+"""
+
+from __future__ import annotations
+
+from functools import wraps
+
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.views import exception_handler
+
+from src.config.renderers import ORJSONRenderer
+
+PARSER_CLASSES = (JSONParser, FormParser, MultiPartParser)
+
+
+def async_api_view(http_method_names: list[str], renderer_classes=(ORJSONRenderer,)):
+    """
+    Turn an ``async def view(request, ...)`` into a Django async view that
+    receives a REST framework ``Request`` and may return a ``Response``.
+    """
+    allowed = [method.upper() for method in http_method_names]
+    if "GET" in allowed and "HEAD" not in allowed:
+        allowed.append("HEAD")
+
+    def decorator(view_func):
+        @wraps(view_func)
+        async def view(request, *args, **kwargs):
+            api_request = Request(
+                request,
+                parsers=[parser() for parser in PARSER_CLASSES],
+                negotiator=DefaultContentNegotiation(),
+            )
+            renderers = [renderer() for renderer in renderer_classes]
+            try:
+                renderer, media_type = api_request.negotiator.select_renderer(api_request, renderers)
+            except exceptions.NotAcceptable:
+                renderer, media_type = renderers[0], renderers[0].media_type
+            api_request.accepted_renderer, api_request.accepted_media_type = renderer, media_type
+
+            context = {"view": None, "args": args, "kwargs": kwargs, "request": api_request}
+            try:
+                if request.method not in allowed:
+                    raise exceptions.MethodNotAllowed(request.method)
+                response = await view_func(api_request, *args, **kwargs)
+            except exceptions.APIException as exc:
+                response = exception_handler(exc, context)
+
+            if isinstance(response, Response):
+                response.accepted_renderer = renderer
+                response.accepted_media_type = media_type
+                response.renderer_context = context
+                response["Allow"] = ", ".join(allowed)
+            return response
+
+        return csrf_exempt(view)
+
+    return decorator
@@ -0,0 +1,132 @@
+"""
+Database configuration built from environment variables.
+
+``DATABASE_ENGINE`` selects the backend:
+
+* ``sqlite`` (default) – a single file next to the code, fine for local
+  development and small single-node events. Connections are tuned for
+  concurrent writers (WAL, busy timeout), see ``sqlite_concurrency_options``.
+* ``postgresql`` – configured from the ``POSTGRES_*`` variables. By default
+  each worker process keeps a psycopg connection pool that its threads share;
+  connections stay open between requests and are health-checked before being
+  handed out. With ``DB_POOL=False`` Django's persistent connections
+  (``CONN_MAX_AGE``) are used instead.
+
+PostgreSQL read replicas are listed in ``DB_REPLICA_HOSTS``; see
+``replica_configs`` and src/config/db_router.py.
+"""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import Mapping
+
+
+def _flag(environ: Mapping[str, str], name: str, default: str) -> bool:
+    return environ.get(name, default) == "True"
+
+
+def sqlite_concurrency_options(environ: Mapping[str, str] = os.environ) -> dict:
+    """
+    Connection options that let several gunicorn workers write to one SQLite
+    file without "database is locked" errors.
+
+    * WAL lets readers proceed while a write is in progress.
+    * synchronous=NORMAL is safe in WAL mode and avoids an fsync per commit.
+    * busy_timeout makes a writer wait for the lock instead of failing.
+    * BEGIN IMMEDIATE takes the write lock up front, so the busy timeout
+      applies; a deferred transaction that upgrades from read to write fails
+      immediately when another writer holds the lock.
+    * mmap speeds up reads of the (small) database file.
+    """
+    busy_timeout_ms = int(environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    mmap_size = int(environ.get("SQLITE_MMAP_SIZE", str(64 * 1024 * 1024)))
+    return {
+        "transaction_mode": "IMMEDIATE",
+        "init_command": (
+            "PRAGMA journal_mode=WAL;"
+            "PRAGMA synchronous=NORMAL;"
+            f"PRAGMA busy_timeout={busy_timeout_ms};"
+            f"PRAGMA mmap_size={mmap_size};"
+        ),
+    }
+
+
+def database_config(base_dir: Path, environ: Mapping[str, str] = os.environ) -> dict:
+    """
+    Return the settings dict for the ``default`` database.
+    """
+    engine = environ.get("DATABASE_ENGINE", "sqlite")
+
+    if engine == "sqlite":
+        config = {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": environ.get("SQLITE_PATH", base_dir / "db.sqlite3"),
+        }
+        if _flag(environ, "SQLITE_CONCURRENCY_MODE", "True"):
+            config["OPTIONS"] = sqlite_concurrency_options(environ)
+        return config
+
+    if engine != "postgresql":
+        raise ValueError(f"Unsupported DATABASE_ENGINE: {engine!r}")
+
+    config = {
+        "ENGINE": "django.db.backends.postgresql",
+        "NAME": environ.get("POSTGRES_DB", "wedding_gallery"),
+        "USER": environ.get("POSTGRES_USER", "postgres"),
+        "PASSWORD": environ.get("POSTGRES_PASSWORD", ""),
+        "HOST": environ.get("POSTGRES_HOST", "localhost"),
+        "PORT": environ.get("POSTGRES_PORT", "5432"),
+        # Check that a reused connection is still alive before running queries
+        # on it (after an RDS failover, for example).
+        "CONN_HEALTH_CHECKS": True,
+        # Large admin and export scans use .iterator(), which streams through
+        # a server-side cursor. Transaction-pooling proxies such as PgBouncer
+        # do not support those, so they can be switched off.
+        "DISABLE_SERVER_SIDE_CURSORS": _flag(environ, "DB_DISABLE_SERVER_SIDE_CURSORS", "False"),
+        "OPTIONS": {
+            "connect_timeout": int(environ.get("DB_CONNECT_TIMEOUT", "5")),
+        },
+    }
+
+    if _flag(environ, "DB_POOL", "True"):
+        # Django refuses CONN_MAX_AGE together with a pool: the pool itself
+        # keeps connections open, recycling them after max_lifetime.
+        config["CONN_MAX_AGE"] = 0
+        config["OPTIONS"]["pool"] = {
+            "min_size": int(environ.get("DB_POOL_MIN_SIZE", "2")),
+            "max_size": int(environ.get("DB_POOL_MAX_SIZE", "8")),
+            "timeout": float(environ.get("DB_POOL_TIMEOUT", "10")),
+            "max_lifetime": float(environ.get("DB_POOL_MAX_LIFETIME", "1800")),
+        }
+    else:
+        config["CONN_MAX_AGE"] = int(environ.get("DB_CONN_MAX_AGE", "600"))
+
+    return config
+
+
+def replica_configs(primary: dict, environ: Mapping[str, str] = os.environ) -> dict:
+    """
+    Return the settings dicts of the read replicas, keyed by alias
+    (``replica_1``, ``replica_2``, ...).
+
+    ``DB_REPLICA_HOSTS`` is a comma-separated list of ``host`` or
+    ``host:port``; replicas otherwise share the primary's settings. In tests
+    they mirror the primary's test database.
+    """
+    hosts = [host.strip() for host in environ.get("DB_REPLICA_HOSTS", "").split(",") if host.strip()]
+    if hosts and primary["ENGINE"] != "django.db.backends.postgresql":
+        raise ValueError("DB_REPLICA_HOSTS requires DATABASE_ENGINE=postgresql")
+
+    replicas = {}
+    for number, host in enumerate(hosts, start=1):
+        host, _, port = host.partition(":")
+        replicas[f"replica_{number}"] = {
+            **primary,
+            "HOST": host,
+            "PORT": port or primary["PORT"],
+            "OPTIONS": {**primary["OPTIONS"]},
+            "TEST": {"MIRROR": "default"},
+        }
+    return replicas
@@ -0,0 +1,189 @@
+"""
+Routing gallery reads to read replicas.
+
+With replicas configured (``DB_READ_REPLICAS``, see
+``src.config.database.replica_configs``), ``ReplicaRouter`` sends reads of
+the gallery and events apps to a replica, so browsing does not compete
+with upload writes on the primary. Everything else, and every write, goes
+to ``default``.
+
+Reads are only routed inside requests that ``ReplicaRoutingMiddleware``
+marks as read-only: safe methods, plus views decorated with
+``replica_reads``, except admin pages other than changelists. Management
+commands, admin forms and writing requests read from the primary, so they
+never act on stale rows.
+
+Read-your-writes: once a request writes, the rest of it reads from the
+primary, and the response pins the client to the primary for
+``DB_REPLICA_PIN_SECONDS`` with a cookie, so a guest sees their own upload
+in the next listing even while replicas catch up.
+
+Lag guard: each replica's replication lag is checked at most every
+``DB_REPLICA_LAG_CHECK_SECONDS`` per process; replicas further behind than
+``DB_REPLICA_MAX_LAG_SECONDS``, or that cannot be reached, are skipped
+until the next check. Without a healthy replica reads go to the primary.
+"""
+
+from __future__ import annotations
+
+import random
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+from src.config import metrics
+
+# Apps whose reads may be served by a replica.
+REPLICA_APPS = {"gallery", "events"}
+
+PIN_COOKIE = "gallery_db_pin"
+
+# Seconds since the last replayed transaction, or 0 when the replica has
+# replayed everything it received (an idle primary has no new transactions,
+# so the replay timestamp alone would report ever-growing lag).
+POSTGRES_LAG_SQL = """
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+"""
+
+
+@dataclass
+class RoutingState:
+    """
+    Routing decisions of the current request.
+    """
+
+    use_replicas: bool = False
+    wrote: bool = False
+    replica: str | None = None
+
+
+_state: ContextVar[RoutingState | None] = ContextVar("db_routing_state", default=None)
+
+_lag_lock = threading.Lock()
+_lag_checked: dict[str, tuple[float, float | None]] = {}
+
+
+def replica_reads(view):
+    """
+    Mark a view that does not write, even though it is not a GET, so its
+    reads may be served by a replica.
+    """
+    view.replica_reads = True
+    return view
+
+
+def start_request():
+    return _state.set(RoutingState())
+
+
+def routing_state() -> RoutingState | None:
+    return _state.get()
+
+
+def finish_request(token) -> RoutingState:
+    state = _state.get()
+    _state.reset(token)
+    return state
+
+
+def measure_lag(alias: str) -> float | None:
+    """
+    Return the replication lag of a replica in seconds, or None when it
+    cannot be reached. Databases without replication report no lag.
+    """
+    connection = connections[alias]
+    if connection.vendor != "postgresql":
+        return 0.0
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(POSTGRES_LAG_SQL)
+            lag = cursor.fetchone()[0]
+    except DatabaseError:
+        return None
+    return float(lag or 0)
+
+
+def replica_lag(alias: str) -> float | None:
+    """
+    Return the replica's lag as of its last check, checking again when
+    that is older than ``DB_REPLICA_LAG_CHECK_SECONDS``.
+    """
+    now = time.monotonic()
+    checked = _lag_checked.get(alias)
+    if checked and now - checked[0] < settings.DB_REPLICA_LAG_CHECK_SECONDS:
+        return checked[1]
+    with _lag_lock:
+        checked = _lag_checked.get(alias)
+        if checked and now - checked[0] < settings.DB_REPLICA_LAG_CHECK_SECONDS:
+            return checked[1]
+        lag = measure_lag(alias)
+        _lag_checked[alias] = (time.monotonic(), lag)
+    return lag
+
+
+def healthy_replicas() -> list[str]:
+    return [
+        alias for alias in settings.DB_READ_REPLICAS
+        if (lag := replica_lag(alias)) is not None and lag <= settings.DB_REPLICA_MAX_LAG_SECONDS
+    ]
+
+
+def _choose_replica(state: RoutingState) -> str:
+    """
+    Pick the replica for the request's reads, once, so paginated reads
+    within a request see one consistent copy.
+    """
+    if state.replica is None:
+        replicas = healthy_replicas()
+        if replicas:
+            state.replica = random.choice(replicas)
+            metrics.DB_READ_ROUTING.labels("replica").inc()
+        else:
+            state.replica = DEFAULT_DB_ALIAS
+            metrics.DB_READ_ROUTING.labels("lagging").inc()
+    return state.replica
+
+
+class ReplicaRouter:
+    """
+    Send reads of ``REPLICA_APPS`` in read-only requests to a replica and
+    everything else to ``default``.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if (
+            state is None
+            or not state.use_replicas
+            or state.wrote
+            or not settings.DB_READ_REPLICAS
+            or model._meta.app_label not in REPLICA_APPS
+        ):
+            return DEFAULT_DB_ALIAS
+        return _choose_replica(state)
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        # Explicitly, so rows read from a replica are saved to the primary.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, *settings.DB_READ_REPLICAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary.
+        if db in settings.DB_READ_REPLICAS:
+            return False
+        return None
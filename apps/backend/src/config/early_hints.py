@@ -0,0 +1,118 @@
+"""
+Preload hints.
+
+Views that know which images the client will want next (the lightbox
+neighbours, the thumbnails of a page) name them in a ``Link: <url>;
+rel=preload; as=image`` header, so caches and service workers in front of
+the browser can start fetching them.
+
+Where the server supports it, the same links also go out as an
+``HTTP 103 Early Hints`` interim response before the final response.
+Gunicorn's WSGI workers cannot send interim responses, so under
+``src.config.wsgi`` only the ``Link`` header is sent. ASGI servers that
+implement the ``http.response.early_hint`` extension (e.g. Hypercorn)
+offer it in the request scope; ``EarlyHintsMiddleware`` in
+``src.config.asgi`` keeps the ``send`` callable of such requests, and
+``preload`` uses it. Browsers act on 103 responses to page navigations;
+for API requests the ``Link`` header is what clients can use.
+"""
+
+from __future__ import annotations
+
+from contextvars import ContextVar
+from typing import Iterable
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+
+EARLY_HINT_EXTENSION = "http.response.early_hint"
+
+# ASGI send callable of the current request, when its server supports
+# early hints.
+_early_hint_send: ContextVar = ContextVar("early_hint_send", default=None)
+
+
+class EarlyHintsMiddleware:
+    """
+    ASGI middleware making early hints available to views (see ``preload``).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or EARLY_HINT_EXTENSION not in scope.get("extensions", {}):
+            return await self.app(scope, receive, send)
+        token = _early_hint_send.set(send)
+        try:
+            return await self.app(scope, receive, send)
+        finally:
+            _early_hint_send.reset(token)
+
+
+def preload_link(url: str) -> str:
+    return f"<{url}>; rel=preload; as=image"
+
+
+def _early_hint(links: list[str]) -> dict:
+    return {"type": EARLY_HINT_EXTENSION, "links": [link.encode() for link in links]}
+
+
+def send_early_hints(links: list[str]) -> bool:
+    """
+    Send ``links`` in a 103 Early Hints response if the server supports it;
+    return whether they were sent. Must be called from a synchronous view,
+    before the response is returned (async views use ``apreload``).
+    """
+    send = _early_hint_send.get()
+    if send is None or not links:
+        return False
+    async_to_sync(send)(_early_hint(links))
+    return True
+
+
+def _preload_links(urls: Iterable[str]) -> list[str]:
+    """
+    Links for the first ``PRELOAD_LINK_LIMIT`` distinct non-empty ``urls``.
+
+    Presigned URLs are several hundred bytes long; the limit keeps the
+    response headers within what proxies buffer (nginx: 4 KB by default).
+    """
+    limit = settings.PRELOAD_LINK_LIMIT
+    links = []
+    for url in dict.fromkeys(url for url in urls if url):
+        if len(links) >= limit:
+            break
+        links.append(preload_link(url))
+    return links
+
+
+def _add_link_header(response, links: list[str]):
+    existing = response.get("Link")
+    response["Link"] = ", ".join([existing, *links] if existing else links)
+    return response
+
+
+def preload(response, urls: Iterable[str]):
+    """
+    Add preload links for the first image ``urls`` to ``response``, and send
+    them as early hints where supported. Returns the response.
+    """
+    links = _preload_links(urls)
+    if not links:
+        return response
+    send_early_hints(links)
+    return _add_link_header(response, links)
+
+
+async def apreload(response, urls: Iterable[str]):
+    """
+    ``preload`` for async views.
+    """
+    links = _preload_links(urls)
+    if not links:
+        return response
+    send = _early_hint_send.get()
+    if send is not None:
+        await send(_early_hint(links))
+    return _add_link_header(response, links)
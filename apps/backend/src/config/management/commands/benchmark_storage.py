@@ -0,0 +1,185 @@
+"""
+Management command to benchmark parallel S3 PUT/GET throughput.
+
+Compares a client with botocore's defaults (10 pooled connections, legacy
+retries) with one built from the STORAGE_* settings, both driven by the
+same number of threads through ``StorageClient``. By default it runs
+against a local stand-in: a small threaded HTTP server in this process that
+stores objects in memory and adds a fixed latency per request, plus a
+connection setup delay standing in for the TCP and TLS handshakes, like a
+nearby S3 endpoint. botocore does not block when its pool is exhausted: it
+opens extra connections and discards them afterwards, so an undersized
+pool shows up as handshakes on the request path.
+
+Pass --endpoint to run against MinIO instead (the bucket must exist); the
+benchmark objects are deleted afterwards.
+"""
+import io
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import md5
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import boto3
+from botocore.config import Config
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from src.uploads.storage import StorageClient, _client_config, _transfer_config
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    """Just enough of the S3 API for PutObject, HeadObject and GetObject."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        time.sleep(self.server.connect_latency)
+
+    def log_message(self, format, *args):
+        pass
+
+    def _object(self):
+        return self.server.objects.get(self.path.split('?')[0])
+
+    def _headers(self, status, body_length, etag=None):
+        time.sleep(self.server.latency)
+        self.send_response(status)
+        self.send_header('Content-Length', str(body_length))
+        if etag:
+            self.send_header('ETag', etag)
+        self.end_headers()
+
+    def do_PUT(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.server.objects[self.path.split('?')[0]] = body
+        self._headers(200, 0, f'"{md5(body).hexdigest()}"')
+
+    def do_HEAD(self):
+        body = self._object()
+        if body is None:
+            self._headers(404, 0)
+            return
+        self._headers(200, len(body), f'"{md5(body).hexdigest()}"')
+
+    def do_GET(self):
+        body = self._object()
+        if body is None:
+            self._headers(404, 0)
+            return
+        self._headers(200, len(body), f'"{md5(body).hexdigest()}"')
+        self.wfile.write(body)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark parallel S3 PUT/GET throughput: default vs tuned client config'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--endpoint',
+            type=str,
+            help='S3 endpoint to use instead of the in-process stand-in (e.g. http://minio:9000)'
+        )
+        parser.add_argument(
+            '--objects',
+            type=int,
+            default=400,
+            help='Objects written and read per client (default: 400)'
+        )
+        parser.add_argument(
+            '--size-kb',
+            type=int,
+            default=256,
+            help='Size of each object in KiB (default: 256, a fullscreen image)'
+        )
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=32,
+            help='Concurrent requests (default: 32)'
+        )
+        parser.add_argument(
+            '--latency-ms',
+            type=float,
+            default=20,
+            help='Latency the stand-in adds per request (default: 20)'
+        )
+        parser.add_argument(
+            '--connect-ms',
+            type=float,
+            default=60,
+            help='Delay the stand-in adds per new connection (default: 60)'
+        )
+
+    def handle(self, *args, **options):
+        server = None
+        endpoint = options['endpoint']
+        if not endpoint:
+            server = ThreadingHTTPServer(('127.0.0.1', 0), _StandInHandler)
+            server.daemon_threads = True
+            server.objects = {}
+            server.latency = options['latency_ms'] / 1000
+            server.connect_latency = options['connect_ms'] / 1000
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            endpoint = f'http://127.0.0.1:{server.server_port}'
+
+        body = os.urandom(options['size_kb'] * 1024)
+        self.stdout.write(
+            f"{options['objects']} objects of {options['size_kb']} KiB, {options['threads']} threads, {endpoint}"
+        )
+        try:
+            default = self._client(endpoint, Config(), transfer_config=None)
+            self._run('default', default, body, options)
+            tuned = self._client(endpoint, _client_config(), transfer_config=_transfer_config())
+            self._run('tuned', tuned, body, options)
+        finally:
+            if server is not None:
+                server.shutdown()
+
+    def _client(self, endpoint, config, transfer_config):
+        client = boto3.client(
+            's3',
+            endpoint_url=endpoint,
+            aws_access_key_id=os.environ.get('AWS_ACCESS_KEY_ID', os.environ.get('MINIO_ROOT_USER', 'benchmark')),
+            aws_secret_access_key=os.environ.get(
+                'AWS_SECRET_ACCESS_KEY', os.environ.get('MINIO_ROOT_PASSWORD', 'benchmark')
+            ),
+            region_name=settings.AWS_S3_REGION_NAME,
+            config=config,
+        )
+        return StorageClient(
+            bucket_name=settings.AWS_STORAGE_BUCKET_NAME,
+            client=client,
+            transfer_config=transfer_config,
+        )
+
+    def _run(self, label, storage, body, options):
+        prefix = f'benchmark/{uuid.uuid4().hex}/'
+        keys = [f'{prefix}{i}.bin' for i in range(options['objects'])]
+        total_mb = len(keys) * len(body) / (1024 * 1024)
+
+        def put(key):
+            storage.upload_fileobj(io.BytesIO(body), key, content_type='application/octet-stream')
+
+        def get(key):
+            data = io.BytesIO()
+            storage.download_fileobj(key, data)
+            assert data.tell() == len(body)
+
+        try:
+            with ThreadPoolExecutor(max_workers=options['threads']) as executor:
+                for operation, func in (('PUT', put), ('GET', get)):
+                    start = time.perf_counter()
+                    list(executor.map(func, keys))
+                    elapsed = time.perf_counter() - start
+                    self.stdout.write(
+                        f'{label:>8} {operation}: {len(keys) / elapsed:8.1f} objects/s '
+                        f'{total_mb / elapsed:8.1f} MiB/s ({elapsed:.2f}s)'
+                    )
+        finally:
+            if options['endpoint']:
+                storage.delete_objects(keys)
@@ -0,0 +1,263 @@
+"""
+Management command to load test running deployments of the backend.
+
+Compares how many concurrent clients each target serves, e.g. the WSGI
+setup (``SERVER_MODE=wsgi``, sync gunicorn workers) and the ASGI one
+(``SERVER_MODE=asgi``, uvicorn workers serving the async views) started
+side by side against the same database and bucket:
+
+    python manage.py run_load_test --event my-wedding \\
+        --target wsgi=http://localhost:8000 --target asgi=http://localhost:8001
+
+At each concurrency level, that many clients send requests back to back
+over keep-alive connections: photo listings and, with --upload-share,
+uploads of a generated JPEG. Each client sends its own X-Real-IP, so
+per-client upload rate limits apply per simulated guest (when the target
+trusts the header, see UPLOAD_CLIENT_IP_HEADER); 429 and 503 answers are
+counted as rejected rather than failed. Reports requests/s and latency
+percentiles per level, and the highest level each target sustains within
+--slo-ms at the 99th percentile with under 1% errors.
+
+Uploads add real photos to the event; use a throwaway event
+(generate_synthetic_event makes one).
+"""
+import http.client
+import io
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode, urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from src.events.models import Event
+
+
+def _parse_target(value):
+    name, sep, url = value.partition('=')
+    if not sep or not url.startswith(('http://', 'https://')):
+        raise ValueError(value)
+    return name, url.rstrip('/')
+
+
+def _parse_levels(value):
+    levels = [int(level) for level in value.split(',')]
+    if any(level < 1 for level in levels):
+        raise ValueError(value)
+    return levels
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def _jpeg(size_kb):
+    """
+    A noisy JPEG of about ``size_kb`` KiB (noise does not compress).
+    """
+    from PIL import Image
+
+    side = max(64, int((size_kb * 1024 / 1.5) ** 0.5))
+    buffer = io.BytesIO()
+    Image.effect_noise((side, side), 60).convert('RGB').save(buffer, format='JPEG', quality=90)
+    return buffer.getvalue()
+
+
+class _Client:
+    """
+    One simulated guest: a keep-alive connection and its own address.
+    """
+
+    def __init__(self, base_url, number, timeout):
+        parts = urlsplit(base_url)
+        connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self.connection = connection_class(parts.hostname, parts.port, timeout=timeout)
+        self.prefix = parts.path
+        self.headers = {'X-Real-IP': f'10.{number // 65536 % 256}.{number // 256 % 256}.{number % 256}'}
+
+    def request(self, method, path, body=None, headers=None):
+        try:
+            self.connection.request(method, self.prefix + path, body=body, headers={**self.headers, **(headers or {})})
+            response = self.connection.getresponse()
+            response.read()
+            return response.status
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            return None
+
+    def close(self):
+        self.connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Load test running backends (e.g. WSGI vs ASGI) and compare their concurrent-request capacity'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target',
+            type=_parse_target,
+            action='append',
+            required=True,
+            help='NAME=URL of a running backend, e.g. wsgi=http://localhost:8000 (repeatable)'
+        )
+        parser.add_argument(
+            '--event',
+            type=str,
+            required=True,
+            help='Code of the event to list and upload to'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=_parse_levels,
+            default=[1, 4, 16, 64],
+            help='Comma-separated numbers of concurrent clients (default: 1,4,16,64)'
+        )
+        parser.add_argument(
+            '--duration',
+            type=float,
+            default=10,
+            help='Seconds per concurrency level (default: 10)'
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            help='Requests per concurrency level, instead of --duration'
+        )
+        parser.add_argument(
+            '--upload-share',
+            type=float,
+            default=0.0,
+            help='Share of requests that upload a photo (default: 0, listings only)'
+        )
+        parser.add_argument(
+            '--upload-kb',
+            type=int,
+            default=3000,
+            help='Size of the uploaded JPEG in KiB (default: 3000, a phone photo)'
+        )
+        parser.add_argument(
+            '--page-size',
+            type=int,
+            default=60,
+            help='Photos per listing page (default: 60)'
+        )
+        parser.add_argument(
+            '--slo-ms',
+            type=float,
+            default=1000,
+            help='99th percentile latency a sustained level must stay within (default: 1000)'
+        )
+        parser.add_argument(
+            '--timeout',
+            type=float,
+            default=60,
+            help='Seconds before a request counts as failed (default: 60)'
+        )
+
+    def handle(self, *args, **options):
+        if not 0 <= options['upload_share'] <= 1:
+            raise CommandError('--upload-share must be between 0 and 1')
+        event = Event.objects.filter(code=options['event']).first()
+        if event is None:
+            raise CommandError(f'Event "{options["event"]}" not found')
+
+        self.token = event.access_token
+        self.upload = _jpeg(options['upload_kb']) if options['upload_share'] else None
+        self.stdout.write(
+            f"Event {event.code}, {options['upload_share']:.0%} uploads, "
+            f"{options['requests'] or options['duration']} {'requests' if options['requests'] else 's'} per level"
+        )
+
+        capacity = {}
+        for name, url in options['target']:
+            self.stdout.write(f'\n{name} ({url})')
+            self.stdout.write(
+                f'{"clients":>8} {"req/s":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"rejected":>9} {"failed":>7}'
+            )
+            capacity[name] = 0
+            for level in options['concurrency']:
+                stats = self._run_level(url, level, options)
+                self.stdout.write(
+                    f'{level:>8} {stats["rate"]:>8.1f} {stats["p50"]:>8.0f} {stats["p95"]:>8.0f} '
+                    f'{stats["p99"]:>8.0f} {stats["rejected"]:>9} {stats["failed"]:>7}'
+                )
+                if stats['p99'] <= options['slo_ms'] and stats['failed'] <= 0.01 * stats['total']:
+                    capacity[name] = max(capacity[name], level)
+
+        self.stdout.write('')
+        for name, clients in capacity.items():
+            self.stdout.write(self.style.SUCCESS(
+                f'{name}: sustains {clients} concurrent clients within {options["slo_ms"]:.0f} ms (p99)'
+            ))
+
+    def _run_level(self, url, level, options):
+        latencies, rejected, failed = [], [0], [0]
+        lock = threading.Lock()
+        remaining = [options['requests']] if options['requests'] else None
+        deadline = time.perf_counter() + options['duration']
+
+        def take():
+            if remaining is None:
+                return time.perf_counter() < deadline
+            with lock:
+                remaining[0] -= 1
+                return remaining[0] >= 0
+
+        def client_loop(number):
+            client = _Client(url, number, options['timeout'])
+            rng = random.Random(number)
+            try:
+                while take():
+                    start = time.perf_counter()
+                    if self.upload is not None and rng.random() < options['upload_share']:
+                        status = self._upload(client)
+                    else:
+                        status = client.request('GET', '/api/gallery/photos/?' + urlencode({
+                            'access_token': self.token,
+                            'page': rng.randint(1, 3),
+                            'page_size': options['page_size'],
+                        }))
+                    elapsed = (time.perf_counter() - start) * 1000
+                    with lock:
+                        if status in (429, 503):
+                            rejected[0] += 1
+                        elif status is None or status >= 400 and status != 404:
+                            # 404: a page past the end of a small gallery.
+                            failed[0] += 1
+                        else:
+                            latencies.append(elapsed)
+            finally:
+                client.close()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=level) as executor:
+            list(executor.map(client_loop, range(level)))
+        elapsed = time.perf_counter() - start
+
+        return {
+            'rate': len(latencies) / elapsed,
+            'p50': percentile(latencies, 0.50),
+            'p95': percentile(latencies, 0.95),
+            'p99': percentile(latencies, 0.99),
+            'rejected': rejected[0],
+            'failed': failed[0],
+            'total': len(latencies) + rejected[0] + failed[0],
+        }
+
+    def _upload(self, client):
+        boundary = uuid.uuid4().hex
+        body = b''.join([
+            f'--{boundary}\r\nContent-Disposition: form-data; name="access_token"\r\n\r\n{self.token}\r\n'.encode(),
+            f'--{boundary}\r\nContent-Disposition: form-data; name="photo"; filename="load-test.jpg"\r\n'
+            'Content-Type: image/jpeg\r\n\r\n'.encode(),
+            self.upload,
+            f'\r\n--{boundary}--\r\n'.encode(),
+        ])
+        return client.request('POST', '/api/gallery/upload/', body=body, headers={
+            'Content-Type': f'multipart/form-data; boundary={boundary}',
+        })
@@ -0,0 +1,123 @@
+"""
+Prometheus metrics for the backend.
+
+Metrics are defined once at import time and exported from ``/api/metrics/``.
+Under gunicorn every worker is its own process, so when
+``PROMETHEUS_MULTIPROC_DIR`` is set (see ``gunicorn.conf.py``) each worker
+writes its samples to that directory and the endpoint aggregates all of them,
+no matter which worker serves the scrape.
+"""
+
+from __future__ import annotations
+
+import os
+
+from django.conf import settings
+from django.http import HttpResponse
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# Buckets in seconds, tuned for an API whose slowest path is a 20 MB upload.
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+REQUEST_DURATION = Histogram(
+    "gallery_request_duration_seconds",
+    "Time spent handling an HTTP request.",
+    ["method", "view", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+
+OPERATION_DURATION = Histogram(
+    "gallery_operation_duration_seconds",
+    "Time spent in an instrumented operation (db, storage, image, sign).",
+    ["category", "operation"],
+    buckets=LATENCY_BUCKETS,
+)
+
+OPERATION_ERRORS = Counter(
+    "gallery_operation_errors_total",
+    "Instrumented operations that raised an exception.",
+    ["category", "operation"],
+)
+
+# Gauges are summed over live workers in multiprocess mode.
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "gallery_admission_queue_depth",
+    "Uploads waiting for a processing slot.",
+    multiprocess_mode="livesum",
+)
+
+ADMISSION_IN_FLIGHT = Gauge(
+    "gallery_admission_in_flight",
+    "Uploads currently holding a processing slot.",
+    multiprocess_mode="livesum",
+)
+
+ADMISSION_RESERVED_BYTES = Gauge(
+    "gallery_admission_reserved_bytes",
+    "Estimated image memory reserved by uploads being processed.",
+    multiprocess_mode="livesum",
+)
+
+ADMISSION_REJECTIONS = Counter(
+    "gallery_admission_rejections_total",
+    "Uploads turned away by admission control.",
+    ["reason"],
+)
+
+IMAGE_VARIANT_REQUESTS = Counter(
+    "gallery_image_variant_requests_total",
+    "Resized image requests by where the variant came from (disk, storage, rendered).",
+    ["source"],
+)
+
+PACKED_OBJECT_REQUESTS = Counter(
+    "gallery_packed_object_requests_total",
+    "Archived rendition requests by where the bytes came from (disk, pack).",
+    ["source"],
+)
+
+DB_READ_ROUTING = Counter(
+    "gallery_db_read_routing_total",
+    "Read-only requests by where their gallery reads went (replica, pinned to the primary after a write, lagging replicas).",
+    ["target"],
+)
+
+
+def _registry() -> CollectorRegistry:
+    """
+    Return the registry to export.
+
+    In multiprocess mode the default registry only knows about the current
+    worker, so we build a fresh one that reads every worker's files.
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def metrics_view(request):
+    """
+    Expose metrics in the Prometheus text format.
+
+    If ``METRICS_TOKEN`` is configured the scraper must send it as a bearer
+    token; otherwise the endpoint is open (it is not routed by the public
+    nginx config).
+    """
+    token = getattr(settings, "METRICS_TOKEN", None)
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        return HttpResponse(status=401)
+    return HttpResponse(generate_latest(_registry()), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,218 @@
+"""
+Project-wide middleware.
+
+Each middleware has a sync and an async path (``sync_and_async_middleware``),
+so under ASGI a request reaches the async views without a hop to a thread
+and back for every middleware.
+"""
+
+from __future__ import annotations
+
+import random
+import threading
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.urls import Resolver404, resolve
+from django.utils.decorators import sync_and_async_middleware
+
+from src.config import db_router, metrics
+from src.config.profiling import is_valid_profile_token, profile_request
+from src.config.timing import finish_request, start_request, timed
+
+_SQL_OPERATIONS = {"select", "insert", "update", "delete"}
+
+
+def _time_query(execute, sql, params, many, context):
+    """
+    ``connection.execute_wrapper`` hook that times every database query.
+    """
+    verb = sql.lstrip().split(None, 1)[0].lower() if sql else ""
+    with timed("db", verb if verb in _SQL_OPERATIONS else "other"):
+        return execute(sql, params, many, context)
+
+
+def _install_query_timer(sender, connection, **kwargs):
+    """
+    ``connection_created`` receiver that times every query of a connection
+    for as long as it lives.
+    """
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+@sync_and_async_middleware
+class RequestTimingMiddleware:
+    """
+    Time each request and the db/storage/image/sign work done inside it.
+
+    Adds a ``Server-Timing`` header to the response and records the request
+    in the ``gallery_request_duration_seconds`` histogram.
+
+    Under ASGI the queries of a request run on the connections of
+    ``sync_to_async`` threads, which are shared by concurrent requests, so
+    the query timer is installed on those connections once, when they are
+    created; it records into whichever request's timings are current.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+            connection_created.connect(_install_query_timer, dispatch_uid="request_timing_query_timer")
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings, token = start_request()
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(_time_query))
+                response = self.get_response(request)
+        finally:
+            finish_request(token)
+        return self._finish(request, response, timings, start)
+
+    async def __acall__(self, request):
+        timings, token = start_request()
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            finish_request(token)
+        return self._finish(request, response, timings, start)
+
+    def _finish(self, request, response, timings, start):
+        total = time.perf_counter() - start
+        match = getattr(request, "resolver_match", None)
+        view_name = match.view_name if match else "unmatched"
+        metrics.REQUEST_DURATION.labels(request.method, view_name, response.status_code).observe(total)
+
+        if getattr(settings, "SERVER_TIMING_ENABLED", True):
+            response["Server-Timing"] = timings.header_value(total)
+        return response
+
+
+@sync_and_async_middleware
+class ReplicaRoutingMiddleware:
+    """
+    Decide per request whether gallery reads may go to a read replica, and
+    pin clients that wrote to the primary for ``DB_REPLICA_PIN_SECONDS``
+    (see src/config/db_router.py).
+
+    Of the admin, only changelists read from a replica: a change or add
+    form read from a lagging replica would be saved back over newer rows.
+    """
+
+    SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+            # Django runs a sync process_view in a thread under ASGI.
+            self.process_view = self.aprocess_view
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = db_router.start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            state = db_router.finish_request(token)
+        return self._pin(response, state)
+
+    async def __acall__(self, request):
+        token = db_router.start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            state = db_router.finish_request(token)
+        return self._pin(response, state)
+
+    def _pin(self, response, state):
+        if state.wrote and settings.DB_READ_REPLICAS:
+            response.set_cookie(
+                db_router.PIN_COOKIE,
+                "1",
+                max_age=settings.DB_REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        self._route_reads(request, view_func)
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        self._route_reads(request, view_func)
+
+    @staticmethod
+    def _replica_safe_view(request) -> bool:
+        match = request.resolver_match
+        if match is None or "admin" not in match.namespaces:
+            return True
+        return (match.url_name or "").endswith("_changelist")
+
+    def _route_reads(self, request, view_func):
+        read_only = request.method in self.SAFE_METHODS or getattr(view_func, "replica_reads", False)
+        if not read_only or not settings.DB_READ_REPLICAS or not self._replica_safe_view(request):
+            return
+        if db_router.PIN_COOKIE in request.COOKIES:
+            metrics.DB_READ_ROUTING.labels("pinned").inc()
+            return
+        db_router.routing_state().use_replicas = True
+
+
+@sync_and_async_middleware
+class SamplingProfilerMiddleware:
+    """
+    Profile one in ``PROFILER_SAMPLE_RATE`` requests to ``PROFILER_VIEWS``,
+    plus any request carrying a valid signed ``X-Profile-Token`` header.
+
+    At most one request per process is profiled at a time, which keeps the
+    overhead bounded even when left enabled during a live event.
+
+    Under ASGI requests are passed through unprofiled: the sampler follows
+    one thread, while an async request's work is interleaved with other
+    requests on the event loop and spread over ``sync_to_async`` threads.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self._busy = threading.Lock()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _wants_profile(self, request) -> bool:
+        token = request.headers.get("X-Profile-Token")
+        if token:
+            return is_valid_profile_token(token)
+
+        sample_rate = settings.PROFILER_SAMPLE_RATE
+        if sample_rate <= 0 or random.randrange(sample_rate) != 0:
+            return False
+        try:
+            view_name = resolve(request.path_info).view_name
+        except Resolver404:
+            return False
+        return view_name in settings.PROFILER_VIEWS
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.get_response(request)
+        if not settings.PROFILER_ENABLED or not self._wants_profile(request):
+            return self.get_response(request)
+        if not self._busy.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            return profile_request(request, self.get_response)
+        finally:
+            self._busy.release()
@@ -0,0 +1,222 @@
+"""
+Low-overhead sampling profiler for live requests.
+
+A background thread wakes up every few milliseconds and records the request
+thread's current stack. Nothing is hooked into the interpreter, so the
+profiled request runs at (almost) full speed and requests that are not
+sampled pay nothing.
+
+Profiles are stored as "folded" stacks (``a;b;c 42``), the input format of
+flamegraph.pl, speedscope and most other flamegraph viewers, in a bounded
+on-disk ring buffer. They can be browsed from ``/admin/profiles/``.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib import admin
+from django.core import signing
+from django.http import Http404, HttpResponse
+from django.shortcuts import render
+
+PROFILE_TOKEN_SALT = "src.config.profiling"
+
+
+def _frame_name(frame) -> str:
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}.{frame.f_code.co_qualname}"
+
+
+class StackSampler:
+    """
+    Periodically sample the stack of one thread.
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: dict[str, int] = {}
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> dict[str, int]:
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                names.append(_frame_name(frame))
+                frame = frame.f_back
+            folded = ";".join(reversed(names))
+            self.stacks[folded] = self.stacks.get(folded, 0) + 1
+            self.samples += 1
+
+
+@dataclass
+class Profile:
+    """
+    A single captured request profile.
+    """
+
+    id: str
+    method: str
+    path: str
+    status: int
+    duration_ms: float
+    samples: int
+    created_at: float
+    stacks: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def created(self) -> datetime:
+        return datetime.fromtimestamp(self.created_at, tz=timezone.utc)
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.items())
+
+
+class ProfileStore:
+    """
+    Ring buffer of profiles on disk: the oldest files are removed once
+    ``max_profiles`` is exceeded.
+    """
+
+    def __init__(self, directory: str | os.PathLike, max_profiles: int):
+        self.directory = Path(directory)
+        self.max_profiles = max_profiles
+
+    def _paths(self) -> list[Path]:
+        if not self.directory.exists():
+            return []
+        # File names start with a zero-padded timestamp, so they sort by age.
+        return sorted(self.directory.glob("*.json"))
+
+    def save(self, profile: Profile) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        name = f"{int(profile.created_at * 1000):015d}-{profile.id}.json"
+        tmp_path = self.directory / f".{name}.tmp"
+        tmp_path.write_text(json.dumps(profile.__dict__))
+        tmp_path.replace(self.directory / name)
+
+        paths = self._paths()
+        for path in paths[: max(0, len(paths) - self.max_profiles)]:
+            path.unlink(missing_ok=True)
+
+    def list(self) -> list[Profile]:
+        profiles = []
+        for path in reversed(self._paths()):
+            try:
+                profiles.append(Profile(**json.loads(path.read_text())))
+            except (OSError, ValueError, TypeError):
+                # Removed by another worker while we were reading it.
+                continue
+        return profiles
+
+    def get(self, profile_id: str) -> Profile | None:
+        for path in self._paths():
+            if path.stem.endswith(f"-{profile_id}"):
+                try:
+                    return Profile(**json.loads(path.read_text()))
+                except (OSError, ValueError, TypeError):
+                    return None
+        return None
+
+
+def get_profile_store() -> ProfileStore:
+    return ProfileStore(settings.PROFILER_DIR, settings.PROFILER_MAX_PROFILES)
+
+
+def make_profile_token() -> str:
+    """
+    Return a signed value for the ``X-Profile-Token`` request header.
+    """
+    return signing.TimestampSigner(salt=PROFILE_TOKEN_SALT).sign("profile")
+
+
+def is_valid_profile_token(value: str) -> bool:
+    try:
+        signing.TimestampSigner(salt=PROFILE_TOKEN_SALT).unsign(
+            value, max_age=settings.PROFILER_TOKEN_MAX_AGE
+        )
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def profile_request(request, get_response):
+    """
+    Run ``get_response`` under the sampler and store the resulting profile.
+    """
+    sampler = StackSampler(threading.get_ident(), settings.PROFILER_INTERVAL)
+    start = time.perf_counter()
+    sampler.start()
+    try:
+        response = get_response(request)
+    finally:
+        stacks = sampler.stop()
+    duration = time.perf_counter() - start
+
+    profile = Profile(
+        id=uuid.uuid4().hex[:12],
+        method=request.method,
+        path=request.path,
+        status=response.status_code,
+        duration_ms=round(duration * 1000, 1),
+        samples=sampler.samples,
+        created_at=time.time(),
+        stacks=stacks,
+    )
+    try:
+        get_profile_store().save(profile)
+    except OSError as e:
+        print(f"Error saving request profile: {e}")  # noqa
+    else:
+        response["X-Profile-Id"] = profile.id
+    return response
+
+
+def profile_list_view(request):
+    """
+    Admin page listing the stored profiles.
+    """
+    return render(request, "admin/profiles.html", {
+        **admin.site.each_context(request),
+        "title": "Request profiles",
+        "profiles": get_profile_store().list(),
+        "profile_token": make_profile_token(),
+        "token_max_age": settings.PROFILER_TOKEN_MAX_AGE,
+        "sample_rate": settings.PROFILER_SAMPLE_RATE,
+        "enabled": settings.PROFILER_ENABLED,
+    })
+
+
+def profile_download_view(request, profile_id):
+    """
+    Download one profile as folded stacks.
+    """
+    profile = get_profile_store().get(profile_id)
+    if profile is None:
+        raise Http404("Profile not found")
+    response = HttpResponse(profile.folded(), content_type="text/plain; charset=utf-8")
+    response["Content-Disposition"] = f'attachment; filename="profile-{profile.id}.folded"'
+    return response
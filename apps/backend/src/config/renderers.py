@@ -0,0 +1,36 @@
+"""
+REST framework renderers.
+"""
+
+from __future__ import annotations
+
+import orjson
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    Drop-in replacement for ``JSONRenderer`` backed by orjson.
+
+    Produces byte-identical output for compact responses: datetimes and
+    other non-JSON types are still formatted by REST framework's encoder,
+    and U+2028/U+2029 are escaped the same way. Indented output and anything
+    orjson cannot handle fall back to the standard renderer.
+    """
+
+    _encoder = encoders.JSONEncoder()
+    options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self._encoder.default, option=self.options)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
@@ -5,6 +5,8 @@ Django settings for wedding gallery project.
 from pathlib import Path
 import os
 
+from src.config.database import database_config, replica_configs
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 
@@ -35,6 +37,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'src.config.middleware.RequestTimingMiddleware',  # Outermost, so it times everything below
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Must be after SecurityMiddleware
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -42,8 +45,10 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'src.config.middleware.ReplicaRoutingMiddleware',  # Inside sessions, so session writes do not pin
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'src.config.middleware.SamplingProfilerMiddleware',
 ]
 
 ROOT_URLCONF = 'src.config.urls'
@@ -65,20 +70,39 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'src.config.wsgi.application'
+ASGI_APPLICATION = 'src.config.asgi.application'
+
+# How the app is served in production (see gunicorn.conf.py): 'wsgi' (sync
+# workers) or 'asgi' (uvicorn workers). Under ASGI the upload, listing and
+# event endpoints are served by async views, which free the worker while
+# they wait on S3 (see src/gallery/async_views.py).
+SERVER_MODE = os.environ.get('SERVER_MODE', 'wsgi')
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', str(SERVER_MODE == 'asgi')) == 'True'
 
 # Database
-# TODO: For production scale or multiple events, consider switching from SQLite to
-#       PostgreSQL (e.g. AWS RDS). When doing so, update this DATABASES setting
-#       to use 'django.db.backends.postgresql' and the appropriate connection
-#       details (host, port, name, user, password).
-#       Also update terraform configuration for RDS.
+# SQLite by default; set DATABASE_ENGINE=postgresql and the POSTGRES_* variables
+# to use PostgreSQL (e.g. AWS RDS). See src/config/database.py for all options.
+# TODO: Update terraform configuration for RDS.
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': database_config(BASE_DIR),
 }
 
+# Read replicas (DB_REPLICA_HOSTS): read-only requests read gallery and event
+# rows from a replica that is at most DB_REPLICA_MAX_LAG_SECONDS behind, and a
+# client that wrote reads from the primary for DB_REPLICA_PIN_SECONDS (see
+# src/config/db_router.py).
+DATABASES.update(replica_configs(DATABASES['default']))
+DATABASE_ROUTERS = ['src.config.db_router.ReplicaRouter']
+DB_READ_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DB_REPLICA_PIN_SECONDS = int(os.environ.get('DB_REPLICA_PIN_SECONDS', '10'))
+DB_REPLICA_MAX_LAG_SECONDS = float(os.environ.get('DB_REPLICA_MAX_LAG_SECONDS', '5'))
+DB_REPLICA_LAG_CHECK_SECONDS = float(os.environ.get('DB_REPLICA_LAG_CHECK_SECONDS', '2'))
+
+# Retries for short write transactions that hit "database is locked" on
+# SQLite (see src/config/transactions.py).
+SQLITE_WRITE_RETRIES = 5
+SQLITE_WRITE_RETRY_BACKOFF = 0.05  # seconds, doubled on each attempt
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -169,6 +193,36 @@ AWS_S3_CUSTOM_DOMAIN = os.environ.get('AWS_S3_CUSTOM_DOMAIN', None)
 USE_MINIO = os.environ.get('USE_MINIO', 'True') == 'True'
 MINIO_ENDPOINT = os.environ.get('MINIO_ENDPOINT', 'http://minio:9000')
 
+# S3 client tuning (see src/uploads/storage.py). The connection pool is per
+# worker process and should cover its request threads plus transfer threads.
+STORAGE_MAX_POOL_CONNECTIONS = int(os.environ.get('STORAGE_MAX_POOL_CONNECTIONS', '32'))
+STORAGE_TCP_KEEPALIVE = os.environ.get('STORAGE_TCP_KEEPALIVE', 'True') == 'True'
+STORAGE_CONNECT_TIMEOUT = float(os.environ.get('STORAGE_CONNECT_TIMEOUT', '5'))
+STORAGE_READ_TIMEOUT = float(os.environ.get('STORAGE_READ_TIMEOUT', '30'))
+# 'adaptive' adds client-side rate limiting when S3 throttles (503 SlowDown).
+STORAGE_RETRY_MODE = os.environ.get('STORAGE_RETRY_MODE', 'adaptive')
+STORAGE_MAX_ATTEMPTS = int(os.environ.get('STORAGE_MAX_ATTEMPTS', '5'))
+# Files above the threshold are transferred in parts, several at a time.
+STORAGE_MULTIPART_THRESHOLD_MB = int(os.environ.get('STORAGE_MULTIPART_THRESHOLD_MB', '16'))
+STORAGE_MULTIPART_CHUNKSIZE_MB = int(os.environ.get('STORAGE_MULTIPART_CHUNKSIZE_MB', '8'))
+STORAGE_TRANSFER_CONCURRENCY = int(os.environ.get('STORAGE_TRANSFER_CONCURRENCY', '4'))
+# Threads per worker running the S3 calls of async views; keep it below
+# STORAGE_MAX_POOL_CONNECTIONS.
+STORAGE_ASYNC_THREADS = int(os.environ.get('STORAGE_ASYNC_THREADS', '16'))
+
+# How guests are authorized to read objects (see src/uploads/cloudfront.py):
+# 'presigned' URLs per object, or 'cookies': CloudFront signed cookies per
+# event, set when the access token is validated, and plain object URLs under
+# CLOUDFRONT_BASE_URL. The private key is given inline (PEM) or as a path.
+READ_AUTH_MODE = os.environ.get('READ_AUTH_MODE', 'presigned')
+CLOUDFRONT_BASE_URL = os.environ.get('CLOUDFRONT_BASE_URL', '')
+CLOUDFRONT_KEY_PAIR_ID = os.environ.get('CLOUDFRONT_KEY_PAIR_ID', '')
+CLOUDFRONT_PRIVATE_KEY = os.environ.get('CLOUDFRONT_PRIVATE_KEY', '')
+CLOUDFRONT_PRIVATE_KEY_PATH = os.environ.get('CLOUDFRONT_PRIVATE_KEY_PATH', '')
+CLOUDFRONT_COOKIE_TTL = int(os.environ.get('CLOUDFRONT_COOKIE_TTL', str(24 * 3600)))
+# Parent domain shared by the API and the distribution, e.g. '.example.com'.
+CLOUDFRONT_COOKIE_DOMAIN = os.environ.get('CLOUDFRONT_COOKIE_DOMAIN', '')
+
 # Base URL of the frontend, used when generating QR codes.
 FRONTEND_BASE_URL = os.environ.get('FRONTEND_BASE_URL', 'http://localhost:3000')
 
@@ -180,6 +234,112 @@ THUMBNAIL_QUALITY = 75
 FULLSCREEN_SIZE = (1920, 1080)
 FULLSCREEN_QUALITY = 85
 
+# Engine making renditions and variants (see src/gallery/image_engine.py):
+# 'pillow', or 'vips' (needs pyvips and libvips; decodes large originals in
+# a fraction of the memory).
+IMAGE_ENGINE = os.environ.get('IMAGE_ENGINE', 'pillow')
+
+# Renditions are encoded at the lowest quality whose luma SSIM against the
+# resized image reaches IMAGE_TARGET_SSIM (see src/gallery/encoding.py).
+# 0 disables the search and uses the fixed *_QUALITY settings instead. Each
+# quality in the range costs about half an encode more per rendition.
+IMAGE_TARGET_SSIM = float(os.environ.get('IMAGE_TARGET_SSIM', '0.98'))
+IMAGE_MIN_QUALITY = int(os.environ.get('IMAGE_MIN_QUALITY', '65'))
+IMAGE_MAX_QUALITY = int(os.environ.get('IMAGE_MAX_QUALITY', '90'))
+# JPEGs at or above this quality keep full-resolution chroma (4:4:4).
+IMAGE_SUBSAMPLING_444_QUALITY = 90
+
+# Thumbnail sprite sheets (see src/gallery/sprites.py): square tiles,
+# SPRITE_COLUMNS x SPRITE_ROWS photos per sheet.
+SPRITE_TILE_SIZE = int(os.environ.get('SPRITE_TILE_SIZE', '256'))
+SPRITE_COLUMNS = 5
+SPRITE_ROWS = 5
+SPRITE_QUALITY = 80
+
+# On-the-fly image variants (see src/gallery/resize.py): requested widths are
+# snapped up to one of these. Rendered variants are cached on local disk
+# (LRU, IMAGE_CACHE_MAX_MB) and written back to object storage.
+IMAGE_VARIANT_WIDTHS = (160, 320, 480, 640, 960, 1280, 1920, 2560)
+IMAGE_VARIANT_QUALITY = 80
+IMAGE_CACHE_DIR = os.environ.get('IMAGE_CACHE_DIR', '/tmp/wedding-gallery-image-cache')
+IMAGE_CACHE_MAX_MB = int(os.environ.get('IMAGE_CACHE_MAX_MB', '1024'))
+
+# Gallery timeline (see src/gallery/timeline.py): approved photos are counted
+# per bucket of this many seconds. Run build_timeline after changing it.
+TIMELINE_BUCKET_SECONDS = int(os.environ.get('TIMELINE_BUCKET_SECONDS', '300'))
+
+# Preload hints (see src/config/early_hints.py): at most this many image
+# URLs are named in a response's Link header (and 103 Early Hints).
+PRELOAD_LINK_LIMIT = int(os.environ.get('PRELOAD_LINK_LIMIT', '4'))
+
+# Archived events (see src/gallery/packs.py): a rendition read from a pack
+# brings the renditions following it, up to this much, into the disk cache.
+ARCHIVE_READAHEAD_KB = int(os.environ.get('ARCHIVE_READAHEAD_KB', '1024'))
+
+# sweep_storage leaves unreferenced objects younger than this alone, so
+# uploads in progress are not deleted (see src/gallery/storage_gc.py).
+STORAGE_GC_GRACE_HOURS = float(os.environ.get('STORAGE_GC_GRACE_HOURS', '24'))
+
+# Static gallery manifests published to the bucket (see src/gallery/manifest.py).
+# MANIFEST_URL_MODE is 'signed' (presigned URLs valid for MANIFEST_URL_EXPIRY
+# seconds, at most 7 days and never longer than the signing credentials, so
+# use an IAM user's keys rather than role credentials) or 'public' (plain URLs
+# under MANIFEST_PUBLIC_BASE_URL, e.g. a CloudFront domain serving the bucket).
+MANIFEST_PAGE_SIZE = int(os.environ.get('MANIFEST_PAGE_SIZE', '100'))
+MANIFEST_URL_MODE = os.environ.get('MANIFEST_URL_MODE', 'signed')
+MANIFEST_PUBLIC_BASE_URL = os.environ.get('MANIFEST_PUBLIC_BASE_URL', '')
+MANIFEST_URL_EXPIRY = min(7 * 24 * 3600, int(os.environ.get('MANIFEST_URL_EXPIRY', str(7 * 24 * 3600))))
+# Publish once the gallery has been quiet this long, but at the latest this
+# long after the first unpublished change.
+MANIFEST_DEBOUNCE_SECONDS = int(os.environ.get('MANIFEST_DEBOUNCE_SECONDS', '30'))
+MANIFEST_MAX_DELAY_SECONDS = int(os.environ.get('MANIFEST_MAX_DELAY_SECONDS', '300'))
+
 # Maximum number of photos a user can upload at once
 MAX_PHOTOS_UPLOAD_LIMIT = 10
 
+# Uploads with more pixels are rejected from their header, before being stored
+# or decoded (see src/uploads/validation.py).
+UPLOAD_MAX_PIXELS = int(os.environ.get('UPLOAD_MAX_PIXELS', str(100_000_000)))
+
+# Resumable uploads: chunks are stored as S3 multipart parts, so every chunk
+# but the last must be at least 5 MiB.
+RESUMABLE_UPLOAD_CHUNK_SIZE = max(
+    5 * 1024 * 1024,
+    int(os.environ.get('RESUMABLE_UPLOAD_CHUNK_SIZE', str(5 * 1024 * 1024))),
+)
+RESUMABLE_UPLOAD_MAX_SIZE = int(os.environ.get('RESUMABLE_UPLOAD_MAX_SIZE', str(50 * 1024 * 1024)))
+RESUMABLE_UPLOAD_EXPIRY_HOURS = int(os.environ.get('RESUMABLE_UPLOAD_EXPIRY_HOURS', '24'))
+
+# Upload admission control (see src/gallery/admission.py)
+# Uploads processed at once per worker process, and the decoded image memory
+# they may reserve together.
+UPLOAD_MAX_CONCURRENT_PROCESSING = int(os.environ.get('UPLOAD_MAX_CONCURRENT_PROCESSING', '2'))
+UPLOAD_MEMORY_BUDGET_MB = int(os.environ.get('UPLOAD_MEMORY_BUDGET_MB', '512'))
+# Seconds an upload waits for a processing slot before getting a 503.
+UPLOAD_ADMISSION_TIMEOUT = float(os.environ.get('UPLOAD_ADMISSION_TIMEOUT', '10'))
+UPLOAD_BUSY_RETRY_AFTER = int(os.environ.get('UPLOAD_BUSY_RETRY_AFTER', '5'))
+# Token buckets: sustained uploads per second and burst size (rate 0 disables).
+UPLOAD_CLIENT_RATE = float(os.environ.get('UPLOAD_CLIENT_RATE', '0.5'))
+UPLOAD_CLIENT_BURST = int(os.environ.get('UPLOAD_CLIENT_BURST', '20'))
+UPLOAD_EVENT_RATE = float(os.environ.get('UPLOAD_EVENT_RATE', '5'))
+UPLOAD_EVENT_BURST = int(os.environ.get('UPLOAD_EVENT_BURST', '200'))
+# Request header carrying the client address (set by nginx); empty to use REMOTE_ADDR.
+UPLOAD_CLIENT_IP_HEADER = os.environ.get('UPLOAD_CLIENT_IP_HEADER', 'HTTP_X_REAL_IP')
+
+# Observability
+# Adds a Server-Timing header (db/storage/image/sign breakdown) to every response.
+SERVER_TIMING_ENABLED = os.environ.get('SERVER_TIMING_ENABLED', 'True') == 'True'
+# Optional bearer token required to scrape /api/metrics/.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', None)
+
+# Sampling profiler (browse results at /admin/profiles/)
+PROFILER_ENABLED = os.environ.get('PROFILER_ENABLED', 'False') == 'True'
+# Profile one in N requests to PROFILER_VIEWS (0 disables random sampling;
+# requests with a signed X-Profile-Token header are always profiled).
+PROFILER_SAMPLE_RATE = int(os.environ.get('PROFILER_SAMPLE_RATE', '100'))
+PROFILER_VIEWS = ['gallery:upload', 'gallery:list']
+PROFILER_INTERVAL = float(os.environ.get('PROFILER_INTERVAL', '0.005'))  # seconds between samples
+PROFILER_DIR = os.environ.get('PROFILER_DIR', str(BASE_DIR / 'profiles'))
+PROFILER_MAX_PROFILES = int(os.environ.get('PROFILER_MAX_PROFILES', '200'))
+PROFILER_TOKEN_MAX_AGE = 60 * 60  # seconds a signed X-Profile-Token stays valid
+
@@ -0,0 +1,58 @@
+from pathlib import Path
+
+import pytest
+
+from src.config.database import database_config, replica_configs
+
+
+def test_sqlite_is_the_default():
+    config = database_config(Path('/app'), {})
+    assert config['ENGINE'] == 'django.db.backends.sqlite3'
+    assert config['NAME'] == Path('/app/db.sqlite3')
+
+
+def test_postgresql_uses_a_health_checked_pool():
+    config = database_config(Path('/app'), {
+        'DATABASE_ENGINE': 'postgresql',
+        'POSTGRES_HOST': 'db',
+        'DB_POOL_MAX_SIZE': '16',
+    })
+    assert config['ENGINE'] == 'django.db.backends.postgresql'
+    assert config['HOST'] == 'db'
+    assert config['CONN_HEALTH_CHECKS'] is True
+    # Django rejects persistent connections combined with a pool.
+    assert config['CONN_MAX_AGE'] == 0
+    assert config['OPTIONS']['pool']['max_size'] == 16
+
+
+def test_postgresql_without_pool_keeps_persistent_connections():
+    config = database_config(Path('/app'), {
+        'DATABASE_ENGINE': 'postgresql',
+        'DB_POOL': 'False',
+        'DB_CONN_MAX_AGE': '120',
+    })
+    assert 'pool' not in config['OPTIONS']
+    assert config['CONN_MAX_AGE'] == 120
+
+
+def test_unknown_engine_is_rejected():
+    with pytest.raises(ValueError):
+        database_config(Path('/app'), {'DATABASE_ENGINE': 'mysql'})
+
+
+def test_replicas_share_the_primary_settings():
+    environ = {'DATABASE_ENGINE': 'postgresql', 'POSTGRES_HOST': 'db', 'DB_REPLICA_HOSTS': 'replica-a, replica-b:6432'}
+    primary = database_config(Path('/app'), environ)
+
+    replicas = replica_configs(primary, environ)
+
+    assert sorted(replicas) == ['replica_1', 'replica_2']
+    assert (replicas['replica_1']['HOST'], replicas['replica_1']['PORT']) == ('replica-a', '5432')
+    assert (replicas['replica_2']['HOST'], replicas['replica_2']['PORT']) == ('replica-b', '6432')
+    assert replicas['replica_2']['NAME'] == primary['NAME']
+    assert replicas['replica_2']['TEST'] == {'MIRROR': 'default'}
+
+
+def test_sqlite_has_no_replicas():
+    with pytest.raises(ValueError):
+        replica_configs(database_config(Path('/app'), {}), {'DB_REPLICA_HOSTS': 'replica-a'})
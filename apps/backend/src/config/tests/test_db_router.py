@@ -0,0 +1,159 @@
+"""
+Read replica routing, against a ``replica`` alias that mirrors the test
+database (see ``django_db_modify_db_settings`` in src/conftest.py).
+"""
+import io
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from src.config import db_router
+from src.events.models import Event
+from src.gallery.models import Photo
+
+pytestmark = pytest.mark.django_db(transaction=True, databases=['default', 'replica'])
+
+
+@pytest.fixture(autouse=True)
+def replica(settings, monkeypatch):
+    settings.DB_READ_REPLICAS = ['replica']
+    monkeypatch.setattr(db_router, '_lag_checked', {})
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def event():
+    return Event.objects.create(name='Test Wedding', code='test-wedding')
+
+
+def _gallery_reads(context):
+    return [
+        query['sql'] for query in context.captured_queries
+        if query['sql'].startswith('SELECT') and ('gallery_photo' in query['sql'] or 'events_event' in query['sql'])
+    ]
+
+
+def _list(client, event):
+    with CaptureQueriesContext(connections['default']) as primary, \
+            CaptureQueriesContext(connections['replica']) as replica:
+        response = client.get(reverse('gallery:list'), {'access_token': event.access_token})
+    assert response.status_code == status.HTTP_200_OK
+    return response, _gallery_reads(primary), _gallery_reads(replica)
+
+
+def _jpeg():
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 48)).save(buffer, format='JPEG')
+    return SimpleUploadedFile('photo.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+
+def test_listing_reads_from_the_replica(memory_storage, event):
+    _, primary, replica = _list(APIClient(), event)
+
+    assert replica
+    assert not primary
+
+
+def test_validate_token_reads_from_the_replica(event):
+    with CaptureQueriesContext(connections['replica']) as replica:
+        response = APIClient().post(reverse('events:validate'), {'access_token': event.access_token})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert _gallery_reads(replica)
+
+
+@pytest.mark.parametrize('url_name, uses_replica', [
+    ('admin:events_event_changelist', True),
+    ('admin:events_event_change', False),
+])
+def test_admin_forms_read_from_the_primary(client, event, url_name, uses_replica):
+    """
+    GIVEN an admin
+    WHEN they open the events changelist or an event's change form
+    THEN only the changelist reads from the replica, so forms are never filled from stale rows
+    """
+    client.force_login(get_user_model().objects.create_superuser('admin', 'admin@example.com', 'pw'))
+    args = [event.pk] if url_name.endswith('_change') else []
+
+    with CaptureQueriesContext(connections['default']) as primary, \
+            CaptureQueriesContext(connections['replica']) as replica:
+        response = client.get(reverse(url_name, args=args))
+
+    assert response.status_code == status.HTTP_200_OK
+    assert bool(_gallery_reads(replica)) is uses_replica
+    assert bool(_gallery_reads(primary)) is not uses_replica
+
+
+def test_upload_pins_the_client_to_the_primary(memory_storage, event):
+    """
+    GIVEN a guest who just uploaded a photo
+    WHEN they list the gallery within the pin window
+    THEN the listing reads from the primary and shows their photo
+    """
+    client = APIClient()
+    response = client.post(reverse('gallery:upload'), {
+        'access_token': event.access_token,
+        'photo': _jpeg(),
+    }, format='multipart')
+    assert response.status_code == status.HTTP_201_CREATED
+    assert response.cookies[db_router.PIN_COOKIE]['max-age'] == 10
+
+    response, primary, replica = _list(client, event)
+    assert primary
+    assert not replica
+    assert [item['id'] for item in response.json()['results']] == [Photo.objects.get().pk]
+
+    # Other guests keep reading from the replica.
+    _, primary, replica = _list(APIClient(), event)
+    assert replica
+    assert not primary
+
+
+def test_lagging_replica_is_skipped(memory_storage, event, monkeypatch):
+    """
+    GIVEN a replica further behind than DB_REPLICA_MAX_LAG_SECONDS
+    WHEN the gallery is listed
+    THEN reads go to the primary until a later check finds it caught up
+    """
+    lag = {'replica': 30.0}
+    monkeypatch.setattr(db_router, 'measure_lag', lambda alias: lag[alias])
+
+    _, primary, replica = _list(APIClient(), event)
+    assert primary
+    assert not replica
+
+    # The measurement is reused until it is DB_REPLICA_LAG_CHECK_SECONDS old.
+    lag['replica'] = 0.5
+    _, primary, replica = _list(APIClient(), event)
+    assert primary
+
+    monkeypatch.setattr(db_router, '_lag_checked', {})
+    _, primary, replica = _list(APIClient(), event)
+    assert replica
+    assert not primary
+
+
+def test_unreachable_replica_is_skipped(memory_storage, event, monkeypatch):
+    monkeypatch.setattr(db_router, 'measure_lag', lambda alias: None)
+
+    _, primary, replica = _list(APIClient(), event)
+
+    assert primary
+    assert not replica
+
+
+def test_reads_outside_requests_use_the_primary(event):
+    with CaptureQueriesContext(connections['replica']) as replica:
+        Event.objects.get(pk=event.pk)
+
+    assert not replica.captured_queries
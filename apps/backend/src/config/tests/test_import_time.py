@@ -0,0 +1,54 @@
+"""
+Startup import budget.
+
+Every gunicorn worker (without preload) and every manage.py command imports
+the whole app, so heavy dependencies are imported where they are used. These
+tests run a fresh interpreter with ``-X importtime`` and fail when startup
+pulls them in again or gets slower than the budget.
+"""
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parents[3]
+
+# Imported lazily, at the point of use.
+LAZY_MODULES = ('boto3', 'botocore.client', 's3transfer', 'PIL.Image', 'qrcode', 'magic', 'numpy', 'pillow_heif', 'cryptography')
+
+# Total import time of django.setup() plus the URLconf, under -X importtime
+# (which inflates it). Override for slow CI machines.
+BUDGET_MS = float(os.environ.get('IMPORT_TIME_BUDGET_MS', '1500'))
+
+
+@pytest.fixture(scope='module')
+def import_profile():
+    """
+    Return cumulative import time in microseconds by module, and the total.
+    """
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': 'src.config.settings'}
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import django; django.setup(); import src.config.urls'],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    modules, total = {}, 0
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        modules[name.strip()] = int(cumulative)
+        if not name.startswith('  '):
+            total += int(cumulative)
+    return modules, total
+
+
+def test_heavy_dependencies_are_not_imported_at_startup(import_profile):
+    modules, _ = import_profile
+    assert [name for name in LAZY_MODULES if name in modules] == []
+
+
+def test_startup_import_time_budget(import_profile):
+    _, total = import_profile
+    assert total / 1000 <= BUDGET_MS, f'startup imports took {total / 1000:.0f} ms, budget {BUDGET_MS:.0f} ms'
@@ -0,0 +1,80 @@
+import threading
+import time
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework import status
+
+from src.config.profiling import Profile, ProfileStore, StackSampler, make_profile_token
+
+
+@pytest.fixture
+def profiler(settings, tmp_path):
+    settings.PROFILER_ENABLED = True
+    settings.PROFILER_SAMPLE_RATE = 0
+    settings.PROFILER_INTERVAL = 0.001
+    settings.PROFILER_DIR = str(tmp_path)
+    settings.PROFILER_MAX_PROFILES = 3
+    return ProfileStore(tmp_path, 3)
+
+
+def _busy_wait(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_sampler_collects_folded_stacks():
+    sampler = StackSampler(threading.get_ident(), 0.001)
+    sampler.start()
+    _busy_wait(0.05)
+    stacks = sampler.stop()
+    assert sampler.samples > 0
+    assert any(stack.endswith('test_profiling._busy_wait') for stack in stacks)
+
+
+def test_store_keeps_only_newest_profiles(tmp_path):
+    store = ProfileStore(tmp_path, 2)
+    for index in range(4):
+        store.save(Profile(
+            id=f'p{index}', method='GET', path='/', status=200,
+            duration_ms=1.0, samples=1, created_at=1000.0 + index,
+        ))
+    assert [profile.id for profile in store.list()] == ['p3', 'p2']
+
+
+@pytest.mark.django_db
+def test_signed_header_forces_profile(client, profiler):
+    response = client.get(reverse('health'), HTTP_X_PROFILE_TOKEN=make_profile_token())
+    assert response.status_code == status.HTTP_200_OK
+    assert profiler.get(response['X-Profile-Id']) is not None
+
+
+@pytest.mark.django_db
+def test_unsigned_header_is_ignored(client, profiler):
+    response = client.get(reverse('health'), HTTP_X_PROFILE_TOKEN='profile:forged')
+    assert 'X-Profile-Id' not in response
+    assert profiler.list() == []
+
+
+@pytest.mark.django_db
+def test_random_sampling_only_covers_configured_views(client, profiler, settings):
+    settings.PROFILER_SAMPLE_RATE = 1
+    settings.PROFILER_VIEWS = ['health']
+    assert 'X-Profile-Id' in client.get(reverse('health'))
+    assert 'X-Profile-Id' not in client.get(reverse('gallery:upload-limit'))
+
+
+@pytest.mark.django_db
+def test_profiles_are_browsable_from_admin(client, profiler):
+    profile_id = client.get(reverse('health'), HTTP_X_PROFILE_TOKEN=make_profile_token())['X-Profile-Id']
+
+    assert client.get(reverse('admin-profiles')).status_code == status.HTTP_302_FOUND
+
+    admin_user = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'pw')
+    client.force_login(admin_user)
+    listing = client.get(reverse('admin-profiles'))
+    assert profile_id in listing.content.decode()
+    download = client.get(reverse('admin-profile-download', args=[profile_id]))
+    assert download['Content-Type'].startswith('text/plain')
@@ -0,0 +1,49 @@
+import io
+
+import pytest
+from django.core.management import call_command
+
+from src.events.models import Event
+from src.gallery.models import Photo
+
+
+@pytest.fixture
+def event(transactional_db):
+    event = Event.objects.create(name='Test Wedding', code='test-wedding')
+    for number in range(3):
+        Photo.objects.create(
+            event=event,
+            file_key=f'test-wedding/originals/{number}.jpg',
+            thumbnail_key=f'test-wedding/thumbnails/{number}_thumbnail.jpg',
+            fullscreen_key=f'test-wedding/fullscreen/{number}_fullscreen.jpg',
+        )
+    return event
+
+
+def test_load_test_reports_each_target(live_server, memory_storage, event, settings):
+    """
+    GIVEN a running backend
+    WHEN it is load tested at two concurrency levels with some uploads
+    THEN each level is reported and the sustained level is summarised
+    """
+    settings.UPLOAD_CLIENT_RATE = settings.UPLOAD_EVENT_RATE = 0
+    stdout = io.StringIO()
+
+    call_command(
+        'run_load_test',
+        '--target', f'wsgi={live_server.url}',
+        '--event', event.code,
+        '--concurrency', '1,3',
+        '--requests', '12',
+        '--upload-share', '0.25',
+        '--upload-kb', '20',
+        '--slo-ms', '60000',
+        stdout=stdout,
+    )
+
+    output = stdout.getvalue()
+    rows = [line.split() for line in output.splitlines() if line.split()[:1] in (['1'], ['3'])]
+    assert [row[0] for row in rows] == ['1', '3']
+    assert all(row[-1] == '0' for row in rows)  # no failed requests
+    assert 'wsgi: sustains 3 concurrent clients' in output
+    assert Photo.objects.filter(event=event).count() > 3
@@ -0,0 +1,101 @@
+import multiprocessing
+
+import pytest
+from django.db import connections
+
+from src.config.database import database_config
+from src.config.transactions import retry_write
+from src.events.models import Event
+from src.gallery.models import GalleryManifest, Photo, SpriteSheet, TimelineBucket
+
+UPLOADERS = 8
+UPLOADS_PER_CLIENT = 25
+
+
+@pytest.fixture
+def file_db(tmp_path, django_db_blocker):
+    """
+    A throwaway on-disk SQLite database configured like production.
+
+    The test database is in-memory, which has different locking behaviour,
+    so the stress test needs a real file. It lives outside the test
+    transaction, so access is unblocked by hand instead of via django_db.
+    """
+    alias = 'sqlite_stress'
+    config = database_config(tmp_path, {'SQLITE_PATH': str(tmp_path / 'stress.sqlite3')})
+    connections.settings[alias] = connections.configure_settings(
+        {'default': connections.settings['default'], alias: config}
+    )[alias]
+    with django_db_blocker.unblock():
+        with connections[alias].schema_editor() as editor:
+            editor.create_model(Event)
+            editor.create_model(SpriteSheet)
+            editor.create_model(Photo)
+            editor.create_model(GalleryManifest)
+            editor.create_model(TimelineBucket)
+        yield alias
+        connections[alias].close()
+    del connections[alias]
+    del connections.settings[alias]
+
+
+def test_connection_uses_wal(file_db):
+    with connections[file_db].cursor() as cursor:
+        cursor.execute('PRAGMA journal_mode')
+        assert cursor.fetchone()[0] == 'wal'
+        cursor.execute('PRAGMA synchronous')
+        assert cursor.fetchone()[0] == 1  # NORMAL
+
+
+def _uploader(file_db, event_id, client_id, start):
+    """
+    One uploader process, writing through its own connection to the file
+    database. An error fails the process, and so its exit code.
+    """
+    try:
+        start.wait()
+        for index in range(UPLOADS_PER_CLIENT):
+            photo = Photo(event_id=event_id, original_filename=f'{client_id}-{index}.jpg')
+            photo.save(using=file_db)
+            retry_write(
+                file_db,
+                Photo.objects.using(file_db).filter(pk=photo.pk).update,
+                thumbnail_key=f'stress/thumbnails/{photo.pk}.jpg',
+            )
+    finally:
+        connections[file_db].close()
+
+
+def test_parallel_uploaders_never_see_lock_errors(file_db):
+    """
+    GIVEN several processes acting as parallel uploaders
+    WHEN each creates photos and then updates their rendition keys
+    THEN every write succeeds without "database is locked" errors.
+
+    Processes, not threads: retry_write serializes the writes of threads
+    in one process on a lock, so only separate processes contend for the
+    file lock the way several workers do.
+    """
+    event = Event(name='Stress', code='stress')
+    event.save(using=file_db)
+    # Forked uploaders inherit the configured alias but must not share its
+    # connection.
+    connections[file_db].close()
+    context = multiprocessing.get_context('fork')
+    start = context.Barrier(UPLOADERS)
+    uploaders = [
+        context.Process(target=_uploader, args=(file_db, event.pk, client_id, start))
+        for client_id in range(UPLOADERS)
+    ]
+    for uploader in uploaders:
+        uploader.start()
+    for uploader in uploaders:
+        uploader.join()
+
+    assert [uploader.exitcode for uploader in uploaders] == [0] * UPLOADERS
+    photos = Photo.objects.using(file_db)
+    assert photos.count() == UPLOADERS * UPLOADS_PER_CLIENT
+    assert not photos.filter(thumbnail_key='').exists()
+    # Concurrent recounts of the same timeline bucket from other processes
+    # do not lose uploads.
+    assert sum(TimelineBucket.objects.using(file_db).values_list('count', flat=True)) == photos.count()
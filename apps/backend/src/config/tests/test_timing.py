@@ -0,0 +1,85 @@
+import pytest
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.test import AsyncClient
+from django.urls import reverse
+from django.utils.module_loading import import_string
+from rest_framework import status
+
+from src.config.timing import RequestTimings, timed
+
+
+@pytest.mark.django_db
+def test_server_timing_header_includes_db(client):
+    """
+    GIVEN a request that queries the database
+    WHEN the response is returned
+    THEN the Server-Timing header contains a db entry and the total.
+    """
+    response = client.post(reverse('events:validate'), {'access_token': 'nope'})
+    header = response['Server-Timing']
+    assert header.startswith('db;dur=')
+    assert 'total;dur=' in header
+
+
+@pytest.mark.django_db
+def test_server_timing_header_under_asgi():
+    """
+    GIVEN the project middleware running in async mode
+    WHEN a request is served
+    THEN it is timed as in sync mode.
+    """
+    response = async_to_sync(AsyncClient().post)(reverse('events:validate'), {'access_token': 'nope'})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    assert 'total;dur=' in response['Server-Timing']
+
+
+@pytest.mark.parametrize('path', [path for path in settings.MIDDLEWARE if path.startswith('src.')])
+def test_project_middleware_runs_async_under_asgi(path):
+    async def get_response(request):
+        pass
+
+    middleware = import_string(path)
+    assert middleware.async_capable
+    assert iscoroutinefunction(middleware(get_response))
+
+
+def test_timed_counts_errors():
+    """
+    GIVEN a timed block
+    WHEN it raises
+    THEN the failure is counted against that operation.
+    """
+    from src.config import metrics
+
+    errors = metrics.OPERATION_ERRORS.labels('storage', 'test')
+    before = errors._value.get()
+    with pytest.raises(ValueError):
+        with timed('storage', 'test'):
+            raise ValueError
+    assert errors._value.get() == before + 1
+
+
+def test_header_value_aggregates_per_category():
+    timings = RequestTimings()
+    timings.add('sign', 0.002)
+    timings.add('sign', 0.003)
+    assert timings.header_value(0.01) == 'sign;dur=5.0;desc="2 calls", total;dur=10.0'
+
+
+@pytest.mark.django_db
+def test_metrics_endpoint_exposes_histograms(client):
+    client.get(reverse('health'))
+    response = client.get(reverse('metrics'))
+    assert response.status_code == status.HTTP_200_OK
+    body = response.content.decode()
+    assert 'gallery_request_duration_seconds_bucket' in body
+    assert 'view="health"' in body
+
+
+@pytest.mark.django_db
+def test_metrics_endpoint_requires_token_when_configured(client, settings):
+    settings.METRICS_TOKEN = 'secret'
+    assert client.get(reverse('metrics')).status_code == status.HTTP_401_UNAUTHORIZED
+    response = client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+    assert response.status_code == status.HTTP_200_OK
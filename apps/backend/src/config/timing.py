@@ -0,0 +1,89 @@
+"""
+Timing instrumentation for requests and the operations they perform.
+
+Wrap anything worth measuring in ``timed(category, operation)``. Each span is
+observed in the Prometheus histograms and, when it happens inside a request,
+added to that request's ``Server-Timing`` header by
+``RequestTimingMiddleware``.
+
+Categories are kept to a small fixed set so the header stays readable:
+``db``, ``storage``, ``image`` and ``sign``.
+"""
+
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from src.config import metrics
+
+
+class RequestTimings:
+    """
+    Accumulated time per category for a single request.
+    """
+
+    def __init__(self):
+        self.durations: dict[str, float] = {}
+        self.counts: dict[str, int] = {}
+
+    def add(self, category: str, duration: float) -> None:
+        self.durations[category] = self.durations.get(category, 0.0) + duration
+        self.counts[category] = self.counts.get(category, 0) + 1
+
+    def header_value(self, total: float) -> str:
+        """
+        Render the ``Server-Timing`` header value, durations in milliseconds.
+        """
+        parts = [
+            f'{category};dur={duration * 1000:.1f};desc="{self.counts[category]} calls"'
+            for category, duration in self.durations.items()
+        ]
+        parts.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(parts)
+
+
+_current_timings: ContextVar[RequestTimings | None] = ContextVar("request_timings", default=None)
+
+
+def start_request() -> tuple[RequestTimings, object]:
+    """
+    Begin collecting timings for the current request.
+
+    Returns the collector and a reset token for ``finish_request``.
+    """
+    timings = RequestTimings()
+    return timings, _current_timings.set(timings)
+
+
+def finish_request(token) -> None:
+    _current_timings.reset(token)
+
+
+def record(category: str, operation: str, duration: float, failed: bool = False) -> None:
+    """
+    Record a finished span.
+    """
+    metrics.OPERATION_DURATION.labels(category, operation).observe(duration)
+    if failed:
+        metrics.OPERATION_ERRORS.labels(category, operation).inc()
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.add(category, duration)
+
+
+@contextmanager
+def timed(category: str, operation: str):
+    """
+    Time the enclosed block. Also usable as a decorator.
+    """
+    failed = False
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        record(category, operation, time.perf_counter() - start, failed)
@@ -0,0 +1,61 @@
+"""
+Helpers for short write transactions.
+
+On SQLite only one connection can write at a time. The connection options in
+``src.config.database`` make writers wait for each other, and ``retry_write``
+adds two more layers for bursts of uploads:
+
+* writes from threads of the same process are serialized on a lock, so they
+  queue in Python instead of all contending for the file lock;
+* a write that still fails with "database is locked" is retried with
+  exponential backoff.
+
+On other databases ``retry_write`` simply runs the function in a transaction.
+"""
+
+from __future__ import annotations
+
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import OperationalError, connections, transaction
+
+_sqlite_write_lock = threading.Lock()
+
+
+def is_lock_error(exc: Exception) -> bool:
+    message = str(exc).lower()
+    return isinstance(exc, OperationalError) and (
+        "database is locked" in message or "database table is locked" in message
+    )
+
+
+def retry_write(using, func, /, *args, **kwargs):
+    """
+    Call ``func(*args, **kwargs)`` as one short write transaction on ``using``.
+
+    Keep the function small: it must not do slow work (storage uploads,
+    image processing) since other writers wait for it.
+    """
+    connection = connections[using]
+    if connection.vendor != "sqlite":
+        with transaction.atomic(using=using):
+            return func(*args, **kwargs)
+
+    if connection.in_atomic_block:
+        # Retrying only part of an outer transaction is not possible; leave
+        # it to whoever owns the transaction.
+        return func(*args, **kwargs)
+
+    attempts = settings.SQLITE_WRITE_RETRIES
+    for attempt in range(attempts):
+        try:
+            with _sqlite_write_lock, transaction.atomic(using=using):
+                return func(*args, **kwargs)
+        except OperationalError as e:
+            if not is_lock_error(e) or attempt == attempts - 1:
+                raise
+        delay = settings.SQLITE_WRITE_RETRY_BACKOFF * (2 ** attempt)
+        time.sleep(delay * random.uniform(0.5, 1.5))
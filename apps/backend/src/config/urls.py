@@ -5,6 +5,8 @@ from django.contrib import admin
 from django.urls import path, include
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
+from src.config.metrics import metrics_view
+from src.config.profiling import profile_download_view, profile_list_view
 
 @api_view(['GET'])
 def health_check(request):
@@ -12,8 +14,15 @@ def health_check(request):
     return Response({'status': 'ok', 'service': 'backend'})
 
 urlpatterns = [
+    path('admin/profiles/', admin.site.admin_view(profile_list_view), name='admin-profiles'),
+    path(
+        'admin/profiles/<str:profile_id>/',
+        admin.site.admin_view(profile_download_view),
+        name='admin-profile-download',
+    ),
     path('admin/', admin.site.urls),
     path('api/health/', health_check, name='health'),
+    path('api/metrics/', metrics_view, name='metrics'),
     path('api/events/', include('src.events.urls')),
     path('api/gallery/', include('src.gallery.urls')),
 ]
@@ -0,0 +1,148 @@
+"""
+Fixtures shared by the test suites of all apps.
+"""
+import datetime
+import hashlib
+import uuid
+from types import SimpleNamespace
+
+import botocore.auth
+import pytest
+from botocore.exceptions import ClientError
+
+from src.uploads import storage as storage_module
+
+FROZEN_NOW = datetime.datetime(2026, 1, 3, 18, 30, 0)
+
+
+class FrozenDatetime(datetime.datetime):
+    @classmethod
+    def utcnow(cls):
+        return FROZEN_NOW
+
+    @classmethod
+    def now(cls, tz=None):
+        return FROZEN_NOW.replace(tzinfo=tz)
+
+
+@pytest.fixture(scope='session')
+def django_db_modify_db_settings(django_db_modify_db_settings_parallel_suffix):
+    """
+    Add a ``replica`` database mirroring ``default``, for the read replica
+    router tests. Reads only go to it when DB_READ_REPLICAS names it.
+    """
+    from django.conf import settings
+
+    default = settings.DATABASES['default']
+    settings.DATABASES['replica'] = {
+        **default,
+        'OPTIONS': {**default.get('OPTIONS', {})},
+        'TEST': {**default['TEST'], 'MIRROR': 'default'},
+    }
+
+
+@pytest.fixture
+def storage(monkeypatch):
+    """
+    A real StorageClient with fixed credentials and a frozen signing clock,
+    so presigned URLs are deterministic. Nothing here talks to the network.
+    """
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'AKIDEXAMPLE')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'wJalrXUtnFEMI/K7MDENG+bPxRfiCYEXAMPLEKEY')
+    monkeypatch.setattr(storage_module, '_storage_client', None)
+    monkeypatch.setattr(botocore.auth, 'datetime', SimpleNamespace(datetime=FrozenDatetime))
+    monkeypatch.setattr(storage_module, 'datetime', FrozenDatetime)
+    return storage_module.get_storage_client()
+
+
+class MemoryStorage:
+    """
+    In-memory stand-in for StorageClient, for tests that store and read
+    objects (uploads, renditions) rather than only sign URLs.
+    """
+
+    bucket_name = 'test-bucket'
+
+    def __init__(self):
+        self.objects = {}
+        self.content_types = {}
+        self.multipart_uploads = {}
+        self.last_modified = {}
+        self.range_requests = []
+
+    def upload_fileobj(self, fileobj, key, content_type=None, cache_control=None):
+        self.objects[key] = fileobj.read()
+        self.content_types[key] = content_type
+
+    def upload_file(self, file_key, file_content, content_type=None):
+        self.objects[file_key] = file_content
+        self.content_types[file_key] = content_type
+
+    def list_objects(self, prefix=''):
+        for key in sorted(self.objects):
+            if key.startswith(prefix):
+                last_modified = self.last_modified.get(key, datetime.datetime.now(datetime.timezone.utc))
+                yield {'Key': key, 'LastModified': last_modified, 'Size': len(self.objects[key])}
+
+    def list_prefixes(self, prefix='', delimiter='/'):
+        return sorted({
+            prefix + key[len(prefix):].split(delimiter)[0] + delimiter
+            for key in self.objects
+            if key.startswith(prefix) and delimiter in key[len(prefix):]
+        })
+
+    def delete_objects(self, keys):
+        assert len(keys) <= storage_module.DELETE_BATCH_SIZE
+        for key in keys:
+            self.objects.pop(key, None)
+        return []
+
+    def download_fileobj(self, key, fileobj):
+        if key not in self.objects:
+            raise ClientError({'Error': {'Code': '404', 'Message': 'Not Found'}}, 'HeadObject')
+        fileobj.write(self.objects[key])
+
+    def object_size(self, key):
+        return len(self.objects[key]) if key in self.objects else None
+
+    def get_range(self, key, start, length):
+        self.range_requests.append((key, start, length))
+        return self.objects[key][start:start + length]
+
+    def create_multipart_upload(self, key, content_type=None):
+        upload_id = uuid.uuid4().hex
+        self.multipart_uploads[upload_id] = {'key': key, 'content_type': content_type, 'parts': {}}
+        return upload_id
+
+    def upload_part(self, key, upload_id, part_number, body):
+        self.multipart_uploads[upload_id]['parts'][part_number] = bytes(body)
+        return f'"{hashlib.md5(body).hexdigest()}"'
+
+    def complete_multipart_upload(self, key, upload_id, parts):
+        if upload_id not in self.multipart_uploads:
+            raise ClientError({'Error': {'Code': 'NoSuchUpload', 'Message': 'Not Found'}}, 'CompleteMultipartUpload')
+        upload = self.multipart_uploads.pop(upload_id)
+        stored = upload['parts']
+        for part in parts:
+            assert part['ETag'] == f'"{hashlib.md5(stored[part["PartNumber"]]).hexdigest()}"'
+        self.objects[key] = b''.join(stored[part['PartNumber']] for part in parts)
+        self.content_types[key] = upload['content_type']
+
+    def abort_multipart_upload(self, key, upload_id):
+        del self.multipart_uploads[upload_id]
+
+    def generate_presigned_url(self, key, expires_in=3600):
+        return f'https://storage.test/{key}'
+
+    def generate_presigned_urls(self, keys, expires_in=3600, signed_at=None):
+        return {key: self.generate_presigned_url(key, expires_in) for key in keys}
+
+
+@pytest.fixture
+def memory_storage(monkeypatch):
+    """
+    Replace the storage client singleton with a MemoryStorage.
+    """
+    memory = MemoryStorage()
+    monkeypatch.setattr(storage_module, '_storage_client', memory)
+    return memory
@@ -3,7 +3,6 @@ Admin registrations for the events application.
 """
 from io import BytesIO
 
-import qrcode
 from django.contrib import admin
 from django.http import HttpResponse
 from django.urls import path, reverse
@@ -20,12 +19,12 @@ class EventAdmin(admin.ModelAdmin):
     list_display = ("name", "qr_code_thumbnail", "code", "date", "is_active", "photo_count")
     list_filter = ("is_active", "date", "created_at")
     search_fields = ("name", "code", "description")
-    readonly_fields = ("access_token", "created_at", "updated_at", "access_url")
+    readonly_fields = ("access_token", "created_at", "updated_at", "packed_at", "access_url")
 
     fieldsets = (
         ("Basic Information", {"fields": ("name", "code", "description", "date", "is_active")}),
         ("Access Information", {"fields": ("access_token", "access_url")}),
-        ("Timestamps", {"fields": ("created_at", "updated_at"), "classes": ("collapse",)}),
+        ("Timestamps", {"fields": ("created_at", "updated_at", "packed_at"), "classes": ("collapse",)}),
     )
 
     def get_urls(self):
@@ -40,6 +39,8 @@ class EventAdmin(admin.ModelAdmin):
         return custom_urls + urls
 
     def serve_qr_code(self, request, object_id):
+        import qrcode
+
         event = self.get_object(request, object_id)
         if event is None:
             return HttpResponse(status=404)
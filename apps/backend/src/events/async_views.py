@@ -0,0 +1,52 @@
+"""
+Async versions of the event views, served under ASGI (see
+src/gallery/async_views.py). Same parameters and responses as views.py.
+"""
+from rest_framework import status
+from rest_framework.response import Response
+from src.config.async_api import async_api_view
+from src.config.db_router import replica_reads
+from src.uploads.cloudfront import set_event_cookies
+from .models import Event
+from .serializers import EventValidationSerializer, EventDetailSerializer
+
+
+@replica_reads
+@async_api_view(['POST'])
+async def validate_token(request):
+    """
+    Validate an event access token.
+    Returns event details if token is valid, and sets the event's
+    CloudFront signed cookies when reads are authorized by cookies.
+    """
+    serializer = EventValidationSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    access_token = serializer.validated_data['access_token']
+
+    try:
+        event = await Event.objects.aget(access_token=access_token, is_active=True)
+    except Event.DoesNotExist:
+        return Response({
+            'valid': False,
+            'error': 'Invalid or inactive access token'
+        }, status=status.HTTP_401_UNAUTHORIZED)
+    return set_event_cookies(Response({
+        'valid': True,
+        'event': EventDetailSerializer(event).data
+    }), event.code)
+
+
+@async_api_view(['GET'])
+async def event_details(request, access_token):
+    """
+    Get event details by access token.
+    """
+    try:
+        event = await Event.objects.aget(access_token=access_token, is_active=True)
+    except Event.DoesNotExist:
+        return Response({
+            'error': 'Invalid or inactive access token'
+        }, status=status.HTTP_404_NOT_FOUND)
+    return Response(EventDetailSerializer(event).data)
@@ -2,46 +2,73 @@
 Decorators for event-based authentication.
 """
 from functools import wraps
+from asgiref.sync import iscoroutinefunction
 from rest_framework.response import Response
 from rest_framework import status
 from .models import Event
 
 
+def _access_token(request, token_location):
+    # Get access token from appropriate location
+    if token_location == 'query':
+        return request.query_params.get('access_token')
+    return request.data.get('access_token')  # 'data'
+
+
+def _missing_token():
+    return Response({
+        'error': 'access_token is required'
+    }, status=status.HTTP_400_BAD_REQUEST)
+
+
+def _invalid_token():
+    return Response({
+        'error': 'Invalid or inactive access token'
+    }, status=status.HTTP_401_UNAUTHORIZED)
+
+
 def require_event_token(token_location='data'):
     """
     Decorator to validate event access token.
-    
+
     Args:
         token_location: Where to find the token - 'data' for POST body, 'query' for GET params
-    
+
     The validated event will be passed as 'event' kwarg to the view function.
+    Works on sync views and on async views (see src/config/async_api.py),
+    which look the event up through the async ORM.
     """
     def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                access_token = _access_token(request, token_location)
+                if not access_token:
+                    return _missing_token()
+                try:
+                    event = await Event.objects.aget(access_token=access_token, is_active=True)
+                except Event.DoesNotExist:
+                    return _invalid_token()
+                kwargs['event'] = event
+                return await view_func(request, *args, **kwargs)
+
+            return async_wrapper
+
         @wraps(view_func)
         def wrapper(request, *args, **kwargs):
-            # Get access token from appropriate location
-            if token_location == 'query':
-                access_token = request.query_params.get('access_token')
-            else:  # 'data'
-                access_token = request.data.get('access_token')
-            
+            access_token = _access_token(request, token_location)
             if not access_token:
-                return Response({
-                    'error': 'access_token is required'
-                }, status=status.HTTP_400_BAD_REQUEST)
-            
+                return _missing_token()
+
             # Validate event
             try:
                 event = Event.objects.get(access_token=access_token, is_active=True)
             except Event.DoesNotExist:
-                return Response({
-                    'error': 'Invalid or inactive access token'
-                }, status=status.HTTP_401_UNAUTHORIZED)
-            
+                return _invalid_token()
+
             # Pass event to the view
             kwargs['event'] = event
             return view_func(request, *args, **kwargs)
-        
+
         return wrapper
     return decorator
-
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 15:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='packed_at',
+            field=models.DateTimeField(blank=True, editable=False, help_text='When renditions were last packed (src/gallery/packs.py); null while the event has no pack.', null=True),
+        ),
+    ]
@@ -35,6 +35,12 @@ class Event(models.Model):
     )
     date = models.DateField(null=True, blank=True)
     is_active = models.BooleanField(default=True)
+    packed_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="When renditions were last packed (src/gallery/packs.py); null while the event has no pack.",
+    )
     created_at = models.DateTimeField(default=timezone.now, editable=False)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -1,7 +1,9 @@
 import pytest
+from asgiref.sync import async_to_sync
 from django.urls import reverse
 from rest_framework import status
-from rest_framework.test import APIClient
+from rest_framework.test import APIClient, APIRequestFactory
+from src.events import async_views, views
 from src.events.models import Event
 
 @pytest.mark.django_db
@@ -58,3 +60,29 @@ class TestEventAPI:
         
         assert response.status_code == status.HTTP_404_NOT_FOUND
 
+
+def _render(response):
+    return response.status_code, response.render().content
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('valid', [True, False])
+def test_async_views_match_the_sync_views(valid):
+    """
+    GIVEN an event
+    WHEN a token is validated and details fetched by the sync and async views
+    THEN the responses are identical
+    """
+    event = Event.objects.create(name="Test Wedding", code="test-wedding", date="2024-01-01")
+    token = event.access_token if valid else 'invalid-token'
+    factory = APIRequestFactory()
+
+    def validate():
+        return factory.post('/api/events/validate/', {'access_token': token}, format='json')
+
+    assert _render(async_to_sync(async_views.validate_token)(validate())) == _render(views.validate_token(validate()))
+
+    details = factory.get(f'/api/events/{token}/')
+    assert _render(async_to_sync(async_views.event_details)(details, access_token=token)) == _render(
+        views.event_details(factory.get(f'/api/events/{token}/'), access_token=token)
+    )
@@ -1,11 +1,15 @@
 """URL patterns for the events application."""
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+
+# Under ASGI the views are served by their async versions.
+io_views = async_views if settings.ASYNC_VIEWS else views
 
 app_name = "events"
 
 urlpatterns = [
-    path('validate/', views.validate_token, name='validate'),
-    path('<str:access_token>/', views.event_details, name='details'),
+    path('validate/', io_views.validate_token, name='validate'),
+    path('<str:access_token>/', io_views.event_details, name='details'),
 ]
 
@@ -4,15 +4,19 @@ Views for the events application.
 from rest_framework import status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
+from src.config.db_router import replica_reads
+from src.uploads.cloudfront import set_event_cookies
 from .models import Event
 from .serializers import EventValidationSerializer, EventDetailSerializer
 
 
+@replica_reads
 @api_view(['POST'])
 def validate_token(request):
     """
     Validate an event access token.
-    Returns event details if token is valid.
+    Returns event details if token is valid, and sets the event's
+    CloudFront signed cookies when reads are authorized by cookies.
     """
     serializer = EventValidationSerializer(data=request.data)
     if not serializer.is_valid():
@@ -23,10 +27,10 @@ def validate_token(request):
     try:
         event = Event.objects.get(access_token=access_token, is_active=True)
         event_serializer = EventDetailSerializer(event)
-        return Response({
+        return set_event_cookies(Response({
             'valid': True,
             'event': event_serializer.data
-        })
+        }), event.code)
     except Event.DoesNotExist:
         return Response({
             'valid': False,
@@ -1,10 +1,15 @@
 """
 Admin registrations for the gallery application.
 """
+import csv
+from itertools import chain
+
 from django.contrib import admin
+from django.http import StreamingHttpResponse
 from django.utils.html import format_html
 
-from .models import Photo
+from .models import Photo, UploadSession
+from .signals import photos_changed
 
 
 @admin.register(Photo)
@@ -23,16 +28,52 @@ class PhotoAdmin(admin.ModelAdmin):
     list_filter = ("event", "uploaded_at", "content_type", "moderation_status")
     search_fields = ("original_filename", "event__name")
     readonly_fields = ("file_key", "uploaded_at", "file_size", "content_type", "moderated_at")
-    actions = ["approve_photos", "reject_photos"]
+    actions = ["approve_photos", "reject_photos", "export_csv"]
+    export_columns = (
+        "id",
+        "event__code",
+        "original_filename",
+        "file_key",
+        "file_size",
+        "content_type",
+        "moderation_status",
+        "uploaded_at",
+    )
 
     def approve_photos(self, request, queryset):
-        queryset.update(moderation_status=Photo.ModerationStatus.APPROVED)
+        self._moderate(queryset, Photo.ModerationStatus.APPROVED)
     approve_photos.short_description = "Approve selected photos"
 
     def reject_photos(self, request, queryset):
-        queryset.update(moderation_status=Photo.ModerationStatus.REJECTED)
+        self._moderate(queryset, Photo.ModerationStatus.REJECTED)
     reject_photos.short_description = "Reject selected photos"
 
+    def _moderate(self, queryset, moderation_status):
+        photo_ids_by_event = {}
+        for event_id, photo_id in queryset.values_list("event_id", "pk"):
+            photo_ids_by_event.setdefault(event_id, []).append(photo_id)
+        queryset.update(moderation_status=moderation_status)
+        # queryset.update() skips Photo.save(), so announce the change here.
+        for event_id, photo_ids in photo_ids_by_event.items():
+            photos_changed.send(sender=Photo, event_id=event_id, photo_ids=photo_ids, using=queryset.db)
+
+    def export_csv(self, request, queryset):
+        """
+        Stream the selected photos as CSV.
+
+        Rows are read with .iterator(), which uses a server-side cursor on
+        PostgreSQL, so exporting a whole event never loads it into memory.
+        """
+        writer = csv.writer(_Echo())
+        rows = queryset.order_by("pk").values_list(*self.export_columns).iterator(chunk_size=2000)
+        response = StreamingHttpResponse(
+            (writer.writerow(row) for row in chain([self.export_columns], rows)),
+            content_type="text/csv",
+        )
+        response["Content-Disposition"] = 'attachment; filename="photos.csv"'
+        return response
+    export_csv.short_description = "Export selected photos as CSV"
+
     def thumbnail_preview(self, obj):
         if obj.file_key:
             return format_html(
@@ -53,3 +94,23 @@ class PhotoAdmin(admin.ModelAdmin):
             size /= 1024.0
         return f"{size:.1f} TB"
     file_size_display.short_description = "Size"
+
+
+class _Echo:
+    """File-like object whose write() returns the value, for streaming csv.writer output."""
+
+    def write(self, value):
+        return value
+
+
+@admin.register(UploadSession)
+class UploadSessionAdmin(admin.ModelAdmin):
+    """Read-only view of resumable uploads, for following progress and expiry."""
+
+    list_display = ["original_filename", "event", "offset", "length", "photo", "created_at", "expires_at"]
+    list_filter = ("event",)
+    search_fields = ("original_filename",)
+    readonly_fields = [field.name for field in UploadSession._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
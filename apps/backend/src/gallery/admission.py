@@ -0,0 +1,318 @@
+"""
+Admission control for photo uploads.
+
+Every upload is decoded by Pillow inside the gunicorn worker, once per
+rendition. A burst of guests uploading at the same time (after the first
+dance, say) would otherwise decode dozens of 24 MP images at once and run the
+worker out of memory. Uploads therefore pass two checks before any work is
+done:
+
+* a token bucket per client and one per event cap the sustained upload rate
+  (429 with ``Retry-After`` when empty);
+* a per-process gate bounds how many uploads are processed at once and how
+  much decoded image memory they may hold together. Uploads wait a short
+  while for room and are turned away with 503 and ``Retry-After`` when the
+  worker stays saturated.
+
+Buckets live in the Django cache, so with a shared cache (Redis, Memcached)
+they apply across workers; with the default local-memory cache they are
+per process. Updates are read-modify-write, which may let a few extra
+uploads through under heavy contention – fine for rate limiting.
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+from src.config import metrics
+from src.gallery.encoding import search_working_bytes
+from src.uploads.validation import register_heif_opener
+
+# Bytes per decoded pixel (RGBA worst case).
+_BYTES_PER_PIXEL = 4
+# Decoded size relative to encoded size when the dimensions are unknown;
+# camera JPEGs typically compress about 10:1.
+_DECODED_EXPANSION = 10
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised when the processing gate has no room within the wait timeout.
+    """
+
+
+class ProcessingGate:
+    """
+    A counting semaphore that also budgets memory.
+
+    At most ``max_concurrent`` holders at a time, and their estimated memory
+    may not exceed ``memory_budget`` bytes together – except that a single
+    holder is always admitted, so an image larger than the whole budget is
+    processed alone instead of never.
+
+    The gate is reentrant per thread: processing started inside an admitted
+    upload (renditions generated by ``Photo.save``) does not wait for a
+    second slot.
+    """
+
+    def __init__(self, max_concurrent: int, memory_budget: int):
+        self.max_concurrent = max_concurrent
+        self.memory_budget = memory_budget
+        self.active = 0
+        self.reserved = 0
+        self.waiting = 0
+        self._condition = threading.Condition()
+        self._local = threading.local()
+
+    def _has_room(self, estimated_bytes: int) -> bool:
+        if self.active == 0:
+            return True
+        return (
+            self.active < self.max_concurrent
+            and self.reserved + estimated_bytes <= self.memory_budget
+        )
+
+    def _acquire(self, estimated_bytes: int, timeout: float | None) -> None:
+        if getattr(self._local, "depth", 0):
+            self._local.depth += 1
+            return
+
+        with self._condition:
+            self.waiting += 1
+            metrics.ADMISSION_QUEUE_DEPTH.inc()
+            try:
+                admitted = self._condition.wait_for(
+                    lambda: self._has_room(estimated_bytes), timeout
+                )
+            finally:
+                self.waiting -= 1
+                metrics.ADMISSION_QUEUE_DEPTH.dec()
+            if not admitted:
+                raise AdmissionRejected()
+            self.active += 1
+            self.reserved += estimated_bytes
+        metrics.ADMISSION_IN_FLIGHT.inc()
+        metrics.ADMISSION_RESERVED_BYTES.inc(estimated_bytes)
+        self._local.depth = 1
+
+    def _release(self, estimated_bytes: int) -> None:
+        self._local.depth -= 1
+        if self._local.depth:
+            return
+        metrics.ADMISSION_IN_FLIGHT.dec()
+        metrics.ADMISSION_RESERVED_BYTES.dec(estimated_bytes)
+        with self._condition:
+            self.active -= 1
+            self.reserved -= estimated_bytes
+            self._condition.notify_all()
+
+    @contextmanager
+    def admit(self, estimated_bytes: int, timeout: float | None = None):
+        """
+        Hold a processing slot reserving ``estimated_bytes``.
+
+        Waits up to ``timeout`` seconds (forever if ``None``) and raises
+        ``AdmissionRejected`` if no room frees up.
+        """
+        self._acquire(estimated_bytes, timeout)
+        try:
+            yield
+        finally:
+            self._release(estimated_bytes)
+
+    @asynccontextmanager
+    async def aadmit(self, estimated_bytes: int, timeout: float | None = None):
+        """
+        ``admit`` for async views: waits in the request's thread rather than
+        on the event loop. That thread is the one running the request's
+        synchronous work (``sync_to_async`` calls, which are thread
+        sensitive), so processing inside is admitted like in ``admit``.
+        """
+        await sync_to_async(self._acquire)(estimated_bytes, timeout)
+        try:
+            yield
+        finally:
+            await sync_to_async(self._release)(estimated_bytes)
+
+
+_processing_gate: ProcessingGate | None = None
+_processing_gate_lock = threading.Lock()
+
+
+def get_processing_gate() -> ProcessingGate:
+    """
+    Return the gate shared by all threads of this process.
+    """
+    global _processing_gate
+    if _processing_gate is None:
+        with _processing_gate_lock:
+            if _processing_gate is None:
+                _processing_gate = ProcessingGate(
+                    settings.UPLOAD_MAX_CONCURRENT_PROCESSING,
+                    settings.UPLOAD_MEMORY_BUDGET_MB * 1024 * 1024,
+                )
+    return _processing_gate
+
+
+def estimate_processing_bytes(file_size: int, fileobj=None) -> int:
+    """
+    Estimate the peak memory needed to process an uploaded image.
+
+    With ``fileobj`` only the image header is read to get its dimensions;
+    without it (or for files Pillow cannot read) the decoded size is guessed
+    from the encoded one. The encoded bytes are held a few times over
+    (request body, storage upload, rendition downloads), plus the bitmap
+    and the working set of the rendition quality search.
+    """
+    decoded_bytes = file_size * _DECODED_EXPANSION
+    if fileobj is not None:
+        from PIL import Image
+
+        register_heif_opener()
+        try:
+            position = fileobj.tell()
+            try:
+                with Image.open(fileobj) as img:
+                    width, height = img.size
+                    decoded_bytes = width * height * _BYTES_PER_PIXEL
+            finally:
+                fileobj.seek(position)
+        except Exception:
+            pass
+    return 3 * file_size + decoded_bytes + search_working_bytes()
+
+
+def take_token(key: str, rate: float, burst: int) -> float:
+    """
+    Take one token from the bucket ``key`` refilled at ``rate`` tokens per
+    second up to ``burst``.
+
+    Returns 0 if a token was taken, otherwise the number of seconds until
+    one becomes available. A rate of 0 disables the bucket.
+    """
+    if rate <= 0:
+        return 0.0
+    now = time.time()
+    cache_key = f"admission:bucket:{key}"
+    tokens, updated = cache.get(cache_key, (float(burst), now))
+    tokens = min(float(burst), tokens + (now - updated) * rate)
+    if tokens < 1:
+        cache.set(cache_key, (tokens, now), timeout=math.ceil(burst / rate) + 1)
+        return (1 - tokens) / rate
+    cache.set(cache_key, (tokens - 1, now), timeout=math.ceil(burst / rate) + 1)
+    return 0.0
+
+
+def client_identifier(request) -> str:
+    """
+    Identify the uploading client by IP address.
+
+    Behind nginx ``REMOTE_ADDR`` is the proxy, so the address is taken from
+    the header named by ``UPLOAD_CLIENT_IP_HEADER`` when present.
+    """
+    header = settings.UPLOAD_CLIENT_IP_HEADER
+    if header and request.META.get(header):
+        return request.META[header].split(",")[0].strip()
+    return request.META.get("REMOTE_ADDR", "unknown")
+
+
+def _rejected(reason: str, message: str, status_code: int, retry_after: float) -> Response:
+    metrics.ADMISSION_REJECTIONS.labels(reason).inc()
+    response = Response({"error": message}, status=status_code)
+    response["Retry-After"] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def _check_rates(request, event):
+    """
+    Take a token from the client's and the event's buckets; return the
+    rejection response if either is empty, otherwise None.
+    """
+    wait = take_token(
+        f"client:{client_identifier(request)}",
+        settings.UPLOAD_CLIENT_RATE,
+        settings.UPLOAD_CLIENT_BURST,
+    )
+    if wait:
+        return _rejected(
+            "client_rate",
+            "Too many uploads, please try again shortly",
+            status.HTTP_429_TOO_MANY_REQUESTS,
+            wait,
+        )
+
+    wait = take_token(
+        f"event:{event.pk}",
+        settings.UPLOAD_EVENT_RATE,
+        settings.UPLOAD_EVENT_BURST,
+    )
+    if wait:
+        return _rejected(
+            "event_rate",
+            "Too many uploads for this event, please try again shortly",
+            status.HTTP_429_TOO_MANY_REQUESTS,
+            wait,
+        )
+    return None
+
+
+def _estimate_upload(request) -> int:
+    photo_file = request.FILES.get("photo")
+    return estimate_processing_bytes(photo_file.size, photo_file) if photo_file else 0
+
+
+def _busy():
+    return _rejected(
+        "busy",
+        "The server is busy processing photos, please try again shortly",
+        status.HTTP_503_SERVICE_UNAVAILABLE,
+        settings.UPLOAD_BUSY_RETRY_AFTER,
+    )
+
+
+def admission_control(view_func):
+    """
+    Apply rate limits and the processing gate to an upload view, sync or
+    async.
+
+    Must be applied below ``require_event_token``, which passes the event.
+    """
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def async_wrapper(request, *args, **kwargs):
+            # The buckets live in the cache, which may be a network hop away.
+            rejected = await sync_to_async(_check_rates)(request, kwargs["event"])
+            if rejected is not None:
+                return rejected
+            try:
+                # Parses the multipart body and reads the image header.
+                estimated_bytes = await sync_to_async(_estimate_upload)(request)
+                async with get_processing_gate().aadmit(estimated_bytes, settings.UPLOAD_ADMISSION_TIMEOUT):
+                    return await view_func(request, *args, **kwargs)
+            except AdmissionRejected:
+                return _busy()
+
+        return async_wrapper
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        rejected = _check_rates(request, kwargs["event"])
+        if rejected is not None:
+            return rejected
+        try:
+            with get_processing_gate().admit(_estimate_upload(request), settings.UPLOAD_ADMISSION_TIMEOUT):
+                return view_func(request, *args, **kwargs)
+        except AdmissionRejected:
+            return _busy()
+
+    return wrapper
@@ -6,3 +6,6 @@ class GalleryConfig(AppConfig):
     name = "src.gallery"
     verbose_name = "Gallery"
 
+    def ready(self):
+        from src.gallery import signals  # noqa: F401
+
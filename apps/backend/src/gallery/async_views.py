@@ -0,0 +1,185 @@
+"""
+Async versions of the I/O-bound gallery views.
+
+Served instead of their counterparts in views.py when ``ASYNC_VIEWS`` is
+on (the default under ``SERVER_MODE=asgi``, see src/gallery/urls.py). They
+take the same parameters and return the same responses.
+
+Waiting on S3 happens on the event loop (``AsyncStorageClient``) and the
+ORM is used through its async API, so a worker keeps serving other
+requests while an upload is stored. Work without an async form (decoding
+renditions in ``Photo.save``, URL signing that looks up archive packs)
+runs in the request's thread with ``sync_to_async``.
+"""
+import os
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.core.paginator import InvalidPage, Page
+from rest_framework import status
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+
+from src.config.async_api import async_api_view
+from src.config.early_hints import apreload
+from src.events.decorators import require_event_token
+from src.uploads.cloudfront import set_event_cookies
+from src.uploads.storage import get_async_storage_client
+from src.uploads.validation import ImageValidationError, validate_image
+from .admission import admission_control
+from .listing import LIST_COLUMNS, PHOTO_FIELDS, parse_fields, serialize_photo_rows, sign_renditions
+from .models import Photo
+from .neighbours import LIST_ORDER, older_than
+from .serializers import PhotoSerializer, PhotoUrlsRequestSerializer
+from .views import PhotoPagination, _thumbnail_urls, _url_signer
+
+
+async def paginate(paginator, queryset, request):
+    """
+    ``PhotoPagination.paginate_queryset`` through the async ORM: the same
+    page, the same next/previous links and the same 404 for pages out of
+    range or invalid cursors.
+    """
+    page_size = paginator.get_page_size(request)
+    paginator.cursor = paginator.get_cursor(request)
+    if paginator.cursor is not None:
+        rows = [row async for row in older_than(queryset, *paginator.cursor)[:page_size + 1]]
+        return paginator.cursor_page(rows, request)
+
+    django_paginator = paginator.django_paginator_class(queryset, page_size)
+    django_paginator.count = await queryset.acount()
+    page_number = paginator.get_page_number(request, django_paginator)
+    try:
+        number = django_paginator.validate_number(page_number)
+    except InvalidPage as exc:
+        raise NotFound(paginator.invalid_page_message.format(page_number=page_number, message=str(exc)))
+
+    bottom = (number - 1) * page_size
+    rows = [row async for row in queryset[bottom:bottom + page_size]]
+    paginator.page = Page(rows, number, django_paginator)
+    paginator.request = request
+    return rows
+
+
+@async_api_view(['POST'])
+@require_event_token(token_location='data')
+@admission_control
+async def upload_photo(request, event):
+    """
+    Upload a photo for an event.
+    Requires access_token and photo file.
+    Event is validated and passed by the decorator.
+    Rate limits and processing capacity are enforced by admission_control.
+    """
+    photo_file = request.FILES.get('photo')
+    if not photo_file:
+        return Response({
+            'error': 'photo file is required'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        # Decodes the header, and the whole image for some formats.
+        image_info = await sync_to_async(validate_image)(photo_file, photo_file.name, photo_file.size)
+    except ImageValidationError as e:
+        return Response(e.as_dict(), status=status.HTTP_400_BAD_REQUEST)
+
+    file_extension = os.path.splitext(photo_file.name)[1]
+    file_key = f"{event.code}/originals/{uuid.uuid4()}{file_extension}"
+
+    try:
+        if hasattr(photo_file, 'seek'):
+            photo_file.seek(0)
+        # Large uploads are spooled to a temporary file.
+        file_content = await sync_to_async(photo_file.read)()
+        await get_async_storage_client().upload_file(
+            file_key=file_key,
+            file_content=file_content,
+            content_type=image_info.content_type
+        )
+
+        # Creating the photo also generates its renditions.
+        photo = await Photo.objects.acreate(
+            event=event,
+            file_key=file_key,
+            original_filename=photo_file.name,
+            file_size=photo_file.size,
+            content_type=image_info.content_type
+        )
+        return Response(PhotoSerializer(photo).data, status=status.HTTP_201_CREATED)
+
+    except Exception as e:
+        return Response({
+            'error': f'Failed to upload photo: {str(e)}'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@async_api_view(['GET'])
+@require_event_token(token_location='query')
+async def list_photos(request, event):
+    """
+    List all photos for an event.
+    Requires access_token as query parameter.
+    Optional fields parameter (comma-separated) limits the returned fields;
+    only the URLs of the requested renditions are signed.
+    Optional before (a cursor from timeline_seek or a next link) starts the
+    page after that photo instead of at a page number; such pages have only
+    next and results.
+    Event is validated and passed by the decorator.
+    """
+    fields = PHOTO_FIELDS
+    if 'fields' in request.query_params:
+        try:
+            fields = parse_fields(request.query_params['fields'])
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    photos = Photo.objects.filter(
+        event=event,
+        moderation_status=Photo.ModerationStatus.APPROVED,
+    ).order_by(*LIST_ORDER).values(*LIST_COLUMNS)
+
+    paginator = PhotoPagination()
+    rows = await paginate(paginator, photos, request)
+
+    sign = _url_signer(request, event, request.query_params['access_token'])
+    results = await sync_to_async(serialize_photo_rows)(rows, fields, sign)
+    response = paginator.get_paginated_response(results)
+    await apreload(response, _thumbnail_urls(results))
+    # Re-issue the signed cookies so they outlive long browsing sessions.
+    return set_event_cookies(response, event.code)
+
+
+@async_api_view(['POST'])
+@require_event_token(token_location='data')
+async def photo_urls(request, event):
+    """
+    Sign URLs of one rendition for a batch of photos.
+    Requires access_token, ids (at most 100) and rendition
+    (original, fullscreen or thumbnail).
+    All photos must belong to the token's event.
+    Event is validated and passed by the decorator.
+    """
+    serializer = PhotoUrlsRequestSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    ids = set(serializer.validated_data['ids'])
+    rows = [row async for row in Photo.objects.filter(
+        event=event,
+        moderation_status=Photo.ModerationStatus.APPROVED,
+        pk__in=ids,
+    ).values(*LIST_COLUMNS)]
+
+    missing = ids.difference(row['id'] for row in rows)
+    if missing:
+        return Response({
+            'error': 'Photos not found in this event',
+            'ids': sorted(missing),
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    sign = _url_signer(request, event, request.data['access_token'])
+    urls = await sync_to_async(sign_renditions)(rows, serializer.validated_data['rendition'], sign)
+    return set_event_cookies(Response({
+        'rendition': serializer.validated_data['rendition'],
+        'urls': {str(photo_id): url for photo_id, url in urls.items()},
+    }, status=status.HTTP_200_OK), event.code)
@@ -0,0 +1,65 @@
+"""
+Decoding originals for renditions.
+
+A rendition is a fraction of the size of its original, so the decoder is
+asked for the smallest image that still covers the rendition, where the
+codec can produce one cheaply (``Image.draft``):
+
+* JPEGs are decoded at 1/2, 1/4 or 1/8 scale by libjpeg's DCT scaling.
+
+HEVC has no reduced-resolution decode, so HEIC/HEIF photos are decoded in
+full, as are the other formats; newer pillow-heif releases (which need a
+newer Pillow) decode an embedded thumbnail instead when one covers the
+rendition. ``Photo`` therefore decodes an original once for all of its
+renditions. The result is oriented and resized to the exact rendition size
+by the caller (see src/gallery/image_engine.py).
+
+Boxes are in display orientation: when the EXIF orientation turns a photo
+by 90 degrees, the box is turned too, so the decoded image still covers
+the rendition once it is oriented.
+"""
+
+from __future__ import annotations
+
+import math
+from typing import TYPE_CHECKING, BinaryIO
+
+from src.config.timing import timed
+from src.uploads.validation import register_heif_opener
+
+if TYPE_CHECKING:
+    from PIL.Image import Image
+
+ORIENTATION_TAG = 0x0112
+# EXIF orientations that swap width and height (rotations by 90 degrees,
+# with or without a mirror).
+TRANSPOSING_ORIENTATIONS = frozenset({5, 6, 7, 8})
+
+
+def fitted_size(size: tuple[int, int], box: tuple[int, int]) -> tuple[int, int]:
+    """
+    Return ``size`` scaled down (never up) to fit in ``box``, rounded up.
+    """
+    scale = min(1.0, box[0] / size[0], box[1] / size[1])
+    return max(1, math.ceil(size[0] * scale)), max(1, math.ceil(size[1] * scale))
+
+
+def decode(fileobj: BinaryIO, box: tuple[int, int]) -> Image:
+    """
+    Decode an original for a rendition that fits in ``box``.
+
+    The returned image is RGB or L, not yet oriented, and at least as large
+    as the rendition, but may be smaller than the original.
+    """
+    from PIL import Image
+
+    register_heif_opener()
+    with timed("image", "decode"):
+        img = Image.open(fileobj)
+        if img.getexif().get(ORIENTATION_TAG, 1) in TRANSPOSING_ORIENTATIONS:
+            box = box[::-1]
+        img.draft("RGB", fitted_size(img.size, box))
+        img.load()
+    if img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    return img
@@ -0,0 +1,214 @@
+"""
+Perceptual-quality-targeted JPEG and WebP encoding.
+
+A fixed encoder quality over-spends bytes on simple scenes (a white dress
+against a white wall compresses well at quality 60) and under-serves
+detailed ones (confetti, foliage). Renditions are instead encoded at the
+lowest quality whose result stays within ``IMAGE_TARGET_SSIM`` of the
+resized image, found by binary search between ``IMAGE_MIN_QUALITY`` and
+``IMAGE_MAX_QUALITY``. Each probe encodes, decodes and scores the image, so
+a rendition costs about log2(max - min) encodes instead of one.
+
+The score is SSIM on the luma plane over 7x7 windows, computed with NumPy
+from summed-area tables, so each probe is a handful of array passes. The
+search runs on the request path (uploads, variant cache misses), so planes
+are scored box-reduced to at most ``SSIM_MAX_SIDE`` pixels on a side and in
+float32: a fullscreen image is scored at 480x270, which keeps a search to
+tens of milliseconds and its working set (``search_working_bytes``, counted
+by the admission gate) to a few megabytes. The reduction averages away
+some fine-grained artefacts, which ``IMAGE_MIN_QUALITY`` keeps in check. Chroma
+is not scored; instead, JPEGs keep full-resolution chroma (4:4:4) at
+``IMAGE_SUBSAMPLING_444_QUALITY`` and above, where 4:2:0 would be the
+dominant error, and use 4:2:0 below it. JPEGs are written progressive, so
+the grid shows a coarse version of a photo before it has fully arrived.
+
+``IMAGE_TARGET_SSIM = 0`` turns the search off and encodes at the fixed
+quality of each rendition.
+"""
+
+from __future__ import annotations
+
+import io
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable
+
+from django.conf import settings
+
+from src.config.timing import timed
+
+if TYPE_CHECKING:
+    import numpy as np
+    from PIL.Image import Image
+
+SSIM_WINDOW = 7
+# Longest side of the luma planes scored during the search.
+SSIM_MAX_SIDE = 512
+# float32 planes held at once while scoring a probe: the reference and its
+# statistics, the probe, and the intermediates of one score.
+_SSIM_PLANES = 16
+# Stabilising constants for 8-bit images (Wang et al., 2004).
+_C1 = (0.01 * 255) ** 2
+_C2 = (0.03 * 255) ** 2
+
+
+@dataclass(frozen=True)
+class EncodedImage:
+    data: bytes
+    quality: int
+    # SSIM of the result, or None when it was encoded at a fixed quality.
+    score: float | None = None
+
+
+def luma(img: Image) -> np.ndarray:
+    """
+    Return the luma plane of ``img`` as a float64 array.
+    """
+    import numpy as np
+
+    return np.asarray(img.convert("L"), dtype=np.float64)
+
+
+def search_luma(img: Image) -> np.ndarray:
+    """
+    Return the luma plane scored by the quality search: box-reduced to at
+    most ``SSIM_MAX_SIDE`` pixels on a side, as float32.
+    """
+    import numpy as np
+
+    plane = img.convert("L")
+    factor = -(-max(plane.size) // SSIM_MAX_SIDE)
+    if factor > 1:
+        plane = plane.reduce(factor)
+    return np.asarray(plane, dtype=np.float32)
+
+
+def search_working_bytes() -> int:
+    """
+    Peak memory of one quality search beyond the image itself, or 0 when
+    the search is turned off.
+    """
+    if not settings.IMAGE_TARGET_SSIM:
+        return 0
+    return SSIM_MAX_SIDE * SSIM_MAX_SIDE * 4 * _SSIM_PLANES
+
+
+def _window_means(a: np.ndarray, size: int) -> np.ndarray:
+    """
+    Return the mean of every ``size`` x ``size`` window of ``a`` (no
+    padding), from a summed-area table, in the dtype of ``a``.
+    """
+    import numpy as np
+
+    # Accumulated in float64: float32 sums of a whole plane lose the
+    # precision the differences below need.
+    table = np.zeros((a.shape[0] + 1, a.shape[1] + 1))
+    np.cumsum(np.cumsum(a, axis=0, dtype=np.float64), axis=1, out=table[1:, 1:])
+    sums = table[size:, size:] - table[:-size, size:] - table[size:, :-size] + table[:-size, :-size]
+    return (sums / (size * size)).astype(a.dtype, copy=False)
+
+
+def ssim_scorer(reference: np.ndarray) -> Callable[[np.ndarray], float]:
+    """
+    Return a function scoring luma planes of the size of ``reference``
+    against it by mean structural similarity, 1.0 for identical images.
+
+    The statistics of the reference are computed once, so scoring each
+    probe of a search costs three window passes rather than five.
+    """
+    size = min(SSIM_WINDOW, *reference.shape)
+    mu_x = _window_means(reference, size)
+    mu_xx = mu_x * mu_x
+    var_x = _window_means(reference * reference, size) - mu_xx
+
+    def score(candidate: np.ndarray) -> float:
+        mu_y = _window_means(candidate, size)
+        mu_yy, mu_xy = mu_y * mu_y, mu_x * mu_y
+        var_y = _window_means(candidate * candidate, size) - mu_yy
+        covariance = _window_means(reference * candidate, size) - mu_xy
+        ssim_map = ((2 * mu_xy + _C1) * (2 * covariance + _C2)) / (
+            (mu_xx + mu_yy + _C1) * (var_x + var_y + _C2)
+        )
+        return float(ssim_map.mean())
+
+    return score
+
+
+def ssim(reference: np.ndarray, candidate: np.ndarray) -> float:
+    """
+    Return the mean structural similarity of two equally sized luma planes.
+    """
+    return ssim_scorer(reference)(candidate)
+
+
+def save_options(pil_format: str, quality: int, final: bool = True) -> dict:
+    """
+    Return the Pillow ``save`` options for ``pil_format`` at ``quality``.
+
+    Huffman optimisation and progressive scans change the size of a JPEG
+    but not its pixels, so search probes (``final=False``) skip them.
+    """
+    if pil_format == "JPEG":
+        subsampling = "4:4:4" if quality >= settings.IMAGE_SUBSAMPLING_444_QUALITY else "4:2:0"
+        options = {"quality": quality, "subsampling": subsampling}
+        if final:
+            options.update(optimize=True, progressive=True)
+        return options
+    if pil_format == "WEBP":
+        return {"quality": quality, "method": 4}
+    return {"quality": quality}
+
+
+def encode_at(img: Image, pil_format: str, quality: int, final: bool = True) -> bytes:
+    """
+    Encode ``img`` as ``pil_format`` at a fixed ``quality``.
+    """
+    output = io.BytesIO()
+    img.save(output, format=pil_format, **save_options(pil_format, quality, final))
+    return output.getvalue()
+
+
+def encode(img: Image, pil_format: str, fixed_quality: int) -> EncodedImage:
+    """
+    Encode ``img`` (RGB or L) as ``pil_format`` at the lowest quality that
+    reaches ``IMAGE_TARGET_SSIM``, or at ``fixed_quality`` when the search
+    is turned off.
+    """
+    target = settings.IMAGE_TARGET_SSIM
+    with timed("image", "encode"):
+        if not target:
+            return EncodedImage(encode_at(img, pil_format, fixed_quality), fixed_quality)
+        return search_quality(
+            img, pil_format, target, settings.IMAGE_MIN_QUALITY, settings.IMAGE_MAX_QUALITY, fixed_quality
+        )
+
+
+def search_quality(
+    img: Image, pil_format: str, target: float, low: int, high: int, fallback_quality: int
+) -> EncodedImage:
+    """
+    Binary-search the lowest quality in ``[low, high]`` whose encoding of
+    ``img`` scores at least ``target``.
+
+    When even ``high`` misses the target the image is mostly grain or
+    noise, which extra bytes barely improve, so it is encoded at
+    ``fallback_quality`` instead.
+    """
+    from PIL import Image
+
+    score = ssim_scorer(search_luma(img))
+    best = None
+    while low <= high:
+        quality = (low + high) // 2
+        data = encode_at(img, pil_format, quality, final=False)
+        with Image.open(io.BytesIO(data)) as decoded:
+            probe_score = score(search_luma(decoded))
+        if probe_score >= target:
+            best = (quality, probe_score)
+            high = quality - 1
+        else:
+            low = quality + 1
+
+    if best is None:
+        return EncodedImage(encode_at(img, pil_format, fallback_quality), fallback_quality)
+    quality, probe_score = best
+    return EncodedImage(encode_at(img, pil_format, quality), quality, probe_score)
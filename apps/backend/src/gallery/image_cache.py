@@ -0,0 +1,157 @@
+"""
+Size-bounded on-disk LRU cache for resized images.
+
+Entries are files named after a hash of their key, so every gunicorn worker
+on the host shares the cache. Reading an entry bumps its modification time;
+when the cache grows past its budget the least recently used files are
+deleted until it is back under 90% of it.
+
+``lock(key)`` gives single-flight de-duplication: concurrent misses of the
+same key, in any thread or worker, wait for the first one to fill the cache
+instead of each doing the work. Locks are ``flock`` on a fixed set of 256
+lock files, so unrelated keys rarely share one and no lock file is ever
+removed while in use.
+"""
+
+from __future__ import annotations
+
+import fcntl
+import hashlib
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import BinaryIO
+
+from django.conf import settings
+
+# Usage is brought down to this fraction of the budget when it is exceeded,
+# so eviction does not run on every write.
+_EVICT_TO = 0.9
+
+
+class DiskLRUCache:
+    """
+    Byte strings stored as files under ``directory``, at most about
+    ``max_bytes`` in total.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        # This process' estimate of the total size; None until first scanned.
+        # Other workers write too, so it is corrected on every eviction scan.
+        self._usage: int | None = None
+        self._usage_lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def get(self, key: str) -> BinaryIO | None:
+        """
+        Return the entry opened for reading, or None on a miss.
+
+        The file stays readable even if it is evicted while open.
+        """
+        path = self._path(key)
+        try:
+            fileobj = open(path, "rb")
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return fileobj
+
+    def put(self, key: str, data: bytes) -> None:
+        """
+        Store ``data`` under ``key``, atomically replacing any older entry.
+        """
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                tmp.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        self._account(len(data))
+
+    @contextmanager
+    def lock(self, key: str):
+        """
+        Hold the lock for ``key`` across threads and processes.
+        """
+        lock_dir = os.path.join(self.directory, "locks")
+        os.makedirs(lock_dir, exist_ok=True)
+        stripe = hashlib.sha256(key.encode()).hexdigest()[:2]
+        with open(os.path.join(lock_dir, stripe), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _account(self, size: int) -> None:
+        with self._usage_lock:
+            if self._usage is not None and self._usage + size <= self.max_bytes:
+                self._usage += size
+                return
+            self._usage = self._evict()
+
+    def _evict(self) -> int:
+        """
+        Delete least recently used entries until the cache is under budget.
+        Returns the remaining total size.
+        """
+        entries = []
+        total = 0
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir() or shard.name == "locks":
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(".tmp"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+        if total <= self.max_bytes:
+            return total
+        entries.sort()
+        target = self.max_bytes * _EVICT_TO
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        return total
+
+
+_image_cache: DiskLRUCache | None = None
+
+
+def get_image_cache() -> DiskLRUCache:
+    """
+    Return the cache of resized images for this process.
+    """
+    global _image_cache
+    if _image_cache is None:
+        _image_cache = DiskLRUCache(
+            settings.IMAGE_CACHE_DIR,
+            settings.IMAGE_CACHE_MAX_MB * 1024 * 1024,
+        )
+    return _image_cache
@@ -0,0 +1,226 @@
+"""
+Image engines.
+
+Renditions (``Photo``) and on-the-fly variants (src/gallery/resize.py) are
+made by the image engine named by ``IMAGE_ENGINE``, in five steps:
+``decode`` an original at about the size of the largest rendition,
+``orient`` it by its EXIF orientation, then ``resize`` and ``encode`` it
+once per rendition. ``metadata`` reads the header only.
+
+* ``pillow`` (the default) decodes with Pillow (see src/gallery/decoding.py)
+  and holds the decoded bitmap while it is resized. JPEGs are decoded at a
+  reduced scale; other formats (PNG, TIFF, HEIC) are decoded in full, so a
+  48 MP original costs about 150 MB of bitmap.
+* ``vips`` decodes with libvips through pyvips, which is not in
+  requirements.txt: install requirements-vips.txt and the libvips
+  library to use it.
+  libvips evaluates on demand, so the original streams through
+  shrink-on-load and a block-wise resize straight to the decode box and
+  only the result is held in memory. This is the engine for hosts with
+  little memory per worker, or for galleries with many PNG/TIFF originals.
+
+Both engines encode through src/gallery/encoding.py, so the SSIM-targeted
+quality search and encoder settings are the same; the vips engine hands
+its rendition-sized bitmap to Pillow for that. Renditions from the two
+engines can differ by a pixel in size and slightly in their pixels.
+
+``benchmark_image_engines`` compares the engines' throughput and peak
+memory.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, BinaryIO, Protocol
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from src.config.timing import timed
+from src.uploads.validation import register_heif_opener
+
+from .decoding import ORIENTATION_TAG, TRANSPOSING_ORIENTATIONS, decode
+from .encoding import EncodedImage, encode
+
+if TYPE_CHECKING:
+    from PIL.Image import Image
+
+
+@dataclass(frozen=True)
+class ImageMetadata:
+    """
+    Header information of an encoded image.
+    """
+
+    format: str
+    # Stored size, before orientation.
+    width: int
+    height: int
+    orientation: int = 1
+
+    @property
+    def display_size(self) -> tuple[int, int]:
+        if self.orientation in TRANSPOSING_ORIENTATIONS:
+            return self.height, self.width
+        return self.width, self.height
+
+
+class ImageEngine(Protocol):
+    """
+    The operations renditions are made of. Images are the engine's own
+    type; only ``encode`` produces something engine-independent.
+    """
+
+    name: str
+
+    def metadata(self, fileobj: BinaryIO) -> ImageMetadata:
+        """
+        Read the header of ``fileobj``, leaving its position unchanged.
+        """
+
+    def decode(self, fileobj: BinaryIO, box: tuple[int, int]) -> Any:
+        """
+        Decode an original, RGB or L and not yet oriented, at least large
+        enough for a rendition that fits in ``box`` once oriented.
+        """
+
+    def orient(self, img: Any) -> Any:
+        """
+        Apply the EXIF orientation of a decoded image.
+        """
+
+    def resize(self, img: Any, box: tuple[int, int]) -> Any:
+        """
+        Return ``img`` scaled down (never up) to fit in ``box``.
+        """
+
+    def encode(self, img: Any, pil_format: str, fixed_quality: int) -> EncodedImage:
+        """
+        Encode ``img`` as ``pil_format`` (see ``encoding.encode``).
+        """
+
+
+class PillowEngine:
+    name = "pillow"
+
+    def metadata(self, fileobj: BinaryIO) -> ImageMetadata:
+        from PIL import Image
+
+        register_heif_opener()
+        position = fileobj.tell()
+        try:
+            with Image.open(fileobj) as img:
+                orientation = img.getexif().get(ORIENTATION_TAG, 1)
+                return ImageMetadata(img.format, img.width, img.height, orientation)
+        finally:
+            fileobj.seek(position)
+
+    def decode(self, fileobj: BinaryIO, box: tuple[int, int]) -> Image:
+        return decode(fileobj, box)
+
+    def orient(self, img: Image) -> Image:
+        from PIL import ImageOps
+
+        ImageOps.exif_transpose(img, in_place=True)
+        return img
+
+    def resize(self, img: Image, box: tuple[int, int]) -> Image:
+        with timed("image", "resize"):
+            img = img.copy()
+            img.thumbnail(box)
+        return img
+
+    def encode(self, img: Image, pil_format: str, fixed_quality: int) -> EncodedImage:
+        return encode(img, pil_format, fixed_quality)
+
+
+class VipsEngine:
+    name = "vips"
+
+    def __init__(self):
+        try:
+            import pyvips
+        except (ImportError, OSError) as e:
+            raise ImproperlyConfigured(
+                "IMAGE_ENGINE=vips needs pyvips and the libvips library"
+            ) from e
+        self.pyvips = pyvips
+
+    def _read(self, fileobj: BinaryIO) -> bytes:
+        position = fileobj.tell()
+        data = fileobj.read()
+        fileobj.seek(position)
+        return data
+
+    def _metadata(self, data: bytes) -> ImageMetadata:
+        # Opening is lazy: only the header is parsed.
+        img = self.pyvips.Image.new_from_buffer(data, "")
+        orientation = img.get("orientation") if img.get_typeof("orientation") else 1
+        # "jpegload_buffer" -> "JPEG", as Pillow names formats.
+        loader = img.get("vips-loader").split("load")[0].upper()
+        return ImageMetadata(loader, img.width, img.height, orientation)
+
+    def metadata(self, fileobj: BinaryIO) -> ImageMetadata:
+        return self._metadata(self._read(fileobj))
+
+    def decode(self, fileobj: BinaryIO, box: tuple[int, int]):
+        data = fileobj.read()
+        if self._metadata(data).orientation in TRANSPOSING_ORIENTATIONS:
+            box = box[::-1]
+        with timed("image", "decode"):
+            img = self.pyvips.Image.thumbnail_buffer(
+                data, box[0], height=box[1], size="down", no_rotate=True
+            )
+            if img.hasalpha():
+                # Dropped, as Pillow's RGBA -> RGB conversion does.
+                img = img.extract_band(0, n=img.bands - 1)
+            if img.format != "uchar" or img.interpretation not in ("srgb", "b-w"):
+                img = img.colourspace("b-w" if img.bands == 1 else "srgb").cast("uchar")
+            # Runs the pipeline: the result serves every rendition.
+            return img.copy_memory()
+
+    def orient(self, img):
+        return img.autorot()
+
+    def resize(self, img, box: tuple[int, int]):
+        with timed("image", "resize"):
+            return img.thumbnail_image(box[0], height=box[1], size="down").copy_memory()
+
+    def encode(self, img, pil_format: str, fixed_quality: int) -> EncodedImage:
+        import numpy as np
+        from PIL import Image
+
+        pixels = np.ndarray(
+            buffer=img.write_to_memory(), dtype=np.uint8, shape=(img.height, img.width, img.bands)
+        )
+        return encode(Image.fromarray(pixels[:, :, 0] if img.bands == 1 else pixels), pil_format, fixed_quality)
+
+
+ENGINES = {
+    PillowEngine.name: PillowEngine,
+    VipsEngine.name: VipsEngine,
+}
+
+_image_engine: ImageEngine | None = None
+
+
+def load_engine(name: str) -> ImageEngine:
+    """
+    Return a new engine by name. Raises ``ImproperlyConfigured`` for
+    unknown names and engines whose libraries are not installed.
+    """
+    if name not in ENGINES:
+        raise ImproperlyConfigured(
+            f'Unknown IMAGE_ENGINE "{name}", expected one of: {", ".join(ENGINES)}'
+        )
+    return ENGINES[name]()
+
+
+def get_image_engine() -> ImageEngine:
+    """
+    Return the engine named by ``IMAGE_ENGINE`` for this process.
+    """
+    global _image_engine
+    if _image_engine is None or _image_engine.name != settings.IMAGE_ENGINE:
+        _image_engine = load_engine(settings.IMAGE_ENGINE)
+    return _image_engine
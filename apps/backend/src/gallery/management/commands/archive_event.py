@@ -0,0 +1,54 @@
+"""
+Management command to pack the renditions of finished events.
+
+Copies the thumbnails and fullscreen images of an event that are not in a
+pack yet into one new pack object (see src/gallery/packs.py). Loose
+objects are kept (packs.py explains why), so photos keep working while
+packing and late uploads are served from their loose objects until the
+next run packs them.
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max
+from django.utils import timezone
+
+from src.events.models import Event
+from src.gallery.packs import build_pack
+
+
+class Command(BaseCommand):
+    help = "Pack events' thumbnails and fullscreen images into archive packs"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--event',
+            type=str,
+            help='Archive the event with this code'
+        )
+        parser.add_argument(
+            '--idle-days',
+            type=float,
+            help='Archive every event without uploads for this many days'
+        )
+
+    def handle(self, *args, **options):
+        if options['event']:
+            events = Event.objects.filter(code=options['event'])
+        elif options['idle_days'] is not None:
+            cutoff = timezone.now() - timedelta(days=options['idle_days'])
+            events = Event.objects.annotate(
+                last_upload=Max('photos__uploaded_at')
+            ).filter(last_upload__lt=cutoff)
+        else:
+            raise CommandError('Pass --event or --idle-days')
+
+        for event in events:
+            pack = build_pack(event)
+            if pack is None:
+                self.stdout.write(f'{event.code}: nothing to pack')
+                continue
+            self.stdout.write(self.style.SUCCESS(
+                f'{event.code}: packed {pack.entries.count()} renditions '
+                f'({pack.size / (1024 * 1024):.1f} MiB) into {pack.key}'
+            ))
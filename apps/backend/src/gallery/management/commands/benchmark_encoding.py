@@ -0,0 +1,153 @@
+"""
+Management command to benchmark SSIM-targeted rendition encoding.
+
+Encodes every image of a sample corpus into a rendition twice: at the
+rendition's fixed quality (THUMBNAIL_QUALITY / FULLSCREEN_QUALITY), and with
+the quality search of src/gallery/encoding.py. Reports the bytes saved and
+the extra encode time per image and in total. Pass --dir to use a folder of
+real photos; by default a small synthetic corpus is generated, from a flat
+scene to a detailed one.
+"""
+import io
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from src.gallery.encoding import encode_at, luma, search_quality, ssim_scorer
+from src.gallery.resize import VARIANT_FORMATS
+
+RENDITIONS = {
+    'thumbnail': ('THUMBNAIL_SIZE', 'THUMBNAIL_QUALITY'),
+    'fullscreen': ('FULLSCREEN_SIZE', 'FULLSCREEN_QUALITY'),
+}
+
+
+def synthetic_corpus(size=(3000, 2000)):
+    """
+    Return (name, image) pairs ranging from simple to detailed scenes.
+    """
+    from PIL import Image, ImageDraw, ImageFilter
+
+    gradient = Image.linear_gradient('L').resize(size)
+    sky = Image.merge('RGB', (gradient, gradient.point(lambda v: 200 - v // 4), Image.new('L', size, 230)))
+
+    shapes = sky.copy()
+    draw = ImageDraw.Draw(shapes)
+    for i in range(12):
+        x, y = (i * 397) % size[0], (i * 211) % size[1]
+        draw.ellipse((x, y, x + 400, y + 300), fill=((i * 40) % 256, 120, 255 - (i * 20) % 256))
+    shapes = shapes.filter(ImageFilter.GaussianBlur(2))
+
+    fractal = Image.effect_mandelbrot(size, (-2.0, -1.2, 1.0, 1.2), 100)
+    fractal = Image.merge('RGB', (fractal, fractal.point(lambda v: 255 - v), gradient))
+
+    noise = Image.effect_noise(size, 48)
+    noise = Image.merge('RGB', (noise, noise, noise))
+    grain = Image.blend(fractal, noise, 0.1)
+    textured = Image.blend(shapes, noise, 0.35)
+
+    return [
+        ('gradient', sky), ('shapes', shapes), ('fractal', fractal), ('grain', grain), ('textured', textured),
+    ]
+
+
+def load_corpus(directory):
+    from PIL import Image
+
+    images = []
+    for path in sorted(Path(directory).iterdir()):
+        try:
+            with Image.open(path) as img:
+                images.append((path.name, img.convert('RGB')))
+        except (OSError, ValueError):
+            continue
+    return images
+
+
+class Command(BaseCommand):
+    help = 'Benchmark rendition encoding: fixed quality vs SSIM-targeted quality'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dir',
+            type=str,
+            help='Folder of images to use instead of the synthetic corpus'
+        )
+        parser.add_argument(
+            '--rendition',
+            choices=sorted(RENDITIONS),
+            default='fullscreen',
+            help='Rendition size and fixed quality to compare against (default: fullscreen)'
+        )
+        parser.add_argument(
+            '--format',
+            choices=sorted(VARIANT_FORMATS),
+            default='jpeg',
+            help='Output format (default: jpeg)'
+        )
+        parser.add_argument(
+            '--target',
+            type=float,
+            default=settings.IMAGE_TARGET_SSIM or 0.98,
+            help='Target SSIM (default: IMAGE_TARGET_SSIM)'
+        )
+
+    def handle(self, *args, **options):
+        from PIL import Image
+
+        corpus = load_corpus(options['dir']) if options['dir'] else synthetic_corpus()
+        if not corpus:
+            raise CommandError('No readable images in the corpus')
+
+        size_setting, quality_setting = RENDITIONS[options['rendition']]
+        fixed_quality = getattr(settings, quality_setting)
+        pil_format = VARIANT_FORMATS[options['format']][0]
+
+        self.stdout.write(
+            f"{len(corpus)} images, {options['rendition']} {pil_format}: "
+            f"quality {fixed_quality} vs SSIM {options['target']}"
+        )
+        self.stdout.write(
+            f"{'image':<20} {'fixed':>10} {'ssim':>7} {'targeted':>10} {'q':>3} {'ssim':>7} "
+            f"{'saved':>7} {'time':>13}"
+        )
+        totals = {'fixed': 0, 'targeted': 0, 'fixed_time': 0.0, 'targeted_time': 0.0}
+        for name, img in corpus:
+            img.thumbnail(getattr(settings, size_setting))
+            score = ssim_scorer(luma(img))
+
+            start = time.perf_counter()
+            fixed = encode_at(img, pil_format, fixed_quality)
+            fixed_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            targeted = search_quality(
+                img, pil_format, options['target'],
+                settings.IMAGE_MIN_QUALITY, settings.IMAGE_MAX_QUALITY, fixed_quality,
+            )
+            targeted_time = time.perf_counter() - start
+
+            scores = []
+            for data in (fixed, targeted.data):
+                with Image.open(io.BytesIO(data)) as decoded:
+                    scores.append(score(luma(decoded)))
+
+            totals['fixed'] += len(fixed)
+            totals['targeted'] += len(targeted.data)
+            totals['fixed_time'] += fixed_time
+            totals['targeted_time'] += targeted_time
+            self.stdout.write(
+                f'{name[:20]:<20} {len(fixed):>10,} {scores[0]:>7.4f} '
+                f'{len(targeted.data):>10,} {targeted.quality:>3} {scores[1]:>7.4f} '
+                f'{1 - len(targeted.data) / len(fixed):>7.1%} '
+                f'{fixed_time * 1000:>5.0f}/{targeted_time * 1000:>5.0f}ms'
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Total: {totals['fixed']:,} -> {totals['targeted']:,} bytes "
+            f"({1 - totals['targeted'] / totals['fixed']:.1%} saved), encode time "
+            f"{totals['fixed_time']:.2f}s -> {totals['targeted_time']:.2f}s "
+            f"({totals['targeted_time'] / totals['fixed_time']:.1f}x)"
+        ))
@@ -0,0 +1,210 @@
+"""
+Management command to benchmark the image engines.
+
+Makes the renditions of every image of a corpus (decode, orient, and
+resize and encode for the fullscreen image and the thumbnail, as
+``Photo.save`` does) with each engine of src/gallery/image_engine.py.
+Reports throughput and the peak memory each engine needed. Each engine
+runs in a forked process, and its peak RSS is measured above what that
+process started with, so the engines do not inherit each other's peaks.
+
+By default the corpus is a few synthetic 48 MP photos (--megapixels), in
+--format: JPEGs are decoded at a reduced scale by both engines, PNG and
+HEIC originals show the cost of a full decode. Pass --dir to use a folder
+of real photos. --fixed-quality skips the SSIM quality search, which is
+the same for every engine, to compare decoding and resizing only.
+"""
+import io
+import multiprocessing
+import resource
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from src.gallery.image_engine import ENGINES, load_engine
+from src.uploads.validation import register_heif_opener
+
+RENDITIONS = (
+    ('FULLSCREEN_SIZE', 'FULLSCREEN_QUALITY'),
+    ('THUMBNAIL_SIZE', 'THUMBNAIL_QUALITY'),
+)
+
+CORPUS_FORMATS = {
+    'jpeg': ('JPEG', {'quality': 90}),
+    'png': ('PNG', {'compress_level': 1}),
+    'heic': ('HEIF', {'quality': 80}),
+}
+
+
+def _parse_engines(value):
+    names = value.split(',')
+    if any(name not in ENGINES for name in names):
+        raise ValueError(value)
+    return names
+
+
+def synthetic_corpus(megapixels, count, corpus_format):
+    """
+    Return (name, encoded bytes) pairs of ``count`` detailed photos of about
+    ``megapixels`` MP, 4:3.
+    """
+    from PIL import Image
+
+    register_heif_opener()
+    pil_format, options = CORPUS_FORMATS[corpus_format]
+    height = int((megapixels * 1_000_000 * 3 / 4) ** 0.5)
+    size = (height * 4 // 3, height)
+    corpus = []
+    for number in range(count):
+        # A fractal rendered small and scaled up, with grain at full size.
+        x = -2.0 + number * 0.3
+        fractal = Image.effect_mandelbrot((800, 600), (x, -1.2, x + 3.0, 1.2), 100)
+        gradient = Image.linear_gradient('L').resize((800, 600))
+        img = Image.merge('RGB', (fractal, fractal.point(lambda v: 255 - v), gradient)).resize(size)
+        grain = Image.effect_noise(size, 24)
+        img = Image.blend(img, Image.merge('RGB', (grain, grain, grain)), 0.1)
+        output = io.BytesIO()
+        img.save(output, format=pil_format, **options)
+        corpus.append((f'synthetic-{number}.{corpus_format}', output.getvalue()))
+    return corpus
+
+
+def load_corpus(directory):
+    corpus = []
+    for path in sorted(Path(directory).iterdir()):
+        if path.is_file():
+            corpus.append((path.name, path.read_bytes()))
+    return corpus
+
+
+def _max_rss_bytes():
+    # Kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def make_renditions(engine, data):
+    """
+    Make the renditions of one encoded original, as ``Photo.save`` does.
+    Returns the metadata of the original.
+    """
+    boxes = [(getattr(settings, size), getattr(settings, quality)) for size, quality in RENDITIONS]
+    decoded = engine.orient(engine.decode(io.BytesIO(data), boxes[0][0]))
+    for box, quality in boxes:
+        engine.encode(engine.resize(decoded, box), 'JPEG', quality)
+    return engine.metadata(io.BytesIO(data))
+
+
+def _run_engine(name, corpus, fixed_quality, connection):
+    try:
+        if fixed_quality:
+            settings.IMAGE_TARGET_SSIM = 0
+        engine = load_engine(name)
+        baseline = _max_rss_bytes()
+        pixels = 0
+        start = time.perf_counter()
+        for _, data in corpus:
+            metadata = make_renditions(engine, data)
+            pixels += metadata.width * metadata.height
+        elapsed = time.perf_counter() - start
+        connection.send({'elapsed': elapsed, 'pixels': pixels, 'peak': _max_rss_bytes() - baseline})
+    except ImproperlyConfigured as e:
+        connection.send({'error': f'not available: {e}'})
+    except Exception as e:
+        connection.send({'error': f'failed: {e!r}'})
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the image engines: rendition throughput and peak memory'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--engines',
+            type=_parse_engines,
+            default=list(ENGINES),
+            help=f'Comma-separated engines to compare (default: {",".join(ENGINES)})'
+        )
+        parser.add_argument(
+            '--dir',
+            type=str,
+            help='Folder of images to use instead of the synthetic corpus'
+        )
+        parser.add_argument(
+            '--megapixels',
+            type=float,
+            default=48,
+            help='Size of the synthetic photos (default: 48, a current phone camera)'
+        )
+        parser.add_argument(
+            '--images',
+            type=int,
+            default=3,
+            help='Number of synthetic photos (default: 3)'
+        )
+        parser.add_argument(
+            '--format',
+            choices=sorted(CORPUS_FORMATS),
+            default='jpeg',
+            help='Format of the synthetic photos (default: jpeg)'
+        )
+        parser.add_argument(
+            '--fixed-quality',
+            action='store_true',
+            help='Encode at the fixed rendition qualities instead of searching for the target SSIM'
+        )
+
+    def handle(self, *args, **options):
+        if options['dir']:
+            corpus = load_corpus(options['dir'])
+        else:
+            corpus = synthetic_corpus(options['megapixels'], options['images'], options['format'])
+        if not corpus:
+            raise CommandError('No images in the corpus')
+
+        total_bytes = sum(len(data) for _, data in corpus)
+        self.stdout.write(
+            f'{len(corpus)} images, {total_bytes / len(corpus) / 1024 / 1024:.1f} MB on average; '
+            f'renditions {settings.FULLSCREEN_SIZE[0]}x{settings.FULLSCREEN_SIZE[1]} and '
+            f'{settings.THUMBNAIL_SIZE[0]}x{settings.THUMBNAIL_SIZE[1]}'
+            f'{" at fixed quality" if options["fixed_quality"] else ""}'
+        )
+        self.stdout.write(f'{"engine":<8} {"images/s":>9} {"MP/s":>8} {"peak RSS":>10}')
+
+        # Forked, so the children share the corpus and the loaded code.
+        context = multiprocessing.get_context('fork')
+        results = {}
+        for name in options['engines']:
+            receiver, sender = context.Pipe(duplex=False)
+            process = context.Process(target=_run_engine, args=(name, corpus, options['fixed_quality'], sender))
+            process.start()
+            sender.close()
+            try:
+                result = receiver.recv()
+            except EOFError:
+                # The process died before reporting (e.g. killed for memory).
+                result = None
+            process.join()
+            if result is None:
+                result = {'error': f'failed: exit code {process.exitcode}'}
+
+            if 'error' in result:
+                self.stdout.write(f'{name:<8} {result["error"]}')
+                continue
+            results[name] = result
+            self.stdout.write(
+                f'{name:<8} {len(corpus) / result["elapsed"]:>9.2f} '
+                f'{result["pixels"] / 1_000_000 / result["elapsed"]:>8.1f} '
+                f'{result["peak"] / 1024 / 1024:>7.0f} MB'
+            )
+
+        if len(results) > 1:
+            baseline_name, baseline = next(iter(results.items()))
+            for name, result in list(results.items())[1:]:
+                self.stdout.write(self.style.SUCCESS(
+                    f'{name}: {baseline["elapsed"] / result["elapsed"]:.2f}x the throughput and '
+                    f'{result["peak"] / max(baseline["peak"], 1):.2f}x the peak memory of {baseline_name}'
+                ))
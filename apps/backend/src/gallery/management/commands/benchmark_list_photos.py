@@ -0,0 +1,86 @@
+"""
+Management command to benchmark the CPU cost of a list_photos page.
+
+Compares the original path (Photo instances through PhotoSerializer and
+the standard JSON renderer) with the fast path used by list_photos
+(.values() rows, batch URL signing and the orjson renderer). All data is
+created inside a transaction that is rolled back afterwards.
+"""
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from src.config.renderers import ORJSONRenderer
+from src.events.models import Event
+from src.gallery.listing import LIST_COLUMNS, serialize_photo_rows
+from src.gallery.models import Photo
+from src.gallery.serializers import PhotoSerializer
+
+
+class Command(BaseCommand):
+    help = 'Benchmark list_photos serialization: PhotoSerializer vs the fast path'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--page-size',
+            type=int,
+            default=100,
+            help='Photos per page (default: 100, the maximum page size)'
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=50,
+            help='Pages rendered per path (default: 50)'
+        )
+
+    def handle(self, *args, **options):
+        page_size = options['page_size']
+        iterations = options['iterations']
+
+        with transaction.atomic():
+            event = Event.objects.create(code=f'benchmark-{uuid.uuid4().hex[:8]}', name='Benchmark')
+            Photo.objects.bulk_create([
+                Photo(
+                    event=event,
+                    file_key=f'{event.code}/originals/{uuid.uuid4()}.jpg',
+                    thumbnail_key=f'{event.code}/thumbnails/{i}_thumbnail.jpg',
+                    fullscreen_key=f'{event.code}/fullscreen/{i}_fullscreen.jpg',
+                    original_filename=f'IMG_{i:04d}.jpg',
+                    file_size=3_500_000,
+                    content_type='image/jpeg',
+                )
+                for i in range(page_size)
+            ])
+            photos = Photo.objects.filter(event=event).order_by('-uploaded_at')
+
+            def serializer_page():
+                data = PhotoSerializer(list(photos[:page_size]), many=True).data
+                return JSONRenderer().render(data)
+
+            def fast_page():
+                rows = list(photos.values(*LIST_COLUMNS)[:page_size])
+                return ORJSONRenderer().render(serialize_photo_rows(rows))
+
+            serializer_cpu = self._measure(serializer_page, iterations)
+            fast_cpu = self._measure(fast_page, iterations)
+            transaction.set_rollback(True)
+
+        saved = serializer_cpu - fast_cpu
+        self.stdout.write(f'Page size: {page_size}, iterations: {iterations}')
+        self.stdout.write(f'  PhotoSerializer: {serializer_cpu * 1000:.2f} ms CPU/page')
+        self.stdout.write(f'  Fast path:       {fast_cpu * 1000:.2f} ms CPU/page')
+        self.stdout.write(self.style.SUCCESS(
+            f'  Saved:           {saved * 1000:.2f} ms CPU/page ({saved / serializer_cpu:.0%})'
+        ))
+
+    def _measure(self, render_page, iterations):
+        """Return the mean CPU seconds per call, after one warm-up call."""
+        render_page()
+        start = time.process_time()
+        for _ in range(iterations):
+            render_page()
+        return (time.process_time() - start) / iterations
@@ -0,0 +1,84 @@
+"""
+Management command to build thumbnail sprite sheets.
+
+Re-renders the sprite sheets whose membership changed since they were last
+built (see src/gallery/sprites.py). With --interval it keeps running and
+checks again every few seconds, which batches the changes of a burst of
+uploads into one rebuild per sheet.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from src.events.models import Event
+from src.gallery.models import Photo, SpriteSheet
+from src.gallery.sprites import build_sprite_sheet, photos_per_sheet, update_sprite_membership
+
+
+class Command(BaseCommand):
+    help = 'Build stale thumbnail sprite sheets'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--event',
+            type=str,
+            help='Only build sheets of the event with this code'
+        )
+        parser.add_argument(
+            '--backfill',
+            action='store_true',
+            help='First assign approved photos that are not in any sheet yet '
+                 '(photos uploaded before sprite sheets existed)'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0,
+            help='Keep running, checking for stale sheets every N seconds'
+        )
+
+    def handle(self, *args, **options):
+        events = Event.objects.all()
+        if options['event']:
+            events = events.filter(code=options['event'])
+
+        if options['backfill']:
+            for event in events:
+                photo_ids = list(
+                    Photo.objects.filter(
+                        event=event,
+                        moderation_status=Photo.ModerationStatus.APPROVED,
+                        sprite_sheet__isnull=True,
+                    ).order_by('uploaded_at', 'pk').values_list('pk', flat=True)
+                )
+                # A sheet's worth per write transaction, so uploads are not
+                # kept waiting behind a whole event.
+                chunk = photos_per_sheet()
+                for start in range(0, len(photo_ids), chunk):
+                    update_sprite_membership(event.pk, photo_ids[start:start + chunk])
+                if photo_ids:
+                    self.stdout.write(f'Assigned {len(photo_ids)} photos of {event.code} to sprite sheets')
+
+        while True:
+            built = self._build_stale(events)
+            if built or not options['interval']:
+                self.stdout.write(self.style.SUCCESS(f'Built {built} sprite sheets'))
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def _build_stale(self, events):
+        built = 0
+        stale = (
+            SpriteSheet.objects.filter(event__in=events)
+            .exclude(built_revision=F('revision'))
+            .select_related('event')
+            .order_by('event_id', 'index')
+        )
+        for sheet in stale:
+            if build_sprite_sheet(sheet):
+                built += 1
+            else:
+                self.stdout.write(f'Sheet {sheet.index} of {sheet.event.code} changed while building; retrying later')
+        return built
@@ -0,0 +1,32 @@
+"""
+Management command to rebuild the gallery timeline buckets.
+
+The buckets are kept up to date as photos change (see
+src/gallery/timeline.py). Rebuild them for galleries that predate the
+timeline, after inserting photos in bulk and after changing
+TIMELINE_BUCKET_SECONDS.
+"""
+from django.core.management.base import BaseCommand
+
+from src.events.models import Event
+from src.gallery.timeline import rebuild_timeline
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the timeline buckets of events'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--event',
+            type=str,
+            help='Only rebuild the event with this code'
+        )
+
+    def handle(self, *args, **options):
+        events = Event.objects.all()
+        if options['event']:
+            events = events.filter(code=options['event'])
+
+        for event in events:
+            buckets = rebuild_timeline(event)
+            self.stdout.write(f'{event.code}: {buckets} timeline buckets')
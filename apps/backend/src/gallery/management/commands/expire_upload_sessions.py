@@ -0,0 +1,61 @@
+"""
+Management command to clean up resumable upload sessions.
+
+Unfinished sessions past their expiry have their S3 multipart upload
+aborted (so the stored parts stop costing money) and are deleted, as are
+completed sessions once they expire. Run it periodically, e.g. hourly
+from cron.
+"""
+from botocore.exceptions import ClientError
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from src.gallery.models import UploadSession
+from src.uploads.storage import get_storage_client
+
+
+class Command(BaseCommand):
+    help = 'Abort and delete expired resumable upload sessions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report what would be removed'
+        )
+
+    def handle(self, *args, **options):
+        expired = UploadSession.objects.filter(expires_at__lte=timezone.now())
+        aborted = deleted = failed = 0
+
+        for session in expired.iterator():
+            if options['dry_run']:
+                self.stdout.write(f'Would remove {session.id} ({session.offset}/{session.length} bytes)')
+                deleted += 1
+                continue
+
+            if session.has_open_multipart_upload:
+                try:
+                    get_storage_client().abort_multipart_upload(
+                        session.file_key, session.multipart_upload_id
+                    )
+                    aborted += 1
+                except ClientError as e:
+                    if e.response.get('Error', {}).get('Code') != 'NoSuchUpload':
+                        # Keep the session so the next run retries the abort.
+                        self.stderr.write(f'Failed to abort upload {session.id}: {e}')
+                        failed += 1
+                        continue
+                    # Already gone, e.g. removed by the bucket lifecycle rule.
+                except Exception as e:
+                    # Keep the session so the next run retries the abort.
+                    self.stderr.write(f'Failed to abort upload {session.id}: {e}')
+                    failed += 1
+                    continue
+            session.delete()
+            deleted += 1
+
+        verb = 'Would remove' if options['dry_run'] else 'Removed'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {deleted} expired upload sessions ({aborted} multipart uploads aborted, {failed} failed)'
+        ))
@@ -0,0 +1,293 @@
+"""
+Management command to generate a large synthetic event for scale testing.
+
+Creates an event and bulk-inserts photo rows in batches, the way a busy
+wedding fills up: guests upload in bursts of a few photos, mostly around
+the ceremony, dinner and dancing, with a tail of uploads over the
+following days. Moderation states, file sizes and formats are mixed
+like real uploads. Rows go in with ``bulk_create``, so ``Photo.save``
+(renditions) and the ``photos_changed`` signal are bypassed: the timeline
+is rebuilt at the end, and ``build_sprite_sheets --backfill`` puts the
+photos into sprite sheets.
+
+With --with-files, JPEG originals and their thumbnail and fullscreen
+renditions are written to the configured storage by a pool of threads.
+A small set of distinct images is rendered once and reused, so the run
+measures storage and database throughput rather than image encoding.
+Reports rows/s and bytes/s.
+"""
+import io
+import math
+import random
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import router
+
+from src.config.transactions import retry_write
+from src.events.models import Event
+from src.gallery.encoding import encode
+from src.gallery.manifest import mark_manifest_dirty
+from src.gallery.models import Photo
+from src.gallery.timeline import rebuild_timeline
+from src.uploads.storage import get_storage_client
+
+# When uploads happen, in hours after the start of the event: (centre,
+# spread, share of the uploads during the event).
+UPLOAD_PEAKS = (
+    (0.5, 0.3, 0.15),  # ceremony
+    (2.5, 0.7, 0.20),  # group photos and drinks
+    (5.0, 1.0, 0.30),  # dinner and speeches
+    (8.0, 1.5, 0.35),  # dancing
+)
+# Share of the uploads made in the days after the event, and their mean
+# delay in hours.
+TAIL_SHARE = 0.15
+TAIL_MEAN_HOURS = 36
+
+# Phones produce 2-6 MB photos; about a third of guests upload HEIC.
+MEDIAN_FILE_SIZE = 3_000_000
+HEIC_SHARE = 0.3
+
+
+def _parse_size(value):
+    try:
+        width, height = (int(part) for part in value.lower().split('x'))
+    except ValueError:
+        raise CommandError(f'Invalid size {value!r}, expected WIDTHxHEIGHT')
+    return width, height
+
+
+def upload_times(rng, count, start):
+    """
+    Return ``count`` upload times, oldest first, in bursts of up to
+    MAX_PHOTOS_UPLOAD_LIMIT photos a few seconds apart.
+    """
+    limit = settings.MAX_PHOTOS_UPLOAD_LIMIT
+    burst_sizes = range(1, limit + 1)
+    burst_weights = [1 / size for size in burst_sizes]
+    centres, spreads, shares = zip(*UPLOAD_PEAKS)
+
+    times = []
+    while len(times) < count:
+        if rng.random() < TAIL_SHARE:
+            hours = 12 + rng.expovariate(1 / TAIL_MEAN_HOURS)
+        else:
+            peak = rng.choices(range(len(UPLOAD_PEAKS)), weights=shares)[0]
+            hours = max(0.0, rng.gauss(centres[peak], spreads[peak]))
+        moment = start + timedelta(hours=hours)
+        for _ in range(rng.choices(burst_sizes, weights=burst_weights)[0]):
+            times.append(moment)
+            moment += timedelta(seconds=rng.uniform(0.5, 4))
+    return sorted(times[:count])
+
+
+def render_images(rng, count, size):
+    """
+    Return ``count`` distinct (original, thumbnail, fullscreen) JPEG byte
+    strings, rendered like uploads and their renditions.
+    """
+    from PIL import Image
+
+    images = []
+    for _ in range(count):
+        x, y = rng.uniform(-2.0, 0.0), rng.uniform(-1.0, 0.2)
+        scale = rng.uniform(0.3, 1.5)
+        fractal = Image.effect_mandelbrot(size, (x, y, x + scale * 1.5, y + scale), 100)
+        noise = Image.effect_noise(size, rng.uniform(8, 40))
+        gradient = Image.linear_gradient('L').resize(size).rotate(rng.uniform(0, 360))
+        img = Image.merge('RGB', (fractal, Image.blend(gradient, noise, 0.3), gradient))
+
+        original = io.BytesIO()
+        img.save(original, format='JPEG', quality=90)
+        renditions = []
+        for box, quality in (
+            (settings.THUMBNAIL_SIZE, settings.THUMBNAIL_QUALITY),
+            (settings.FULLSCREEN_SIZE, settings.FULLSCREEN_QUALITY),
+        ):
+            rendition = img.copy()
+            rendition.thumbnail(box)
+            renditions.append(encode(rendition, 'JPEG', quality).data)
+        images.append((original.getvalue(), *renditions))
+    return images
+
+
+class Command(BaseCommand):
+    help = 'Generate a large synthetic event (photo rows, optionally files) for scale testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--code',
+            type=str,
+            help='Event code (default: synthetic-<random>)'
+        )
+        parser.add_argument(
+            '--photos',
+            type=int,
+            default=50_000,
+            help='Number of photos (default: 50000)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5_000,
+            help='Rows per bulk insert (default: 5000)'
+        )
+        parser.add_argument(
+            '--start',
+            type=datetime.fromisoformat,
+            help='Start of the event, ISO 8601 (default: a week ago, 15:00 UTC)'
+        )
+        parser.add_argument(
+            '--pending',
+            type=float,
+            default=0.03,
+            help='Share of photos awaiting moderation (default: 0.03)'
+        )
+        parser.add_argument(
+            '--rejected',
+            type=float,
+            default=0.02,
+            help='Share of photos rejected by moderation (default: 0.02)'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            help='Random seed, for reproducible events'
+        )
+        parser.add_argument(
+            '--with-files',
+            action='store_true',
+            help='Also write JPEG originals and renditions to storage'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=8,
+            help='Threads writing files (default: 8)'
+        )
+        parser.add_argument(
+            '--distinct-images',
+            type=int,
+            default=16,
+            help='Distinct images rendered and reused for the files (default: 16)'
+        )
+        parser.add_argument(
+            '--original-size',
+            type=_parse_size,
+            default=(2400, 1600),
+            help='Size of the generated originals, WIDTHxHEIGHT (default: 2400x1600)'
+        )
+
+    def handle(self, *args, **options):
+        if options['pending'] + options['rejected'] > 1:
+            raise CommandError('--pending and --rejected add up to more than 1')
+        rng = random.Random(options['seed'])
+        code = options['code'] or f'synthetic-{uuid.uuid4().hex[:8]}'
+        if Event.objects.filter(code=code).exists():
+            raise CommandError(f'Event "{code}" already exists')
+
+        start = options['start'] or (datetime.now(dt_timezone.utc) - timedelta(days=7)).replace(
+            hour=15, minute=0, second=0, microsecond=0
+        )
+        if start.tzinfo is None:
+            start = start.replace(tzinfo=dt_timezone.utc)
+        event = Event.objects.create(
+            code=code, name=f'Synthetic event ({options["photos"]} photos)', date=start.date()
+        )
+        self.stdout.write(f'Event {event.code}, access token {event.access_token}')
+
+        images = None
+        if options['with_files']:
+            images = render_images(rng, max(1, options['distinct_images']), options['original_size'])
+
+        times = upload_times(rng, options['photos'], start)
+        using = router.db_for_write(Photo)
+        rows = bytes_written = 0
+        db_seconds = storage_seconds = 0.0
+        with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as pool:
+            for offset in range(0, len(times), options['batch_size']):
+                batch = [
+                    self._photo(rng, event, number, uploaded_at, images, options)
+                    for number, uploaded_at in enumerate(
+                        times[offset:offset + options['batch_size']], start=offset + 1
+                    )
+                ]
+
+                began = time.perf_counter()
+                if images:
+                    bytes_written += sum(pool.map(self._write_files, batch))
+                storage_seconds += time.perf_counter() - began
+
+                began = time.perf_counter()
+                retry_write(using, Photo.objects.using(using).bulk_create, [photo for photo, _ in batch])
+                db_seconds += time.perf_counter() - began
+                rows += len(batch)
+                self.stdout.write(f'  {rows}/{len(times)} photos')
+
+        mark_manifest_dirty(event.pk, using)
+        rebuild_timeline(event, using)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Inserted {rows} photos in {db_seconds:.1f}s ({rows / max(db_seconds, 1e-9):,.0f} rows/s)'
+        ))
+        if images:
+            self.stdout.write(self.style.SUCCESS(
+                f'Wrote {bytes_written / (1024 * 1024):,.1f} MiB in {storage_seconds:.1f}s '
+                f'({bytes_written / (1024 * 1024) / max(storage_seconds, 1e-9):,.1f} MiB/s, '
+                f'{options["workers"]} workers)'
+            ))
+        self.stdout.write('Run build_sprite_sheets --backfill to put the photos into sprite sheets.')
+
+    def _photo(self, rng, event, number, uploaded_at, images, options):
+        """
+        Return an unsaved Photo and the files to write for it, if any.
+        """
+        draw = rng.random()
+        if draw < options['pending']:
+            status, moderated_at = Photo.ModerationStatus.PENDING, None
+        elif draw < options['pending'] + options['rejected']:
+            status = Photo.ModerationStatus.REJECTED
+            moderated_at = uploaded_at + timedelta(minutes=rng.expovariate(1 / 120))
+        else:
+            status, moderated_at = Photo.ModerationStatus.APPROVED, None
+
+        name = uuid.uuid4().hex
+        files = None
+        if images:
+            files = rng.choice(images)
+            extension, content_type, file_size = '.jpg', 'image/jpeg', len(files[0])
+        elif rng.random() < HEIC_SHARE:
+            extension, content_type = '.heic', 'image/heic'
+            file_size = int(rng.lognormvariate(math.log(MEDIAN_FILE_SIZE * 0.6), 0.4))
+        else:
+            extension, content_type = '.jpg', 'image/jpeg'
+            file_size = int(rng.lognormvariate(math.log(MEDIAN_FILE_SIZE), 0.4))
+
+        photo = Photo(
+            event=event,
+            file_key=f'{event.code}/originals/{name}{extension}',
+            thumbnail_key=f'{event.code}/thumbnails/{name}_thumbnail.jpg',
+            fullscreen_key=f'{event.code}/fullscreen/{name}_fullscreen.jpg',
+            original_filename=f'IMG_{number:06d}{extension.upper()}',
+            uploaded_at=uploaded_at,
+            moderation_status=status,
+            moderated_at=moderated_at,
+            file_size=file_size,
+            content_type=content_type,
+        )
+        return photo, files
+
+    def _write_files(self, item):
+        """
+        Write a photo's original and renditions; return the bytes written.
+        """
+        photo, files = item
+        storage = get_storage_client()
+        for key, data in zip((photo.file_key, photo.thumbnail_key, photo.fullscreen_key), files):
+            storage.upload_fileobj(io.BytesIO(data), key, content_type='image/jpeg')
+        return sum(len(data) for data in files)
@@ -0,0 +1,57 @@
+"""
+Management command to publish static gallery manifests.
+
+Publishes the manifests of events whose gallery changed and has since
+settled, and republishes signed manifests before their URLs expire (see
+src/gallery/manifest.py). With --interval it keeps running and checks again
+every few seconds; only one instance should run at a time.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from src.events.models import Event
+from src.gallery.manifest import due_manifests, publish_manifest
+
+
+class Command(BaseCommand):
+    help = 'Publish static gallery manifests to object storage'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--event',
+            type=str,
+            help='Publish the manifest of the event with this code now'
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Publish the manifests of all events now, changed or not'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0,
+            help='Keep running, publishing due manifests every N seconds'
+        )
+
+    def handle(self, *args, **options):
+        if options['event'] or options['all']:
+            events = Event.objects.all()
+            if options['event']:
+                events = events.filter(code=options['event'])
+            for event in events:
+                self._publish(event)
+
+        while True:
+            for manifest in due_manifests():
+                self._publish(manifest.event)
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def _publish(self, event):
+        if publish_manifest(event):
+            self.stdout.write(self.style.SUCCESS(f'Published manifest of {event.code}'))
+        else:
+            self.stdout.write(f'Manifest of {event.code} is up to date')
@@ -0,0 +1,95 @@
+"""
+Management command to delete unused objects from the bucket.
+
+First deletes the objects queued when their rows were deleted and
+everything stored under the prefixes of deleted events, then lists every
+event's prefix and deletes objects no row refers to (failed uploads,
+superseded sprite sheets and manifest pages) once they are older than the
+grace period. See src/gallery/storage_gc.py. Run it periodically, e.g.
+daily from cron.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from src.events.models import Event
+from src.gallery.models import StorageDeletion, StoragePrefixDeletion
+from src.gallery.storage_gc import (
+    delete_keys,
+    find_orphans,
+    find_unknown_prefixes,
+    objects_older_than,
+    prefix_deletion_keys,
+    process_deletion_queue,
+    process_prefix_deletions,
+)
+
+
+class Command(BaseCommand):
+    help = 'Delete storage objects that no database row refers to'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report what would be deleted'
+        )
+        parser.add_argument(
+            '--event',
+            type=str,
+            help='Only sweep the prefix of the event with this code'
+        )
+        parser.add_argument(
+            '--grace-hours',
+            type=float,
+            default=settings.STORAGE_GC_GRACE_HOURS,
+            help='Leave unreferenced objects younger than this alone'
+        )
+        parser.add_argument(
+            '--unknown-prefixes',
+            action='store_true',
+            help='Also delete everything under top-level prefixes that belong '
+                 'to no event (only if the bucket holds nothing else)'
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        older_than = timezone.now() - timedelta(hours=options['grace_hours'])
+
+        if dry_run:
+            self.stdout.write(f'Would delete {StorageDeletion.objects.count()} queued objects')
+            for queued in StoragePrefixDeletion.objects.order_by('pk'):
+                self._delete(queued.prefix, prefix_deletion_keys(queued), dry_run)
+        else:
+            deleted, failed = process_deletion_queue()
+            self.stdout.write(f'Deleted {deleted} queued objects ({failed} failed, kept queued)')
+            deleted, failed = process_prefix_deletions()
+            self.stdout.write(f'Deleted {deleted} objects of deleted events ({failed} failed, kept queued)')
+
+        events = Event.objects.all()
+        if options['event']:
+            events = events.filter(code=options['event'])
+        for event in events:
+            self._delete(f'{event.code}/', find_orphans(event, older_than), dry_run)
+
+        if options['unknown_prefixes'] and not options['event']:
+            for prefix in find_unknown_prefixes():
+                self._delete(prefix, objects_older_than(prefix, older_than), dry_run)
+
+    def _delete(self, prefix, keys, dry_run):
+        if dry_run:
+            count = 0
+            for key in keys:
+                self.stdout.write(f'Would delete {key}')
+                count += 1
+            self.stdout.write(f'Would delete {count} unreferenced objects under {prefix}')
+            return
+
+        sent, failed = delete_keys(keys)
+        for key in failed:
+            self.stderr.write(f'Failed to delete {key}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {sent - len(failed)} unreferenced objects under {prefix} ({len(failed)} failed)'
+        ))
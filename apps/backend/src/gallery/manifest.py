@@ -0,0 +1,250 @@
+"""
+Static gallery manifests.
+
+Browsing the gallery through ``list_photos`` costs every guest page view a
+token lookup, a query and URL signing. The manifest publisher writes the
+approved photos of an event to the bucket as static JSON instead, so guests
+can browse from S3/CloudFront:
+
+* ``{prefix}/index.json`` holds the manifest version, the photo count and
+  the URLs of the pages; it is the only object that is overwritten;
+* ``{prefix}/pages/{n}-{hash}.json`` hold ``MANIFEST_PAGE_SIZE`` photos
+  each, in ``list_photos`` format plus the ``sprite`` field. Pages are
+  content addressed and never change once written.
+
+The prefix is ``{code}/manifest/{digest}``, where the digest is an HMAC of
+the event's access token. Event codes are readable slugs, so without it
+anyone who guessed a code could read a public manifest; with it the index
+is only found through ``GET /api/gallery/manifest/``, which takes the
+token. Rotating the token moves the manifest on its next publish.
+
+Photos are ordered oldest first, so new uploads only change the last page;
+a page is uploaded again only when its content changes.
+
+Rendition URLs are either public (``MANIFEST_URL_MODE = "public"``, under
+``MANIFEST_PUBLIC_BASE_URL``, e.g. a CloudFront domain) or presigned for
+``MANIFEST_URL_EXPIRY``. Signed URLs are all signed as of the start of the
+current signing period (half the expiry), so unchanged pages keep the same
+URLs until the period ends and every URL is valid for at least half the
+expiry after it was published. Manifests are republished when the period
+rolls over.
+
+Gallery changes (``photos_changed``, deletions) mark the event's manifest
+dirty; ``publish_manifests`` publishes it once no change has arrived for
+``MANIFEST_DEBOUNCE_SECONDS``, or at the latest ``MANIFEST_MAX_DELAY_SECONDS``
+after the first unpublished change. Superseded pages are left in place so
+clients holding an older index keep working.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import hmac
+import io
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+from functools import partial
+from urllib.parse import quote
+
+from django.conf import settings
+from django.db import router
+from django.db.models import DateTimeField, Q, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from src.config.transactions import retry_write
+from src.events.models import Event
+from src.uploads.storage import get_storage_client
+
+from .listing import LIST_COLUMNS, PHOTO_FIELDS, serialize_photo_rows
+from .models import GalleryManifest, Photo
+from .sprites import sprite_positions
+
+MANIFEST_FIELDS = PHOTO_FIELDS + ("sprite",)
+
+# Pages never change; the index is revalidated on every load.
+PAGE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+INDEX_CACHE_CONTROL = "no-cache"
+
+
+def manifest_prefix(event: Event) -> str:
+    """
+    Return the key prefix of an event's manifest objects.
+    """
+    digest = hmac.new(
+        settings.SECRET_KEY.encode(),
+        f"manifest:{event.code}:{event.access_token}".encode(),
+        hashlib.sha256,
+    ).hexdigest()
+    return f"{event.code}/manifest/{digest[:32]}"
+
+
+def index_key(event: Event) -> str:
+    return f"{manifest_prefix(event)}/index.json"
+
+
+def signing_period_start(now: datetime | None = None) -> datetime | None:
+    """
+    Return the time manifest URLs are signed as of, or None for public URLs.
+    """
+    if settings.MANIFEST_URL_MODE == "public":
+        return None
+    period = max(1, settings.MANIFEST_URL_EXPIRY // 2)
+    timestamp = int((now or timezone.now()).timestamp())
+    return datetime.fromtimestamp(timestamp - timestamp % period, tz=dt_timezone.utc)
+
+
+def manifest_urls(keys: list[str], signed_at: datetime | None) -> dict[str, str]:
+    """
+    Return the URLs published for ``keys``: presigned as of ``signed_at``,
+    or public URLs when ``signed_at`` is None.
+    """
+    if signed_at is None:
+        base_url = settings.MANIFEST_PUBLIC_BASE_URL.rstrip("/")
+        return {key: f"{base_url}/{quote(key)}" for key in keys}
+    return get_storage_client().generate_presigned_urls(
+        keys, expires_in=settings.MANIFEST_URL_EXPIRY, signed_at=signed_at
+    )
+
+
+def mark_manifest_dirty(event_id: int, using: str | None = None, create: bool = True) -> None:
+    """
+    Record that the gallery of an event changed since its manifest was
+    published. With ``create=False`` only an existing manifest is marked.
+    """
+    using = using or router.db_for_write(GalleryManifest)
+    retry_write(using, _mark_dirty, using, event_id, timezone.now(), create)
+
+
+def _mark_dirty(using: str, event_id: int, now: datetime, create: bool) -> None:
+    manifests = GalleryManifest.objects.using(using).filter(event_id=event_id)
+    updated = manifests.update(
+        changed_at=now,
+        dirty_since=Coalesce("dirty_since", Value(now, output_field=DateTimeField())),
+    )
+    if not updated and create:
+        GalleryManifest.objects.using(using).get_or_create(
+            event_id=event_id, defaults={"changed_at": now, "dirty_since": now}
+        )
+
+
+def due_manifests(now: datetime | None = None):
+    """
+    Return the manifests that should be published now: dirty ones whose
+    changes have settled (or waited long enough), and published ones whose
+    signed URLs are from an earlier signing period.
+    """
+    now = now or timezone.now()
+    quiet_since = now - timedelta(seconds=settings.MANIFEST_DEBOUNCE_SECONDS)
+    overdue_since = now - timedelta(seconds=settings.MANIFEST_MAX_DELAY_SECONDS)
+    due = Q(dirty_since__isnull=False) & (
+        Q(changed_at__lte=quiet_since) | Q(dirty_since__lte=overdue_since)
+    )
+    signed_at = signing_period_start(now)
+    if signed_at is not None:
+        due |= Q(published_at__isnull=False) & (Q(signed_at__isnull=True) | Q(signed_at__lt=signed_at))
+    return GalleryManifest.objects.filter(due).select_related("event")
+
+
+def _fingerprint(*parts) -> str:
+    data = json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def _upload_json(key: str, data: dict, cache_control: str) -> None:
+    body = io.BytesIO(json.dumps(data, separators=(",", ":")).encode())
+    get_storage_client().upload_fileobj(
+        body, key, content_type="application/json", cache_control=cache_control
+    )
+
+
+def publish_manifest(event: Event, now: datetime | None = None) -> bool:
+    """
+    Publish the manifest of ``event``, uploading only the pages that
+    changed. Returns True if a new version was published.
+    """
+    now = now or timezone.now()
+    using = router.db_for_write(GalleryManifest)
+    manifest, _ = GalleryManifest.objects.using(using).get_or_create(event=event)
+    page_size = settings.MANIFEST_PAGE_SIZE
+    signed_at = signing_period_start(now)
+    url_base = signed_at.isoformat() if signed_at else settings.MANIFEST_PUBLIC_BASE_URL
+    prefix = manifest_prefix(event)
+
+    rows = list(
+        Photo.objects.using(using)
+        .filter(event=event, moderation_status=Photo.ModerationStatus.APPROVED)
+        .order_by("uploaded_at", "pk")
+        .values(*LIST_COLUMNS)
+    )
+    sprites = sprite_positions(rows)
+
+    page_keys, page_hashes, pages = [], [], []
+    for number, start in enumerate(range(0, len(rows), page_size)):
+        page_rows = rows[start:start + page_size]
+        # Everything the page content depends on, without signing.
+        page_hash = _fingerprint(
+            number, prefix, url_base, settings.MANIFEST_URL_EXPIRY,
+            page_rows, [sprites.get(row["id"]) for row in page_rows],
+        )
+        if number < len(manifest.page_hashes) and manifest.page_hashes[number] == page_hash:
+            page_key = manifest.page_keys[number]
+        else:
+            page_key = f"{prefix}/pages/{number}-{page_hash[:16]}.json"
+            photos = serialize_photo_rows(
+                page_rows, MANIFEST_FIELDS, sign=partial(manifest_urls, signed_at=signed_at)
+            )
+            _upload_json(page_key, {"page": number, "photos": photos}, PAGE_CACHE_CONTROL)
+        page_keys.append(page_key)
+        page_hashes.append(page_hash)
+        pages.append(len(page_rows))
+
+    page_urls = manifest_urls(page_keys, signed_at)
+    index = {
+        "event": {"code": event.code, "name": event.name},
+        "order": "oldest_first",
+        "photo_count": len(rows),
+        "page_size": page_size,
+        "urls_expire_at": (
+            (signed_at + timedelta(seconds=settings.MANIFEST_URL_EXPIRY)).isoformat()
+            if signed_at else None
+        ),
+        "pages": [{"url": page_urls[key], "count": count} for key, count in zip(page_keys, pages)],
+    }
+    index_hash = _fingerprint(index)
+    changed = index_hash != manifest.index_hash or manifest.index_key != index_key(event)
+    version = manifest.version + 1 if changed else manifest.version
+    if changed:
+        _upload_json(
+            index_key(event),
+            {"version": version, "published_at": now.isoformat(), **index},
+            INDEX_CACHE_CONTROL,
+        )
+
+    fields = {
+        "version": version,
+        "index_key": index_key(event),
+        "index_hash": index_hash,
+        "page_keys": page_keys,
+        "page_hashes": page_hashes,
+        "photo_count": len(rows),
+        "signed_at": signed_at,
+        "published_at": now if changed else manifest.published_at or now,
+    }
+
+    def save():
+        GalleryManifest.objects.using(using).filter(pk=manifest.pk).update(**fields)
+        # Changes that arrived while publishing stay pending.
+        GalleryManifest.objects.using(using).filter(
+            pk=manifest.pk, changed_at__lte=now
+        ).update(dirty_since=None, changed_at=None)
+
+    retry_write(using, save)
+    return changed
+
+
+def published_index_url(manifest: GalleryManifest) -> str:
+    """
+    Return the URL guests load the published index from.
+    """
+    return manifest_urls([manifest.index_key], manifest.signed_at)[manifest.index_key]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2 on 2026-10-19 08:00
+
+import django.db.models.deletion
+import django.utils.timezone
+import src.gallery.models
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0001_initial'),
+        ('gallery', '0003_photo_fullscreen_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadSession',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('file_key', models.CharField(help_text='Key/path the completed file will have in object storage.', max_length=512)),
+                ('multipart_upload_id', models.CharField(blank=True, max_length=1024)),
+                ('original_filename', models.CharField(blank=True, max_length=255)),
+                ('content_type', models.CharField(blank=True, max_length=255)),
+                ('length', models.BigIntegerField(help_text='Total size of the file in bytes.')),
+                ('chunk_size', models.BigIntegerField(help_text='Size of every chunk but the last.')),
+                ('offset', models.BigIntegerField(default=0, help_text='Bytes received so far.')),
+                ('parts', models.JSONField(blank=True, default=list)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+                ('expires_at', models.DateTimeField(default=src.gallery.models._upload_session_expiry)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upload_sessions', to='events.event')),
+                ('photo', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='upload_session', to='gallery.photo')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['expires_at'], name='gallery_upl_expires_d882f0_idx')],
+            },
+        ),
+    ]
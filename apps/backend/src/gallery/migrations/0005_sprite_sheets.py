@@ -0,0 +1,47 @@
+# Generated by Django 5.2 on 2026-10-19 08:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0001_initial'),
+        ('gallery', '0004_upload_session'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photo',
+            name='sprite_slot',
+            field=models.PositiveSmallIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='SpriteSheet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveIntegerField()),
+                ('next_slot', models.PositiveSmallIntegerField(default=0)),
+                ('revision', models.PositiveIntegerField(default=0)),
+                ('built_revision', models.PositiveIntegerField(default=0)),
+                ('image_key', models.CharField(blank=True, help_text='Key/path of the built sheet in object storage; empty while none is usable.', max_length=512)),
+                ('tile_size', models.PositiveSmallIntegerField(default=0)),
+                ('columns', models.PositiveSmallIntegerField(default=0)),
+                ('width', models.PositiveIntegerField(default=0)),
+                ('height', models.PositiveIntegerField(default=0)),
+                ('tiles', models.JSONField(blank=True, default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sprite_sheets', to='events.event')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='sprite_sheet',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='photos', to='gallery.spritesheet'),
+        ),
+        migrations.AddConstraint(
+            model_name='spritesheet',
+            constraint=models.UniqueConstraint(fields=('event', 'index'), name='unique_sprite_sheet_index'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2 on 2026-10-19 08:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0001_initial'),
+        ('gallery', '0005_sprite_sheets'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GalleryManifest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField(default=0)),
+                ('index_key', models.CharField(blank=True, max_length=512)),
+                ('index_hash', models.CharField(blank=True, max_length=64)),
+                ('page_keys', models.JSONField(blank=True, default=list)),
+                ('page_hashes', models.JSONField(blank=True, default=list)),
+                ('photo_count', models.PositiveIntegerField(default=0)),
+                ('signed_at', models.DateTimeField(blank=True, help_text='Signing time of the published URLs; null for public URLs.', null=True)),
+                ('published_at', models.DateTimeField(blank=True, null=True)),
+                ('dirty_since', models.DateTimeField(blank=True, help_text='First gallery change not yet published.', null=True)),
+                ('changed_at', models.DateTimeField(blank=True, help_text='Latest gallery change not yet published.', null=True)),
+                ('event', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='manifest', to='events.event')),
+            ],
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2 on 2026-10-19 08:15
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gallery', '0006_gallery_manifest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StorageDeletion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=1024)),
+                ('queued_at', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+            ],
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2 on 2026-10-19 08:32
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0001_initial'),
+        ('gallery', '0007_storage_deletion_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivePack',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(help_text='Key/path of the pack in object storage.', max_length=512)),
+                ('size', models.BigIntegerField(default=0)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archive_packs', to='events.event')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PackedObject',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=512, unique=True)),
+                ('offset', models.BigIntegerField()),
+                ('length', models.PositiveIntegerField()),
+                ('pack', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entries', to='gallery.archivepack')),
+                ('photo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='packed_objects', to='gallery.photo')),
+            ],
+            options={
+                'ordering': ['pack', 'offset'],
+            },
+        ),
+    ]
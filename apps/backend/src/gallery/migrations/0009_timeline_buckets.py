@@ -0,0 +1,40 @@
+# Generated by Django 5.2 on 2026-10-19 08:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0001_initial'),
+        ('gallery', '0008_archive_packs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('width', models.PositiveIntegerField(help_text='Bucket length in seconds.')),
+                ('start', models.DateTimeField()),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['event', 'width', 'start'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='photo',
+            index=models.Index(fields=['event', 'moderation_status', 'uploaded_at'], name='photo_event_status_time'),
+        ),
+        migrations.AddField(
+            model_name='timelinebucket',
+            name='event',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_buckets', to='events.event'),
+        ),
+        migrations.AddConstraint(
+            model_name='timelinebucket',
+            constraint=models.UniqueConstraint(fields=('event', 'width', 'start'), name='unique_timeline_bucket'),
+        ),
+    ]
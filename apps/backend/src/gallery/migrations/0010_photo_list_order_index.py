@@ -0,0 +1,22 @@
+# Generated by Django 5.2 on 2026-10-19 08:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0001_initial'),
+        ('gallery', '0009_timeline_buckets'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='photo',
+            name='photo_event_status_time',
+        ),
+        migrations.AddIndex(
+            model_name='photo',
+            index=models.Index(fields=['event', 'moderation_status', 'uploaded_at', 'id'], name='photo_event_status_time_id'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-19 12:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gallery', '0010_photo_list_order_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadsession',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, help_text='When the multipart upload was completed in object storage.', null=True),
+        ),
+        migrations.AddField(
+            model_name='uploadsession',
+            name='completing_until',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-19 15:40
+
+from django.db import migrations
+from django.db.models import Max, OuterRef, Subquery
+
+
+def backfill_packed_at(apps, schema_editor):
+    """
+    Mark the events that already have archive packs.
+    """
+    Event = apps.get_model('events', 'Event')
+    ArchivePack = apps.get_model('gallery', 'ArchivePack')
+    last_pack = ArchivePack.objects.filter(event=OuterRef('pk')).values('event').annotate(
+        last=Max('created_at')
+    ).values('last')
+    Event.objects.filter(pk__in=ArchivePack.objects.values('event')).update(packed_at=Subquery(last_pack))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0002_event_packed_at'),
+        ('gallery', '0011_upload_session_completion'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_packed_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2 on 2026-10-19 16:10
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gallery', '0012_event_packed_at_backfill'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoragePrefixDeletion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prefix', models.CharField(max_length=1024)),
+                ('queued_at', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+            ],
+        ),
+    ]
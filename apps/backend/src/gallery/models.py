@@ -5,18 +5,39 @@ Models for the gallery application.
 from __future__ import annotations
 
 import os
+import uuid
+from datetime import timedelta
 from io import BytesIO
 import io
 
 from django.conf import settings
 from django.core.files.base import ContentFile
-from django.db import models
+from django.db import models, router
 from django.utils import timezone
-from PIL import Image
+from src.config.transactions import retry_write
 from src.events.models import Event
+from src.gallery.admission import estimate_processing_bytes, get_processing_gate
+from src.gallery.image_engine import get_image_engine
+from src.gallery.signals import photos_changed
+from src.uploads.cloudfront import object_url
 from src.uploads.storage import get_storage_client
 
 
+def rendition_key(row: dict, rendition: str) -> str:
+    """
+    Return the storage key serving ``rendition`` ("original", "fullscreen"
+    or "thumbnail") for a photo row with the ``*_key`` columns.
+
+    Mirrors the ``Photo`` URL properties: the thumbnail falls back to the
+    fullscreen image, which falls back to the original.
+    """
+    if rendition == "thumbnail" and row["thumbnail_key"]:
+        return row["thumbnail_key"]
+    if rendition in ("thumbnail", "fullscreen") and row["fullscreen_key"]:
+        return row["fullscreen_key"]
+    return row["file_key"]
+
+
 class Photo(models.Model):
     """
     A single uploaded photo belonging to an event.
@@ -57,32 +78,41 @@ class Photo(models.Model):
     moderated_at = models.DateTimeField(null=True, blank=True)
     file_size = models.BigIntegerField(null=True, blank=True)
     content_type = models.CharField(max_length=255, blank=True)
+    sprite_sheet = models.ForeignKey(
+        "SpriteSheet",
+        null=True,
+        blank=True,
+        editable=False,
+        on_delete=models.SET_NULL,
+        related_name="photos",
+    )
+    sprite_slot = models.PositiveSmallIntegerField(null=True, blank=True, editable=False)
 
     @property
     def original_image_url(self) -> str:
         """
-        Returns a presigned URL to the original image file.
+        Returns a URL to the original image file.
         """
-        return get_storage_client().generate_presigned_url(self.file_key)
+        return object_url(self.file_key)
 
     @property
     def fullscreen_url(self) -> str:
         """
-        Returns a presigned URL to the fullscreen image file.
+        Returns a URL to the fullscreen image file.
         Returns the original image URL if no fullscreen image exists.
         """
         if self.fullscreen_key:
-            return get_storage_client().generate_presigned_url(self.fullscreen_key)
+            return object_url(self.fullscreen_key)
         return self.original_image_url
 
     @property
     def thumbnail_url(self) -> str:
         """
-        Returns a presigned URL to the thumbnail file.
+        Returns a URL to the thumbnail file.
         Returns the fullscreen image URL if no thumbnail exists.
         """
         if self.thumbnail_key:
-            return get_storage_client().generate_presigned_url(self.thumbnail_key)
+            return object_url(self.thumbnail_key)
         return self.fullscreen_url
 
     def save(self, *args, **kwargs):
@@ -91,39 +121,49 @@ class Photo(models.Model):
         on initial creation.
         """
         is_new = self._state.adding
-        super().save(*args, **kwargs)
+        using = kwargs.get("using") or router.db_for_write(Photo, instance=self)
+        retry_write(using, super().save, *args, **kwargs)
 
-        if is_new and self.file_key:
-            if not self.thumbnail_key:
-                self._create_and_upload_thumbnail()
-            if not self.fullscreen_key:
-                self._create_and_upload_fullscreen()
+        if is_new and self.file_key and not (self.thumbnail_key and self.fullscreen_key):
+            # Bound concurrent decodes in this process; uploads already hold
+            # a slot from admission control, so this does not wait for them.
+            with get_processing_gate().admit(estimate_processing_bytes(self.file_size or 0)):
+                # Decoded once for both renditions (HEIC decodes are slow).
+                original = self._decode_original()
+                if original is not None:
+                    if not self.thumbnail_key:
+                        self._create_and_upload_thumbnail(original)
+                    if not self.fullscreen_key:
+                        self._create_and_upload_fullscreen(original)
 
-    def _create_and_upload_fullscreen(self):
+        photos_changed.send(sender=Photo, event_id=self.event_id, photo_ids=[self.pk], using=using)
+
+    def _decode_original(self):
         """
-        Creates a fullscreen-optimized image and uploads it to storage.
+        Downloads, decodes and orients the original, large enough for the
+        fullscreen image (and so for the thumbnail). Returns None if it
+        cannot be read.
         """
-        storage = get_storage_client()
+        engine = get_image_engine()
         try:
             original_image_data = io.BytesIO()
-            storage.download_fileobj(self.file_key, original_image_data)
+            get_storage_client().download_fileobj(self.file_key, original_image_data)
             original_image_data.seek(0)
-            
-            img = Image.open(original_image_data)
+            return engine.orient(engine.decode(original_image_data, settings.FULLSCREEN_SIZE))
+        except Exception as e:
+            print(f"Error decoding {self.file_key}: {e}")
+            return None
 
-            if img.mode not in ("RGB", "L"):
-                img = img.convert("RGB")
-            
-            img.thumbnail(settings.FULLSCREEN_SIZE)
-
-            fullscreen_io = io.BytesIO()
-            img.save(
-                fullscreen_io,
-                format="JPEG",
-                quality=settings.FULLSCREEN_QUALITY,
-                optimize=True,
-            )
-            fullscreen_io.seek(0)
+    def _create_and_upload_fullscreen(self, original):
+        """
+        Creates a fullscreen-optimized image from the decoded original and
+        uploads it to storage.
+        """
+        storage = get_storage_client()
+        engine = get_image_engine()
+        try:
+            img = engine.resize(original, settings.FULLSCREEN_SIZE)
+            fullscreen_io = io.BytesIO(engine.encode(img, "JPEG", settings.FULLSCREEN_QUALITY).data)
             
             event_code = self.file_key.split('/')[0]
             filename = os.path.basename(self.file_key)
@@ -137,39 +177,25 @@ class Photo(models.Model):
                 content_type="image/jpeg"
             )
 
-            Photo.objects.filter(pk=self.pk).update(fullscreen_key=fullscreen_key)
+            retry_write(
+                self._state.db,
+                Photo.objects.using(self._state.db).filter(pk=self.pk).update,
+                fullscreen_key=fullscreen_key,
+            )
             self.fullscreen_key = fullscreen_key
 
         except Exception as e:
             print(f"Error creating fullscreen image for {self.file_key}: {e}")
 
-    def _create_and_upload_thumbnail(self):
+    def _create_and_upload_thumbnail(self, original):
         """
-        Creates a thumbnail from the original image and uploads it to storage.
+        Creates a thumbnail from the decoded original and uploads it to storage.
         """
         storage = get_storage_client()
+        engine = get_image_engine()
         try:
-            # Download original image into an in-memory buffer
-            original_image_data = io.BytesIO()
-            storage.download_fileobj(self.file_key, original_image_data)
-            original_image_data.seek(0)
-            
-            img = Image.open(original_image_data)
-
-            # Ensure image is in RGB mode for saving as JPEG
-            if img.mode not in ("RGB", "L"):
-                img = img.convert("RGB")
-            
-            img.thumbnail(settings.THUMBNAIL_SIZE)
-
-            thumb_io = io.BytesIO()
-            img.save(
-                thumb_io,
-                format="JPEG",
-                quality=settings.THUMBNAIL_QUALITY,
-                optimize=True,
-            )
-            thumb_io.seek(0)
+            img = engine.resize(original, settings.THUMBNAIL_SIZE)
+            thumb_io = io.BytesIO(engine.encode(img, "JPEG", settings.THUMBNAIL_QUALITY).data)
             
             # Construct a new key for the thumbnail
             event_code = self.file_key.split('/')[0]
@@ -186,7 +212,11 @@ class Photo(models.Model):
             )
 
             # Save the new thumbnail key to the model without calling save() again
-            Photo.objects.filter(pk=self.pk).update(thumbnail_key=thumb_key)
+            retry_write(
+                self._state.db,
+                Photo.objects.using(self._state.db).filter(pk=self.pk).update,
+                thumbnail_key=thumb_key,
+            )
             self.thumbnail_key = thumb_key
 
         except Exception as e:
@@ -196,7 +226,284 @@ class Photo(models.Model):
 
     class Meta:
         ordering = ["-uploaded_at"]
+        indexes = [
+            # Listings, timeline counts, and seeks by upload time (with id
+            # breaking ties, see src/gallery/neighbours.py).
+            models.Index(
+                fields=["event", "moderation_status", "uploaded_at", "id"], name="photo_event_status_time_id"
+            ),
+        ]
 
     def __str__(self) -> str:  # pragma: no cover - trivial
         return self.original_filename or self.file_key
 
+
+
+class SpriteSheet(models.Model):
+    """
+    One image holding the thumbnails of a fixed run of an event's photos.
+
+    Photos are assigned a slot (``Photo.sprite_slot``) in the event's newest
+    sheet when they are approved, so adding photos only ever touches that
+    sheet. Every membership change bumps ``revision``; ``build_sprite_sheets``
+    re-renders sheets whose ``built_revision`` is behind. ``tiles`` maps
+    photo ids to slots as they are in the built image.
+    """
+
+    event = models.ForeignKey(
+        Event,
+        on_delete=models.CASCADE,
+        related_name="sprite_sheets",
+    )
+    index = models.PositiveIntegerField()
+    next_slot = models.PositiveSmallIntegerField(default=0)
+    revision = models.PositiveIntegerField(default=0)
+    built_revision = models.PositiveIntegerField(default=0)
+    image_key = models.CharField(
+        max_length=512,
+        blank=True,
+        help_text="Key/path of the built sheet in object storage; empty while none is usable.",
+    )
+    tile_size = models.PositiveSmallIntegerField(default=0)
+    columns = models.PositiveSmallIntegerField(default=0)
+    width = models.PositiveIntegerField(default=0)
+    height = models.PositiveIntegerField(default=0)
+    tiles = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["event", "index"], name="unique_sprite_sheet_index"),
+        ]
+
+    def __str__(self) -> str:  # pragma: no cover - trivial
+        return f"{self.event} sprite sheet {self.index}"
+
+    @property
+    def is_stale(self) -> bool:
+        return self.built_revision != self.revision
+
+
+class GalleryManifest(models.Model):
+    """
+    State of an event's static gallery manifest in object storage.
+
+    ``page_hashes`` and ``page_keys`` describe the published pages, so a
+    publish only uploads pages whose content changed. ``dirty_since`` and
+    ``changed_at`` record unpublished gallery changes, for debouncing.
+    """
+
+    event = models.OneToOneField(
+        Event,
+        on_delete=models.CASCADE,
+        related_name="manifest",
+    )
+    version = models.PositiveIntegerField(default=0)
+    index_key = models.CharField(max_length=512, blank=True)
+    index_hash = models.CharField(max_length=64, blank=True)
+    page_keys = models.JSONField(default=list, blank=True)
+    page_hashes = models.JSONField(default=list, blank=True)
+    photo_count = models.PositiveIntegerField(default=0)
+    signed_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Signing time of the published URLs; null for public URLs.",
+    )
+    published_at = models.DateTimeField(null=True, blank=True)
+    dirty_since = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="First gallery change not yet published.",
+    )
+    changed_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Latest gallery change not yet published.",
+    )
+
+    def __str__(self) -> str:  # pragma: no cover - trivial
+        return f"{self.event} manifest v{self.version}"
+
+
+class TimelineBucket(models.Model):
+    """
+    The number of approved photos of an event uploaded in one time bucket,
+    ``width`` seconds long (see src/gallery/timeline.py).
+    """
+
+    event = models.ForeignKey(
+        Event,
+        on_delete=models.CASCADE,
+        related_name="timeline_buckets",
+    )
+    width = models.PositiveIntegerField(help_text="Bucket length in seconds.")
+    start = models.DateTimeField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ["event", "width", "start"]
+        constraints = [
+            models.UniqueConstraint(fields=["event", "width", "start"], name="unique_timeline_bucket"),
+        ]
+
+    def __str__(self) -> str:  # pragma: no cover - trivial
+        return f"{self.event} {self.start:%Y-%m-%d %H:%M} +{self.width}s: {self.count}"
+
+
+class ArchivePack(models.Model):
+    """
+    One object in storage holding the renditions of many of an event's
+    photos back to back (see src/gallery/packs.py).
+
+    Where each rendition lies in the pack is recorded as ``PackedObject``
+    rows. Renditions stored after the pack was built stay loose objects.
+    """
+
+    event = models.ForeignKey(
+        Event,
+        on_delete=models.CASCADE,
+        related_name="archive_packs",
+    )
+    key = models.CharField(max_length=512, help_text="Key/path of the pack in object storage.")
+    size = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    def __str__(self) -> str:  # pragma: no cover - trivial
+        return self.key
+
+
+class PackedObject(models.Model):
+    """
+    Where a rendition lies in an archive pack.
+
+    ``key`` is the loose object the bytes were copied from: an entry only
+    applies while the photo still refers to that key.
+    """
+
+    pack = models.ForeignKey(
+        ArchivePack,
+        on_delete=models.CASCADE,
+        related_name="entries",
+    )
+    photo = models.ForeignKey(
+        Photo,
+        on_delete=models.CASCADE,
+        related_name="packed_objects",
+    )
+    key = models.CharField(max_length=512, unique=True)
+    offset = models.BigIntegerField()
+    length = models.PositiveIntegerField()
+
+    class Meta:
+        ordering = ["pack", "offset"]
+
+    def __str__(self) -> str:  # pragma: no cover - trivial
+        return f"{self.key} @ {self.pack_id}:{self.offset}+{self.length}"
+
+
+def _upload_session_expiry():
+    return timezone.now() + timedelta(hours=settings.RESUMABLE_UPLOAD_EXPIRY_HOURS)
+
+
+class UploadSession(models.Model):
+    """
+    An in-progress resumable upload.
+
+    Chunks are stored as parts of an S3 multipart upload, which is started
+    when the first chunk arrives (its bytes tell us the real content type).
+    Once every byte has arrived the upload is completed into a ``Photo``.
+    Sessions left unfinished past ``expires_at`` are aborted by the
+    ``expire_upload_sessions`` command.
+
+    Completing is two steps that can fail independently: the multipart
+    upload is completed in S3 (recorded in ``completed_at``, so a retry does
+    not complete it again), then the photo is created. One request at a
+    time holds the completion for ``COMPLETION_LEASE``
+    (``completing_until``), so concurrent completes create one photo.
+    """
+
+    COMPLETION_LEASE = timedelta(minutes=2)
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    event = models.ForeignKey(
+        Event,
+        on_delete=models.CASCADE,
+        related_name="upload_sessions",
+    )
+    file_key = models.CharField(
+        max_length=512,
+        help_text="Key/path the completed file will have in object storage.",
+    )
+    multipart_upload_id = models.CharField(max_length=1024, blank=True)
+    original_filename = models.CharField(max_length=255, blank=True)
+    content_type = models.CharField(max_length=255, blank=True)
+    length = models.BigIntegerField(help_text="Total size of the file in bytes.")
+    chunk_size = models.BigIntegerField(help_text="Size of every chunk but the last.")
+    offset = models.BigIntegerField(default=0, help_text="Bytes received so far.")
+    parts = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+    expires_at = models.DateTimeField(default=_upload_session_expiry)
+    completed_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="When the multipart upload was completed in object storage.",
+    )
+    completing_until = models.DateTimeField(null=True, blank=True, editable=False)
+    photo = models.OneToOneField(
+        Photo,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="upload_session",
+    )
+
+    class Meta:
+        indexes = [models.Index(fields=["expires_at"])]
+
+    def __str__(self) -> str:  # pragma: no cover - trivial
+        return f"{self.original_filename} ({self.offset}/{self.length})"
+
+    @property
+    def is_expired(self) -> bool:
+        return self.expires_at <= timezone.now()
+
+    @property
+    def is_complete(self) -> bool:
+        return self.photo_id is not None
+
+    @property
+    def has_open_multipart_upload(self) -> bool:
+        return bool(self.multipart_upload_id) and self.completed_at is None
+
+
+class StorageDeletion(models.Model):
+    """
+    An object in storage whose database row is gone and that is waiting to
+    be deleted by ``sweep_storage`` (see src/gallery/storage_gc.py).
+
+    Queued in the same transaction as the row deletion, so a rolled back
+    delete never loses an object.
+    """
+
+    key = models.CharField(max_length=1024)
+    queued_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    def __str__(self) -> str:  # pragma: no cover - trivial
+        return self.key
+
+
+class StoragePrefixDeletion(models.Model):
+    """
+    The storage prefix of a deleted event, waiting for ``sweep_storage`` to
+    delete everything stored under it before the event was deleted (see
+    src/gallery/storage_gc.py).
+
+    Only older objects are deleted, so a new event that reuses the code
+    keeps its own.
+    """
+
+    prefix = models.CharField(max_length=1024)
+    queued_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    def __str__(self) -> str:  # pragma: no cover - trivial
+        return self.prefix
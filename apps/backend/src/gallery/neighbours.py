@@ -0,0 +1,105 @@
+"""
+Lightbox neighbours.
+
+When a guest opens a photo in the lightbox, the client asks for the photos
+just before and after it in the listing, with their fullscreen URLs, so it
+can download them before the guest presses an arrow key.
+
+The listing is ordered newest first by ``LIST_ORDER``; ``id`` breaks ties
+between photos uploaded in the same instant, so the order is total and
+the same on every page. Neighbours are found with keyset seeks from the
+photo's ``(uploaded_at, id)`` rather than by counting its offset in the
+listing: each side is one range scan of the ``photo_event_status_time_id``
+index that stops after ``count`` rows, however deep into a large gallery
+the photo is.
+
+Listing pages can start from a key the same way: ``encode_cursor`` turns
+a row's ``(uploaded_at, id)`` into an opaque ``before=`` cursor, and
+``older_than`` seeks to the rows after it in list order.
+"""
+
+from __future__ import annotations
+
+import base64
+import binascii
+from datetime import datetime
+
+from django.db.models import Q, QuerySet
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from src.events.models import Event
+
+from .listing import LIST_COLUMNS
+from .models import Photo
+
+# Order of photo listings, newest first.
+LIST_ORDER = ("-uploaded_at", "-id")
+
+DEFAULT_NEIGHBOURS = 2
+MAX_NEIGHBOURS = 10
+
+
+def find_neighbours(
+    event: Event, photo_id: int, count: int = DEFAULT_NEIGHBOURS
+) -> tuple[dict, list[dict], list[dict]] | None:
+    """
+    Return the row of an approved photo and up to ``count`` rows before and
+    after it in list order (``Photo.objects.values(*LIST_COLUMNS)``), or
+    None if the event has no such photo.
+
+    Both lists are in list order, so the photo shown after ``previous[-1]``
+    is the photo itself, and after that ``next[0]``.
+    """
+    approved = Photo.objects.filter(event=event, moderation_status=Photo.ModerationStatus.APPROVED)
+    row = approved.filter(pk=photo_id).values(*LIST_COLUMNS).first()
+    if row is None:
+        return None
+
+    uploaded_at, pk = row["uploaded_at"], row["id"]
+    newer = approved.filter(
+        Q(uploaded_at__gt=uploaded_at) | Q(uploaded_at=uploaded_at, id__gt=pk)
+    ).order_by("uploaded_at", "id").values(*LIST_COLUMNS)[:count]
+    older = older_than(approved, uploaded_at, pk).order_by(*LIST_ORDER).values(*LIST_COLUMNS)[:count]
+    return row, list(reversed(newer)), list(older)
+
+
+def older_than(queryset: QuerySet, uploaded_at: datetime, pk: int) -> QuerySet:
+    """Photos of ``queryset`` after the key ``(uploaded_at, pk)`` in list order."""
+    return queryset.filter(Q(uploaded_at__lt=uploaded_at) | Q(uploaded_at=uploaded_at, id__lt=pk))
+
+
+def encode_cursor(row: dict) -> str:
+    """The ``before=`` cursor of a row with ``uploaded_at`` and ``id``."""
+    key = f"{row['uploaded_at'].isoformat()}|{row['id']}"
+    return base64.urlsafe_b64encode(key.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """
+    The ``(uploaded_at, id)`` key of a cursor from ``encode_cursor``.
+    Raises ValueError if it is not one.
+    """
+    try:
+        key = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    except (binascii.Error, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+    uploaded_at, _, pk = key.partition("|")
+    moment = parse_datetime(uploaded_at)
+    if moment is None or timezone.is_naive(moment) or not pk.isdigit():
+        raise ValueError("Invalid cursor")
+    return moment, int(pk)
+
+
+def by_distance(previous: list, following: list) -> list:
+    """
+    Interleave neighbours nearest first: next, previous, second next, ...
+    Guests mostly move forward, so at equal distance the next photo wins.
+    """
+    ordered = []
+    for distance in range(max(len(previous), len(following))):
+        if distance < len(following):
+            ordered.append(following[distance])
+        if distance < len(previous):
+            ordered.append(previous[-1 - distance])
+    return ordered
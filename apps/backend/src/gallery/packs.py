@@ -0,0 +1,202 @@
+"""
+Per-event archive packs.
+
+Once an event is over its gallery is mostly read, and every thumbnail and
+fullscreen image is a separate small object: one GET and one signature
+each. ``archive_event`` copies an event's renditions back to back into one
+large object, a pack, and records where each one lies (``PackedObject``).
+
+Listings then point packed renditions at ``/api/gallery/packed/<id>``
+instead of presigned URLs, so they sign nothing. That endpoint reads the
+bytes with a ranged GET into the pack (browsers cannot send ``Range``
+from an ``<img>``, so the byte ranges are resolved here rather than with
+range-signed URLs). Renditions are laid out in listing order, thumbnails
+first, and a miss reads ahead ``ARCHIVE_READAHEAD_KB`` into the pack, so
+one GET fills the disk cache (``image_cache``) with the neighbouring
+thumbnails the same page is about to request.
+
+Events without a pack (``Event.packed_at`` is null) are signed as
+before, without looking for packed objects.
+
+Packing does not touch the loose objects, and anything stored after a
+pack was built (a late upload to an archived event) is simply not in it,
+so it keeps being served from its loose object. Running ``archive_event``
+again packs just those. The loose renditions are kept rather than deleted
+because only listings and ``photo_urls`` know about packs: sprite sheets
+are rebuilt from loose thumbnails when photos are moderated or deleted,
+and the static manifest and the serializer's URLs point straight at
+loose objects, which a CDN or presigned URL cannot address as a byte
+range of a pack. They are the small part of an event's storage (a few
+hundred KB per photo, next to originals of several MB), and they go with
+their photo or event like any other rendition.
+"""
+
+from __future__ import annotations
+
+import io
+import tempfile
+import uuid
+from typing import BinaryIO, Callable
+
+from django.conf import settings
+from django.db import router, transaction
+from django.utils import timezone
+
+from src.config import metrics
+from src.config.transactions import retry_write
+from src.events.models import Event
+from src.uploads.cloudfront import object_urls
+from src.uploads.storage import get_storage_client
+
+from .image_cache import get_image_cache
+from .models import ArchivePack, PackedObject, Photo
+
+# Columns of a PackedObject needed to read it.
+PACKED_COLUMNS = ("id", "key", "offset", "length", "pack_id", "pack__key")
+
+
+def unpacked_renditions(event: Event) -> list[tuple[int, str]]:
+    """
+    Return ``(photo_id, key)`` for the event's renditions that are in no
+    pack, thumbnails first, each in listing order.
+    """
+    rows = list(
+        Photo.objects.filter(event=event)
+        .order_by("-uploaded_at")
+        .values_list("id", "thumbnail_key", "fullscreen_key")
+    )
+    packed = set(PackedObject.objects.filter(pack__event=event).values_list("key", flat=True))
+    renditions = [(photo_id, key) for photo_id, key, _ in rows]
+    renditions += [(photo_id, key) for photo_id, _, key in rows]
+    return [(photo_id, key) for photo_id, key in renditions if key and key not in packed]
+
+
+def build_pack(event: Event) -> ArchivePack | None:
+    """
+    Pack the event's unpacked renditions into a new pack.
+
+    Returns None when there is nothing to pack. Renditions missing from
+    storage are skipped.
+    """
+    from botocore.exceptions import ClientError
+
+    renditions = unpacked_renditions(event)
+    if not renditions:
+        return None
+
+    storage = get_storage_client()
+    entries = []
+    with tempfile.TemporaryFile() as pack_file:
+        for photo_id, key in renditions:
+            # Through a buffer: the transfer manager seeks within the file
+            # it downloads into.
+            data = io.BytesIO()
+            try:
+                storage.download_fileobj(key, data)
+            except ClientError as e:
+                if e.response.get("Error", {}).get("Code") not in ("404", "NoSuchKey"):
+                    raise
+                continue
+            entries.append((photo_id, key, pack_file.tell(), data.tell()))
+            pack_file.write(data.getbuffer())
+        if not entries:
+            return None
+
+        size = pack_file.tell()
+        pack_file.seek(0)
+        pack_key = f"{event.code}/packs/{uuid.uuid4().hex}.pack"
+        storage.upload_fileobj(pack_file, pack_key, content_type="application/octet-stream")
+
+    using = router.db_for_write(ArchivePack)
+
+    def record():
+        with transaction.atomic(using=using):
+            pack = ArchivePack.objects.using(using).create(event=event, key=pack_key, size=size)
+            # Photos deleted while packing are left out.
+            existing = set(
+                Photo.objects.using(using)
+                .filter(pk__in={photo_id for photo_id, *_ in entries})
+                .values_list("pk", flat=True)
+            )
+            PackedObject.objects.using(using).bulk_create([
+                PackedObject(pack=pack, photo_id=photo_id, key=key, offset=offset, length=length)
+                for photo_id, key, offset, length in entries
+                if photo_id in existing
+            ])
+            Event.objects.using(using).filter(pk=event.pk).update(packed_at=timezone.now())
+        return pack
+
+    return retry_write(using, record)
+
+
+def packed_url_signer(
+    event: Event, packed_url: Callable[[int], str]
+) -> Callable[[list[str]], dict[str, str]]:
+    """
+    Return a ``sign`` function for ``serialize_photo_rows`` that maps
+    packed keys of ``event`` to ``packed_url(packed_object_id)`` and
+    the rest to their ``object_urls``.
+    """
+    if event.packed_at is None:
+        return object_urls
+
+    def sign(keys: list[str]) -> dict[str, str]:
+        packed = dict(
+            PackedObject.objects.filter(pack__event=event, key__in=keys).values_list("key", "id")
+        )
+        urls = {key: packed_url(object_id) for key, object_id in packed.items()}
+        loose = [key for key in keys if key not in packed]
+        if loose:
+            urls.update(object_urls(loose))
+        return urls
+
+    return sign
+
+
+def open_packed(row: dict) -> BinaryIO:
+    """
+    Return the bytes of a packed rendition (a row with ``PACKED_COLUMNS``),
+    from the disk cache or with a ranged GET into its pack.
+    """
+    cache = get_image_cache()
+    fileobj = cache.get(row["key"])
+    if fileobj is not None:
+        metrics.PACKED_OBJECT_REQUESTS.labels("disk").inc()
+        return fileobj
+
+    with cache.lock(row["key"]):
+        fileobj = cache.get(row["key"])
+        if fileobj is not None:
+            metrics.PACKED_OBJECT_REQUESTS.labels("disk").inc()
+            return fileobj
+
+        chunks = read_ahead(row)
+        for key, data in chunks.items():
+            cache.put(key, data)
+        metrics.PACKED_OBJECT_REQUESTS.labels("pack").inc()
+    return io.BytesIO(chunks[row["key"]])
+
+
+def read_ahead(row: dict) -> dict[str, bytes]:
+    """
+    Read a packed rendition and the ones following it in the pack, up to
+    ``ARCHIVE_READAHEAD_KB``, with one ranged GET.
+
+    Returns the bytes of each by key.
+    """
+    end = row["offset"] + max(row["length"], settings.ARCHIVE_READAHEAD_KB * 1024)
+    neighbours = (
+        PackedObject.objects.filter(pack_id=row["pack_id"], offset__gte=row["offset"], offset__lt=end)
+        .order_by("offset")
+        .values_list("key", "offset", "length")
+    )
+    objects = [
+        (key, offset, length) for key, offset, length in neighbours
+        if key == row["key"] or offset + length <= end
+    ]
+    span = max(offset + length for _, offset, length in objects) - row["offset"]
+    data = get_storage_client().get_range(row["pack__key"], row["offset"], span)
+    return {
+        key: data[offset - row["offset"]:offset - row["offset"] + length]
+        for key, offset, length in objects
+    }
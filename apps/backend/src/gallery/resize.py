@@ -0,0 +1,185 @@
+"""
+On-the-fly image variants.
+
+``/api/gallery/photos/<id>/img?w=&fmt=`` serves a photo resized to a given
+width, so the frontend can ask for the sizes it needs (srcset, new layouts)
+without backfilling renditions for every photo. Requested widths are
+snapped up to one of ``IMAGE_VARIANT_WIDTHS``, which bounds the number of
+variants per photo.
+
+Variants are looked up in three tiers:
+
+1. the local disk cache (``image_cache``), shared by the workers of a host;
+2. object storage, under ``{code}/variants/{photo_id}/{fingerprint}/w{width}.{ext}``,
+   where every rendered variant is written back so it survives deploys and
+   is shared between hosts;
+3. rendering from the original, bounded by the processing gate.
+
+The fingerprint (``variant_fingerprint``) digests everything besides the
+original that decides a variant's bytes: the image engine, the encoder
+settings and ``VARIANT_RENDERING``. Changing any of them moves variants to
+new keys, so both caches miss and the variant is rendered again; the
+variants left under the old fingerprint are swept as orphans
+(src/gallery/storage_gc.py).
+
+Concurrent misses of the same variant are de-duplicated: the first request
+renders it while the others wait for the cache to be filled.
+"""
+
+from __future__ import annotations
+
+import io
+from dataclasses import dataclass
+from hashlib import sha256
+from typing import BinaryIO
+
+from django.conf import settings
+
+from src.config import metrics
+from src.uploads.storage import get_storage_client
+
+from .admission import estimate_processing_bytes, get_processing_gate
+from .image_cache import get_image_cache
+from .image_engine import get_image_engine
+
+# fmt parameter -> (Pillow format, content type, file extension).
+VARIANT_FORMATS = {
+    "jpeg": ("JPEG", "image/jpeg", "jpg"),
+    "webp": ("WEBP", "image/webp", "webp"),
+}
+
+# Bumped when rendering changes in a way the settings do not show.
+# 2: the EXIF orientation is applied.
+VARIANT_RENDERING = 2
+
+
+@dataclass(frozen=True)
+class Variant:
+    """
+    One resized version of a photo.
+    """
+
+    photo_id: int
+    source_key: str
+    width: int
+    fmt: str
+    key: str
+
+    @property
+    def content_type(self) -> str:
+        return VARIANT_FORMATS[self.fmt][1]
+
+    @property
+    def etag(self) -> str:
+        # The key carries the width, format and settings fingerprint.
+        digest = sha256(f"{self.source_key}:{self.key}".encode()).hexdigest()
+        return f'"{digest[:32]}"'
+
+
+def variant_fingerprint() -> str:
+    """
+    Return a short digest of the rendering version, engine and encoder
+    settings variants are currently made with.
+    """
+    rendering = (
+        VARIANT_RENDERING,
+        settings.IMAGE_ENGINE,
+        settings.IMAGE_VARIANT_QUALITY,
+        settings.IMAGE_TARGET_SSIM,
+        settings.IMAGE_MIN_QUALITY,
+        settings.IMAGE_MAX_QUALITY,
+    )
+    return sha256(repr(rendering).encode()).hexdigest()[:12]
+
+
+def snap_width(width: int) -> int:
+    """
+    Return the smallest allowed width at least ``width``, or the largest
+    allowed width.
+    """
+    widths = sorted(settings.IMAGE_VARIANT_WIDTHS)
+    for allowed in widths:
+        if allowed >= width:
+            return allowed
+    return widths[-1]
+
+
+def variant_for(row: dict, event_code: str, width: int, fmt: str) -> Variant:
+    """
+    Describe the variant of a photo row (``id`` and ``file_key``) at
+    ``width`` (already snapped) in format ``fmt``.
+    """
+    extension = VARIANT_FORMATS[fmt][2]
+    return Variant(
+        photo_id=row["id"],
+        source_key=row["file_key"],
+        width=width,
+        fmt=fmt,
+        key=f"{event_code}/variants/{row['id']}/{variant_fingerprint()}/w{width}.{extension}",
+    )
+
+
+def open_variant(variant: Variant, file_size: int = 0) -> BinaryIO:
+    """
+    Return the variant's bytes, rendering and storing it on a miss.
+
+    Raises ``AdmissionRejected`` when rendering has to wait too long for
+    the processing gate.
+    """
+    cache = get_image_cache()
+    fileobj = cache.get(variant.key)
+    if fileobj is not None:
+        metrics.IMAGE_VARIANT_REQUESTS.labels("disk").inc()
+        return fileobj
+
+    with cache.lock(variant.key):
+        # Another request may have filled the cache while we waited.
+        fileobj = cache.get(variant.key)
+        if fileobj is not None:
+            metrics.IMAGE_VARIANT_REQUESTS.labels("disk").inc()
+            return fileobj
+
+        data = _download(variant.key)
+        if data is not None:
+            metrics.IMAGE_VARIANT_REQUESTS.labels("storage").inc()
+        else:
+            with get_processing_gate().admit(
+                estimate_processing_bytes(file_size), settings.UPLOAD_ADMISSION_TIMEOUT
+            ):
+                source = _download(variant.source_key)
+                if source is None:
+                    raise FileNotFoundError(variant.source_key)
+                data = render_variant(source, variant.width, variant.fmt)
+            get_storage_client().upload_fileobj(
+                io.BytesIO(data), variant.key, content_type=variant.content_type
+            )
+            metrics.IMAGE_VARIANT_REQUESTS.labels("rendered").inc()
+
+        cache.put(variant.key, data)
+    return io.BytesIO(data)
+
+
+def _download(key: str) -> bytes | None:
+    from botocore.exceptions import ClientError
+
+    data = io.BytesIO()
+    try:
+        get_storage_client().download_fileobj(key, data)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey"):
+            return None
+        raise
+    return data.getvalue()
+
+
+def render_variant(source: bytes, width: int, fmt: str) -> bytes:
+    """
+    Orient an encoded image, resize it to ``width`` (never upscaling) and
+    encode it in ``fmt``.
+    """
+    engine = get_image_engine()
+    pil_format = VARIANT_FORMATS[fmt][0]
+    # The box only constrains the width.
+    box = (width, 1 << 16)
+    img = engine.orient(engine.decode(io.BytesIO(source), box))
+    return engine.encode(engine.resize(img, box), pil_format, settings.IMAGE_VARIANT_QUALITY).data
@@ -2,7 +2,8 @@
 Serializers for the gallery application.
 """
 from rest_framework import serializers
-from .models import Photo
+from src.uploads.validation import ImageValidationError, validate_image
+from .models import Photo, UploadSession
 
 
 class PhotoSerializer(serializers.ModelSerializer):
@@ -29,13 +30,36 @@ class PhotoUploadSerializer(serializers.Serializer):
     photo = serializers.FileField(required=True)
     
     def validate_photo(self, value):
-        """Validate that the uploaded file is an image."""
-        # Check file extension
-        valid_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.webp']
-        ext = value.name.lower().split('.')[-1]
-        if f'.{ext}' not in valid_extensions:
-            raise serializers.ValidationError(
-                f'File type not supported. Allowed types: {", ".join(valid_extensions)}'
-            )
+        """Validate that the uploaded file is an image, from its content."""
+        try:
+            validate_image(value, value.name, value.size)
+        except ImageValidationError as e:
+            raise serializers.ValidationError(e.message, code=e.code)
         return value
 
+
+class PhotoUrlsRequestSerializer(serializers.Serializer):
+    """Serializer for a batch of photo URLs to sign."""
+    access_token = serializers.CharField(required=True, max_length=64)
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=100,
+    )
+    rendition = serializers.ChoiceField(choices=['original', 'fullscreen', 'thumbnail'])
+
+
+class UploadSessionCreateSerializer(serializers.Serializer):
+    """Serializer for starting a resumable upload."""
+    access_token = serializers.CharField(required=True, max_length=64)
+    filename = serializers.CharField(max_length=255)
+    size = serializers.IntegerField(min_value=1)
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    """Serializer for the state of a resumable upload."""
+
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'offset', 'length', 'chunk_size', 'expires_at']
+        read_only_fields = fields
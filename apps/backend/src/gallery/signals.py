@@ -0,0 +1,111 @@
+"""
+Signals for the gallery application.
+
+``photos_changed`` is sent whenever the photos guests can see may have
+changed: a photo was added, re-moderated or deleted. Data derived from the
+gallery (sprite sheets, the static manifest, the timeline buckets, and
+the storage objects queued for deletion by ``storage_gc``) listens to it
+and to the delete signals below instead of hooking every place that
+changes photos. Bulk updates (``queryset.update``) bypass ``Photo.save``,
+so code doing them sends the signal itself.
+
+Arguments: ``event_id``, ``photo_ids`` and ``using`` (the database alias).
+"""
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, pre_delete
+from django.dispatch import Signal, receiver
+
+photos_changed = Signal()
+
+
+def _deleting_event(origin) -> bool:
+    """
+    Whether a deletion was started by deleting events (an event or a
+    queryset of them), whose rows ``event_deleted`` handles in bulk.
+    """
+    from src.events.models import Event
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return model is Event
+
+
+@receiver(photos_changed)
+def update_sprite_sheets(sender, event_id, photo_ids, using, **kwargs):
+    from src.gallery.sprites import update_sprite_membership
+    update_sprite_membership(event_id, photo_ids, using)
+
+
+@receiver(photos_changed)
+def mark_manifest_dirty(sender, event_id, photo_ids, using, **kwargs):
+    from src.gallery.manifest import mark_manifest_dirty
+    mark_manifest_dirty(event_id, using)
+
+
+@receiver(photos_changed)
+def update_timeline(sender, event_id, photo_ids, using, **kwargs):
+    from src.gallery.timeline import update_timeline
+    update_timeline(event_id, photo_ids, using)
+
+
+@receiver(pre_delete, sender="events.Event")
+def event_deleted(sender, instance, using, **kwargs):
+    from src.gallery.storage_gc import queue_prefix_deletion
+    # Everything below the event is deleted with it: queue its whole
+    # storage prefix instead of its objects row by row.
+    queue_prefix_deletion(f"{instance.code}/", using)
+
+
+@receiver(pre_delete, sender="gallery.Photo")
+def photo_deleted(sender, instance, using, origin=None, **kwargs):
+    if _deleting_event(origin):
+        return
+    from src.gallery.sprites import invalidate_sprite_sheets
+    # Read the sheet from the database: slots are assigned with update(),
+    # so the instance being deleted may not know about its sheet.
+    sheet_ids = sender.objects.using(using).filter(
+        pk=instance.pk, sprite_sheet__isnull=False
+    ).values_list("sprite_sheet_id", flat=True)
+    if sheet_ids:
+        invalidate_sprite_sheets(list(sheet_ids), using)
+
+    from src.gallery.manifest import mark_manifest_dirty
+    mark_manifest_dirty(instance.event_id, using, create=False)
+
+
+@receiver(post_delete, sender="gallery.Photo")
+def queue_photo_files(sender, instance, using, origin=None, **kwargs):
+    if _deleting_event(origin):
+        return
+    from src.gallery.storage_gc import queue_deletion
+    queue_deletion([instance.file_key, instance.thumbnail_key, instance.fullscreen_key], using)
+
+
+@receiver(post_delete, sender="gallery.Photo")
+def remove_from_timeline(sender, instance, using, origin=None, **kwargs):
+    if _deleting_event(origin):
+        return
+    from src.gallery.timeline import update_buckets
+    update_buckets(instance.event_id, [instance.uploaded_at], using, create=False)
+
+
+@receiver(post_delete, sender="gallery.SpriteSheet")
+def queue_sprite_sheet_image(sender, instance, using, origin=None, **kwargs):
+    if _deleting_event(origin):
+        return
+    from src.gallery.storage_gc import queue_deletion
+    queue_deletion([instance.image_key], using)
+
+
+@receiver(post_delete, sender="gallery.GalleryManifest")
+def queue_manifest_files(sender, instance, using, origin=None, **kwargs):
+    if _deleting_event(origin):
+        return
+    from src.gallery.storage_gc import queue_deletion
+    queue_deletion([instance.index_key, *instance.page_keys], using)
+
+
+@receiver(post_delete, sender="gallery.ArchivePack")
+def queue_archive_pack(sender, instance, using, origin=None, **kwargs):
+    if _deleting_event(origin):
+        return
+    from src.gallery.storage_gc import queue_deletion
+    queue_deletion([instance.key], using)
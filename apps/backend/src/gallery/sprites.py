@@ -0,0 +1,204 @@
+"""
+Thumbnail sprite sheets.
+
+A page of the gallery grid used to load every thumbnail with its own
+request. Sprite sheets pack the thumbnails of a run of photos into one
+JPEG, and ``list_photos`` returns each photo's position in its sheet
+(``?fields=...,sprite``), so a page of thumbnails arrives in one or two
+requests.
+
+Sheets are maintained incrementally:
+
+* an approved photo gets the next free slot of the event's newest sheet
+  (a new sheet is started when it is full), so new uploads only ever touch
+  one sheet;
+* a photo that is rejected or deleted leaves a hole in its sheet, and that
+  sheet is hidden (``image_key`` cleared) until it is rebuilt without it;
+* membership changes bump the sheet's ``revision``; the
+  ``build_sprite_sheets`` command re-renders sheets that are behind.
+"""
+
+from __future__ import annotations
+
+import io
+import os
+
+from django.conf import settings
+from django.db import router
+from django.db.models import F
+
+from src.config.timing import timed
+from src.config.transactions import retry_write
+from src.uploads.storage import get_storage_client
+
+from .models import Photo, SpriteSheet, rendition_key
+
+
+def photos_per_sheet() -> int:
+    return settings.SPRITE_COLUMNS * settings.SPRITE_ROWS
+
+
+def update_sprite_membership(event_id: int, photo_ids: list[int], using: str | None = None) -> None:
+    """
+    Bring the sheet membership of ``photo_ids`` in line with their
+    moderation status.
+    """
+    using = using or router.db_for_write(SpriteSheet)
+    retry_write(using, _update_membership, using, event_id, photo_ids)
+
+
+def _update_membership(using: str, event_id: int, photo_ids: list[int]) -> None:
+    photos = list(
+        Photo.objects.using(using)
+        .filter(event_id=event_id, pk__in=photo_ids)
+        .order_by("uploaded_at", "pk")
+        .values("pk", "moderation_status", "sprite_sheet_id")
+    )
+    approved = Photo.ModerationStatus.APPROVED
+
+    removed = [p for p in photos if p["sprite_sheet_id"] and p["moderation_status"] != approved]
+    if removed:
+        Photo.objects.using(using).filter(pk__in=[p["pk"] for p in removed]).update(
+            sprite_sheet=None, sprite_slot=None
+        )
+        _invalidate(using, {p["sprite_sheet_id"] for p in removed})
+
+    added = [p["pk"] for p in photos if not p["sprite_sheet_id"] and p["moderation_status"] == approved]
+    while added:
+        sheet = (
+            SpriteSheet.objects.using(using)
+            .select_for_update()
+            .filter(event_id=event_id)
+            .order_by("-index")
+            .first()
+        )
+        if sheet is None or sheet.next_slot >= photos_per_sheet():
+            sheet = SpriteSheet.objects.using(using).create(
+                event_id=event_id,
+                index=sheet.index + 1 if sheet else 0,
+            )
+        room = photos_per_sheet() - sheet.next_slot
+        batch, added = added[:room], added[room:]
+        for slot, pk in enumerate(batch, start=sheet.next_slot):
+            Photo.objects.using(using).filter(pk=pk).update(sprite_sheet=sheet, sprite_slot=slot)
+        SpriteSheet.objects.using(using).filter(pk=sheet.pk).update(
+            next_slot=sheet.next_slot + len(batch),
+            revision=F("revision") + 1,
+        )
+
+
+def invalidate_sprite_sheets(sheet_ids, using: str | None = None) -> None:
+    """
+    Mark sheets as needing a rebuild and stop serving their current image,
+    which may show photos that must no longer be visible.
+    """
+    using = using or router.db_for_write(SpriteSheet)
+    retry_write(using, _invalidate, using, set(sheet_ids))
+
+
+def _invalidate(using: str, sheet_ids: set[int]) -> None:
+    SpriteSheet.objects.using(using).filter(pk__in=sheet_ids).update(
+        image_key="",
+        tiles={},
+        revision=F("revision") + 1,
+    )
+
+
+def tile_position(slot: int, columns: int, tile_size: int) -> tuple[int, int]:
+    return (slot % columns) * tile_size, (slot // columns) * tile_size
+
+
+def build_sprite_sheet(sheet: SpriteSheet) -> bool:
+    """
+    Render ``sheet`` from its photos' thumbnails and upload it.
+
+    Returns False if the sheet changed while it was being built; it stays
+    stale and is picked up again by the next run.
+    """
+    from PIL import Image, ImageOps
+
+    revision = sheet.revision
+    tile_size = settings.SPRITE_TILE_SIZE
+    columns = settings.SPRITE_COLUMNS
+    photos = list(
+        sheet.photos.filter(moderation_status=Photo.ModerationStatus.APPROVED)
+        .order_by("sprite_slot")
+        .values("id", "sprite_slot", "file_key", "fullscreen_key", "thumbnail_key")
+    )
+
+    rows = max(1, -(-sheet.next_slot // columns))
+    canvas = Image.new("RGB", (columns * tile_size, rows * tile_size), (255, 255, 255))
+    storage = get_storage_client()
+    tiles = {}
+    for photo in photos:
+        data = io.BytesIO()
+        try:
+            storage.download_fileobj(rendition_key(photo, "thumbnail"), data)
+            data.seek(0)
+            with timed("image", "sprite_tile"):
+                with Image.open(data) as img:
+                    img.draft("RGB", (tile_size, tile_size))
+                    tile = ImageOps.fit(img.convert("RGB"), (tile_size, tile_size))
+        except Exception as e:
+            # Leave the tile empty; the client falls back to the thumbnail.
+            print(f"Error adding {photo['file_key']} to sprite sheet {sheet.pk}: {e}")  # noqa
+            continue
+        canvas.paste(tile, tile_position(photo["sprite_slot"], columns, tile_size))
+        tiles[str(photo["id"])] = photo["sprite_slot"]
+
+    output = io.BytesIO()
+    with timed("image", "encode"):
+        canvas.save(output, format="JPEG", quality=settings.SPRITE_QUALITY, optimize=True, progressive=True)
+    output.seek(0)
+
+    # A new key per revision, so cached copies of older sheets never show
+    # up with new coordinates.
+    event_code = sheet.event.code
+    image_key = os.path.join(event_code, "sprites", f"{sheet.index}-r{revision}.jpg")
+    storage.upload_fileobj(fileobj=output, key=image_key, content_type="image/jpeg")
+
+    updated = retry_write(
+        sheet._state.db,
+        SpriteSheet.objects.using(sheet._state.db).filter(pk=sheet.pk, revision=revision).update,
+        image_key=image_key,
+        built_revision=revision,
+        tile_size=tile_size,
+        columns=columns,
+        width=canvas.width,
+        height=canvas.height,
+        tiles=tiles,
+    )
+    return bool(updated)
+
+
+def sprite_positions(rows: list[dict]) -> dict[int, dict]:
+    """
+    Return sprite info for the photo rows that are in a built sheet, keyed
+    by photo id: the sheet's image key, the tile's position and the sheet
+    dimensions.
+    """
+    sheet_ids = {row["sprite_sheet_id"] for row in rows if row["sprite_sheet_id"]}
+    if not sheet_ids:
+        return {}
+    sheets = {
+        sheet["id"]: sheet
+        for sheet in SpriteSheet.objects.filter(pk__in=sheet_ids).exclude(image_key="").values(
+            "id", "image_key", "tiles", "tile_size", "columns", "width", "height"
+        )
+    }
+
+    positions = {}
+    for row in rows:
+        sheet = sheets.get(row["sprite_sheet_id"])
+        if sheet is None or sheet["tiles"].get(str(row["id"])) != row["sprite_slot"]:
+            continue
+        x, y = tile_position(row["sprite_slot"], sheet["columns"], sheet["tile_size"])
+        positions[row["id"]] = {
+            "image_key": sheet["image_key"],
+            "x": x,
+            "y": y,
+            "size": sheet["tile_size"],
+            "width": sheet["width"],
+            "height": sheet["height"],
+        }
+    return positions
@@ -0,0 +1,214 @@
+"""
+Garbage collection of objects in the bucket.
+
+Objects end up without a database row in two ways, and both are cleaned
+up by the ``sweep_storage`` command:
+
+* rows are deleted: a photo's keys are queued as ``StorageDeletion`` rows
+  by a ``post_delete`` receiver and deleted in batches of 1000 with
+  ``DeleteObjects``. A deleted event's whole prefix is queued instead, as
+  a ``StoragePrefixDeletion``, which also covers the objects no row names
+  (resized variants, superseded sheets and manifest pages). Only objects
+  stored before the event was deleted go, so a new event that reuses the
+  code keeps its own;
+* something failed between storing an object and recording it (an upload
+  whose row was never created), or an object was superseded (older sprite
+  sheet revisions, manifest pages). The sweep lists each event's prefix
+  with ``list_objects_v2`` and deletes the objects no row refers to.
+  Prefixes of events that no longer exist are deleted entirely.
+
+The keys an event refers to are held in a set while its prefix is listed,
+so memory is bounded by the size of the largest event, not of the bucket.
+Listed objects are streamed a page at a time. Only objects older than the
+grace period are swept, so uploads and publishes in progress (object
+stored, row not yet written) are left alone.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+from itertools import islice
+from typing import Iterable, Iterator
+
+from django.db import router
+
+from src.events.models import Event
+from src.uploads.storage import DELETE_BATCH_SIZE, get_storage_client
+
+from .models import (
+    ArchivePack,
+    GalleryManifest,
+    Photo,
+    SpriteSheet,
+    StorageDeletion,
+    StoragePrefixDeletion,
+    UploadSession,
+)
+from .resize import variant_fingerprint
+
+
+def queue_deletion(keys: Iterable[str], using: str | None = None) -> None:
+    """
+    Queue storage keys for deletion by the next sweep.
+    """
+    using = using or router.db_for_write(StorageDeletion)
+    StorageDeletion.objects.using(using).bulk_create(
+        [StorageDeletion(key=key) for key in dict.fromkeys(keys) if key],
+        batch_size=DELETE_BATCH_SIZE,
+    )
+
+
+def delete_keys(keys: Iterable[str]) -> tuple[int, list[str]]:
+    """
+    Delete ``keys`` with as few requests as possible.
+
+    Returns the number of keys sent and the keys that failed.
+    """
+    storage = get_storage_client()
+    keys = iter(keys)
+    sent, failed = 0, []
+    while batch := list(islice(keys, DELETE_BATCH_SIZE)):
+        failed.extend(storage.delete_objects(batch))
+        sent += len(batch)
+    return sent, failed
+
+
+def process_deletion_queue() -> tuple[int, int]:
+    """
+    Delete the queued keys from storage, a batch at a time.
+
+    Returns the number of deleted and failed keys; failed keys stay queued
+    for the next run.
+    """
+    deleted = failed = 0
+    last_pk = 0
+    while True:
+        batch = list(
+            StorageDeletion.objects.filter(pk__gt=last_pk)
+            .order_by("pk")
+            .values_list("pk", "key")[:DELETE_BATCH_SIZE]
+        )
+        if not batch:
+            return deleted, failed
+        last_pk = batch[-1][0]
+        failed_keys = set(get_storage_client().delete_objects([key for _, key in batch]))
+        done = [pk for pk, key in batch if key not in failed_keys]
+        StorageDeletion.objects.filter(pk__in=done).delete()
+        deleted += len(done)
+        failed += len(batch) - len(done)
+
+
+def queue_prefix_deletion(prefix: str, using: str | None = None) -> None:
+    """
+    Queue everything stored under ``prefix`` so far for deletion by the next
+    sweep.
+    """
+    using = using or router.db_for_write(StoragePrefixDeletion)
+    StoragePrefixDeletion.objects.using(using).create(prefix=prefix)
+
+
+def prefix_deletion_keys(queued: StoragePrefixDeletion) -> Iterator[str]:
+    """
+    Yield the keys under a queued prefix that were stored before it was
+    queued and that no row of an event now using the prefix refers to.
+    """
+    event = Event.objects.filter(code=queued.prefix.rstrip("/")).first()
+    keep = referenced_keys(event) if event else set()
+    for obj in get_storage_client().list_objects(queued.prefix):
+        if obj["LastModified"] < queued.queued_at and obj["Key"] not in keep:
+            yield obj["Key"]
+
+
+def process_prefix_deletions() -> tuple[int, int]:
+    """
+    Delete the objects under the queued prefixes of deleted events.
+
+    Returns the number of deleted and failed keys; a prefix with failed
+    keys stays queued for the next run.
+    """
+    deleted = failed = 0
+    for queued in StoragePrefixDeletion.objects.order_by("pk"):
+        sent, failed_keys = delete_keys(prefix_deletion_keys(queued))
+        if not failed_keys:
+            queued.delete()
+        deleted += sent - len(failed_keys)
+        failed += len(failed_keys)
+    return deleted, failed
+
+
+def referenced_keys(event: Event, using: str | None = None) -> set[str]:
+    """
+    Return every storage key the rows of ``event`` refer to.
+    """
+    keys = set()
+    photo_keys = Photo.objects.using(using).filter(event=event).values_list(
+        "file_key", "thumbnail_key", "fullscreen_key"
+    )
+    for row in photo_keys.iterator(chunk_size=2000):
+        keys.update(row)
+    keys.update(SpriteSheet.objects.using(using).filter(event=event).values_list("image_key", flat=True))
+    keys.update(UploadSession.objects.using(using).filter(event=event).values_list("file_key", flat=True))
+    keys.update(ArchivePack.objects.using(using).filter(event=event).values_list("key", flat=True))
+    for index_key, page_keys in GalleryManifest.objects.using(using).filter(event=event).values_list(
+        "index_key", "page_keys"
+    ):
+        keys.add(index_key)
+        keys.update(page_keys)
+    keys.discard("")
+    return keys
+
+
+def _variant_photo_id(event: Event, key: str, fingerprint: str) -> int | None:
+    """
+    Return the photo id of a resized variant key
+    (``{code}/variants/{id}/{fingerprint}/...``) made with the current
+    settings fingerprint.
+    """
+    prefix = f"{event.code}/variants/"
+    if not key.startswith(prefix):
+        return None
+    photo_id, _, rest = key[len(prefix):].partition("/")
+    if not photo_id.isdigit() or not rest.startswith(f"{fingerprint}/"):
+        return None
+    return int(photo_id)
+
+
+def find_orphans(event: Event, older_than: datetime) -> Iterator[str]:
+    """
+    Yield the keys under the event's prefix that no row refers to and that
+    were last modified before ``older_than``.
+
+    Resized variants belong to their photo for as long as it is approved
+    and they were made with the current settings fingerprint.
+    """
+    referenced = referenced_keys(event)
+    fingerprint = variant_fingerprint()
+    approved = set(
+        Photo.objects.filter(
+            event=event, moderation_status=Photo.ModerationStatus.APPROVED
+        ).values_list("pk", flat=True)
+    )
+    for obj in get_storage_client().list_objects(f"{event.code}/"):
+        key = obj["Key"]
+        if key in referenced or _variant_photo_id(event, key, fingerprint) in approved:
+            continue
+        if obj["LastModified"] >= older_than:
+            continue
+        yield key
+
+
+def find_unknown_prefixes() -> list[str]:
+    """
+    Return the top-level prefixes that do not belong to any event.
+    """
+    codes = set(Event.objects.values_list("code", flat=True))
+    return [
+        prefix for prefix in get_storage_client().list_prefixes()
+        if prefix.rstrip("/") not in codes
+    ]
+
+
+def objects_older_than(prefix: str, older_than: datetime) -> Iterator[str]:
+    for obj in get_storage_client().list_objects(prefix):
+        if obj["LastModified"] < older_than:
+            yield obj["Key"]
@@ -0,0 +1,24 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from src.events.models import Event
+from src.gallery.models import Photo
+
+
+@pytest.mark.django_db
+def test_export_csv_streams_selected_photos(client):
+    event = Event.objects.create(name='Test Wedding', code='test-wedding')
+    # No file_key, so no renditions are generated on save.
+    photos = [Photo.objects.create(event=event, original_filename=f'{i}.jpg') for i in range(3)]
+    client.force_login(get_user_model().objects.create_superuser('admin', 'a@example.com', 'pw'))
+
+    response = client.post(reverse('admin:gallery_photo_changelist'), {
+        'action': 'export_csv',
+        '_selected_action': [photo.pk for photo in photos],
+    })
+
+    assert response.streaming
+    lines = b''.join(response.streaming_content).decode().splitlines()
+    assert lines[0].startswith('id,event__code,original_filename')
+    assert len(lines) == 4
@@ -0,0 +1,161 @@
+import io
+import threading
+
+import pytest
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+from PIL import Image
+from prometheus_client import REGISTRY
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from src.events.models import Event
+from src.gallery import admission
+from src.gallery.admission import AdmissionRejected, ProcessingGate, estimate_processing_bytes, take_token
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+def _jpeg(size=(64, 48)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size).save(buffer, format='JPEG')
+    return SimpleUploadedFile('photo.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+
+class TestProcessingGate:
+    def test_limits_concurrency_and_is_reentrant(self):
+        gate = ProcessingGate(max_concurrent=1, memory_budget=1000)
+        with gate.admit(10, timeout=0):
+            # Nested processing in the same thread reuses the slot.
+            with gate.admit(10, timeout=0):
+                assert gate.active == 1
+
+            rejected = []
+
+            def other_thread():
+                try:
+                    with gate.admit(10, timeout=0.01):
+                        pass
+                except AdmissionRejected:
+                    rejected.append(True)
+
+            thread = threading.Thread(target=other_thread)
+            thread.start()
+            thread.join()
+            assert rejected == [True]
+
+        assert gate.active == 0
+        assert gate.reserved == 0
+
+    def test_memory_budget(self):
+        gate = ProcessingGate(max_concurrent=4, memory_budget=100)
+        result = []
+
+        def admit(estimated_bytes):
+            try:
+                with gate.admit(estimated_bytes, timeout=0):
+                    result.append(estimated_bytes)
+            except AdmissionRejected:
+                result.append(None)
+
+        with gate.admit(80, timeout=0):
+            for estimated_bytes in (30, 20):
+                thread = threading.Thread(target=admit, args=(estimated_bytes,))
+                thread.start()
+                thread.join()
+        assert result == [None, 20]
+
+        # An image larger than the whole budget still gets processed, alone.
+        with gate.admit(500, timeout=0):
+            assert gate.reserved == 500
+
+
+def test_estimate_reads_dimensions_from_header(settings):
+    settings.IMAGE_TARGET_SSIM = 0
+    photo = _jpeg(size=(400, 300))
+    photo.seek(5)
+    assert estimate_processing_bytes(photo.size, photo) == 3 * photo.size + 400 * 300 * 4
+    assert photo.tell() == 5
+
+
+def test_estimate_counts_the_quality_search(settings):
+    settings.IMAGE_TARGET_SSIM = 0.98
+    photo = _jpeg(size=(400, 300))
+    search_bytes = estimate_processing_bytes(photo.size, photo) - (3 * photo.size + 400 * 300 * 4)
+    # Bounded by the reduced planes it scores, whatever the image size.
+    assert 0 < search_bytes <= 32 * 1024 * 1024
+
+
+def test_token_bucket():
+    assert take_token('test', rate=1, burst=2) == 0
+    assert take_token('test', rate=1, burst=2) == 0
+    assert 0.9 < take_token('test', rate=1, burst=2) <= 1
+    assert take_token('other', rate=1, burst=2) == 0
+    # A rate of 0 disables the bucket.
+    assert all(take_token('off', rate=0, burst=0) == 0 for _ in range(5))
+
+
+@pytest.mark.django_db
+class TestUploadAdmission:
+    @pytest.fixture
+    def event(self):
+        return Event.objects.create(name='Test Wedding', code='test-wedding')
+
+    def test_client_rate_limit(self, settings, event):
+        """
+        GIVEN a client that used up its upload burst
+        WHEN it uploads another photo
+        THEN the upload is rejected with 429 and a Retry-After header
+        """
+        settings.UPLOAD_CLIENT_RATE = 0.1
+        settings.UPLOAD_CLIENT_BURST = 0
+        before = REGISTRY.get_sample_value('gallery_admission_rejections_total', {'reason': 'client_rate'}) or 0
+
+        response = APIClient().post(reverse('gallery:upload'), {
+            'access_token': event.access_token,
+            'photo': _jpeg(),
+        }, format='multipart', HTTP_X_REAL_IP='203.0.113.7')
+
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        assert response['Retry-After'] == '10'
+        after = REGISTRY.get_sample_value('gallery_admission_rejections_total', {'reason': 'client_rate'})
+        assert after == before + 1
+
+    def test_busy_worker(self, settings, event, monkeypatch):
+        """
+        GIVEN a worker whose processing slots are all taken
+        WHEN a photo is uploaded
+        THEN the upload is rejected with 503 and a Retry-After header
+        """
+        settings.UPLOAD_ADMISSION_TIMEOUT = 0.01
+        settings.UPLOAD_BUSY_RETRY_AFTER = 7
+        gate = ProcessingGate(max_concurrent=1, memory_budget=1024 * 1024 * 1024)
+        monkeypatch.setattr(admission, '_processing_gate', gate)
+
+        holding, release = threading.Event(), threading.Event()
+
+        def hold_slot():
+            with gate.admit(0):
+                holding.set()
+                release.wait()
+
+        thread = threading.Thread(target=hold_slot)
+        thread.start()
+        holding.wait()
+        try:
+            response = APIClient().post(reverse('gallery:upload'), {
+                'access_token': event.access_token,
+                'photo': _jpeg(),
+            }, format='multipart')
+        finally:
+            release.set()
+            thread.join()
+
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert response['Retry-After'] == '7'
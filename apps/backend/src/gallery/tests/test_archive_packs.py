@@ -0,0 +1,141 @@
+import datetime
+import io
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from src.events.models import Event
+from src.gallery import image_cache
+from src.gallery.models import ArchivePack, PackedObject, Photo
+
+
+@pytest.fixture(autouse=True)
+def disk_cache(settings, tmp_path, monkeypatch):
+    settings.IMAGE_CACHE_DIR = str(tmp_path / 'cache')
+    monkeypatch.setattr(image_cache, '_image_cache', None)
+
+
+@pytest.mark.django_db
+class TestArchivePacks:
+    @pytest.fixture
+    def event(self):
+        return Event.objects.create(name='Test Wedding', code='test-wedding')
+
+    def _photo(self, storage, event, name):
+        keys = {
+            'file_key': f'test-wedding/originals/{name}.jpg',
+            'thumbnail_key': f'test-wedding/thumbnails/{name}_thumbnail.jpg',
+            'fullscreen_key': f'test-wedding/fullscreen/{name}_fullscreen.jpg',
+        }
+        for field, key in keys.items():
+            storage.objects[key] = f'{field} of {name}'.encode()
+        return Photo.objects.create(event=event, **keys)
+
+    def _archive(self, event):
+        call_command('archive_event', '--event', event.code, stdout=io.StringIO())
+
+    def _list(self, event):
+        response = APIClient().get(reverse('gallery:list'), {'access_token': event.access_token})
+        assert response.status_code == status.HTTP_200_OK
+        return {item['id']: item for item in response.json()['results']}
+
+    def _fetch(self, url, headers=None):
+        return APIClient().get(url, headers=headers or {})
+
+    def test_archived_renditions_are_served_from_the_pack(self, memory_storage, event):
+        """
+        GIVEN an archived event
+        WHEN its photos are listed and their thumbnails fetched
+        THEN the URLs point at the pack endpoint and one ranged GET serves a page
+        """
+        photos = [self._photo(memory_storage, event, name) for name in ('a', 'b', 'c')]
+        self._archive(event)
+
+        pack = ArchivePack.objects.get(event=event)
+        assert PackedObject.objects.filter(pack=pack).count() == 6
+        assert pack.size == len(memory_storage.objects[pack.key])
+
+        listed = self._list(event)
+        for photo in photos:
+            item = listed[photo.pk]
+            assert '/api/gallery/packed/' in item['thumbnail_url']
+            assert f'access_token={event.access_token}' in item['thumbnail_url']
+            assert item['original_image_url'] == f'https://storage.test/{photo.file_key}'
+
+        by_id = {photo.pk: photo for photo in photos}
+        for photo_id, item in listed.items():
+            response = self._fetch(item['thumbnail_url'])
+            assert response.status_code == status.HTTP_200_OK
+            assert response['Content-Type'] == 'image/jpeg'
+            assert b''.join(response.streaming_content) == memory_storage.objects[by_id[photo_id].thumbnail_key]
+        # Read ahead: the first request of the page brought in the others.
+        assert len(memory_storage.range_requests) == 1
+
+        response = self._fetch(listed[photos[0].pk]['fullscreen_url'])
+        assert b''.join(response.streaming_content) == memory_storage.objects[photos[0].fullscreen_key]
+
+        response = self._fetch(
+            listed[photos[0].pk]['fullscreen_url'], headers={'If-None-Match': response['ETag']}
+        )
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    def test_late_uploads_stay_loose_until_archived_again(self, memory_storage, event):
+        self._photo(memory_storage, event, 'a')
+        self._archive(event)
+        late = self._photo(memory_storage, event, 'late')
+
+        item = self._list(event)[late.pk]
+        assert item['thumbnail_url'] == f'https://storage.test/{late.thumbnail_key}'
+
+        self._archive(event)
+        assert ArchivePack.objects.filter(event=event).count() == 2
+        assert set(PackedObject.objects.filter(photo=late).values_list('pack', flat=True)) == {
+            ArchivePack.objects.latest('pk').pk
+        }
+        assert '/api/gallery/packed/' in self._list(event)[late.pk]['thumbnail_url']
+
+    def test_listing_unpacked_events_skips_the_pack_lookup(self, memory_storage, event):
+        """
+        GIVEN an event that was never archived
+        WHEN its photos are listed
+        THEN no packed objects are looked up, until it is archived
+        """
+        self._photo(memory_storage, event, 'a')
+
+        with CaptureQueriesContext(connection) as context:
+            self._list(event)
+        assert not any('gallery_packedobject' in query['sql'] for query in context.captured_queries)
+
+        self._archive(event)
+        event.refresh_from_db()
+        assert event.packed_at is not None
+        with CaptureQueriesContext(connection) as context:
+            self._list(event)
+        assert any('gallery_packedobject' in query['sql'] for query in context.captured_queries)
+
+    def test_other_events_cannot_read_the_pack(self, memory_storage, event):
+        photo = self._photo(memory_storage, event, 'a')
+        self._archive(event)
+        other = Event.objects.create(name='Other Wedding', code='other-wedding')
+
+        url = reverse('gallery:packed-object', args=[PackedObject.objects.get(key=photo.thumbnail_key).pk])
+        response = APIClient().get(url, {'access_token': other.access_token})
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_deleting_the_event_deletes_the_pack(self, memory_storage, event):
+        self._photo(memory_storage, event, 'a')
+        self._archive(event)
+        pack_key = ArchivePack.objects.get().key
+        memory_storage.last_modified[pack_key] = timezone.now() - datetime.timedelta(minutes=1)
+
+        event.delete()
+        call_command('sweep_storage', stdout=io.StringIO())
+
+        assert pack_key not in memory_storage.objects
@@ -0,0 +1,146 @@
+import asyncio
+import io
+import threading
+import time
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APIRequestFactory
+
+from src.events.models import Event
+from src.gallery import async_views, views
+from src.gallery.models import Photo
+from src.uploads import storage as storage_module
+
+factory = APIRequestFactory()
+
+
+@pytest.fixture
+def event():
+    return Event.objects.create(name='Test Wedding', code='test-wedding')
+
+
+def _photo(event, number):
+    return Photo.objects.create(
+        event=event,
+        file_key=f'{event.code}/originals/{number}.jpg',
+        thumbnail_key=f'{event.code}/thumbnails/{number}_thumbnail.jpg',
+        fullscreen_key=f'{event.code}/fullscreen/{number}_fullscreen.jpg',
+        original_filename=f'{number}.jpg',
+    )
+
+
+def _jpeg():
+    buffer = io.BytesIO()
+    Image.new('RGB', (640, 480), 'teal').save(buffer, format='JPEG')
+    return SimpleUploadedFile('photo.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+
+def _call_async(view, request, **kwargs):
+    response = async_to_sync(view)(request, **kwargs)
+    return response.render() if hasattr(response, 'render') else response
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('params', [
+    {},
+    {'page': 2, 'page_size': 2, 'fields': 'id,thumbnail_url'},
+    {'page': 'last', 'page_size': 2},
+    {'page': 9},
+    {'fields': 'colour'},
+])
+def test_listing_matches_the_sync_view(memory_storage, event, params):
+    """
+    GIVEN a gallery with a few photos
+    WHEN it is listed by the sync and the async view
+    THEN the responses are identical, including links, errors and preload hints
+    """
+    for number in range(5):
+        _photo(event, number)
+    query = {'access_token': event.access_token, **params}
+
+    expected = views.list_photos(factory.get('/api/gallery/photos/', query)).render()
+    response = _call_async(async_views.list_photos, factory.get('/api/gallery/photos/', query))
+
+    assert response.status_code == expected.status_code
+    assert response.content == expected.content
+    assert response.get('Link') == expected.get('Link')
+
+
+@pytest.mark.django_db
+def test_photo_urls_match_the_sync_view(memory_storage, event):
+    photos = [_photo(event, number) for number in range(3)]
+    for ids in ([photos[0].pk, photos[2].pk], [photos[0].pk, 999]):
+        data = {'access_token': event.access_token, 'ids': ids, 'rendition': 'fullscreen'}
+
+        expected = views.photo_urls(factory.post('/api/gallery/photos/urls/', data, format='json')).render()
+        response = _call_async(async_views.photo_urls, factory.post('/api/gallery/photos/urls/', data, format='json'))
+
+        assert (response.status_code, response.content) == (expected.status_code, expected.content)
+
+
+@pytest.mark.django_db
+def test_async_views_check_the_token_and_method(event):
+    missing = _call_async(async_views.list_photos, factory.get('/api/gallery/photos/'))
+    invalid = _call_async(async_views.list_photos, factory.get('/api/gallery/photos/', {'access_token': 'nope'}))
+    wrong_method = _call_async(async_views.list_photos, factory.delete('/api/gallery/photos/'))
+    bad_json = _call_async(async_views.photo_urls, factory.post(
+        '/api/gallery/photos/urls/', '{"ids": [', content_type='application/json'
+    ))
+
+    assert missing.status_code == status.HTTP_400_BAD_REQUEST
+    assert invalid.status_code == status.HTTP_401_UNAUTHORIZED
+    assert wrong_method.status_code == status.HTTP_405_METHOD_NOT_ALLOWED
+    assert wrong_method['Allow'] == 'GET, HEAD'
+    assert bad_json.status_code == status.HTTP_400_BAD_REQUEST
+    assert 'JSON parse error' in bad_json.data['detail']
+
+
+@pytest.mark.django_db(transaction=True)
+def test_uploads_wait_on_storage_concurrently(memory_storage, event, settings, monkeypatch):
+    """
+    GIVEN S3 taking 300 ms per upload
+    WHEN four guests upload at once to the async view
+    THEN the uploads wait on storage together, off the event loop, and
+    each photo gets its renditions
+    """
+    settings.UPLOAD_CLIENT_RATE = settings.UPLOAD_EVENT_RATE = 0
+    settings.UPLOAD_MAX_CONCURRENT_PROCESSING = 4
+    monkeypatch.setattr(storage_module, '_storage_executor_instance', None)
+    cache.clear()
+    waits = []
+    store = memory_storage.upload_file
+
+    def slow_upload(file_key, file_content, content_type=None):
+        start = time.perf_counter()
+        time.sleep(0.3)
+        waits.append((threading.current_thread().name, start, time.perf_counter()))
+        store(file_key, file_content, content_type)
+
+    monkeypatch.setattr(memory_storage, 'upload_file', slow_upload, raising=False)
+
+    async def upload():
+        # The ASGI handler gives each request its own thread for its sync
+        # work; here all requests share one, which keeps their writes to the
+        # in-memory test database from running into its table locks.
+        request = factory.post('/api/gallery/upload/', {
+            'access_token': event.access_token, 'photo': _jpeg(),
+        }, format='multipart')
+        return await async_views.upload_photo(request)
+
+    async def upload_all():
+        return await asyncio.gather(*(upload() for _ in range(4)))
+
+    responses = asyncio.run(upload_all())
+
+    assert [response.status_code for response in responses] == [status.HTTP_201_CREATED] * 4
+    # All four were waiting on S3 at the same time, on the storage threads.
+    assert max(start for _, start, _ in waits) < min(end for _, _, end in waits)
+    assert all(name.startswith('storage') for name, _, _ in waits)
+    photos = Photo.objects.filter(event=event)
+    assert photos.count() == 4
+    assert all(photo.thumbnail_key in memory_storage.objects for photo in photos)
@@ -0,0 +1,159 @@
+import io
+import json
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from src.events.models import Event
+from src.gallery.manifest import due_manifests, index_key, publish_manifest
+from src.gallery.models import GalleryManifest, Photo
+
+
+@pytest.mark.django_db
+class TestGalleryManifest:
+    @pytest.fixture(autouse=True)
+    def small_pages(self, settings):
+        settings.MANIFEST_PAGE_SIZE = 2
+        settings.MANIFEST_URL_MODE = 'signed'
+
+    @pytest.fixture
+    def event(self):
+        return Event.objects.create(name='Test Wedding', code='test-wedding')
+
+    def _add_photo(self, storage, event, moderation_status=Photo.ModerationStatus.APPROVED):
+        buffer = io.BytesIO()
+        Image.new('RGB', (60, 40)).save(buffer, format='PNG')
+        file_key = f'test-wedding/originals/{len(storage.objects)}.png'
+        storage.objects[file_key] = buffer.getvalue()
+        return Photo.objects.create(
+            event=event, file_key=file_key, content_type='image/png', moderation_status=moderation_status
+        )
+
+    def _read(self, storage, url):
+        return json.loads(storage.objects[url.removeprefix('https://storage.test/')])
+
+    def _page_keys(self, storage):
+        return {key for key in storage.objects if '/manifest/' in key and '/pages/' in key}
+
+    def test_publishes_index_and_pages(self, memory_storage, event):
+        """
+        GIVEN three approved photos and one rejected photo
+        WHEN the manifest is published
+        THEN the index lists two pages holding the approved photos, oldest first
+        """
+        photos = [self._add_photo(memory_storage, event) for _ in range(3)]
+        self._add_photo(memory_storage, event, Photo.ModerationStatus.REJECTED)
+
+        assert publish_manifest(event)
+
+        index = json.loads(memory_storage.objects[index_key(event)])
+        assert index['version'] == 1
+        assert index['photo_count'] == 3
+        assert [page['count'] for page in index['pages']] == [2, 1]
+        listed = [photo for page in index['pages'] for photo in self._read(memory_storage, page['url'])['photos']]
+        assert [photo['id'] for photo in listed] == [photo.id for photo in photos]
+        assert listed[0]['thumbnail_url'].startswith('https://storage.test/test-wedding/thumbnails/')
+        assert 'sprite' in listed[0]
+
+    def test_republishing_only_rewrites_changed_pages(self, memory_storage, event):
+        """
+        GIVEN a published manifest of three photos
+        WHEN nothing changed, and then a fourth photo is added
+        THEN the first publish is a no-op and the second only replaces the last page
+        """
+        for _ in range(3):
+            self._add_photo(memory_storage, event)
+        publish_manifest(event)
+        first_pages = self._page_keys(memory_storage)
+
+        assert not publish_manifest(event)
+        assert self._page_keys(memory_storage) == first_pages
+
+        self._add_photo(memory_storage, event)
+        assert publish_manifest(event)
+
+        index = json.loads(memory_storage.objects[index_key(event)])
+        assert index['version'] == 2
+        assert [page['count'] for page in index['pages']] == [2, 2]
+        assert len(self._page_keys(memory_storage) - first_pages) == 1
+        assert index['pages'][0]['url'].removeprefix('https://storage.test/') in first_pages
+
+    def test_gallery_changes_are_debounced(self, memory_storage, event, settings):
+        """
+        GIVEN a published manifest
+        WHEN a photo is added
+        THEN the manifest is due once the debounce delay has passed
+        """
+        settings.MANIFEST_DEBOUNCE_SECONDS = 30
+        settings.MANIFEST_MAX_DELAY_SECONDS = 300
+        publish_manifest(event)
+        assert not due_manifests().exists()
+
+        self._add_photo(memory_storage, event)
+
+        now = timezone.now()
+        assert not due_manifests(now).exists()
+        assert list(due_manifests(now + timedelta(seconds=31))) == [event.manifest]
+
+        settings.MANIFEST_DEBOUNCE_SECONDS = 0
+        call_command('publish_manifests', stdout=io.StringIO())
+        manifest = GalleryManifest.objects.get(event=event)
+        assert manifest.version == 2
+        assert manifest.dirty_since is None
+
+    def test_signed_manifest_is_republished_before_urls_expire(self, memory_storage, event, settings):
+        settings.MANIFEST_URL_EXPIRY = 2 * 24 * 3600
+        publish_manifest(event)
+
+        assert not due_manifests(timezone.now()).exists()
+        assert due_manifests(timezone.now() + timedelta(days=1)).exists()
+
+    def test_manifest_endpoint(self, memory_storage, event):
+        """
+        GIVEN an event whose manifest is published
+        WHEN a guest asks where it is
+        THEN the response points at the index, which is 404 before publishing
+        """
+        url = reverse('gallery:manifest')
+        response = APIClient().get(url, {'access_token': event.access_token})
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+        self._add_photo(memory_storage, event)
+        publish_manifest(event)
+
+        response = APIClient().get(url, {'access_token': event.access_token})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()['url'] == f'https://storage.test/{index_key(event)}'
+        assert response.json()['photo_count'] == 1
+        assert GalleryManifest.objects.get(event=event).version == response.json()['version']
+
+    def test_public_manifest_is_not_found_from_the_event_code(self, memory_storage, event, settings):
+        """
+        GIVEN public manifest URLs
+        WHEN the manifest is published, and again after the token is rotated
+        THEN it is not under a key derived from the code alone, and moves
+        with the token
+        """
+        settings.MANIFEST_URL_MODE = 'public'
+        settings.MANIFEST_PUBLIC_BASE_URL = 'https://photos.example.com'
+        self._add_photo(memory_storage, event)
+        publish_manifest(event)
+        first_key = index_key(event)
+
+        assert first_key in memory_storage.objects
+        assert 'test-wedding/manifest/index.json' not in memory_storage.objects
+        assert event.access_token not in first_key
+
+        event.regenerate_access_token()
+        event.save()
+        assert publish_manifest(event)
+
+        manifest = GalleryManifest.objects.get(event=event)
+        assert manifest.index_key == index_key(event) != first_key
+        assert all(key.startswith(manifest.index_key.removesuffix('index.json')) for key in manifest.page_keys)
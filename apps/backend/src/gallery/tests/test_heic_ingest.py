@@ -0,0 +1,104 @@
+"""
+HEIC/HEIF originals: accepted as uploaded by iPhones, decoded once in the
+rendition pipeline, and turned into the same JPEG renditions as a JPEG of
+the same photo.
+"""
+import io
+import os
+import time
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+from PIL import Image, ImageFilter
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from src.events.models import Event
+from src.gallery.decoding import decode
+from src.gallery.encoding import luma, ssim
+from src.gallery.models import Photo
+from src.uploads.validation import register_heif_opener
+
+# Decode of the 1024x768 test HEIC, with generous headroom. Override for
+# slow CI machines.
+DECODE_BUDGET_MS = float(os.environ.get('HEIC_DECODE_BUDGET_MS', '500'))
+
+
+@pytest.fixture(scope='module')
+def photo():
+    size = (1024, 768)
+    fractal = Image.effect_mandelbrot(size, (-2.0, -1.2, 1.0, 1.2), 100)
+    gradient = Image.linear_gradient('L').resize(size)
+    img = Image.merge('RGB', (fractal, fractal.point(lambda v: 255 - v), gradient))
+    return img.filter(ImageFilter.GaussianBlur(1))
+
+
+@pytest.fixture(scope='module')
+def encoded(photo):
+    """
+    The photo as the JPEG an iPhone transcodes to, and as its HEIC.
+    """
+    register_heif_opener()
+    jpeg, heic = io.BytesIO(), io.BytesIO()
+    photo.save(jpeg, format='JPEG', quality=90)
+    photo.save(heic, format='HEIF', quality=50)
+    return {'jpeg': jpeg.getvalue(), 'heic': heic.getvalue()}
+
+
+def _score(photo, data):
+    with Image.open(io.BytesIO(data)) as img:
+        return ssim(luma(photo), luma(img))
+
+
+def test_heic_upload_is_smaller_at_the_same_quality(photo, encoded):
+    assert len(encoded['heic']) < 0.6 * len(encoded['jpeg'])
+    assert _score(photo, encoded['heic']) > 0.99
+    assert _score(photo, encoded['jpeg']) > 0.99
+
+
+def test_decode_time(encoded):
+    timings = {}
+    for name, data in encoded.items():
+        runs = []
+        for _ in range(3):
+            start = time.perf_counter()
+            decode(io.BytesIO(data), (1920, 1080))
+            runs.append(time.perf_counter() - start)
+        timings[name] = min(runs) * 1000
+
+    assert timings['heic'] < DECODE_BUDGET_MS, (
+        f"HEIC decode took {timings['heic']:.0f}ms (JPEG: {timings['jpeg']:.0f}ms)"
+    )
+
+
+@pytest.mark.django_db
+def test_heic_upload_gets_jpeg_renditions(memory_storage, encoded):
+    """
+    GIVEN the same photo as HEIC and as JPEG
+    WHEN both are uploaded
+    THEN the HEIC is stored as is and both get matching JPEG renditions
+    """
+    event = Event.objects.create(name='Test Wedding', code='test-wedding')
+    photos = {}
+    for name, filename in (('heic', 'IMG_0001.HEIC'), ('jpeg', 'IMG_0001.jpg')):
+        response = APIClient().post(reverse('gallery:upload'), {
+            'access_token': event.access_token,
+            'photo': SimpleUploadedFile(filename, encoded[name]),
+        }, format='multipart')
+        assert response.status_code == status.HTTP_201_CREATED
+        photos[name] = Photo.objects.get(pk=response.json()['id'])
+
+    heic = photos['heic']
+    assert heic.content_type == 'image/heic'
+    assert memory_storage.objects[heic.file_key] == encoded['heic']
+
+    for key in ('thumbnail_key', 'fullscreen_key'):
+        renditions = []
+        for photo in photos.values():
+            with Image.open(io.BytesIO(memory_storage.objects[getattr(photo, key)])) as img:
+                assert img.format == 'JPEG'
+                img.load()
+                renditions.append(img)
+        assert renditions[0].size == renditions[1].size
+        assert ssim(luma(renditions[0]), luma(renditions[1])) > 0.97
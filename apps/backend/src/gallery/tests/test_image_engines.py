@@ -0,0 +1,100 @@
+"""
+Image engines: renditions are oriented, the engine comes from settings,
+and the optional vips engine makes the same renditions as Pillow.
+"""
+import io
+
+import pytest
+from django.core.exceptions import ImproperlyConfigured
+from PIL import Image
+
+from src.events.models import Event
+from src.gallery import image_engine
+from src.gallery.encoding import luma, ssim
+from src.gallery.image_engine import get_image_engine, load_engine
+from src.gallery.models import Photo
+
+
+def _sideways_jpeg(size=(1600, 800), orientation=6):
+    """
+    A photo stored turned on its side, with the EXIF orientation that turns
+    it upright: the left half is red, which is the top once oriented.
+    """
+    img = Image.new('RGB', size, 'navy')
+    img.paste('red', (0, 0, size[0] // 2, size[1]))
+    exif = img.getexif()
+    exif[0x0112] = orientation
+    buffer = io.BytesIO()
+    img.save(buffer, format='JPEG', quality=95, exif=exif.tobytes())
+    return buffer.getvalue()
+
+
+@pytest.mark.django_db
+def test_renditions_are_oriented(memory_storage):
+    """
+    GIVEN a phone photo stored sideways with EXIF orientation 6
+    WHEN its renditions are made
+    THEN they are upright: portrait, with the red half at the top
+    """
+    event = Event.objects.create(name='Test Wedding', code='test-wedding')
+    memory_storage.objects['test-wedding/originals/sideways.jpg'] = _sideways_jpeg()
+
+    photo = Photo.objects.create(event=event, file_key='test-wedding/originals/sideways.jpg')
+
+    for key, size in ((photo.fullscreen_key, (540, 1080)), (photo.thumbnail_key, (200, 400))):
+        with Image.open(io.BytesIO(memory_storage.objects[key])) as img:
+            assert img.size == size
+            assert 0x0112 not in img.getexif()
+            top = img.getpixel((size[0] // 2, size[1] // 4))
+            bottom = img.getpixel((size[0] // 2, size[1] * 3 // 4))
+    assert top[0] > 200 and bottom[2] > 100
+
+
+def test_metadata_reads_the_header():
+    metadata = load_engine('pillow').metadata(io.BytesIO(_sideways_jpeg()))
+
+    assert (metadata.format, metadata.width, metadata.height, metadata.orientation) == ('JPEG', 1600, 800, 6)
+    assert metadata.display_size == (800, 1600)
+
+
+def test_engine_comes_from_settings(settings, monkeypatch):
+    monkeypatch.setattr(image_engine, '_image_engine', None)
+
+    settings.IMAGE_ENGINE = 'pillow'
+    assert get_image_engine().name == 'pillow'
+    settings.IMAGE_ENGINE = 'imagemagick'
+    with pytest.raises(ImproperlyConfigured, match='Unknown IMAGE_ENGINE'):
+        get_image_engine()
+
+
+def test_vips_engine_needs_pyvips():
+    try:
+        import pyvips  # noqa: F401
+    except (ImportError, OSError):
+        with pytest.raises(ImproperlyConfigured, match='pyvips'):
+            load_engine('vips')
+    else:
+        pytest.skip('pyvips is installed')
+
+
+@pytest.mark.parametrize('orientation', [1, 6])
+def test_vips_renditions_match_pillow(settings, orientation):
+    """
+    GIVEN a photo, stored upright or sideways
+    WHEN the Pillow and the vips engine make a rendition of it
+    THEN the renditions are the same size (within a pixel) and look alike
+    """
+    pytest.importorskip('pyvips')
+    settings.IMAGE_TARGET_SSIM = 0
+    data = _sideways_jpeg(orientation=orientation)
+
+    renditions = []
+    for name in ('pillow', 'vips'):
+        engine = load_engine(name)
+        img = engine.orient(engine.decode(io.BytesIO(data), settings.FULLSCREEN_SIZE))
+        encoded = engine.encode(engine.resize(img, settings.THUMBNAIL_SIZE), 'JPEG', 90)
+        renditions.append(Image.open(io.BytesIO(encoded.data)))
+
+    pillow, vips = renditions
+    assert abs(pillow.width - vips.width) <= 1 and abs(pillow.height - vips.height) <= 1
+    assert ssim(luma(pillow), luma(vips.resize(pillow.size))) > 0.9
@@ -0,0 +1,157 @@
+import io
+import os
+import threading
+
+import pytest
+from django.urls import reverse
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from src.events.models import Event
+from src.gallery import image_cache, resize
+from src.gallery.image_cache import DiskLRUCache
+from src.gallery.models import Photo
+from src.gallery.resize import open_variant, snap_width, variant_fingerprint, variant_for
+
+
+@pytest.fixture(autouse=True)
+def disk_cache(settings, tmp_path, monkeypatch):
+    settings.IMAGE_CACHE_DIR = str(tmp_path / 'cache')
+    monkeypatch.setattr(image_cache, '_image_cache', None)
+
+
+def _jpeg(size=(1000, 500)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, (200, 30, 30)).save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+
+def test_snap_width(settings):
+    settings.IMAGE_VARIANT_WIDTHS = (320, 640, 1280)
+    assert snap_width(1) == 320
+    assert snap_width(320) == 320
+    assert snap_width(321) == 640
+    assert snap_width(5000) == 1280
+
+
+def test_lru_eviction(tmp_path):
+    cache = DiskLRUCache(str(tmp_path), max_bytes=250)
+    cache.put('a', b'a' * 100)
+    cache.put('b', b'b' * 100)
+    os.utime(cache._path('a'), (1000, 1000))
+    os.utime(cache._path('b'), (2000, 2000))
+    cache.get('a').close()  # a is now the most recently used
+
+    cache.put('c', b'c' * 100)
+
+    assert cache.get('b') is None
+    assert cache.get('a').read() == b'a' * 100
+    assert cache.get('c').read() == b'c' * 100
+
+
+def test_concurrent_misses_render_once(memory_storage, monkeypatch):
+    """
+    GIVEN several requests for a variant that is not cached anywhere
+    WHEN they arrive at the same time
+    THEN it is rendered once and every request gets the same bytes
+    """
+    memory_storage.objects['wedding/originals/a.jpg'] = _jpeg()
+    variant = variant_for({'id': 1, 'file_key': 'wedding/originals/a.jpg'}, 'wedding', 320, 'jpeg')
+    renders = []
+    render = resize.render_variant
+
+    def counting_render(*args):
+        renders.append(args)
+        return render(*args)
+
+    monkeypatch.setattr(resize, 'render_variant', counting_render)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(open_variant(variant).read())) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(renders) == 1
+    assert len(results) == 4 and len(set(results)) == 1
+
+
+def test_settings_change_the_variant_key(settings, monkeypatch):
+    """
+    GIVEN a variant
+    WHEN the engine or encoder settings change
+    THEN it moves to a new key, so neither the disk cache nor storage serves the old bytes
+    """
+    row = {'id': 1, 'file_key': 'wedding/originals/a.jpg'}
+    variant = variant_for(row, 'wedding', 320, 'jpeg')
+
+    settings.IMAGE_VARIANT_QUALITY += 5
+    requalified = variant_for(row, 'wedding', 320, 'jpeg')
+    assert requalified.key != variant.key and requalified.etag != variant.etag
+
+    monkeypatch.setattr(resize, 'VARIANT_RENDERING', resize.VARIANT_RENDERING + 1)
+    assert variant_for(row, 'wedding', 320, 'jpeg').key != requalified.key
+
+
+@pytest.mark.django_db
+class TestPhotoImage:
+    @pytest.fixture
+    def event(self):
+        return Event.objects.create(name='Test Wedding', code='test-wedding')
+
+    @pytest.fixture
+    def photo(self, memory_storage, event):
+        memory_storage.objects['test-wedding/originals/a.jpg'] = _jpeg()
+        return Photo.objects.create(event=event, file_key='test-wedding/originals/a.jpg', content_type='image/jpeg')
+
+    def _get(self, event, photo, **params):
+        url = reverse('gallery:photo-image', kwargs={'photo_id': photo.pk})
+        headers = params.pop('headers', {})
+        return APIClient().get(url, {'access_token': event.access_token, **params}, headers=headers)
+
+    def test_renders_caches_and_writes_back(self, memory_storage, event, photo):
+        """
+        GIVEN an uploaded photo
+        WHEN a width that is not allowed is requested twice
+        THEN it is snapped, rendered once, written to storage and then served from disk
+        """
+        response = self._get(event, photo, w=300, fmt='webp')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response['Content-Type'] == 'image/webp'
+        assert 'immutable' in response['Cache-Control']
+        with Image.open(io.BytesIO(b''.join(response.streaming_content))) as img:
+            assert img.size == (320, 160)
+        variant_key = f'test-wedding/variants/{photo.pk}/{variant_fingerprint()}/w320.webp'
+        assert variant_key in memory_storage.objects
+
+        # The disk cache answers without touching storage.
+        memory_storage.objects.clear()
+        response = self._get(event, photo, w=320, fmt='webp')
+        assert response.status_code == status.HTTP_200_OK
+
+        response = self._get(event, photo, w=320, fmt='webp', headers={'If-None-Match': response['ETag']})
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    def test_serves_stored_variant_without_rendering(self, memory_storage, event, photo, monkeypatch):
+        memory_storage.objects[f'test-wedding/variants/{photo.pk}/{variant_fingerprint()}/w640.jpg'] = _jpeg((640, 320))
+        monkeypatch.setattr(resize, 'render_variant', None)
+
+        response = self._get(event, photo, w=600)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response['Content-Type'] == 'image/jpeg'
+
+    def test_never_upscales(self, event, photo):
+        response = self._get(event, photo, w=2000)
+        with Image.open(io.BytesIO(b''.join(response.streaming_content))) as img:
+            assert img.size == (1000, 500)
+
+    @pytest.mark.parametrize('params', [{'w': 'wide'}, {'w': 0}, {'fmt': 'gif'}])
+    def test_invalid_parameters(self, event, photo, params):
+        assert self._get(event, photo, **params).status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_rejected_photo_is_not_served(self, event, photo):
+        Photo.objects.filter(pk=photo.pk).update(moderation_status=Photo.ModerationStatus.REJECTED)
+        assert self._get(event, photo).status_code == status.HTTP_404_NOT_FOUND
@@ -0,0 +1,174 @@
+import json
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from src.config.renderers import ORJSONRenderer
+from src.events.models import Event
+from src.gallery.models import Photo
+from src.gallery.serializers import PhotoSerializer
+
+
+@pytest.mark.django_db
+class TestListPhotos:
+    @pytest.fixture
+    def event(self):
+        return Event.objects.create(name='Test Wedding', code='test-wedding')
+
+    @pytest.fixture
+    def photos(self, event):
+        start = datetime(2026, 1, 3, 16, 0, tzinfo=timezone.utc)
+        photos = [
+            Photo(
+                event=event,
+                file_key=f'test-wedding/originals/{i}.jpg',
+                # Exercise both URL fallbacks.
+                thumbnail_key=f'test-wedding/thumbnails/{i}_thumbnail.jpg' if i % 3 else '',
+                fullscreen_key=f'test-wedding/fullscreen/{i}_fullscreen.jpg' if i % 2 else '',
+                original_filename=f'IMG_{i}.jpg',
+                file_size=1000 + i,
+                content_type='image/jpeg',
+                uploaded_at=start + timedelta(minutes=i, microseconds=123456),
+            )
+            for i in range(12)
+        ]
+        # bulk_create skips Photo.save(), so no renditions are generated.
+        return Photo.objects.bulk_create(photos)
+
+    def test_fast_path_matches_photo_serializer(self, storage, event, photos):
+        response = APIClient().get(reverse('gallery:list'), {
+            'access_token': event.access_token,
+            'page_size': 5,
+            'page': 2,
+        })
+
+        assert response.status_code == status.HTTP_200_OK
+        expected = Photo.objects.filter(event=event).order_by('-uploaded_at')[5:10]
+        links = json.loads(response.content)
+        # Byte for byte, as REST framework renders the serializer's output.
+        assert response.content == JSONRenderer().render({
+            'count': 12,
+            'next': links['next'],
+            'previous': links['previous'],
+            'results': PhotoSerializer(expected, many=True).data,
+        })
+
+    def test_fields_limit_output_and_signing(self, storage, event, photos, monkeypatch):
+        signed = []
+        sign = storage.generate_presigned_urls
+        monkeypatch.setattr(storage, 'generate_presigned_urls', lambda keys: signed.extend(keys) or sign(keys))
+
+        response = APIClient().get(reverse('gallery:list'), {
+            'access_token': event.access_token,
+            'fields': 'thumbnail_url,id',
+        })
+
+        assert response.status_code == status.HTTP_200_OK
+        results = response.json()['results']
+        expected = Photo.objects.filter(event=event).order_by('-uploaded_at')[:20]
+        assert results == [{'id': p.id, 'thumbnail_url': p.thumbnail_url} for p in expected]
+        assert len(signed) == 12
+
+    def test_unknown_field_is_rejected(self, event):
+        response = APIClient().get(reverse('gallery:list'), {
+            'access_token': event.access_token,
+            'fields': 'id,file_key',
+        })
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'file_key' in response.json()['error']
+
+    def test_pending_photos_are_not_listed(self, storage, event, photos):
+        Photo.objects.filter(pk=photos[0].pk).update(moderation_status=Photo.ModerationStatus.PENDING)
+        response = APIClient().get(reverse('gallery:list'), {'access_token': event.access_token})
+        assert response.json()['count'] == 11
+
+
+def test_orjson_renderer_output_is_byte_identical():
+    data = {
+        'results': [{
+            'uploaded_at': datetime(2026, 1, 3, 16, 0, 0, 123456, tzinfo=timezone.utc),
+            'original_filename': 'Anđelka & Anto.jpg',
+            'file_size': 12,
+            'size': Decimal('1.5'),
+        }],
+        'next': None,
+    }
+    assert ORJSONRenderer().render(data) == JSONRenderer().render(data)
+
+
+@pytest.mark.django_db
+class TestPhotoUrls:
+    @pytest.fixture
+    def event(self):
+        return Event.objects.create(name='Test Wedding', code='test-wedding')
+
+    @pytest.fixture
+    def photos(self, event):
+        return Photo.objects.bulk_create([
+            Photo(
+                event=event,
+                file_key=f'test-wedding/originals/{i}.jpg',
+                fullscreen_key=f'test-wedding/fullscreen/{i}_fullscreen.jpg' if i else '',
+                original_filename=f'IMG_{i}.jpg',
+                file_size=1000,
+                content_type='image/jpeg',
+            )
+            for i in range(3)
+        ])
+
+    def test_signs_requested_rendition(self, storage, event, photos):
+        """
+        GIVEN photos of an event, one without a fullscreen rendition
+        WHEN fullscreen URLs are requested for them
+        THEN each URL matches the photo's fullscreen_url, falling back to the original
+        """
+        response = APIClient().post(reverse('gallery:photo-urls'), {
+            'access_token': event.access_token,
+            'ids': [p.id for p in photos],
+            'rendition': 'fullscreen',
+        }, format='json')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == {
+            'rendition': 'fullscreen',
+            'urls': {str(p.id): p.fullscreen_url for p in photos},
+        }
+
+    def test_rejects_photos_of_other_events(self, storage, event, photos):
+        """
+        GIVEN a photo of another event
+        WHEN its URL is requested with this event's token
+        THEN the request fails without signing anything
+        """
+        other_event = Event.objects.create(name='Other Wedding', code='other-wedding')
+        [other] = Photo.objects.bulk_create([Photo(
+            event=other_event,
+            file_key='other-wedding/originals/x.jpg',
+            original_filename='x.jpg',
+            file_size=1000,
+            content_type='image/jpeg',
+        )])
+
+        response = APIClient().post(reverse('gallery:photo-urls'), {
+            'access_token': event.access_token,
+            'ids': [photos[0].id, other.id],
+            'rendition': 'original',
+        }, format='json')
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        assert response.json()['ids'] == [other.id]
+        assert 'urls' not in response.json()
+
+    def test_rejects_invalid_rendition(self, event, photos):
+        response = APIClient().post(reverse('gallery:photo-urls'), {
+            'access_token': event.access_token,
+            'ids': [photos[0].id],
+            'rendition': 'poster',
+        }, format='json')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'rendition' in response.json()
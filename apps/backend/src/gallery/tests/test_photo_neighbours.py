@@ -0,0 +1,175 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlencode
+
+import pytest
+from asgiref.testing import ApplicationCommunicator
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from src.config.asgi import application
+from src.events.models import Event
+from src.gallery.models import Photo
+
+START = datetime(2026, 1, 3, 15, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def event():
+    return Event.objects.create(name='Test Wedding', code='test-wedding')
+
+
+def _photo(event, minutes, **fields):
+    name = f'{minutes}-{Photo.objects.count()}'
+    return Photo.objects.create(
+        event=event,
+        file_key=f'{event.code}/originals/{name}.jpg',
+        thumbnail_key=f'{event.code}/thumbnails/{name}_thumbnail.jpg',
+        fullscreen_key=f'{event.code}/fullscreen/{name}_fullscreen.jpg',
+        uploaded_at=START + timedelta(minutes=minutes),
+        **fields,
+    )
+
+
+def _neighbours(event, photo, **params):
+    return APIClient().get(
+        reverse('gallery:photo-neighbours', args=[photo.pk]),
+        {'access_token': event.access_token, **params},
+    )
+
+
+def _listed_ids(event):
+    response = APIClient().get(reverse('gallery:list'), {
+        'access_token': event.access_token, 'fields': 'id', 'page_size': 100,
+    })
+    return [item['id'] for item in response.json()['results']]
+
+
+@pytest.mark.django_db
+def test_neighbours_follow_list_order(memory_storage, event):
+    """
+    GIVEN photos where several were uploaded in the same instant
+    WHEN asking for the neighbours of each photo
+    THEN they are the photos next to it in list_photos order
+    """
+    for minutes in (0, 1, 1, 1, 2, 5, 5, 9):
+        _photo(event, minutes)
+    _photo(event, 3, moderation_status=Photo.ModerationStatus.PENDING)
+    listed = _listed_ids(event)
+
+    for position, photo_id in enumerate(listed):
+        response = _neighbours(event, Photo.objects.get(pk=photo_id))
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert data['photo']['id'] == photo_id
+        assert [item['id'] for item in data['previous']] == listed[max(0, position - 2):position]
+        assert [item['id'] for item in data['next']] == listed[position + 1:position + 3]
+
+
+@pytest.mark.django_db
+def test_neighbours_seek_without_offsets(memory_storage, event):
+    photos = [_photo(event, minutes) for minutes in range(30)]
+
+    with CaptureQueriesContext(connection) as queries:
+        response = _neighbours(event, photos[10], count=3)
+
+    data = response.json()
+    assert [item['id'] for item in data['previous']] == [photos[13].pk, photos[12].pk, photos[11].pk]
+    assert [item['id'] for item in data['next']] == [photos[9].pk, photos[8].pk, photos[7].pk]
+    assert data['photo']['fullscreen_url'] == f'https://storage.test/{photos[10].fullscreen_key}'
+    assert set(data['photo']) == {'id', 'original_filename', 'fullscreen_url'}
+    photo_queries = [q['sql'] for q in queries.captured_queries if 'gallery_photo' in q['sql']]
+    assert len(photo_queries) == 3
+    assert not [sql for sql in photo_queries if 'OFFSET' in sql or 'COUNT' in sql]
+
+
+@pytest.mark.django_db
+def test_neighbours_preload_fullscreen_images_nearest_first(memory_storage, event, settings):
+    settings.PRELOAD_LINK_LIMIT = 3
+    photos = [_photo(event, minutes) for minutes in range(6)]
+
+    response = _neighbours(event, photos[3], fields='id,thumbnail_url,fullscreen_url')
+
+    # The next photo in the listing is the older one.
+    assert response['Link'] == ', '.join(
+        f'<https://storage.test/{photo.fullscreen_key}>; rel=preload; as=image'
+        for photo in (photos[2], photos[4], photos[1])
+    )
+    assert 'thumbnail_url' in response.json()['next'][0]
+
+
+@pytest.mark.django_db
+def test_neighbours_of_unknown_or_hidden_photos(memory_storage, event):
+    other = Event.objects.create(name='Other Wedding', code='other-wedding')
+    pending = _photo(event, 0, moderation_status=Photo.ModerationStatus.PENDING)
+    elsewhere = _photo(other, 0)
+
+    assert _neighbours(event, pending).status_code == status.HTTP_404_NOT_FOUND
+    assert _neighbours(event, elsewhere).status_code == status.HTTP_404_NOT_FOUND
+    assert _neighbours(other, elsewhere, count=11).status_code == status.HTTP_400_BAD_REQUEST
+    assert _neighbours(other, elsewhere, count='many').status_code == status.HTTP_400_BAD_REQUEST
+
+    data = _neighbours(other, elsewhere).json()
+    assert data['previous'] == data['next'] == []
+
+
+@pytest.mark.django_db
+def test_listing_preloads_its_first_thumbnails(memory_storage, event, settings):
+    settings.PRELOAD_LINK_LIMIT = 2
+    photos = [_photo(event, minutes) for minutes in range(3)]
+
+    response = APIClient().get(reverse('gallery:list'), {'access_token': event.access_token})
+
+    assert response['Link'] == (
+        f'<https://storage.test/{photos[2].thumbnail_key}>; rel=preload; as=image, '
+        f'<https://storage.test/{photos[1].thumbnail_key}>; rel=preload; as=image'
+    )
+    response = APIClient().get(reverse('gallery:list'), {'access_token': event.access_token, 'fields': 'id'})
+    assert 'Link' not in response
+
+
+@pytest.mark.django_db(transaction=True)
+def test_early_hints_are_sent_when_the_server_supports_them(memory_storage, event):
+    """
+    GIVEN an ASGI server offering the http.response.early_hint extension
+    WHEN the lightbox asks for neighbours
+    THEN a 103 Early Hints message with the preload links precedes the response
+    """
+    photos = [_photo(event, minutes) for minutes in range(3)]
+    query = urlencode({'access_token': event.access_token})
+
+    async def request(extensions):
+        communicator = ApplicationCommunicator(application, {
+            'type': 'http',
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': reverse('gallery:photo-neighbours', args=[photos[1].pk]),
+            'query_string': query.encode(),
+            'headers': [(b'host', b'testserver')],
+            'server': ('testserver', 80),
+            'client': ('127.0.0.1', 12345),
+            'extensions': extensions,
+        })
+        await communicator.send_input({'type': 'http.request', 'body': b''})
+        messages = [await communicator.receive_output(timeout=5)]
+        while messages[-1]['type'] != 'http.response.body' or messages[-1].get('more_body'):
+            messages.append(await communicator.receive_output(timeout=5))
+        return messages
+
+    messages = asyncio.run(request({'http.response.early_hint': {}}))
+    assert messages[0] == {
+        'type': 'http.response.early_hint',
+        'links': [
+            f'<https://storage.test/{photos[0].fullscreen_key}>; rel=preload; as=image'.encode(),
+            f'<https://storage.test/{photos[2].fullscreen_key}>; rel=preload; as=image'.encode(),
+        ],
+    }
+    assert messages[1]['type'] == 'http.response.start'
+    assert messages[1]['status'] == 200
+
+    messages = asyncio.run(request({}))
+    assert messages[0]['type'] == 'http.response.start'
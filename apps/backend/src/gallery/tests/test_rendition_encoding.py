@@ -0,0 +1,75 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw, ImageFilter
+
+from src.gallery.encoding import encode, luma, search_luma, ssim
+
+
+def _scene(noise=0.0):
+    img = Image.linear_gradient('L').resize((640, 480)).convert('RGB')
+    draw = ImageDraw.Draw(img)
+    for i in range(6):
+        draw.ellipse((i * 90, i * 60, i * 90 + 150, i * 60 + 100), fill=(40 * i, 120, 200))
+    img = img.filter(ImageFilter.GaussianBlur(1))
+    if noise:
+        grain = Image.effect_noise(img.size, 64)
+        img = Image.blend(img, Image.merge('RGB', (grain, grain, grain)), noise)
+    return img
+
+
+def test_ssim_orders_distortion():
+    reference = luma(_scene())
+    rng = np.random.default_rng(0)
+
+    assert ssim(reference, reference) == pytest.approx(1.0)
+    slight = ssim(reference, reference + rng.normal(0, 2, reference.shape))
+    heavy = ssim(reference, reference + rng.normal(0, 20, reference.shape))
+    assert 1.0 > slight > heavy
+
+
+def test_search_finds_lowest_quality_reaching_target(settings):
+    """
+    GIVEN a simple scene and a target SSIM
+    WHEN it is encoded
+    THEN the result reaches the target, one step lower would not, and it is
+    smaller than the fixed-quality encoding
+    """
+    settings.IMAGE_TARGET_SSIM = 0.99
+    settings.IMAGE_MIN_QUALITY = 30
+    settings.IMAGE_MAX_QUALITY = 95
+    img = _scene()
+
+    result = encode(img, 'JPEG', 95)
+
+    assert 30 < result.quality < 95
+    assert result.score >= 0.99
+    lower = io.BytesIO()
+    img.save(lower, format='JPEG', quality=result.quality - 1)
+    assert ssim(search_luma(img), search_luma(Image.open(lower))) < 0.99
+
+    fixed = io.BytesIO()
+    img.save(fixed, format='JPEG', quality=95, optimize=True)
+    assert len(result.data) < len(fixed.getvalue())
+
+
+def test_jpegs_are_progressive_with_tuned_subsampling(settings):
+    settings.IMAGE_TARGET_SSIM = 0
+    img = _scene()
+
+    low = Image.open(io.BytesIO(encode(img, 'JPEG', 75).data))
+    high = Image.open(io.BytesIO(encode(img, 'JPEG', settings.IMAGE_SUBSAMPLING_444_QUALITY).data))
+
+    assert low.info.get('progressive') and high.info.get('progressive')
+    assert low.layer[0][1:3] == (2, 2)  # 4:2:0
+    assert high.layer[0][1:3] == (1, 1)  # 4:4:4
+
+
+def test_unreachable_target_falls_back_to_fixed_quality(settings):
+    settings.IMAGE_TARGET_SSIM = 0.999
+    settings.IMAGE_MAX_QUALITY = 60
+
+    result = encode(_scene(noise=0.5), 'WEBP', 80)
+
+    assert (result.quality, result.score) == (80, None)
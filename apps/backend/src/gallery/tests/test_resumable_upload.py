@@ -0,0 +1,247 @@
+import io
+import os
+from datetime import timedelta
+
+import pytest
+from django.core.cache import cache
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from src.events.models import Event
+from src.gallery.models import Photo, UploadSession
+
+CHUNK_SIZE = 1024
+
+
+def _noise_png():
+    # Random pixels do not compress, so the file spans several chunks.
+    buffer = io.BytesIO()
+    Image.frombytes('RGB', (32, 32), os.urandom(32 * 32 * 3)).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+@pytest.mark.django_db
+class TestResumableUpload:
+    @pytest.fixture(autouse=True)
+    def small_chunks(self, settings):
+        settings.RESUMABLE_UPLOAD_CHUNK_SIZE = CHUNK_SIZE
+        cache.clear()
+
+    @pytest.fixture
+    def event(self):
+        return Event.objects.create(name='Test Wedding', code='test-wedding')
+
+    @pytest.fixture
+    def client(self):
+        return APIClient()
+
+    def _create(self, client, event, content, filename='IMG_1.png'):
+        return client.post(reverse('gallery:upload-create'), {
+            'access_token': event.access_token,
+            'filename': filename,
+            'size': len(content),
+        }, format='json')
+
+    def _session_url(self, event, session_id, name='gallery:upload-session'):
+        return f"{reverse(name, args=[session_id])}?access_token={event.access_token}"
+
+    def _patch(self, client, event, session_id, offset, chunk):
+        return client.generic(
+            'PATCH',
+            self._session_url(event, session_id),
+            chunk,
+            content_type='application/offset+octet-stream',
+            HTTP_UPLOAD_OFFSET=str(offset),
+        )
+
+    def test_interrupted_upload_resumes(self, client, memory_storage, event):
+        """
+        GIVEN a resumable upload whose connection dropped after two chunks
+        WHEN the client asks for the offset, sends the rest and completes it
+        THEN the photo is stored in one piece and created with renditions
+        """
+        content = _noise_png()
+        response = self._create(client, event, content)
+        assert response.status_code == status.HTTP_201_CREATED
+        session_id = response.json()['id']
+        assert response.json()['chunk_size'] == CHUNK_SIZE
+        assert response['Location'] == reverse('gallery:upload-session', args=[session_id])
+
+        for offset in (0, CHUNK_SIZE):
+            response = self._patch(client, event, session_id, offset, content[offset:offset + CHUNK_SIZE])
+            assert response.status_code == status.HTTP_204_NO_CONTENT
+
+        # The connection dropped; the client has lost track and asks.
+        response = client.head(self._session_url(event, session_id))
+        offset = int(response['Upload-Offset'])
+        assert offset == 2 * CHUNK_SIZE
+        assert int(response['Upload-Length']) == len(content)
+
+        # Replaying an old chunk is refused with the current offset.
+        response = self._patch(client, event, session_id, 0, content[:CHUNK_SIZE])
+        assert response.status_code == status.HTTP_409_CONFLICT
+        assert int(response['Upload-Offset']) == offset
+
+        while offset < len(content):
+            response = self._patch(client, event, session_id, offset, content[offset:offset + CHUNK_SIZE])
+            assert response.status_code == status.HTTP_204_NO_CONTENT
+            offset = int(response['Upload-Offset'])
+
+        complete_url = self._session_url(event, session_id, 'gallery:upload-complete')
+        response = client.post(complete_url)
+        assert response.status_code == status.HTTP_201_CREATED
+
+        photo = Photo.objects.get(pk=response.json()['id'])
+        assert memory_storage.objects[photo.file_key] == content
+        assert memory_storage.content_types[photo.file_key] == 'image/png'
+        assert (photo.event, photo.original_filename, photo.file_size) == (event, 'IMG_1.png', len(content))
+        assert photo.thumbnail_key in memory_storage.objects
+        assert photo.fullscreen_key in memory_storage.objects
+
+        # Completing again (the response was lost) returns the same photo.
+        response = client.post(complete_url)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()['id'] == photo.id
+
+    def _upload_all(self, client, event, content):
+        session_id = self._create(client, event, content).json()['id']
+        for offset in range(0, len(content), CHUNK_SIZE):
+            self._patch(client, event, session_id, offset, content[offset:offset + CHUNK_SIZE])
+        return session_id
+
+    @pytest.mark.parametrize('failing_save', [1, 2], ids=['recording-completion', 'linking-photo'])
+    def test_retry_after_a_failed_complete(self, client, memory_storage, event, monkeypatch, failing_save):
+        """
+        GIVEN a complete whose object was assembled in S3, but that failed
+        recording it or linking the photo it created
+        WHEN the client retries
+        THEN the retry succeeds with a single photo of the stored object
+        """
+        content = _noise_png()
+        session_id = self._upload_all(client, event, content)
+        save = UploadSession.save
+        calls = []
+
+        def flaky_save(session, *args, **kwargs):
+            calls.append(kwargs.get('update_fields'))
+            if len(calls) == failing_save:
+                raise RuntimeError('database went away')
+            return save(session, *args, **kwargs)
+
+        monkeypatch.setattr(UploadSession, 'save', flaky_save)
+        complete_url = self._session_url(event, session_id, 'gallery:upload-complete')
+
+        assert client.post(complete_url).status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
+        response = client.post(complete_url)
+
+        assert response.status_code == status.HTTP_201_CREATED
+        photo = Photo.objects.get()
+        assert response.json()['id'] == photo.id
+        assert memory_storage.objects[photo.file_key] == content
+
+    def test_concurrent_completes_create_one_photo(self, client, memory_storage, event):
+        """
+        GIVEN a session another request is completing
+        WHEN the client completes it too
+        THEN it is told to retry instead of creating a second photo, and is
+        given the photo once the other request has finished
+        """
+        session_id = self._upload_all(client, event, _noise_png())
+        complete_url = self._session_url(event, session_id, 'gallery:upload-complete')
+        UploadSession.objects.filter(pk=session_id).update(
+            completing_until=timezone.now() + timedelta(minutes=1)
+        )
+
+        response = client.post(complete_url)
+        assert response.status_code == status.HTTP_409_CONFLICT
+        assert response['Retry-After'] == '1'
+        assert not Photo.objects.exists()
+
+        # The other request's lease ran out (it died).
+        UploadSession.objects.filter(pk=session_id).update(
+            completing_until=timezone.now() - timedelta(seconds=1)
+        )
+        response = client.post(complete_url)
+        assert response.status_code == status.HTTP_201_CREATED
+        assert client.post(complete_url).json()['id'] == response.json()['id']
+        assert Photo.objects.count() == 1
+
+    def test_first_chunk_is_validated(self, client, memory_storage, event):
+        content = b'%PDF-1.7\n' + b'x' * 2000
+        session_id = self._create(client, event, content, filename='IMG_1.jpg').json()['id']
+
+        response = self._patch(client, event, session_id, 0, content[:CHUNK_SIZE])
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json()['code'] == 'unsupported_type'
+        assert not UploadSession.objects.exists()
+        assert not memory_storage.multipart_uploads
+
+    def test_failed_first_chunk_aborts_its_multipart_upload(self, client, memory_storage, event, monkeypatch):
+        """
+        GIVEN a resumable upload whose first chunk fails to store
+        WHEN the client retries the chunk
+        THEN the failed attempt's multipart upload was aborted and the retry starts a new one
+        """
+        content = _noise_png()
+        session_id = self._create(client, event, content).json()['id']
+        upload_part = memory_storage.upload_part
+
+        def failing_upload_part(*args):
+            raise ConnectionError('storage unavailable')
+
+        monkeypatch.setattr(memory_storage, 'upload_part', failing_upload_part)
+        response = self._patch(client, event, session_id, 0, content[:CHUNK_SIZE])
+        assert response.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
+        assert memory_storage.multipart_uploads == {}
+
+        monkeypatch.setattr(memory_storage, 'upload_part', upload_part)
+        response = self._patch(client, event, session_id, 0, content[:CHUNK_SIZE])
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+        assert list(memory_storage.multipart_uploads) == [UploadSession.objects.get().multipart_upload_id]
+
+    def test_chunks_must_have_the_session_size(self, client, memory_storage, event):
+        content = _noise_png()
+        session_id = self._create(client, event, content).json()['id']
+        response = self._patch(client, event, session_id, 0, content[:100])
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_incomplete_upload_cannot_be_completed(self, client, memory_storage, event):
+        content = _noise_png()
+        session_id = self._create(client, event, content).json()['id']
+        self._patch(client, event, session_id, 0, content[:CHUNK_SIZE])
+
+        response = client.post(self._session_url(event, session_id, 'gallery:upload-complete'))
+
+        assert response.status_code == status.HTTP_409_CONFLICT
+        assert int(response['Upload-Offset']) == CHUNK_SIZE
+        assert not Photo.objects.exists()
+
+    def test_sessions_belong_to_their_event(self, client, memory_storage, event):
+        session_id = self._create(client, event, _noise_png()).json()['id']
+        other = Event.objects.create(name='Other Wedding', code='other-wedding')
+        response = client.head(self._session_url(other, session_id))
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_expired_sessions_are_aborted(self, client, memory_storage, event):
+        """
+        GIVEN an unfinished upload past its expiry
+        WHEN the expiry command runs
+        THEN its multipart upload is aborted and the session removed
+        """
+        content = _noise_png()
+        session_id = self._create(client, event, content).json()['id']
+        self._patch(client, event, session_id, 0, content[:CHUNK_SIZE])
+        UploadSession.objects.filter(pk=session_id).update(expires_at=timezone.now() - timedelta(minutes=1))
+
+        response = client.head(self._session_url(event, session_id))
+        assert response.status_code == status.HTTP_410_GONE
+
+        call_command('expire_upload_sessions', stdout=io.StringIO())
+
+        assert not UploadSession.objects.exists()
+        assert not memory_storage.multipart_uploads
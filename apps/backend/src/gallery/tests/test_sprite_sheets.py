@@ -0,0 +1,134 @@
+import io
+
+import pytest
+from django.contrib.admin.sites import site
+from django.core.management import call_command
+from django.urls import reverse
+from PIL import Image
+from rest_framework.test import APIClient
+
+from src.events.models import Event
+from src.gallery import sprites
+from src.gallery.admin import PhotoAdmin
+from src.gallery.models import Photo, SpriteSheet
+
+COLORS = [(255, 0, 0), (0, 255, 0), (0, 0, 255), (255, 255, 0), (0, 255, 255), (255, 0, 255)]
+
+
+@pytest.mark.django_db
+class TestSpriteSheets:
+    @pytest.fixture(autouse=True)
+    def small_sheets(self, settings):
+        settings.SPRITE_TILE_SIZE = 16
+        settings.SPRITE_COLUMNS = 2
+        settings.SPRITE_ROWS = 2
+
+    @pytest.fixture
+    def event(self):
+        return Event.objects.create(name='Test Wedding', code='test-wedding')
+
+    def _add_photo(self, storage, event, color):
+        """Store a solid-color original and create its Photo, renditions included."""
+        buffer = io.BytesIO()
+        Image.new('RGB', (60, 40), color).save(buffer, format='PNG')
+        file_key = f'test-wedding/originals/{len(storage.objects)}.png'
+        storage.objects[file_key] = buffer.getvalue()
+        return Photo.objects.create(event=event, file_key=file_key, content_type='image/png')
+
+    def _build(self):
+        call_command('build_sprite_sheets', stdout=io.StringIO())
+
+    def _list_sprites(self, event):
+        response = APIClient().get(reverse('gallery:list'), {
+            'access_token': event.access_token,
+            'fields': 'id,sprite',
+        })
+        return {photo['id']: photo['sprite'] for photo in response.json()['results']}
+
+    def _tile_color(self, storage, sprite):
+        key = sprite['url'].removeprefix('https://storage.test/')
+        with Image.open(io.BytesIO(storage.objects[key])) as sheet:
+            assert sheet.size == (sprite['width'], sprite['height'])
+            return sheet.convert('RGB').getpixel((sprite['x'] + 8, sprite['y'] + 8))
+
+    def test_listing_returns_tiles_of_built_sheets(self, memory_storage, event):
+        """
+        GIVEN five approved photos and sheets of four
+        WHEN the sheets are built
+        THEN every listed photo points at its own tile in one of two sheets
+        """
+        photos = [self._add_photo(memory_storage, event, color) for color in COLORS[:5]]
+        assert self._list_sprites(event) == {photo.id: None for photo in photos}
+
+        self._build()
+
+        sprites = self._list_sprites(event)
+        assert len({sprite['url'] for sprite in sprites.values()}) == 2
+        for photo, color in zip(photos, COLORS):
+            tile = self._tile_color(memory_storage, sprites[photo.id])
+            assert all(abs(a - b) < 10 for a, b in zip(tile, color))
+
+    def test_new_photos_only_touch_the_newest_sheet(self, memory_storage, event):
+        for color in COLORS[:5]:
+            self._add_photo(memory_storage, event, color)
+        self._build()
+        first, second = SpriteSheet.objects.order_by('index')
+
+        self._add_photo(memory_storage, event, COLORS[5])
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        assert not first.is_stale
+        assert second.is_stale
+        # The built image keeps serving until the rebuild.
+        assert second.image_key
+
+    def test_rejected_photo_is_hidden_immediately(self, memory_storage, event, rf):
+        """
+        GIVEN a built sheet
+        WHEN one of its photos is rejected in the admin
+        THEN the sheet is no longer served until rebuilt without that photo
+        """
+        photos = [self._add_photo(memory_storage, event, color) for color in COLORS[:3]]
+        self._build()
+
+        PhotoAdmin(Photo, site).reject_photos(rf.get('/'), Photo.objects.filter(pk=photos[1].pk))
+
+        assert self._list_sprites(event) == {photos[0].id: None, photos[2].id: None}
+        self._build()
+        sprites = self._list_sprites(event)
+        assert sprites[photos[0].id] and sprites[photos[2].id]
+        assert SpriteSheet.objects.get().tiles == {str(photos[0].id): 0, str(photos[2].id): 2}
+
+    def test_deleted_photo_invalidates_its_sheet(self, memory_storage, event):
+        photos = [self._add_photo(memory_storage, event, color) for color in COLORS[:2]]
+        self._build()
+
+        photos[0].delete()
+
+        sheet = SpriteSheet.objects.get()
+        assert sheet.is_stale and not sheet.image_key
+
+    def test_backfill_writes_a_sheet_at_a_time(self, memory_storage, event, monkeypatch):
+        """
+        GIVEN six approved photos in no sheet, as before sprite sheets existed
+        WHEN the sheets are backfilled
+        THEN every photo gets a tile, assigned a sheet's worth per transaction
+        """
+        photos = [self._add_photo(memory_storage, event, color) for color in COLORS]
+        Photo.objects.update(sprite_sheet=None, sprite_slot=None)
+        SpriteSheet.objects.all().delete()
+        chunks = []
+        update_membership = sprites._update_membership
+
+        def record(using, event_id, photo_ids):
+            chunks.append(list(photo_ids))
+            return update_membership(using, event_id, photo_ids)
+
+        monkeypatch.setattr(sprites, '_update_membership', record)
+        call_command('build_sprite_sheets', '--backfill', stdout=io.StringIO())
+
+        assert chunks == [[photo.id for photo in photos[:4]], [photo.id for photo in photos[4:]]]
+        sprites_by_photo = self._list_sprites(event)
+        assert all(sprites_by_photo[photo.id] for photo in photos)
+        assert SpriteSheet.objects.count() == 2
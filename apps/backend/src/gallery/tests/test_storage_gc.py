@@ -0,0 +1,151 @@
+import datetime
+import io
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from src.events.models import Event
+from src.gallery.models import Photo, StorageDeletion, StoragePrefixDeletion
+from src.gallery.resize import variant_fingerprint
+from src.gallery.storage_gc import delete_keys
+
+OLD = timezone.now() - datetime.timedelta(days=2)
+
+
+@pytest.mark.django_db
+class TestStorageGarbageCollection:
+    @pytest.fixture
+    def event(self):
+        return Event.objects.create(name='Test Wedding', code='test-wedding')
+
+    def _photo(self, storage, event, name):
+        keys = {
+            'file_key': f'test-wedding/originals/{name}.jpg',
+            'thumbnail_key': f'test-wedding/thumbnails/{name}_thumbnail.jpg',
+            'fullscreen_key': f'test-wedding/fullscreen/{name}_fullscreen.jpg',
+        }
+        for key in keys.values():
+            storage.objects[key] = b'data'
+            storage.last_modified[key] = OLD
+        return Photo.objects.create(event=event, **keys)
+
+    def _sweep(self, *args):
+        call_command('sweep_storage', *args, stdout=io.StringIO(), stderr=io.StringIO())
+
+    def test_deleted_photos_are_queued_and_deleted(self, memory_storage, event):
+        """
+        GIVEN two photos
+        WHEN one is deleted and the storage is swept
+        THEN only the deleted photo's objects are removed and the queue is empty
+        """
+        kept = self._photo(memory_storage, event, 'kept')
+        deleted = self._photo(memory_storage, event, 'deleted')
+
+        deleted.delete()
+        assert set(StorageDeletion.objects.values_list('key', flat=True)) == {
+            deleted.file_key, deleted.thumbnail_key, deleted.fullscreen_key,
+        }
+
+        self._sweep()
+
+        assert set(memory_storage.objects) == {kept.file_key, kept.thumbnail_key, kept.fullscreen_key}
+        assert not StorageDeletion.objects.exists()
+
+    def test_deleting_an_event_deletes_its_whole_prefix(self, memory_storage, event):
+        """
+        GIVEN an event with a photo, a variant, a superseded sprite sheet and an old manifest page
+        WHEN the event is deleted, a new event reuses its code, and the storage is swept
+        THEN everything stored before the deletion is removed and the new event's objects are kept
+        """
+        photo = self._photo(memory_storage, event, 'a')
+        unnamed = [
+            f'test-wedding/variants/{photo.pk}/{variant_fingerprint()}/w320.jpg',
+            'test-wedding/sprites/0-1.jpg',
+            'test-wedding/manifest/0123456789abcdef/page-1.json',
+        ]
+        for key in unnamed:
+            memory_storage.objects[key] = b'data'
+            memory_storage.last_modified[key] = OLD
+
+        event.delete()
+        assert list(StoragePrefixDeletion.objects.values_list('prefix', flat=True)) == ['test-wedding/']
+        reused = Event.objects.create(name='Another Wedding', code='test-wedding')
+        memory_storage.objects['test-wedding/originals/new.jpg'] = b'data'
+        kept = Photo.objects.create(event=reused, file_key='test-wedding/originals/kept.jpg')
+        memory_storage.objects[kept.file_key] = b'data'
+        memory_storage.last_modified[kept.file_key] = OLD
+
+        self._sweep('--grace-hours', '100')
+
+        assert set(memory_storage.objects) == {'test-wedding/originals/new.jpg', kept.file_key}
+        assert not StoragePrefixDeletion.objects.exists()
+
+    def test_deleting_an_event_takes_the_same_queries_for_any_number_of_photos(self, memory_storage):
+        """
+        GIVEN two events, with 2 and 8 photos
+        WHEN they are deleted
+        THEN both take the same number of queries: their rows are handled in bulk, not per photo
+        """
+        queries = []
+        for count in (2, 8):
+            event = Event.objects.create(name='Wedding', code=f'wedding-{count}')
+            for number in range(count):
+                self._photo(memory_storage, event, f'{count}-{number}')
+            with CaptureQueriesContext(connection) as context:
+                event.delete()
+            queries.append(len(context.captured_queries))
+
+        assert queries[0] == queries[1]
+        assert StoragePrefixDeletion.objects.count() == 2
+
+    def test_sweeps_old_unreferenced_objects(self, memory_storage, event):
+        """
+        GIVEN an old object no row refers to, a fresh one, and variants
+        WHEN the storage is swept
+        THEN only the old orphan and the variants of a deleted photo or of old settings are removed
+        """
+        photo = self._photo(memory_storage, event, 'a')
+        orphans = [
+            'test-wedding/originals/failed-upload.jpg',
+            f'test-wedding/variants/999/{variant_fingerprint()}/w320.jpg',
+            f'test-wedding/variants/{photo.pk}/0123456789ab/w320.jpg',
+        ]
+        fresh = 'test-wedding/originals/uploading.jpg'
+        live_variant = f'test-wedding/variants/{photo.pk}/{variant_fingerprint()}/w320.jpg'
+        for key in orphans + [live_variant]:
+            memory_storage.objects[key] = b'data'
+            memory_storage.last_modified[key] = OLD
+        memory_storage.objects[fresh] = b'data'
+
+        self._sweep('--dry-run')
+        assert all(key in memory_storage.objects for key in orphans)
+
+        self._sweep()
+
+        assert not any(key in memory_storage.objects for key in orphans)
+        assert fresh in memory_storage.objects
+        assert live_variant in memory_storage.objects
+        assert photo.file_key in memory_storage.objects
+
+    def test_unknown_prefixes_only_on_request(self, memory_storage, event):
+        memory_storage.objects['deleted-event/originals/a.jpg'] = b'data'
+        memory_storage.last_modified['deleted-event/originals/a.jpg'] = OLD
+
+        self._sweep()
+        assert 'deleted-event/originals/a.jpg' in memory_storage.objects
+
+        self._sweep('--unknown-prefixes')
+        assert 'deleted-event/originals/a.jpg' not in memory_storage.objects
+
+
+def test_delete_keys_batches_requests(memory_storage):
+    keys = [f'wedding/originals/{i}.jpg' for i in range(2500)]
+    memory_storage.objects.update({key: b'' for key in keys})
+
+    sent, failed = delete_keys(iter(keys))
+
+    assert (sent, failed) == (2500, [])
+    assert not memory_storage.objects
@@ -0,0 +1,60 @@
+import io
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from django.core.management import call_command
+from PIL import Image
+
+from src.events.models import Event
+from src.gallery.models import GalleryManifest, Photo
+
+
+def _generate(*args):
+    stdout = io.StringIO()
+    call_command('generate_synthetic_event', '--code', 'synthetic', '--seed', '1', *args, stdout=stdout)
+    return stdout.getvalue()
+
+
+@pytest.mark.django_db
+def test_generates_rows_in_batches():
+    """
+    GIVEN a request for 2000 photos in batches of 500
+    WHEN the generator runs
+    THEN the event gets 2000 photos spread over the event with a moderation mix
+    """
+    start = datetime(2026, 1, 3, 15, tzinfo=timezone.utc)
+    output = _generate('--photos', '2000', '--batch-size', '500', '--start', start.isoformat())
+
+    event = Event.objects.get(code='synthetic')
+    photos = Photo.objects.filter(event=event)
+    assert photos.count() == 2000
+    assert output.count('photos\n') == 4
+    assert 'rows/s' in output
+
+    counts = {status: photos.filter(moderation_status=status).count() for status in Photo.ModerationStatus.values}
+    assert 0 < counts['PENDING'] < 120
+    assert 0 < counts['REJECTED'] < 100
+    assert not photos.filter(moderation_status='REJECTED', moderated_at__isnull=True).exists()
+
+    times = list(photos.values_list('uploaded_at', flat=True))
+    assert min(times) >= start
+    during_event = sum(uploaded_at < start + timedelta(hours=12) for uploaded_at in times)
+    assert 0.75 < during_event / len(times) < 0.95
+    assert GalleryManifest.objects.filter(event=event, dirty_since__isnull=False).exists()
+
+
+@pytest.mark.django_db
+def test_writes_files_with_a_pool(memory_storage):
+    output = _generate(
+        '--photos', '12', '--with-files', '--workers', '4',
+        '--distinct-images', '2', '--original-size', '640x480',
+    )
+
+    assert 'MiB/s' in output
+    for photo in Photo.objects.all():
+        assert memory_storage.objects[photo.file_key][:2] == b'\xff\xd8'
+        assert photo.file_size == len(memory_storage.objects[photo.file_key])
+        with Image.open(io.BytesIO(memory_storage.objects[photo.thumbnail_key])) as thumbnail:
+            assert max(thumbnail.size) == 400
+        assert photo.fullscreen_key in memory_storage.objects
+    assert len(memory_storage.objects) == 36
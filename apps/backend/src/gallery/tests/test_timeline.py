@@ -0,0 +1,157 @@
+import io
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from src.events.models import Event
+from src.gallery.models import Photo, TimelineBucket
+
+START = datetime(2026, 1, 3, 15, 0, tzinfo=timezone.utc)
+
+
+@pytest.mark.django_db
+class TestTimeline:
+    @pytest.fixture
+    def event(self):
+        return Event.objects.create(name='Test Wedding', code='test-wedding')
+
+    def _photo(self, event, minutes, **fields):
+        name = f'{minutes}-{Photo.objects.count()}'
+        return Photo.objects.create(
+            event=event,
+            file_key=f'test-wedding/originals/{name}.jpg',
+            thumbnail_key=f'test-wedding/thumbnails/{name}_thumbnail.jpg',
+            fullscreen_key=f'test-wedding/fullscreen/{name}_fullscreen.jpg',
+            uploaded_at=START + timedelta(minutes=minutes),
+            **fields,
+        )
+
+    def _timeline(self, event):
+        response = APIClient().get(reverse('gallery:timeline'), {'access_token': event.access_token})
+        assert response.status_code == status.HTTP_200_OK
+        return response.json()
+
+    def _seek(self, event, at, **params):
+        response = APIClient().get(
+            reverse('gallery:timeline-seek'), {'access_token': event.access_token, 'at': at.isoformat(), **params}
+        )
+        assert response.status_code == status.HTTP_200_OK
+        return response.json()
+
+    def test_buckets_follow_uploads_moderation_and_deletes(self, event):
+        """
+        GIVEN photos uploaded across three 5 minute buckets
+        WHEN one is rejected and another deleted
+        THEN the bucket counts follow, without counting over the photos table
+        """
+        photos = [self._photo(event, minutes) for minutes in (0, 1, 4, 7, 12, 13)]
+        self._photo(event, 2, moderation_status=Photo.ModerationStatus.PENDING)
+
+        with CaptureQueriesContext(connection) as queries:
+            timeline = self._timeline(event)
+        assert timeline['bucket_seconds'] == 300
+        assert timeline['total'] == 6
+        assert [bucket['count'] for bucket in timeline['buckets']] == [3, 1, 2]
+        assert timeline['buckets'][0]['start'] == '2026-01-03T15:00:00Z'
+        assert not [q for q in queries.captured_queries if 'gallery_photo' in q['sql']]
+
+        photos[0].moderation_status = Photo.ModerationStatus.REJECTED
+        photos[0].save()
+        photos[3].delete()
+
+        timeline = self._timeline(event)
+        assert [bucket['count'] for bucket in timeline['buckets']] == [2, 2]
+        assert timeline['total'] == 4
+
+    def test_rebuild_matches_incremental_counts(self, event):
+        for minutes in (0, 3, 6, 6, 30):
+            self._photo(event, minutes)
+        incremental = self._timeline(event)
+
+        TimelineBucket.objects.all().delete()
+        call_command('build_timeline', '--event', event.code, stdout=io.StringIO())
+
+        assert self._timeline(event) == incremental
+
+    def _list(self, event, **params):
+        response = APIClient().get(reverse('gallery:list'), {
+            'access_token': event.access_token, 'fields': 'id', **params,
+        })
+        assert response.status_code == status.HTTP_200_OK
+        return response.json()
+
+    def test_seek_finds_the_page_of_a_moment(self, event):
+        """
+        GIVEN 50 photos, one a minute
+        WHEN seeking to a moment between two uploads
+        THEN the cursor starts a page at the newest photo taken before it,
+        found by keyset seeks rather than by counting or skipping rows
+        """
+        photos = [self._photo(event, minutes) for minutes in range(50)]
+
+        with CaptureQueriesContext(connection) as queries:
+            seek = self._seek(event, START + timedelta(minutes=17, seconds=30))
+        # The only count is over the rest of the moment's timeline bucket.
+        counts = [q['sql'] for q in queries.captured_queries if 'COUNT(' in q['sql']]
+        assert len(counts) == 1 and '"uploaded_at" <' in counts[0]
+        assert not [q for q in queries.captured_queries if 'OFFSET' in q['sql']]
+
+        # Photos 18..49 are newer: 32 of them.
+        assert seek['position'] == 32
+        assert seek['photo_id'] == photos[17].pk
+        with CaptureQueriesContext(connection) as queries:
+            page = self._list(event, before=seek['cursor'], page_size=10)
+        assert not [q for q in queries.captured_queries if 'COUNT(' in q['sql'] or 'OFFSET' in q['sql']]
+        assert [item['id'] for item in page['results']] == [photo.pk for photo in photos[17:7:-1]]
+
+        # The next link carries on from the last photo of the page.
+        page = APIClient().get(page['next']).json()
+        assert [item['id'] for item in page['results']] == [photo.pk for photo in photos[7::-1]]
+        assert page['next'] is None
+
+    def test_seek_to_the_newest_photo_starts_the_first_page(self, event):
+        photos = [self._photo(event, minutes) for minutes in range(3)]
+
+        seek = self._seek(event, START + timedelta(hours=1))
+
+        assert (seek['position'], seek['photo_id'], seek['cursor']) == (0, photos[2].pk, None)
+
+    def test_seek_before_the_first_photo(self, event):
+        self._photo(event, 0)
+
+        seek = self._seek(event, START - timedelta(hours=1))
+
+        assert seek['photo_id'] is None
+        assert seek['position'] == 1
+        assert self._list(event, before=seek['cursor']) == {'next': None, 'results': []}
+
+    def test_list_rejects_an_invalid_cursor(self, event):
+        self._photo(event, 0)
+
+        response = APIClient().get(reverse('gallery:list'), {
+            'access_token': event.access_token, 'before': 'not-a-cursor',
+        })
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        assert response.json() == {'detail': 'Invalid cursor'}
+
+    @pytest.mark.parametrize('at', ['first dance', '2026-02-30T10:00', '2026-06-20T25:00'])
+    def test_seek_requires_a_moment(self, event, at):
+        response = APIClient().get(
+            reverse('gallery:timeline-seek'), {'access_token': event.access_token, 'at': at}
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json() == {'error': 'at must be an ISO 8601 date and time'}
+
+    def test_deleting_the_event_deletes_its_buckets(self, event):
+        self._photo(event, 0)
+
+        event.delete()
+
+        assert not TimelineBucket.objects.exists()
@@ -0,0 +1,150 @@
+"""
+Gallery timeline.
+
+Guests scrub through an event by time ("the first dance"). The timeline
+endpoint returns the number of approved photos per bucket of
+``TIMELINE_BUCKET_SECONDS``, read from ``TimelineBucket`` rows instead of a
+``GROUP BY`` over every photo of the event.
+
+Buckets are maintained incrementally: ``photos_changed`` and photo
+deletions recount only the buckets the changed photos fall in, each with
+an index range count (``Photo`` is indexed on event, moderation status and
+upload time). The bucket rows are locked while they are recounted, so
+concurrent uploads to the same bucket cannot overwrite each other's count
+with a stale one. ``build_timeline`` rebuilds the buckets of whole events,
+for galleries that predate the timeline, rows inserted in bulk and after a
+change of bucket width.
+
+Seeking: ``photos_newer_than`` gives the position of a moment in the
+listing (newest first) from the sum of the later buckets plus a range
+count within the moment's own bucket, so a client can jump straight to
+the ``list_photos`` page holding it.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import router
+from django.db.models import Sum
+
+from src.config.transactions import retry_write
+from src.events.models import Event
+
+from .models import Photo, TimelineBucket
+
+
+def bucket_start(moment: datetime, width: int) -> datetime:
+    """
+    Return the start of the ``width`` second bucket holding ``moment``.
+    """
+    timestamp = int(moment.timestamp())
+    return datetime.fromtimestamp(timestamp - timestamp % width, tz=dt_timezone.utc)
+
+
+def _approved(using: str, event_id: int):
+    return Photo.objects.using(using).filter(
+        event_id=event_id, moderation_status=Photo.ModerationStatus.APPROVED
+    )
+
+
+def update_buckets(
+    event_id: int, moments: list[datetime], using: str | None = None, create: bool = True
+) -> None:
+    """
+    Recount the buckets holding ``moments``. With ``create=False`` only
+    existing buckets are recounted (for deletions, which can only lower a
+    count, and may be part of deleting the event itself).
+    """
+    if not moments:
+        return
+    width = settings.TIMELINE_BUCKET_SECONDS
+    starts = sorted({bucket_start(moment, width) for moment in moments})
+    using = using or router.db_for_write(TimelineBucket)
+    retry_write(using, _recount, using, event_id, width, starts, create)
+
+
+def _recount(
+    using: str, event_id: int, width: int, starts: list[datetime], create: bool
+) -> None:
+    buckets = TimelineBucket.objects.using(using)
+    if create:
+        buckets.bulk_create(
+            [TimelineBucket(event_id=event_id, width=width, start=start) for start in starts],
+            ignore_conflicts=True,
+        )
+    locked = list(
+        buckets.select_for_update().filter(event_id=event_id, width=width, start__in=starts)
+    )
+    approved = _approved(using, event_id)
+    for bucket in locked:
+        bucket.count = approved.filter(
+            uploaded_at__gte=bucket.start,
+            uploaded_at__lt=bucket.start + timedelta(seconds=width),
+        ).count()
+    buckets.bulk_update(locked, ["count"])
+
+
+def update_timeline(event_id: int, photo_ids: list[int], using: str | None = None) -> None:
+    """
+    Recount the buckets of photos that were added or re-moderated.
+    """
+    using = using or router.db_for_write(TimelineBucket)
+    moments = list(
+        Photo.objects.using(using).filter(pk__in=photo_ids).values_list("uploaded_at", flat=True)
+    )
+    update_buckets(event_id, moments, using)
+
+
+def rebuild_timeline(event: Event, using: str | None = None) -> int:
+    """
+    Rebuild all buckets of an event at the current width; return how many
+    non-empty buckets it has.
+    """
+    width = settings.TIMELINE_BUCKET_SECONDS
+    using = using or router.db_for_write(TimelineBucket)
+    counts: dict[datetime, int] = {}
+    for uploaded_at in _approved(using, event.pk).values_list("uploaded_at", flat=True).iterator():
+        start = bucket_start(uploaded_at, width)
+        counts[start] = counts.get(start, 0) + 1
+
+    def replace():
+        TimelineBucket.objects.using(using).filter(event=event).delete()
+        TimelineBucket.objects.using(using).bulk_create([
+            TimelineBucket(event=event, width=width, start=start, count=count)
+            for start, count in sorted(counts.items())
+        ])
+
+    retry_write(using, replace)
+    return len(counts)
+
+
+def timeline_buckets(event: Event) -> list[tuple[datetime, int]]:
+    """
+    Return ``(start, count)`` of the event's non-empty buckets, oldest first.
+    """
+    return list(
+        TimelineBucket.objects.filter(
+            event=event, width=settings.TIMELINE_BUCKET_SECONDS, count__gt=0
+        ).order_by("start").values_list("start", "count")
+    )
+
+
+def photos_newer_than(event: Event, moment: datetime) -> int:
+    """
+    Return the number of approved photos uploaded after ``moment``: its
+    position in the listing.
+    """
+    width = settings.TIMELINE_BUCKET_SECONDS
+    start = bucket_start(moment, width)
+    later = TimelineBucket.objects.filter(
+        event=event, width=width, start__gt=start
+    ).aggregate(total=Sum("count"))["total"] or 0
+    within = Photo.objects.filter(
+        event=event,
+        moderation_status=Photo.ModerationStatus.APPROVED,
+        uploaded_at__gt=moment,
+        uploaded_at__lt=start + timedelta(seconds=width),
+    ).count()
+    return later + within
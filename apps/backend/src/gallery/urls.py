@@ -1,12 +1,26 @@
 """URL patterns for the gallery application."""
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+
+# Under ASGI the I/O-bound endpoints are served by async views.
+io_views = async_views if settings.ASYNC_VIEWS else views
 
 app_name = "gallery"
 
 urlpatterns = [
-    path('upload/', views.upload_photo, name='upload'),
-    path('photos/', views.list_photos, name='list'),
+    path('upload/', io_views.upload_photo, name='upload'),
+    path('uploads/', views.create_upload_session, name='upload-create'),
+    path('uploads/<uuid:session_id>/', views.upload_session, name='upload-session'),
+    path('uploads/<uuid:session_id>/complete/', views.complete_upload_session, name='upload-complete'),
+    path('photos/', io_views.list_photos, name='list'),
+    path('photos/urls/', io_views.photo_urls, name='photo-urls'),
+    path('photos/<int:photo_id>/img', views.photo_image, name='photo-image'),
+    path('photos/<int:photo_id>/neighbours/', views.photo_neighbours, name='photo-neighbours'),
+    path('packed/<int:object_id>', views.packed_object, name='packed-object'),
+    path('timeline/', views.timeline, name='timeline'),
+    path('timeline/seek/', views.timeline_seek, name='timeline-seek'),
+    path('manifest/', views.gallery_manifest, name='manifest'),
     path('upload-limit/', views.get_upload_limit, name='upload-limit'),
 ]
 
@@ -1,36 +1,124 @@
 """
 Views for the gallery application.
 """
+import io
 import uuid
 import os
+from urllib.parse import urlencode
+from django.conf import settings
+from django.db.models import Q
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from rest_framework import status
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, renderer_classes
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 from django.views.decorators.csrf import csrf_exempt
 from django.core.files.uploadedfile import InMemoryUploadedFile
+from django.http import FileResponse, HttpResponseNotModified
 from src.events.models import Event
+from src.config.early_hints import preload
+from src.config.renderers import ORJSONRenderer
+from src.config.transactions import retry_write
 from src.events.decorators import require_event_token
-from .models import Photo
-from .serializers import PhotoSerializer, PhotoUploadSerializer
+from .admission import AdmissionRejected, admission_control
+from .manifest import published_index_url
+from .listing import LIST_COLUMNS, PHOTO_FIELDS, parse_fields, serialize_photo_rows, sign_renditions
+from .models import GalleryManifest, PackedObject, Photo, UploadSession
+from .neighbours import (
+    DEFAULT_NEIGHBOURS,
+    LIST_ORDER,
+    MAX_NEIGHBOURS,
+    by_distance,
+    decode_cursor,
+    encode_cursor,
+    find_neighbours,
+    older_than,
+)
+from .packs import PACKED_COLUMNS, open_packed, packed_url_signer
+from .resize import VARIANT_FORMATS, open_variant, snap_width, variant_for
+from .timeline import photos_newer_than, timeline_buckets
+from .serializers import (
+    PhotoSerializer,
+    PhotoUploadSerializer,
+    PhotoUrlsRequestSerializer,
+    UploadSessionCreateSerializer,
+    UploadSessionSerializer,
+)
+from src.uploads.cloudfront import set_event_cookies
 from src.uploads.storage import get_storage_client
+from src.uploads.validation import ImageValidationError, validate_extension, validate_image
 
 
 class PhotoPagination(PageNumberPagination):
-    """Pagination for photo listings."""
+    """
+    Pagination for photo listings.
+
+    Pages are numbered, or start right after the photo named by a before=
+    cursor (from timeline_seek or the previous page's next link). Cursor
+    pages are a keyset seek with no offset and no count, so they cost the
+    same however deep into the gallery they are.
+    """
     page_size = 20
     page_size_query_param = 'page_size'
     max_page_size = 100
+    cursor_query_param = 'before'
+    invalid_cursor_message = 'Invalid cursor'
+    cursor = None
+    next_cursor = None
+
+    def get_cursor(self, request):
+        """The key of the before= cursor, or None when the page is numbered."""
+        value = request.query_params.get(self.cursor_query_param)
+        if value is None:
+            return None
+        try:
+            return decode_cursor(value)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor = self.get_cursor(request)
+        if self.cursor is None:
+            return super().paginate_queryset(queryset, request, view)
+        rows = list(older_than(queryset, *self.cursor)[:self.get_page_size(request) + 1])
+        return self.cursor_page(rows, request)
+
+    def cursor_page(self, rows, request):
+        """
+        The page of rows read after the cursor: one more than a page is read
+        to tell whether another page follows.
+        """
+        page_size = self.get_page_size(request)
+        self.request = request
+        self.next_cursor = encode_cursor(rows[page_size - 1]) if len(rows) > page_size else None
+        return rows[:page_size]
+
+    def get_paginated_response(self, data):
+        if self.cursor is None:
+            return super().get_paginated_response(data)
+        return Response({'next': self.get_next_cursor_link(), 'results': data})
+
+    def get_next_cursor_link(self):
+        if self.next_cursor is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
 
 
 @csrf_exempt
 @api_view(['POST'])
 @require_event_token(token_location='data')
+@admission_control
 def upload_photo(request, event):
     """
     Upload a photo for an event.
     Requires access_token and photo file.
     Event is validated and passed by the decorator.
+    Rate limits and processing capacity are enforced by admission_control.
     """
     # Get photo file from FILES
     photo_file = request.FILES.get('photo')
@@ -39,14 +127,13 @@ def upload_photo(request, event):
             'error': 'photo file is required'
         }, status=status.HTTP_400_BAD_REQUEST)
     
-    # Validate file type
-    valid_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.webp']
-    file_ext = os.path.splitext(photo_file.name)[1].lower()
-    if file_ext not in valid_extensions:
-        return Response({
-            'error': f'Invalid file type. Allowed types: {", ".join(valid_extensions)}'
-        }, status=status.HTTP_400_BAD_REQUEST)
-    
+    # Validate the file from its magic bytes and image header, before
+    # anything is stored or decoded
+    try:
+        image_info = validate_image(photo_file, photo_file.name, photo_file.size)
+    except ImageValidationError as e:
+        return Response(e.as_dict(), status=status.HTTP_400_BAD_REQUEST)
+
     # Generate unique file key
     file_extension = os.path.splitext(photo_file.name)[1]
     unique_filename = f"{uuid.uuid4()}{file_extension}"
@@ -66,7 +153,7 @@ def upload_photo(request, event):
         storage.upload_file(
             file_key=file_key,
             file_content=file_content,
-            content_type=photo_file.content_type
+            content_type=image_info.content_type
         )
         
         # Create Photo record
@@ -75,7 +162,7 @@ def upload_photo(request, event):
             file_key=file_key,
             original_filename=photo_file.name,
             file_size=photo_file.size,
-            content_type=photo_file.content_type
+            content_type=image_info.content_type
         )
         
         # Return photo details
@@ -88,23 +175,571 @@ def upload_photo(request, event):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+RESUMABLE_CONTENT_TYPE = 'application/offset+octet-stream'
+
+
+@csrf_exempt
+@api_view(['POST'])
+@require_event_token(token_location='data')
+@admission_control
+def create_upload_session(request, event):
+    """
+    Start a resumable upload.
+    Requires access_token, filename and size (in bytes).
+    The file is then sent in chunks of chunk_size bytes with PATCH requests
+    to the returned session, and completed with a POST to its complete/ URL.
+    Event is validated and passed by the decorator.
+    """
+    serializer = UploadSessionCreateSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    filename = serializer.validated_data['filename']
+    size = serializer.validated_data['size']
+    try:
+        validate_extension(filename)
+    except ImageValidationError as e:
+        return Response(e.as_dict(), status=status.HTTP_400_BAD_REQUEST)
+    if size > settings.RESUMABLE_UPLOAD_MAX_SIZE:
+        return Response({
+            'error': f'File is too large. Maximum size is {settings.RESUMABLE_UPLOAD_MAX_SIZE} bytes',
+            'code': 'file_too_large',
+        }, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+    file_extension = os.path.splitext(filename)[1]
+    session = UploadSession.objects.create(
+        event=event,
+        file_key=f"{event.code}/originals/{uuid.uuid4()}{file_extension}",
+        original_filename=filename,
+        length=size,
+        chunk_size=settings.RESUMABLE_UPLOAD_CHUNK_SIZE,
+    )
+    response = Response(UploadSessionSerializer(session).data, status=status.HTTP_201_CREATED)
+    response['Location'] = reverse('gallery:upload-session', args=[session.id])
+    return response
+
+
+def _find_upload_session(event, session_id):
+    """
+    Return (session, None) for a live session of the event, or
+    (None, error response).
+    """
+    session = UploadSession.objects.filter(event=event, pk=session_id).first()
+    if session is None:
+        return None, Response({'error': 'Upload session not found'}, status=status.HTTP_404_NOT_FOUND)
+    if session.is_expired and not session.is_complete:
+        return None, Response({'error': 'Upload session has expired'}, status=status.HTTP_410_GONE)
+    return session, None
+
+
+def _abort_multipart_upload(storage, key, upload_id):
+    """Abort a multipart upload, logging rather than raising on failure."""
+    try:
+        storage.abort_multipart_upload(key, upload_id)
+    except Exception as e:
+        print(f"Error aborting multipart upload {key}: {e}")  # noqa
+
+
+def _offset_response(session, status_code, data=None):
+    response = Response(data, status=status_code)
+    response['Upload-Offset'] = str(session.offset)
+    response['Upload-Length'] = str(session.length)
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+@csrf_exempt
+@api_view(['HEAD', 'PATCH', 'DELETE'])
+@require_event_token(token_location='query')
+def upload_session(request, event, session_id):
+    """
+    Resumable upload session.
+    Requires access_token as query parameter.
+    HEAD returns the current offset (Upload-Offset header).
+    PATCH appends a chunk: the body is the chunk
+    (Content-Type: application/offset+octet-stream) and the Upload-Offset
+    header must equal the current offset.
+    DELETE abandons the upload.
+    Event is validated and passed by the decorator.
+    """
+    session, error = _find_upload_session(event, session_id)
+    if error:
+        return error
+
+    if request.method == 'HEAD':
+        return _offset_response(session, status.HTTP_200_OK)
+
+    if request.method == 'DELETE':
+        if session.has_open_multipart_upload:
+            _abort_multipart_upload(get_storage_client(), session.file_key, session.multipart_upload_id)
+        session.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    if session.is_complete:
+        return Response({'error': 'Upload is already complete'}, status=status.HTTP_409_CONFLICT)
+    if request.content_type != RESUMABLE_CONTENT_TYPE:
+        return Response({
+            'error': f'Content-Type must be {RESUMABLE_CONTENT_TYPE}'
+        }, status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+    try:
+        offset = int(request.headers['Upload-Offset'])
+    except (KeyError, ValueError):
+        return Response({'error': 'Upload-Offset header is required'}, status=status.HTTP_400_BAD_REQUEST)
+    if offset != session.offset:
+        # The client lost track (e.g. a chunk arrived but the response did
+        # not); it should resume from the offset we report.
+        return _offset_response(session, status.HTTP_409_CONFLICT, {
+            'error': 'Upload-Offset does not match the current offset'
+        })
+
+    chunk = request.body
+    expected_size = min(session.chunk_size, session.length - offset)
+    if len(chunk) != expected_size:
+        return Response({
+            'error': f'Chunk must be {expected_size} bytes',
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    storage = get_storage_client()
+    changes = {}
+    upload_id = session.multipart_upload_id
+    if offset == 0:
+        # The first chunk holds the image header: reject non-images and
+        # bombs before storing anything.
+        try:
+            image_info = validate_image(io.BytesIO(chunk), session.original_filename, session.length)
+        except ImageValidationError as e:
+            session.delete()
+            return Response(e.as_dict(), status=status.HTTP_400_BAD_REQUEST)
+        upload_id = storage.create_multipart_upload(session.file_key, image_info.content_type)
+        changes.update(multipart_upload_id=upload_id, content_type=image_info.content_type)
+
+    part_number = offset // session.chunk_size + 1
+    try:
+        etag = storage.upload_part(session.file_key, upload_id, part_number, chunk)
+    except Exception as e:
+        if offset == 0:
+            # The upload id was never saved, so nothing else could abort it;
+            # retrying the chunk starts a new one.
+            _abort_multipart_upload(storage, session.file_key, upload_id)
+        return Response({
+            'error': f'Failed to store chunk: {str(e)}'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    # Only advance from the offset this request started at, so concurrent
+    # PATCHes of the same chunk cannot both be recorded.
+    session.offset = offset + len(chunk)
+    session.parts = [*session.parts, {'PartNumber': part_number, 'ETag': etag}]
+    updated = retry_write(
+        session._state.db,
+        UploadSession.objects.filter(pk=session.pk, offset=offset).update,
+        offset=session.offset,
+        parts=session.parts,
+        **changes,
+    )
+    if not updated:
+        if offset == 0:
+            storage.abort_multipart_upload(session.file_key, upload_id)
+        session.refresh_from_db()
+        return _offset_response(session, status.HTTP_409_CONFLICT)
+    return _offset_response(session, status.HTTP_204_NO_CONTENT)
+
+
+@csrf_exempt
+@api_view(['POST'])
+@require_event_token(token_location='query')
+def complete_upload_session(request, event, session_id):
+    """
+    Complete a resumable upload once all chunks have arrived.
+    Requires access_token as query parameter.
+    Creates the Photo just like upload_photo; completing twice returns the
+    same photo.
+    Event is validated and passed by the decorator.
+    """
+    session, error = _find_upload_session(event, session_id)
+    if error:
+        return error
+    if session.is_complete:
+        return Response(PhotoSerializer(session.photo).data, status=status.HTTP_200_OK)
+    if session.offset != session.length:
+        return _offset_response(session, status.HTTP_409_CONFLICT)
+
+    # One request at a time completes a session; a lease left by a request
+    # that died runs out.
+    now = timezone.now()
+    using = session._state.db
+    claimed = retry_write(
+        using,
+        UploadSession.objects.filter(pk=session.pk, photo__isnull=True).filter(
+            Q(completing_until__isnull=True) | Q(completing_until__lt=now)
+        ).update,
+        completing_until=now + UploadSession.COMPLETION_LEASE,
+    )
+    if not claimed:
+        session.refresh_from_db()
+        if session.is_complete:
+            return Response(PhotoSerializer(session.photo).data, status=status.HTTP_200_OK)
+        response = Response({
+            'error': 'Upload is already being completed'
+        }, status=status.HTTP_409_CONFLICT)
+        response['Retry-After'] = '1'
+        return response
+
+    try:
+        if session.completed_at is None:
+            _complete_multipart_upload(session)
+            session.completed_at = timezone.now()
+            retry_write(using, session.save, update_fields=['completed_at'])
+
+        # A previous attempt may have created the photo but failed to link it.
+        photo = Photo.objects.filter(event=event, file_key=session.file_key).first()
+        if photo is None:
+            photo = Photo.objects.create(
+                event=event,
+                file_key=session.file_key,
+                original_filename=session.original_filename,
+                file_size=session.length,
+                content_type=session.content_type,
+            )
+        session.photo = photo
+        session.completing_until = None
+        retry_write(using, session.save, update_fields=['photo', 'completing_until'])
+        return Response(PhotoSerializer(photo).data, status=status.HTTP_201_CREATED)
+
+    except Exception as e:
+        # Let the client retry right away.
+        retry_write(using, UploadSession.objects.filter(pk=session.pk).update, completing_until=None)
+        return Response({
+            'error': f'Failed to complete upload: {str(e)}'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+def _complete_multipart_upload(session):
+    """
+    Complete the session's multipart upload, unless an earlier attempt
+    already did (S3 then no longer knows the upload, but has the object).
+    """
+    from botocore.exceptions import ClientError
+
+    storage = get_storage_client()
+    try:
+        storage.complete_multipart_upload(session.file_key, session.multipart_upload_id, session.parts)
+    except ClientError as e:
+        already_completed = (
+            e.response.get('Error', {}).get('Code') == 'NoSuchUpload'
+            and storage.object_size(session.file_key) == session.length
+        )
+        if not already_completed:
+            raise
+
+
+def _url_signer(request, event, access_token):
+    """
+    Sign photo URLs: renditions in an archive pack point at packed_object,
+    everything else is presigned or, with signed cookies, a plain URL.
+    """
+    query = urlencode({'access_token': access_token})
+
+    def packed_url(object_id):
+        return request.build_absolute_uri(reverse('gallery:packed-object', args=[object_id])) + '?' + query
+
+    return packed_url_signer(event, packed_url)
+
+
+def _thumbnail_urls(results):
+    """
+    URLs of the thumbnails in a listing page, or of the sprite sheets
+    holding them, for preloading.
+    """
+    return ((item.get('sprite') or {}).get('url') or item.get('thumbnail_url') for item in results)
+
+
 @api_view(['GET'])
+@renderer_classes([ORJSONRenderer])
 @require_event_token(token_location='query')
 def list_photos(request, event):
     """
     List all photos for an event.
     Requires access_token as query parameter.
+    Optional fields parameter (comma-separated) limits the returned fields;
+    only the URLs of the requested renditions are signed.
+    Optional before (a cursor from timeline_seek or a next link) starts the
+    page after that photo instead of at a page number; such pages have only
+    next and results.
     Event is validated and passed by the decorator.
     """
-    # Get photos for this event
-    photos = Photo.objects.filter(event=event, moderation_status=Photo.ModerationStatus.APPROVED).order_by('-uploaded_at')
-    
+    fields = PHOTO_FIELDS
+    if 'fields' in request.query_params:
+        try:
+            fields = parse_fields(request.query_params['fields'])
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    # Get photos for this event, reading only the columns the listing needs
+    photos = Photo.objects.filter(
+        event=event,
+        moderation_status=Photo.ModerationStatus.APPROVED,
+    ).order_by(*LIST_ORDER).values(*LIST_COLUMNS)
+
     # Paginate results
     paginator = PhotoPagination()
     paginated_photos = paginator.paginate_queryset(photos, request)
-    
-    serializer = PhotoSerializer(paginated_photos, many=True)
-    return paginator.get_paginated_response(serializer.data)
+
+    sign = _url_signer(request, event, request.query_params['access_token'])
+    results = serialize_photo_rows(paginated_photos, fields, sign)
+    response = paginator.get_paginated_response(results)
+    preload(response, _thumbnail_urls(results))
+    # Re-issue the signed cookies so they outlive long browsing sessions.
+    return set_event_cookies(response, event.code)
+
+
+NEIGHBOUR_FIELDS = ('id', 'original_filename', 'fullscreen_url')
+
+
+@api_view(['GET'])
+@renderer_classes([ORJSONRenderer])
+@require_event_token(token_location='query')
+def photo_neighbours(request, photo_id, event):
+    """
+    Return a photo and the photos just before and after it in list_photos
+    order, for the lightbox to load ahead.
+    Requires access_token as query parameter.
+    Optional count (photos on each side, default 2, at most 10) and fields
+    (as for list_photos; default id, original_filename and fullscreen_url).
+    The Link header preloads the neighbours' fullscreen images, nearest
+    first.
+    Event is validated and passed by the decorator.
+    """
+    try:
+        count = int(request.query_params.get('count', DEFAULT_NEIGHBOURS))
+        if not 0 <= count <= MAX_NEIGHBOURS:
+            raise ValueError
+    except ValueError:
+        return Response({
+            'error': f'count must be an integer from 0 to {MAX_NEIGHBOURS}'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    fields = NEIGHBOUR_FIELDS
+    if 'fields' in request.query_params:
+        try:
+            fields = parse_fields(request.query_params['fields'])
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    found = find_neighbours(event, photo_id, count)
+    if found is None:
+        return Response({'error': 'Photo not found'}, status=status.HTTP_404_NOT_FOUND)
+    row, previous, following = found
+
+    # Sign the URLs of all the photos in one batch.
+    sign = _url_signer(request, event, request.query_params['access_token'])
+    items = serialize_photo_rows([*previous, row, *following], fields, sign)
+    previous, photo, following = items[:len(previous)], items[len(previous)], items[len(previous) + 1:]
+
+    response = Response({
+        'photo': photo,
+        'previous': previous,
+        'next': following,
+    }, status=status.HTTP_200_OK)
+    preload(response, (item.get('fullscreen_url') for item in by_distance(previous, following)))
+    return set_event_cookies(response, event.code)
+
+
+@csrf_exempt
+@api_view(['POST'])
+@renderer_classes([ORJSONRenderer])
+@require_event_token(token_location='data')
+def photo_urls(request, event):
+    """
+    Sign URLs of one rendition for a batch of photos.
+    Requires access_token, ids (at most 100) and rendition
+    (original, fullscreen or thumbnail).
+    All photos must belong to the token's event.
+    Event is validated and passed by the decorator.
+    """
+    serializer = PhotoUrlsRequestSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    ids = set(serializer.validated_data['ids'])
+    rows = list(Photo.objects.filter(
+        event=event,
+        moderation_status=Photo.ModerationStatus.APPROVED,
+        pk__in=ids,
+    ).values(*LIST_COLUMNS))
+
+    missing = ids.difference(row['id'] for row in rows)
+    if missing:
+        return Response({
+            'error': 'Photos not found in this event',
+            'ids': sorted(missing),
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    sign = _url_signer(request, event, request.data['access_token'])
+    urls = sign_renditions(rows, serializer.validated_data['rendition'], sign)
+    return set_event_cookies(Response({
+        'rendition': serializer.validated_data['rendition'],
+        'urls': {str(photo_id): url for photo_id, url in urls.items()},
+    }, status=status.HTTP_200_OK), event.code)
+
+
+@api_view(['GET'])
+@renderer_classes([ORJSONRenderer])
+@require_event_token(token_location='query')
+def timeline(request, event):
+    """
+    Count approved photos per time bucket (TIMELINE_BUCKET_SECONDS), oldest
+    first, for scrubbing through the gallery. Empty buckets are left out.
+    Requires access_token as query parameter.
+    Event is validated and passed by the decorator.
+    """
+    buckets = timeline_buckets(event)
+    return Response({
+        'bucket_seconds': settings.TIMELINE_BUCKET_SECONDS,
+        'total': sum(count for _, count in buckets),
+        'buckets': [{'start': start, 'count': count} for start, count in buckets],
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@require_event_token(token_location='query')
+def timeline_seek(request, event):
+    """
+    Find where a moment falls in the photo listing.
+    Requires access_token and at (ISO 8601) as query parameters.
+    Returns the id of the newest photo uploaded at or before that moment
+    (null when no photo is that old), its position in the listing, and the
+    cursor to pass to list_photos as before= for a page starting with it
+    (null when it is the newest photo, so the first page starts with it).
+    The cursor is the key of the photo just newer than the moment, found
+    by one index seek, so the page is reached without counting or skipping
+    the photos above it.
+    Event is validated and passed by the decorator.
+    """
+    try:
+        # None when malformed, ValueError for impossible dates (February 30).
+        moment = parse_datetime(request.query_params.get('at', ''))
+    except ValueError:
+        moment = None
+    if moment is None:
+        return Response({'error': 'at must be an ISO 8601 date and time'}, status=status.HTTP_400_BAD_REQUEST)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+
+    approved = Photo.objects.filter(event=event, moderation_status=Photo.ModerationStatus.APPROVED)
+    photo_id = approved.filter(uploaded_at__lte=moment).order_by(*LIST_ORDER).values_list('id', flat=True).first()
+    newer = approved.filter(uploaded_at__gt=moment).order_by('uploaded_at', 'id').values('uploaded_at', 'id').first()
+    return Response({
+        'position': photos_newer_than(event, moment),
+        'photo_id': photo_id,
+        'cursor': encode_cursor(newer) if newer else None,
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@require_event_token(token_location='query')
+def photo_image(request, photo_id, event):
+    """
+    Serve a photo resized to a width.
+    Requires access_token as query parameter.
+    Optional w (pixels, snapped up to one of IMAGE_VARIANT_WIDTHS; the
+    largest by default) and fmt (jpeg or webp, default jpeg).
+    Event is validated and passed by the decorator.
+    """
+    widths = settings.IMAGE_VARIANT_WIDTHS
+    try:
+        width = int(request.query_params.get('w', max(widths)))
+        if width <= 0:
+            raise ValueError
+    except ValueError:
+        return Response({'error': 'w must be a positive integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+    fmt = request.query_params.get('fmt', 'jpeg')
+    if fmt not in VARIANT_FORMATS:
+        return Response({
+            'error': f'fmt must be one of: {", ".join(VARIANT_FORMATS)}'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    row = Photo.objects.filter(
+        event=event,
+        moderation_status=Photo.ModerationStatus.APPROVED,
+        pk=photo_id,
+    ).values('id', 'file_key', 'file_size').first()
+    if row is None:
+        return Response({'error': 'Photo not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    variant = variant_for(row, event.code, snap_width(width), fmt)
+    cache_headers = {
+        'ETag': variant.etag,
+        # Variant URLs never change content: a new original gets a new photo.
+        'Cache-Control': 'private, max-age=31536000, immutable',
+    }
+    if request.headers.get('If-None-Match') == variant.etag:
+        return HttpResponseNotModified(headers=cache_headers)
+
+    try:
+        fileobj = open_variant(variant, row['file_size'] or 0)
+    except AdmissionRejected:
+        response = Response({
+            'error': 'The server is busy processing photos, please try again shortly'
+        }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        response['Retry-After'] = str(settings.UPLOAD_BUSY_RETRY_AFTER)
+        return response
+    except FileNotFoundError:
+        return Response({'error': 'Photo file not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    return FileResponse(fileobj, content_type=variant.content_type, headers=cache_headers)
+
+
+@api_view(['GET'])
+@require_event_token(token_location='query')
+def packed_object(request, object_id, event):
+    """
+    Serve a rendition from the event's archive pack.
+    Requires access_token as query parameter.
+    Listings of archived events link here instead of to presigned URLs.
+    Event is validated and passed by the decorator.
+    """
+    row = PackedObject.objects.filter(
+        pack__event=event,
+        photo__moderation_status=Photo.ModerationStatus.APPROVED,
+        pk=object_id,
+    ).values(*PACKED_COLUMNS).first()
+    if row is None:
+        return Response({'error': 'Photo not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    etag = f'"{row["pack_id"]}-{row["offset"]}-{row["length"]}"'
+    cache_headers = {
+        'ETag': etag,
+        # A pack is never rewritten: re-archiving creates a new one.
+        'Cache-Control': 'private, max-age=31536000, immutable',
+    }
+    if request.headers.get('If-None-Match') == etag:
+        return HttpResponseNotModified(headers=cache_headers)
+
+    return FileResponse(open_packed(row), content_type='image/jpeg', headers=cache_headers)
+
+
+@api_view(['GET'])
+@require_event_token(token_location='query')
+def gallery_manifest(request, event):
+    """
+    Return where the event's static gallery manifest is published.
+    Requires access_token as query parameter.
+    Guests can then browse the gallery from object storage, without further
+    API calls. Event is validated and passed by the decorator.
+    """
+    manifest = GalleryManifest.objects.filter(event=event, published_at__isnull=False).first()
+    if manifest is None:
+        return Response({
+            'error': 'The gallery manifest has not been published yet'
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    return Response({
+        'version': manifest.version,
+        'url': published_index_url(manifest),
+        'photo_count': manifest.photo_count,
+        'published_at': manifest.published_at,
+    }, status=status.HTTP_200_OK)
 
 
 @api_view(['GET'])
@@ -112,7 +747,6 @@ def get_upload_limit(request):
     """
     Return the maximum number of photos that can be uploaded at once.
     """
-    from django.conf import settings
     return Response({
         'max_upload_limit': settings.MAX_PHOTOS_UPLOAD_LIMIT
     }, status=status.HTTP_200_OK)
@@ -0,0 +1,207 @@
+"""
+CloudFront signed cookies.
+
+With ``READ_AUTH_MODE = "presigned"`` (the default) every object URL handed
+to guests is presigned on its own: a SigV4 HMAC per photo and rendition,
+and a different URL on every listing, so browsers never reuse a cached
+image across page loads.
+
+With ``READ_AUTH_MODE = "cookies"`` objects are served by a CloudFront
+distribution in front of the bucket (``CLOUDFRONT_BASE_URL``) that only
+accepts requests carrying CloudFront signed cookies. Once an access token
+is validated, the backend sets three cookies holding a custom policy that
+allows ``{CLOUDFRONT_BASE_URL}/{event code}/*`` until an expiry, signed
+with the distribution's RSA key (``CLOUDFRONT_PRIVATE_KEY``). The API then
+returns plain, stable object URLs, and a listing page costs one signature
+at most, however many photos it has.
+
+Cookies are scoped to the event's path, so a guest can hold cookies for
+several events. They are signed as of the start of the current signing
+period (half of ``CLOUDFRONT_COOKIE_TTL``) and cached for it, so every
+cookie is valid for at least half the TTL and most requests sign nothing.
+Listings re-issue the cookies, which keeps long sessions working.
+
+The cookies must reach CloudFront: the API and the distribution have to
+share a parent domain (``CLOUDFRONT_COOKIE_DOMAIN``, e.g. ``.example.com``)
+or be served from the same host.
+"""
+
+from __future__ import annotations
+
+import base64
+import json
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import TYPE_CHECKING
+from urllib.parse import quote, urlsplit
+
+from django.conf import settings
+
+from src.config.timing import timed
+
+from .storage import get_storage_client
+
+if TYPE_CHECKING:
+    from cryptography.hazmat.primitives.asymmetric.rsa import RSAPrivateKey
+    from django.http import HttpResponse
+
+POLICY_COOKIE = "CloudFront-Policy"
+SIGNATURE_COOKIE = "CloudFront-Signature"
+KEY_PAIR_ID_COOKIE = "CloudFront-Key-Pair-Id"
+
+
+@dataclass(frozen=True)
+class SignedCookies:
+    """
+    CloudFront cookies granting access to everything under a path.
+    """
+
+    values: dict[str, str]
+    path: str
+    expires: datetime
+
+
+def cookies_enabled() -> bool:
+    return settings.READ_AUTH_MODE == "cookies"
+
+
+def cloudfront_b64encode(data: bytes) -> str:
+    """
+    Base64 with the characters CloudFront substitutes for ones that are
+    not valid in cookies and query strings.
+    """
+    return base64.b64encode(data).decode().translate(str.maketrans("+=/", "-_~"))
+
+
+def cloudfront_b64decode(value: str) -> bytes:
+    return base64.b64decode(value.translate(str.maketrans("-_~", "+=/")))
+
+
+def build_policy(resource: str, expires: datetime) -> bytes:
+    """
+    Return a custom policy allowing ``resource`` (which may end in ``*``)
+    until ``expires``.
+    """
+    policy = {
+        "Statement": [{
+            "Resource": resource,
+            "Condition": {"DateLessThan": {"AWS:EpochTime": int(expires.timestamp())}},
+        }]
+    }
+    return json.dumps(policy, separators=(",", ":")).encode()
+
+
+@lru_cache(maxsize=4)
+def _load_private_key(pem: str) -> RSAPrivateKey:
+    from cryptography.hazmat.primitives import serialization
+
+    return serialization.load_pem_private_key(pem.encode(), password=None)
+
+
+def _private_key() -> RSAPrivateKey:
+    pem = settings.CLOUDFRONT_PRIVATE_KEY
+    if not pem and settings.CLOUDFRONT_PRIVATE_KEY_PATH:
+        with open(settings.CLOUDFRONT_PRIVATE_KEY_PATH) as f:
+            pem = f.read()
+    if not pem:
+        raise RuntimeError("READ_AUTH_MODE is 'cookies' but no CloudFront private key is configured")
+    return _load_private_key(pem)
+
+
+@timed("sign", "cloudfront_policy")
+def sign_policy(policy: bytes) -> str:
+    """
+    Sign a policy the way CloudFront verifies it: RSA, PKCS#1 v1.5, SHA-1.
+    """
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.asymmetric import padding
+
+    signature = _private_key().sign(policy, padding.PKCS1v15(), hashes.SHA1())
+    return cloudfront_b64encode(signature)
+
+
+def event_prefix(event_code: str) -> str:
+    return f"{quote(event_code)}/"
+
+
+def signing_period_start(now: datetime | None = None) -> datetime:
+    """
+    Return the time cookies issued at ``now`` are signed as of.
+    """
+    period = max(1, settings.CLOUDFRONT_COOKIE_TTL // 2)
+    timestamp = int((now or datetime.now(timezone.utc)).timestamp())
+    return datetime.fromtimestamp(timestamp - timestamp % period, tz=timezone.utc)
+
+
+def event_cookies(event_code: str, now: datetime | None = None) -> SignedCookies:
+    """
+    Return the signed cookies for the objects of an event.
+    """
+    return _event_cookies(
+        settings.CLOUDFRONT_BASE_URL.rstrip("/"),
+        settings.CLOUDFRONT_KEY_PAIR_ID,
+        event_code,
+        signing_period_start(now) + timedelta(seconds=settings.CLOUDFRONT_COOKIE_TTL),
+    )
+
+
+@lru_cache(maxsize=1024)
+def _event_cookies(base_url: str, key_pair_id: str, event_code: str, expires: datetime) -> SignedCookies:
+    prefix = event_prefix(event_code)
+    policy = build_policy(f"{base_url}/{prefix}*", expires)
+    return SignedCookies(
+        values={
+            POLICY_COOKIE: cloudfront_b64encode(policy),
+            SIGNATURE_COOKIE: sign_policy(policy),
+            KEY_PAIR_ID_COOKIE: key_pair_id,
+        },
+        path=f"{urlsplit(base_url).path}/{prefix}",
+        expires=expires,
+    )
+
+
+def set_event_cookies(response: HttpResponse, event_code: str) -> HttpResponse:
+    """
+    Attach the event's signed cookies to ``response`` when reads are
+    authorized by cookies.
+    """
+    if not cookies_enabled():
+        return response
+    cookies = event_cookies(event_code)
+    for name, value in cookies.values.items():
+        response.set_cookie(
+            name,
+            value,
+            expires=cookies.expires,
+            path=cookies.path,
+            domain=settings.CLOUDFRONT_COOKIE_DOMAIN or None,
+            secure=not settings.DEBUG,
+            httponly=True,
+            samesite="Lax",
+        )
+    return response
+
+
+def public_urls(keys: list[str]) -> dict[str, str]:
+    """
+    Return the plain CloudFront URLs of ``keys``.
+    """
+    base_url = settings.CLOUDFRONT_BASE_URL.rstrip("/")
+    return {key: f"{base_url}/{quote(key)}" for key in keys}
+
+
+def object_urls(keys: list[str]) -> dict[str, str]:
+    """
+    Return the URLs guests read ``keys`` from: plain CloudFront URLs when
+    reads are authorized by cookies, presigned URLs otherwise.
+    """
+    if cookies_enabled():
+        return public_urls(keys)
+    return get_storage_client().generate_presigned_urls(keys)
+
+
+def object_url(key: str) -> str:
+    if cookies_enabled():
+        return public_urls([key])[key]
+    return get_storage_client().generate_presigned_url(key)
@@ -4,23 +4,83 @@ Storage utilities for uploading files to S3 / Minio.
 This module provides a small abstraction layer around boto3 so the rest of the
 codebase does not need to know whether we are talking to AWS S3 or a local
 Minio instance.
+
+boto3 and botocore take about 100 ms to import, so they are imported when a
+client is first built rather than with this module: management commands and
+code paths that never touch storage do not pay for them.
 """
 
 from __future__ import annotations
 
+import asyncio
+import contextvars
+import hmac
 import os
-from dataclasses import dataclass
-from typing import BinaryIO
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from functools import partial
+from hashlib import sha256
+from typing import TYPE_CHECKING, BinaryIO, Iterator
+from urllib.parse import urlsplit
 
-import boto3
-from botocore.client import BaseClient
 from django.conf import settings
 
+from src.config.timing import timed
+
+if TYPE_CHECKING:
+    from boto3.s3.transfer import TransferConfig
+    from botocore.client import BaseClient
+    from botocore.config import Config
+    from botocore.credentials import Credentials
+
+# Most keys a single DeleteObjects request accepts.
+DELETE_BATCH_SIZE = 1000
+
+
+def _client_config() -> Config:
+    """
+    Connection settings for the S3 client.
+
+    The pool must be at least as large as the number of threads using the
+    client at once (request threads plus transfer threads), or they queue
+    for a connection.
+    """
+    from botocore.config import Config
+
+    return Config(
+        max_pool_connections=settings.STORAGE_MAX_POOL_CONNECTIONS,
+        tcp_keepalive=settings.STORAGE_TCP_KEEPALIVE,
+        connect_timeout=settings.STORAGE_CONNECT_TIMEOUT,
+        read_timeout=settings.STORAGE_READ_TIMEOUT,
+        retries={
+            "mode": settings.STORAGE_RETRY_MODE,
+            "max_attempts": settings.STORAGE_MAX_ATTEMPTS,
+        },
+    )
+
 
-def _build_s3_client() -> BaseClient:
+def _transfer_config() -> TransferConfig:
+    """
+    Multipart settings for ``upload_fileobj``/``download_fileobj``.
+    """
+    from boto3.s3.transfer import TransferConfig
+
+    return TransferConfig(
+        multipart_threshold=settings.STORAGE_MULTIPART_THRESHOLD_MB * 1024 * 1024,
+        multipart_chunksize=settings.STORAGE_MULTIPART_CHUNKSIZE_MB * 1024 * 1024,
+        max_concurrency=settings.STORAGE_TRANSFER_CONCURRENCY,
+        use_threads=settings.STORAGE_TRANSFER_CONCURRENCY > 1,
+    )
+
+
+def _build_s3_client(config: Config | None = None) -> BaseClient:
     """
     Build a boto3 S3 client pointing either at AWS or at Minio.
     """
+    import boto3
+
     use_minio = getattr(settings, "USE_MINIO", False)
     region_name = getattr(settings, "AWS_S3_REGION_NAME", "eu-central-1")
 
@@ -34,6 +94,7 @@ def _build_s3_client() -> BaseClient:
         "aws_access_key_id": access_key,
         "aws_secret_access_key": secret_key,
         "region_name": region_name,
+        "config": config or _client_config(),
     }
 
     if use_minio:
@@ -51,28 +112,63 @@ class StorageClient:
 
     bucket_name: str
     client: BaseClient
+    transfer_config: TransferConfig | None = None
+    _presign_client: BaseClient | None = field(default=None, init=False, repr=False)
+    _presign_credentials: Credentials | None = field(default=None, init=False, repr=False)
 
+    @timed("storage", "download")
     def download_fileobj(self, key: str, fileobj: BinaryIO) -> None:
         """
         Download a file from storage into a file-like object.
         """
-        self.client.download_fileobj(self.bucket_name, key, fileobj)
+        self.client.download_fileobj(self.bucket_name, key, fileobj, Config=self.transfer_config)
+
+    @timed("storage", "head")
+    def object_size(self, key: str) -> int | None:
+        """
+        Return the size of an object, or None if it does not exist.
+        """
+        from botocore.exceptions import ClientError
+
+        try:
+            response = self.client.head_object(Bucket=self.bucket_name, Key=key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        return response["ContentLength"]
 
+    @timed("storage", "download")
+    def get_range(self, key: str, start: int, length: int) -> bytes:
+        """
+        Read ``length`` bytes of an object from offset ``start`` with one
+        ranged GET.
+        """
+        response = self.client.get_object(
+            Bucket=self.bucket_name, Key=key, Range=f"bytes={start}-{start + length - 1}"
+        )
+        return response["Body"].read()
+
+    @timed("storage", "upload")
     def upload_fileobj(
         self,
         fileobj: BinaryIO,
         key: str,
         content_type: str | None = None,
+        cache_control: str | None = None,
     ) -> None:
         extra_args = {}
         if content_type:
             extra_args["ContentType"] = content_type
+        if cache_control:
+            extra_args["CacheControl"] = cache_control
 
         self.client.upload_fileobj(
             Fileobj=fileobj,
             Bucket=self.bucket_name,
             Key=key,
             ExtraArgs=extra_args or None,
+            Config=self.transfer_config,
         )
 
     def upload_file(
@@ -88,25 +184,122 @@ class StorageClient:
         file_obj = io.BytesIO(file_content)
         self.upload_fileobj(file_obj, file_key, content_type)
 
-    def generate_presigned_url(self, key: str, expires_in: int = 3600) -> str:
+    @timed("storage", "multipart_create")
+    def create_multipart_upload(self, key: str, content_type: str | None = None) -> str:
         """
-        Generate a time-limited URL for reading an object.
-        For MinIO, we create URLs with the public endpoint (localhost:9000)
-        so browsers can access them. Signature is calculated for this endpoint.
-        For AWS S3, if a custom domain is provided, we use it as the endpoint
-        for the presigned URL. This is useful when behind a CDN.
+        Start a multipart upload and return its upload id.
+        """
+        kwargs = {"Bucket": self.bucket_name, "Key": key}
+        if content_type:
+            kwargs["ContentType"] = content_type
+        return self.client.create_multipart_upload(**kwargs)["UploadId"]
+
+    @timed("storage", "upload_part")
+    def upload_part(self, key: str, upload_id: str, part_number: int, body: bytes) -> str:
         """
+        Upload one part of a multipart upload and return its ETag.
+
+        Every part except the last must be at least 5 MiB.
+        """
+        response = self.client.upload_part(
+            Bucket=self.bucket_name,
+            Key=key,
+            UploadId=upload_id,
+            PartNumber=part_number,
+            Body=body,
+        )
+        return response["ETag"]
+
+    @timed("storage", "multipart_complete")
+    def complete_multipart_upload(self, key: str, upload_id: str, parts: list[dict]) -> None:
+        """
+        Assemble the uploaded parts (``[{"PartNumber": 1, "ETag": ...}]``)
+        into the final object.
+        """
+        self.client.complete_multipart_upload(
+            Bucket=self.bucket_name,
+            Key=key,
+            UploadId=upload_id,
+            MultipartUpload={"Parts": parts},
+        )
+
+    @timed("storage", "multipart_abort")
+    def abort_multipart_upload(self, key: str, upload_id: str) -> None:
+        """
+        Abort a multipart upload, discarding the parts uploaded so far.
+        """
+        self.client.abort_multipart_upload(Bucket=self.bucket_name, Key=key, UploadId=upload_id)
+
+    def list_objects(self, prefix: str = "") -> Iterator[dict]:
+        """
+        Yield the objects under ``prefix`` (``Key``, ``LastModified``,
+        ``Size``, ...) in key order, fetching one page of up to 1000 at a time.
+        """
+        kwargs = {"Bucket": self.bucket_name, "Prefix": prefix}
+        while True:
+            with timed("storage", "list"):
+                response = self.client.list_objects_v2(**kwargs)
+            yield from response.get("Contents", [])
+            if not response.get("IsTruncated"):
+                return
+            kwargs["ContinuationToken"] = response["NextContinuationToken"]
+
+    def list_prefixes(self, prefix: str = "", delimiter: str = "/") -> list[str]:
+        """
+        Return the "directories" directly below ``prefix``, e.g. ``["wedding/"]``.
+        """
+        kwargs = {"Bucket": self.bucket_name, "Prefix": prefix, "Delimiter": delimiter}
+        prefixes = []
+        while True:
+            with timed("storage", "list"):
+                response = self.client.list_objects_v2(**kwargs)
+            prefixes.extend(item["Prefix"] for item in response.get("CommonPrefixes", []))
+            if not response.get("IsTruncated"):
+                return prefixes
+            kwargs["ContinuationToken"] = response["NextContinuationToken"]
+
+    @timed("storage", "delete_batch")
+    def delete_objects(self, keys: list[str]) -> list[str]:
+        """
+        Delete up to ``DELETE_BATCH_SIZE`` objects in one request.
+
+        Returns the keys that could not be deleted. Missing keys count as
+        deleted.
+        """
+        if not keys:
+            return []
+        response = self.client.delete_objects(
+            Bucket=self.bucket_name,
+            Delete={"Objects": [{"Key": key} for key in keys], "Quiet": True},
+        )
+        return [error["Key"] for error in response.get("Errors", [])]
+
+    def _get_presign_client(self) -> BaseClient:
+        """
+        Return the client used to sign URLs, building it on first use.
+
+        For MinIO, we sign with the public endpoint (localhost:9000) so
+        browsers can access the URLs; the signature is calculated for that
+        endpoint. For AWS S3, if a custom domain is provided, we use it as the
+        endpoint for the presigned URL. This is useful when behind a CDN.
+        Signing is purely local, so one client can sign any number of URLs.
+        """
+        if self._presign_client is not None:
+            return self._presign_client
+
+        import boto3.session
+
         use_minio = getattr(settings, "USE_MINIO", False)
-        
-        client_kwargs = {
-            "aws_access_key_id": os.environ.get("AWS_ACCESS_KEY_ID", os.environ.get("MINIO_ROOT_USER")),
-            "aws_secret_access_key": os.environ.get("AWS_SECRET_ACCESS_KEY", os.environ.get("MINIO_ROOT_PASSWORD")),
-            "region_name": getattr(settings, "AWS_S3_REGION_NAME", "eu-central-1"),
-        }
+
+        session = boto3.session.Session(
+            aws_access_key_id=os.environ.get("AWS_ACCESS_KEY_ID", os.environ.get("MINIO_ROOT_USER")),
+            aws_secret_access_key=os.environ.get("AWS_SECRET_ACCESS_KEY", os.environ.get("MINIO_ROOT_PASSWORD")),
+            region_name=getattr(settings, "AWS_S3_REGION_NAME", "eu-central-1"),
+        )
 
         # By default, use the client that was initialized with the class
         presigned_url_client = self.client
-        
+
         # If a public endpoint is specified (for MinIO or a custom S3 domain),
         # create a new client configured for that public endpoint.
         public_endpoint = None
@@ -117,27 +310,233 @@ class StorageClient:
             public_endpoint = getattr(settings, "AWS_S3_CUSTOM_DOMAIN", None)
 
         if public_endpoint:
-            client_kwargs["endpoint_url"] = public_endpoint
-            presigned_url_client = boto3.client("s3", **client_kwargs)
+            presigned_url_client = session.client("s3", endpoint_url=public_endpoint)
+
+        self._presign_credentials = session.get_credentials()
+        self._presign_client = presigned_url_client
+        return presigned_url_client
 
-        return presigned_url_client.generate_presigned_url(
+    @timed("sign", "presign")
+    def generate_presigned_url(self, key: str, expires_in: int = 3600) -> str:
+        """
+        Generate a time-limited URL for reading an object.
+        """
+        return self._get_presign_client().generate_presigned_url(
             "get_object",
             Params={"Bucket": self.bucket_name, "Key": key},
             ExpiresIn=expires_in,
         )
 
+    @timed("sign", "presign_batch")
+    def generate_presigned_urls(
+        self,
+        keys: list[str],
+        expires_in: int = 3600,
+        signed_at: datetime | None = None,
+    ) -> dict[str, str]:
+        """
+        Sign several keys at once, returning a mapping of key to URL.
+
+        botocore resolves the endpoint rules on every call, which costs more
+        than the signature itself. Every key of a bucket shares the same
+        endpoint, so botocore signs the first key and the remaining URLs are
+        signed by ``_SigV4UrlSigner`` in the same shape.
+
+        With ``signed_at`` every URL is signed as of that time, so signing
+        the same key again gives the same URL (for published manifests).
+        botocore can only sign as of now, so ``ValueError`` is raised when
+        its URLs cannot be re-signed in that shape.
+        """
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+
+        client = self._get_presign_client()
+        first_url = client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket_name, "Key": keys[0]},
+            ExpiresIn=expires_in,
+        )
+        urls = {keys[0]: first_url}
+        if len(keys) == 1 and signed_at is None:
+            return urls
+
+        credentials = self._presign_credentials.get_frozen_credentials() if self._presign_credentials else None
+        signer = _SigV4UrlSigner.from_url(
+            first_url, keys[0], credentials, client.meta.region_name, expires_in, now=signed_at
+        )
+        if signer is None and signed_at is not None:
+            raise ValueError(
+                f"Cannot sign as of {signed_at.isoformat()}: botocore's URL for {keys[0]} "
+                "is not a SigV4 query signature with credentials"
+            )
+        if signer and signed_at is not None:
+            urls[keys[0]] = signer.sign(keys[0])
+        for key in keys[1:]:
+            urls[key] = signer.sign(key) if signer else self.generate_presigned_url(key, expires_in)
+        return urls
+
+
+class _SigV4UrlSigner:
+    """
+    Produce presigned S3 GET URLs identical to botocore's, for keys that
+    share an endpoint, reusing one timestamp and derived signing key.
+    """
+
+    def __init__(self, origin, path_prefix, host, credentials, region_name, expires_in, now=None):
+        from botocore.utils import percent_encode, percent_encode_sequence
+
+        now = now or datetime.now(timezone.utc)
+        self._percent_encode = percent_encode
+        self.origin = origin
+        self.path_prefix = path_prefix
+        self.host = host
+        self.timestamp = now.strftime("%Y%m%dT%H%M%SZ")
+        self.scope = f"{self.timestamp[:8]}/{region_name}/s3/aws4_request"
+
+        params = {
+            "X-Amz-Algorithm": "AWS4-HMAC-SHA256",
+            "X-Amz-Credential": f"{credentials.access_key}/{self.scope}",
+            "X-Amz-Date": self.timestamp,
+            "X-Amz-Expires": expires_in,
+            "X-Amz-SignedHeaders": "host",
+        }
+        if credentials.token is not None:
+            params["X-Amz-Security-Token"] = credentials.token
+        self.query = percent_encode_sequence(params)
+        self.canonical_query = "&".join(sorted(self.query.split("&")))
+
+        signing_key = f"AWS4{credentials.secret_key}".encode()
+        for part in (self.timestamp[:8], region_name, "s3", "aws4_request"):
+            signing_key = hmac.new(signing_key, part.encode(), sha256).digest()
+        self.signing_key = signing_key
+
+    @classmethod
+    def from_url(cls, url, key, credentials, region_name, expires_in, now=None):
+        """
+        Build a signer from a URL botocore presigned for ``key``.
+
+        Returns None when the URL is not in the expected SigV4 shape, in
+        which case callers fall back to botocore.
+        """
+        from botocore.utils import percent_encode
+
+        base, _, query = url.partition("?")
+        quoted_key = percent_encode(key, safe="/~")
+        if (
+            credentials is None
+            or not base.endswith(quoted_key)
+            or "X-Amz-Algorithm=AWS4-HMAC-SHA256" not in query
+            or "X-Amz-SignedHeaders=host&" not in query
+        ):
+            return None
+        parts = urlsplit(base[: -len(quoted_key)])
+        host = parts.hostname
+        if parts.port is not None and parts.port != {"http": 80, "https": 443}.get(parts.scheme):
+            host = f"{host}:{parts.port}"
+        return cls(
+            f"{parts.scheme}://{parts.netloc}", parts.path, host,
+            credentials, region_name, expires_in, now=now,
+        )
+
+    def sign(self, key: str) -> str:
+        path = self.path_prefix + self._percent_encode(key, safe="/~")
+        canonical_request = (
+            f"GET\n{path}\n{self.canonical_query}\nhost:{self.host}\n\nhost\nUNSIGNED-PAYLOAD"
+        )
+        string_to_sign = (
+            f"AWS4-HMAC-SHA256\n{self.timestamp}\n{self.scope}\n"
+            f"{sha256(canonical_request.encode()).hexdigest()}"
+        )
+        signature = hmac.new(self.signing_key, string_to_sign.encode(), sha256).hexdigest()
+        return f"{self.origin}{path}?{self.query}&X-Amz-Signature={signature}"
+
 
 _storage_client: StorageClient | None = None
+_storage_client_lock = threading.Lock()
 
 
 def get_storage_client() -> StorageClient:
     """
-    Return a singleton StorageClient instance.
+    Return the StorageClient of this process, shared by its threads.
+
+    boto3 clients are thread-safe but must not cross a fork: a client built
+    before gunicorn forks its workers would share connection pool sockets
+    between processes. The singleton is therefore dropped in forked
+    children, which build their own on first use.
     """
     global _storage_client
     if _storage_client is None:
-        bucket = getattr(settings, "AWS_STORAGE_BUCKET_NAME")
-        _storage_client = StorageClient(bucket_name=bucket, client=_build_s3_client())
+        with _storage_client_lock:
+            if _storage_client is None:
+                bucket = getattr(settings, "AWS_STORAGE_BUCKET_NAME")
+                _storage_client = StorageClient(
+                    bucket_name=bucket,
+                    client=_build_s3_client(),
+                    transfer_config=_transfer_config(),
+                )
     return _storage_client
 
 
+class AsyncStorageClient:
+    """
+    Awaitable facade over a StorageClient, for async views.
+
+    boto3 has no asyncio interface; its calls block on the network. Each
+    call is run in a thread pool shared by the process and bounded by
+    ``STORAGE_ASYNC_THREADS``, so the event loop keeps serving other
+    requests while one waits on S3, and a burst of uploads queues for a
+    thread instead of opening more connections than the client's pool
+    holds. Calls carry the caller's context, so they are still timed as
+    part of the request (see src/config/timing.py).
+    """
+
+    def __init__(self, storage: StorageClient):
+        self.storage = storage
+
+    def __getattr__(self, name: str):
+        method = getattr(self.storage, name)
+        if not callable(method):
+            return method
+
+        async def offloaded(*args, **kwargs):
+            loop = asyncio.get_running_loop()
+            context = contextvars.copy_context()
+            return await loop.run_in_executor(
+                _storage_executor(), partial(context.run, method, *args, **kwargs)
+            )
+
+        return offloaded
+
+
+_storage_executor_instance: ThreadPoolExecutor | None = None
+
+
+def _storage_executor() -> ThreadPoolExecutor:
+    global _storage_executor_instance
+    if _storage_executor_instance is None:
+        with _storage_client_lock:
+            if _storage_executor_instance is None:
+                _storage_executor_instance = ThreadPoolExecutor(
+                    max_workers=settings.STORAGE_ASYNC_THREADS, thread_name_prefix="storage"
+                )
+    return _storage_executor_instance
+
+
+def get_async_storage_client() -> AsyncStorageClient:
+    """
+    Return an AsyncStorageClient over this process's StorageClient.
+    """
+    return AsyncStorageClient(get_storage_client())
+
+
+def _reset_after_fork() -> None:
+    global _storage_client, _storage_client_lock, _storage_executor_instance
+    _storage_client = None
+    _storage_client_lock = threading.Lock()
+    _storage_executor_instance = None
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
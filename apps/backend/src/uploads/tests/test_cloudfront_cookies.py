@@ -0,0 +1,135 @@
+"""
+CloudFront signed cookies: issued when an access token is validated, with a
+policy over the event's objects that verifies against the public key, and
+plain object URLs in listings.
+"""
+import json
+from datetime import datetime, timezone
+
+import pytest
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import padding, rsa
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from src.events.models import Event
+from src.gallery.models import Photo
+from src.uploads import cloudfront
+
+BASE_URL = 'https://photos.example.com'
+
+
+@pytest.fixture(scope='module')
+def private_key():
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+@pytest.fixture
+def cookie_mode(settings, private_key):
+    settings.READ_AUTH_MODE = 'cookies'
+    settings.CLOUDFRONT_BASE_URL = BASE_URL
+    settings.CLOUDFRONT_KEY_PAIR_ID = 'K2JCJMDEHXQW5F'
+    settings.CLOUDFRONT_PRIVATE_KEY = private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ).decode()
+    settings.CLOUDFRONT_COOKIE_DOMAIN = '.example.com'
+    cloudfront._event_cookies.cache_clear()
+    yield
+    cloudfront._event_cookies.cache_clear()
+
+
+def _verify(public_key, cookies):
+    """
+    Check the cookies the way CloudFront does and return the policy.
+    """
+    policy = cloudfront.cloudfront_b64decode(cookies[cloudfront.POLICY_COOKIE].value)
+    signature = cloudfront.cloudfront_b64decode(cookies[cloudfront.SIGNATURE_COOKIE].value)
+    public_key.verify(signature, policy, padding.PKCS1v15(), hashes.SHA1())
+    return json.loads(policy)
+
+
+@pytest.mark.django_db
+class TestSignedCookies:
+    @pytest.fixture
+    def event(self):
+        return Event.objects.create(name='Test Wedding', code='test-wedding')
+
+    def test_validate_token_sets_signed_cookies(self, cookie_mode, private_key, event):
+        """
+        GIVEN cookie read authorization
+        WHEN an access token is validated
+        THEN signed cookies over the event's objects are set
+        """
+        response = APIClient().post(reverse('events:validate'), {'access_token': event.access_token})
+
+        assert response.status_code == status.HTTP_200_OK
+        cookies = response.cookies
+        assert cookies[cloudfront.KEY_PAIR_ID_COOKIE].value == 'K2JCJMDEHXQW5F'
+        for name in (cloudfront.POLICY_COOKIE, cloudfront.SIGNATURE_COOKIE, cloudfront.KEY_PAIR_ID_COOKIE):
+            assert cookies[name]['path'] == '/test-wedding/'
+            assert cookies[name]['domain'] == '.example.com'
+            assert cookies[name]['httponly']
+
+        statement, = _verify(private_key.public_key(), cookies)['Statement']
+        assert statement['Resource'] == f'{BASE_URL}/test-wedding/*'
+        expires = statement['Condition']['DateLessThan']['AWS:EpochTime']
+        assert expires - datetime.now(timezone.utc).timestamp() >= 12 * 3600
+
+    def test_tampered_policy_does_not_verify(self, cookie_mode, private_key, event):
+        cookies = APIClient().post(
+            reverse('events:validate'), {'access_token': event.access_token}
+        ).cookies
+        policy = cloudfront.cloudfront_b64decode(cookies[cloudfront.POLICY_COOKIE].value)
+        cookies[cloudfront.POLICY_COOKIE] = cloudfront.cloudfront_b64encode(
+            policy.replace(b'test-wedding', b'other-wedding')
+        )
+
+        with pytest.raises(InvalidSignature):
+            _verify(private_key.public_key(), cookies)
+
+    def test_listing_returns_plain_urls_and_signs_once(self, cookie_mode, private_key, event, monkeypatch):
+        """
+        GIVEN cookie read authorization and an event with photos
+        WHEN the gallery is listed twice
+        THEN the URLs are plain and stable and one policy is signed in total
+        """
+        for name in ('a', 'b', 'c'):
+            Photo.objects.create(
+                event=event,
+                file_key=f'test-wedding/originals/{name}.jpg',
+                thumbnail_key=f'test-wedding/thumbnails/{name}_thumbnail.jpg',
+                fullscreen_key=f'test-wedding/fullscreen/{name}_fullscreen.jpg',
+            )
+        signed = []
+        sign_policy = cloudfront.sign_policy
+        monkeypatch.setattr(cloudfront, 'sign_policy', lambda policy: signed.append(policy) or sign_policy(policy))
+
+        listings = []
+        for _ in range(2):
+            response = APIClient().get(reverse('gallery:list'), {'access_token': event.access_token})
+            assert response.status_code == status.HTTP_200_OK
+            _verify(private_key.public_key(), response.cookies)
+            listings.append(response.json()['results'])
+
+        assert listings[0] == listings[1]
+        for item in listings[0]:
+            photo = Photo.objects.get(pk=item['id'])
+            assert item['thumbnail_url'] == f'{BASE_URL}/{photo.thumbnail_key}'
+            assert item['original_image_url'] == f'{BASE_URL}/{photo.file_key}'
+        assert len(signed) == 1
+
+    def test_invalid_token_sets_no_cookies(self, cookie_mode):
+        response = APIClient().post(reverse('events:validate'), {'access_token': 'nope'})
+
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+        assert cloudfront.SIGNATURE_COOKIE not in response.cookies
+
+    def test_presigned_mode_sets_no_cookies(self, memory_storage, event):
+        response = APIClient().post(reverse('events:validate'), {'access_token': event.access_token})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert not response.cookies
@@ -0,0 +1,113 @@
+import asyncio
+import datetime
+import threading
+import time
+
+import pytest
+
+from src.uploads import storage as storage_module
+
+
+@pytest.mark.parametrize('use_minio', [True, False])
+def test_batch_signing_matches_botocore(storage, settings, use_minio):
+    """
+    GIVEN keys with characters that need escaping
+    WHEN they are signed as a batch
+    THEN every URL is identical to botocore's own presigned URL.
+    """
+    settings.USE_MINIO = use_minio
+    keys = [
+        'wedding/originals/IMG 0001.jpg',
+        'wedding/thumbnails/čestitke+1_thumbnail.jpg',
+        'wedding/fullscreen/a~b_fullscreen.jpg',
+    ]
+    batch = storage.generate_presigned_urls(keys + keys[:1])
+    assert batch == {key: storage.generate_presigned_url(key) for key in keys}
+
+
+def test_batch_signing_at_a_fixed_time(storage):
+    """
+    GIVEN a fixed signing time
+    WHEN the same keys are signed twice
+    THEN the URLs are identical and dated at that time.
+    """
+    signed_at = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+    keys = ['wedding/thumbnails/a.jpg', 'wedding/thumbnails/b.jpg']
+    first = storage.generate_presigned_urls(keys, expires_in=604800, signed_at=signed_at)
+    assert first == storage.generate_presigned_urls(keys, expires_in=604800, signed_at=signed_at)
+    assert all('X-Amz-Date=20260101T000000Z' in url for url in first.values())
+
+
+def test_batch_signing_at_a_fixed_time_needs_sigv4(storage, monkeypatch):
+    """
+    GIVEN URLs botocore signs in a shape the batch signer cannot reproduce
+    WHEN keys are signed at a fixed time
+    THEN signing fails instead of returning URLs dated now.
+    """
+    monkeypatch.setattr(storage_module._SigV4UrlSigner, 'from_url', classmethod(lambda cls, *args, **kwargs: None))
+    signed_at = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+
+    with pytest.raises(ValueError, match='Cannot sign as of 2026-01-01'):
+        storage.generate_presigned_urls(['wedding/thumbnails/a.jpg'], signed_at=signed_at)
+    # Without a fixed time botocore's URLs are fine.
+    assert list(storage.generate_presigned_urls(['wedding/thumbnails/a.jpg', 'wedding/thumbnails/b.jpg'])) == [
+        'wedding/thumbnails/a.jpg', 'wedding/thumbnails/b.jpg',
+    ]
+
+
+def test_client_uses_tuned_config(storage, settings):
+    """
+    GIVEN pool and transfer settings
+    WHEN the storage client is built
+    THEN its botocore client and transfers use them.
+    """
+    config = storage.client.meta.config
+    assert config.max_pool_connections == settings.STORAGE_MAX_POOL_CONNECTIONS
+    assert config.retries['mode'] == settings.STORAGE_RETRY_MODE
+    assert storage.transfer_config.max_request_concurrency == settings.STORAGE_TRANSFER_CONCURRENCY
+
+
+def test_client_is_rebuilt_after_fork(storage):
+    storage_module._reset_after_fork()
+    assert storage_module.get_storage_client() is not storage
+
+
+def test_object_size(storage):
+    from botocore.stub import Stubber
+
+    with Stubber(storage.client) as stubber:
+        stubber.add_response('head_object', {'ContentLength': 42}, {'Bucket': storage.bucket_name, 'Key': 'a.jpg'})
+        stubber.add_client_error('head_object', '404', http_status_code=404)
+        assert storage.object_size('a.jpg') == 42
+        assert storage.object_size('missing.jpg') is None
+
+
+def test_async_client_offloads_to_a_bounded_pool(memory_storage, settings, monkeypatch):
+    """
+    GIVEN STORAGE_ASYNC_THREADS = 2
+    WHEN six storage calls are awaited at once
+    THEN at most two run at a time.
+    """
+    settings.STORAGE_ASYNC_THREADS = 2
+    monkeypatch.setattr(storage_module, '_storage_executor_instance', None)
+    running, peak = [0], [0]
+    lock = threading.Lock()
+
+    def slow_get_range(key, start, length):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+        return key.encode()
+
+    monkeypatch.setattr(memory_storage, 'get_range', slow_get_range)
+    client = storage_module.get_async_storage_client()
+
+    async def read_all():
+        return await asyncio.gather(*(client.get_range(f'key-{i}', 0, 1) for i in range(6)))
+
+    assert asyncio.run(read_all()) == [f'key-{i}'.encode() for i in range(6)]
+    assert peak[0] == 2
+    assert client.bucket_name == memory_storage.bucket_name
@@ -0,0 +1,100 @@
+import io
+import struct
+import zlib
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from src.events.models import Event
+from src.gallery import views as gallery_views
+from src.gallery.models import Photo
+from src.gallery.serializers import PhotoUploadSerializer
+from src.uploads.validation import ImageValidationError, validate_image
+
+
+def _image_bytes(size=(64, 48), format='JPEG', mode='RGB'):
+    buffer = io.BytesIO()
+    Image.new(mode, size).save(buffer, format=format)
+    return buffer.getvalue()
+
+
+def _png_header(width, height):
+    """A PNG that is only a header claiming the given dimensions."""
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+    ihdr = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', ihdr) + chunk(b'IEND', b'')
+
+
+def _validate(content, filename='photo.jpg'):
+    return validate_image(io.BytesIO(content), filename, len(content))
+
+
+def test_accepts_image_and_reads_header():
+    info = _validate(_image_bytes(size=(640, 480), format='WEBP'), 'photo.webp')
+    assert (info.content_type, info.width, info.height, info.pixels) == ('image/webp', 640, 480, 307200)
+
+
+def test_content_type_comes_from_magic_bytes():
+    # A PNG uploaded with a .jpg name is still stored as what it is.
+    assert _validate(_image_bytes(format='PNG')).content_type == 'image/png'
+
+
+@pytest.mark.parametrize('content, filename, code', [
+    (_image_bytes(), 'photo.exe', 'invalid_extension'),
+    (b'', 'photo.jpg', 'empty_file'),
+    (b'MZ\x90\x00 this is not an image', 'photo.jpg', 'unsupported_type'),
+    (b'%PDF-1.7\n' + b'x' * 100, 'photo.png', 'unsupported_type'),
+    (b'\xff\xd8\xff\xe0' + b'\x00' * 100, 'photo.jpg', 'corrupt_image'),
+    # Way past Pillow's own decompression bomb limit.
+    (_png_header(60000, 60000), 'photo.png', 'too_many_pixels'),
+])
+def test_rejects(content, filename, code):
+    with pytest.raises(ImageValidationError) as exc_info:
+        _validate(content, filename)
+    assert exc_info.value.code == code
+
+
+def test_pixel_limit(settings):
+    settings.UPLOAD_MAX_PIXELS = 1_000_000
+    with pytest.raises(ImageValidationError) as exc_info:
+        _validate(_image_bytes(size=(2000, 1000), format='PNG', mode='1'), 'photo.png')
+    assert exc_info.value.as_dict() == {
+        'error': 'The image is too large (2000x1000); at most 1000000 pixels are allowed',
+        'code': 'too_many_pixels',
+        'details': {'width': 2000, 'height': 1000, 'max_pixels': 1_000_000},
+    }
+
+
+def test_serializer_uses_validator():
+    serializer = PhotoUploadSerializer(data={
+        'access_token': 'token',
+        'photo': SimpleUploadedFile('photo.jpg', b'not an image at all'),
+    })
+    assert not serializer.is_valid()
+    assert serializer.errors['photo'][0].code == 'unsupported_type'
+
+
+@pytest.mark.django_db
+def test_upload_rejects_before_storing(monkeypatch):
+    """
+    GIVEN a file that is not an image but has an image extension
+    WHEN it is uploaded
+    THEN it is rejected with a structured error and nothing is stored
+    """
+    monkeypatch.setattr(gallery_views, 'get_storage_client', lambda: pytest.fail('storage was used'))
+    event = Event.objects.create(name='Test Wedding', code='test-wedding')
+
+    response = APIClient().post(reverse('gallery:upload'), {
+        'access_token': event.access_token,
+        'photo': SimpleUploadedFile('photo.jpg', b'<html>not an image</html>', content_type='image/jpeg'),
+    }, format='multipart')
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json()['code'] == 'unsupported_type'
+    assert response.json()['details']['detected_type'] == 'text/html'
+    assert not Photo.objects.exists()
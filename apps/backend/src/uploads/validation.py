@@ -0,0 +1,179 @@
+"""
+Cheap validation of uploaded images before they are stored.
+
+Only the first bytes of the file and the image header are read: the file
+type is sniffed from its magic bytes (not trusted from the filename or the
+client's Content-Type), and Pillow parses the header for the dimensions
+without decoding any pixels. Non-images, corrupt headers and decompression
+bombs are rejected before anything is written to S3 or decoded in full.
+
+HEIC/HEIF photos are accepted as they come off iPhones, about half the
+size of the JPEG the phone would otherwise transcode them to. Pillow reads
+them through the pillow-heif plugin, registered on first use by
+``register_heif_opener``.
+"""
+
+from __future__ import annotations
+
+import os
+import warnings
+from dataclasses import dataclass
+from typing import BinaryIO
+
+from django.conf import settings
+
+# Sniffed MIME type -> (Pillow format, allowed file extensions).
+ALLOWED_IMAGE_TYPES = {
+    "image/jpeg": ("JPEG", (".jpg", ".jpeg")),
+    "image/png": ("PNG", (".png",)),
+    "image/gif": ("GIF", (".gif",)),
+    "image/webp": ("WEBP", (".webp",)),
+    "image/heic": ("HEIF", (".heic", ".heif")),
+    "image/heif": ("HEIF", (".heic", ".heif")),
+}
+
+ALLOWED_EXTENSIONS = tuple(dict.fromkeys(
+    ext for _, extensions in ALLOWED_IMAGE_TYPES.values() for ext in extensions
+))
+
+# Enough for libmagic to recognise every allowed format.
+_SNIFF_BYTES = 2048
+
+_heif_registered = False
+
+
+class ImageValidationError(Exception):
+    """
+    An upload that is not an acceptable image.
+
+    ``code`` is a stable machine-readable reason, ``details`` carries values
+    the client may show (limits, detected type).
+    """
+
+    def __init__(self, code: str, message: str, **details):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.details = details
+
+    def as_dict(self) -> dict:
+        data = {"error": self.message, "code": self.code}
+        if self.details:
+            data["details"] = self.details
+        return data
+
+
+@dataclass(frozen=True)
+class ImageInfo:
+    """
+    What the header of a valid upload says about it.
+    """
+
+    content_type: str
+    format: str
+    width: int
+    height: int
+
+    @property
+    def pixels(self) -> int:
+        return self.width * self.height
+
+
+def register_heif_opener() -> None:
+    """
+    Let Pillow open HEIC/HEIF files. Call before ``Image.open`` on anything
+    that may be an upload; pillow-heif is only imported the first time.
+    """
+    global _heif_registered
+    if not _heif_registered:
+        import pillow_heif
+
+        pillow_heif.register_heif_opener()
+        _heif_registered = True
+
+
+def validate_extension(filename: str) -> None:
+    """
+    Check the filename extension, the only thing known before any content.
+    """
+    ext = os.path.splitext(filename)[1].lower()
+    if ext not in ALLOWED_EXTENSIONS:
+        raise ImageValidationError(
+            "invalid_extension",
+            f'Invalid file type. Allowed types: {", ".join(ALLOWED_EXTENSIONS)}',
+            allowed=list(ALLOWED_EXTENSIONS),
+        )
+
+
+def validate_image(fileobj: BinaryIO, filename: str, size: int | None = None) -> ImageInfo:
+    """
+    Check that ``fileobj`` is an image we accept and return its header info.
+
+    ``fileobj`` may hold just the beginning of the file (the first chunk of
+    a resumable upload); only the header is needed.
+
+    Raises ``ImageValidationError``. The file position is restored.
+    """
+    validate_extension(filename)
+    if size == 0:
+        raise ImageValidationError("empty_file", "The uploaded file is empty")
+
+    import magic
+
+    position = fileobj.tell()
+    try:
+        fileobj.seek(0)
+        head = fileobj.read(_SNIFF_BYTES)
+        content_type = magic.from_buffer(head, mime=True)
+        if content_type not in ALLOWED_IMAGE_TYPES:
+            raise ImageValidationError(
+                "unsupported_type",
+                "The file is not a supported image",
+                detected_type=content_type,
+                allowed=list(ALLOWED_IMAGE_TYPES),
+            )
+        pil_format, _ = ALLOWED_IMAGE_TYPES[content_type]
+
+        fileobj.seek(0)
+        width, height = _read_dimensions(fileobj, pil_format)
+    finally:
+        fileobj.seek(position)
+
+    max_pixels = settings.UPLOAD_MAX_PIXELS
+    if width * height > max_pixels:
+        raise ImageValidationError(
+            "too_many_pixels",
+            f"The image is too large ({width}x{height}); at most {max_pixels} pixels are allowed",
+            width=width,
+            height=height,
+            max_pixels=max_pixels,
+        )
+    return ImageInfo(content_type=content_type, format=pil_format, width=width, height=height)
+
+
+def _read_dimensions(fileobj: BinaryIO, pil_format: str) -> tuple[int, int]:
+    """
+    Parse the image header with Pillow; no pixel data is decoded.
+    """
+    from PIL import Image
+
+    register_heif_opener()
+    try:
+        with warnings.catch_warnings():
+            # Our own pixel limit applies; Pillow's bomb warning would only
+            # add noise for images between its limit and ours.
+            warnings.simplefilter("ignore", Image.DecompressionBombWarning)
+            with Image.open(fileobj, formats=[pil_format]) as img:
+                width, height = img.size
+    except Image.DecompressionBombError as e:
+        raise ImageValidationError(
+            "too_many_pixels",
+            "The image is too large",
+            max_pixels=settings.UPLOAD_MAX_PIXELS,
+        ) from e
+    except Exception as e:
+        raise ImageValidationError("corrupt_image", "The image could not be read") from e
+
+    if width <= 0 or height <= 0:
+        raise ImageValidationError("corrupt_image", "The image has no pixels")
+    return width, height
@@ -28,35 +28,214 @@ export const getEventDetails = async (accessToken) => {
   return response.data;
 };
 
+const UPLOAD_MAX_ATTEMPTS = 4;
+// Larger files are sent in resumable chunks, so a dropped connection only
+// costs the chunk in flight.
+const RESUMABLE_UPLOAD_THRESHOLD = 5 * 1024 * 1024;
+const CHUNK_MAX_FAILURES = 8;
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+const isSaturated = (error) => [429, 503].includes(error.response?.status);
+
+const retryDelay = (error) => {
+  const retryAfter = parseInt(error.response?.headers['retry-after'], 10) || 5;
+  // Spread retries so a crowd of guests does not come back all at once.
+  return (retryAfter + Math.random() * retryAfter) * 1000;
+};
+
 /**
- * Upload a photo
+ * Upload a photo in a single request.
+ * When the server is saturated (429/503) the upload is retried after the
+ * delay given in its Retry-After header.
  */
-export const uploadPhoto = async (accessToken, photoFile, onProgress) => {
-  const formData = new FormData();
-  formData.append('access_token', accessToken);
-  formData.append('photo', photoFile);
+const uploadPhotoAtOnce = async (accessToken, photoFile, onProgress) => {
+  for (let attempt = 1; ; attempt++) {
+    const formData = new FormData();
+    formData.append('access_token', accessToken);
+    formData.append('photo', photoFile);
 
-  const response = await api.post('/gallery/upload/', formData, {
-    headers: {
-      'Content-Type': 'multipart/form-data',
-    },
-    onUploadProgress: (progressEvent) => {
-      if (onProgress) {
-        onProgress(progressEvent);
+    try {
+      const response = await api.post('/gallery/upload/', formData, {
+        headers: {
+          'Content-Type': 'multipart/form-data',
+        },
+        onUploadProgress: (progressEvent) => {
+          if (onProgress) {
+            onProgress(progressEvent);
+          }
+        },
+      });
+      return response.data;
+    } catch (error) {
+      if (!isSaturated(error) || attempt >= UPLOAD_MAX_ATTEMPTS) {
+        throw error;
       }
-    },
+      await sleep(retryDelay(error));
+    }
+  }
+};
+
+/**
+ * Upload a photo through a resumable upload session: create the session,
+ * PATCH the chunks and complete it. After a failed chunk the current offset
+ * is fetched with HEAD and the upload continues from there.
+ */
+const uploadPhotoResumable = async (accessToken, photoFile, onProgress) => {
+  let session;
+  for (let attempt = 1; !session; attempt++) {
+    try {
+      const response = await api.post('/gallery/uploads/', {
+        access_token: accessToken,
+        filename: photoFile.name,
+        size: photoFile.size,
+      });
+      session = response.data;
+    } catch (error) {
+      if (!isSaturated(error) || attempt >= UPLOAD_MAX_ATTEMPTS) {
+        throw error;
+      }
+      await sleep(retryDelay(error));
+    }
+  }
+
+  const sessionUrl = `/gallery/uploads/${session.id}/`;
+  const params = { access_token: accessToken };
+  let offset = session.offset;
+  let failures = 0;
+
+  while (offset < photoFile.size) {
+    const chunk = photoFile.slice(offset, offset + session.chunk_size);
+    try {
+      const response = await api.patch(sessionUrl, chunk, {
+        params,
+        headers: {
+          'Content-Type': 'application/offset+octet-stream',
+          'Upload-Offset': String(offset),
+        },
+        onUploadProgress: (progressEvent) => {
+          if (onProgress) {
+            onProgress({ loaded: offset + progressEvent.loaded, total: photoFile.size });
+          }
+        },
+      });
+      offset = parseInt(response.headers['upload-offset'], 10);
+      failures = 0;
+    } catch (error) {
+      const status = error.response?.status;
+      // Anything but a network error, a conflict or a server error means the
+      // upload itself was refused (not an image, expired, ...).
+      if (error.response && status !== 409 && status < 500) {
+        throw error;
+      }
+      failures += 1;
+      if (failures >= CHUNK_MAX_FAILURES) {
+        throw error;
+      }
+      await sleep(Math.min(30000, 1000 * 2 ** failures));
+      try {
+        const head = await api.head(sessionUrl, { params });
+        offset = parseInt(head.headers['upload-offset'], 10);
+      } catch (headError) {
+        // Still offline; retry the same chunk after the next backoff.
+      }
+    }
+  }
+
+  const response = await api.post(`${sessionUrl}complete/`, null, { params });
+  return response.data;
+};
+
+/**
+ * Upload a photo, in resumable chunks when it is large.
+ */
+export const uploadPhoto = async (accessToken, photoFile, onProgress) => {
+  if (photoFile.size > RESUMABLE_UPLOAD_THRESHOLD) {
+    return uploadPhotoResumable(accessToken, photoFile, onProgress);
+  }
+  return uploadPhotoAtOnce(accessToken, photoFile, onProgress);
+};
+
+/**
+ * Get photos for an event.
+ * Pass a comma-separated list of fields to receive (and sign) only those.
+ */
+export const getPhotos = async (accessToken, page = 1, fields = null) => {
+  const params = {
+    access_token: accessToken,
+    page: page,
+  };
+  if (fields) {
+    params.fields = fields;
+  }
+  const response = await api.get('/gallery/photos/', { params });
+  return response.data;
+};
+
+/**
+ * Get the page of photos after a cursor from seekTimeline:
+ * { next, results }, where next is the URL of the following page.
+ * Pass a comma-separated list of fields to receive (and sign) only those.
+ */
+export const getPhotosBefore = async (accessToken, cursor, fields = null) => {
+  const params = {
+    access_token: accessToken,
+    before: cursor,
+  };
+  if (fields) {
+    params.fields = fields;
+  }
+  const response = await api.get('/gallery/photos/', { params });
+  return response.data;
+};
+
+/**
+ * Get signed URLs of one rendition (original, fullscreen or thumbnail)
+ * for a batch of photo IDs. Returns a map of photo ID to URL.
+ */
+export const getPhotoUrls = async (accessToken, ids, rendition) => {
+  const response = await api.post('/gallery/photos/urls/', {
+    access_token: accessToken,
+    ids: ids,
+    rendition: rendition,
+  });
+  return response.data.urls;
+};
+
+/**
+ * Get a photo and the photos just before and after it in getPhotos order,
+ * with their fullscreen URLs: { photo, previous, next }, both lists in
+ * list order.
+ */
+export const getPhotoNeighbours = async (accessToken, photoId, count = 2) => {
+  const response = await api.get(`/gallery/photos/${photoId}/neighbours/`, {
+    params: { access_token: accessToken, count: count },
+  });
+  return response.data;
+};
+
+/**
+ * Get the number of approved photos per time bucket, oldest first:
+ * { bucket_seconds, total, buckets: [{ start, count }] }.
+ */
+export const getTimeline = async (accessToken) => {
+  const response = await api.get('/gallery/timeline/', {
+    params: { access_token: accessToken },
   });
   return response.data;
 };
 
 /**
- * Get photos for an event
+ * Find the newest photo taken at or before a moment (a Date or ISO
+ * string): { position, photo_id, cursor }. Pass the cursor to
+ * getPhotosBefore for the page starting with that photo; it is null when
+ * the photo is the newest, so the first getPhotos page starts with it.
  */
-export const getPhotos = async (accessToken, page = 1) => {
-  const response = await api.get('/gallery/photos/', {
+export const seekTimeline = async (accessToken, at) => {
+  const response = await api.get('/gallery/timeline/seek/', {
     params: {
       access_token: accessToken,
-      page: page,
+      at: at instanceof Date ? at.toISOString() : at,
     },
   });
   return response.data;
@@ -2,7 +2,7 @@
  * Gallery component to display photos with virtualization using react-virtuoso
  */
 import React, { useState, useEffect, useCallback, useMemo } from 'react';
-import { getPhotos } from '../api';
+import { getPhotos, getPhotoNeighbours, getPhotoUrls } from '../api';
 import './Gallery.css';
 import { Virtuoso } from 'react-virtuoso';
 
@@ -19,6 +19,23 @@ function useWindowSize() {
   return size;
 }
 
+// The grid draws thumbnails from sprite sheets (one image per run of photos);
+// individual thumbnail and fullscreen URLs are signed only when needed.
+const GRID_FIELDS = 'id,original_filename,sprite';
+// Photos on each side of the open lightbox photo to load ahead.
+const LIGHTBOX_PRELOAD = 2;
+
+// CSS showing one tile of a sprite sheet, scaled to fill its square cell.
+function spriteStyle(sprite) {
+  const position = (offset, length) =>
+    length > sprite.size ? `${(offset / (length - sprite.size)) * 100}%` : '0%';
+  return {
+    backgroundImage: `url("${sprite.url}")`,
+    backgroundSize: `${(sprite.width / sprite.size) * 100}% ${(sprite.height / sprite.size) * 100}%`,
+    backgroundPosition: `${position(sprite.x, sprite.width)} ${position(sprite.y, sprite.height)}`,
+  };
+}
+
 function Gallery({ accessToken, onBack }) {
   const [photos, setPhotos] = useState([]);
   const [loading, setLoading] = useState(false);
@@ -28,6 +45,7 @@ function Gallery({ accessToken, onBack }) {
   const [hasMore, setHasMore] = useState(true);
   const [totalPhotos, setTotalPhotos] = useState(0);
   const [nextPageUrl, setNextPageUrl] = useState(null);
+  const [fullscreenUrls, setFullscreenUrls] = useState({});
   const [width, height] = useWindowSize();
 
   const loadMoreItems = useCallback(async () => {
@@ -36,7 +54,19 @@ function Gallery({ accessToken, onBack }) {
     setLoading(true);
     try {
       const pageToFetch = nextPageUrl ? new URL(nextPageUrl).searchParams.get('page') : 1;
-      const data = await getPhotos(accessToken, pageToFetch);
+      const data = await getPhotos(accessToken, pageToFetch, GRID_FIELDS);
+
+      // Photos not in a built sprite sheet yet (just uploaded) need their
+      // own thumbnail URL.
+      const unsprited = data.results.filter((photo) => !photo.sprite).map((photo) => photo.id);
+      if (unsprited.length > 0) {
+        const urls = await getPhotoUrls(accessToken, unsprited, 'thumbnail');
+        data.results.forEach((photo) => {
+          if (urls[photo.id]) {
+            photo.thumbnail_url = urls[photo.id];
+          }
+        });
+      }
       
       setPhotos((prev) => {
         const newPhotos = data.results.filter(
@@ -63,6 +93,7 @@ function Gallery({ accessToken, onBack }) {
 
   const handleRefresh = () => {
     setPhotos([]);
+    setFullscreenUrls({});
     setNextPageUrl(null);
     setHasMore(true);
     loadMoreItems();
@@ -96,6 +127,35 @@ function Gallery({ accessToken, onBack }) {
     }
   };
 
+  // Sign fullscreen URLs for the open photo and its neighbours, and start
+  // downloading the neighbours so arrow keys show them without waiting.
+  useEffect(() => {
+    if (selectedPhoto === null) return;
+    const nearby = photos.slice(
+      Math.max(0, selectedPhotoIndex - LIGHTBOX_PRELOAD),
+      selectedPhotoIndex + LIGHTBOX_PRELOAD + 1
+    );
+    if (nearby.every((photo) => fullscreenUrls[photo.id])) return;
+
+    let cancelled = false;
+    getPhotoNeighbours(accessToken, selectedPhoto.id, LIGHTBOX_PRELOAD)
+      .then(({ photo, previous, next }) => {
+        if (cancelled) return;
+        const urls = {};
+        [photo, ...previous, ...next].forEach((item) => {
+          urls[item.id] = item.fullscreen_url;
+        });
+        [...next, ...previous.slice().reverse()].forEach((item) => {
+          if (!fullscreenUrls[item.id]) {
+            new Image().src = item.fullscreen_url;
+          }
+        });
+        setFullscreenUrls((prev) => ({ ...prev, ...urls }));
+      })
+      .catch((err) => console.error('Error loading photo URLs:', err));
+    return () => { cancelled = true; };
+  }, [accessToken, photos, selectedPhoto, selectedPhotoIndex, fullscreenUrls]);
+
   // Keyboard navigation for lightbox
   useEffect(() => {
     const handleKeyPress = (e) => {
@@ -167,17 +227,26 @@ function Gallery({ accessToken, onBack }) {
                 aspectRatio: '1',
               }}
             >
-              <img
-                src={photo.thumbnail_url}
-                alt={photo.original_filename}
-                style={{
-                  width: '100%',
-                  height: '100%',
-                  objectFit: 'cover',
-                  borderRadius: '8px',
-                  boxShadow: '0 2px 8px rgba(0, 0, 0, 0.1)',
-                }}
-              />
+              {photo.sprite ? (
+                <div
+                  className="photo-sprite"
+                  role="img"
+                  aria-label={photo.original_filename}
+                  style={spriteStyle(photo.sprite)}
+                />
+              ) : (
+                <img
+                  src={photo.thumbnail_url}
+                  alt={photo.original_filename}
+                  style={{
+                    width: '100%',
+                    height: '100%',
+                    objectFit: 'cover',
+                    borderRadius: '8px',
+                    boxShadow: '0 2px 8px rgba(0, 0, 0, 0.1)',
+                  }}
+                />
+              )}
             </div>
           );
         })}
@@ -270,7 +339,11 @@ function Gallery({ accessToken, onBack }) {
           )}
           
           <div className="lightbox-content" onClick={(e) => e.stopPropagation()}>
-            <img src={selectedPhoto.fullscreen_url} alt={selectedPhoto.original_filename} />
+            {/* The thumbnail stands in until the fullscreen URL is signed. */}
+            <img
+              src={fullscreenUrls[selectedPhoto.id] || selectedPhoto.thumbnail_url}
+              alt={selectedPhoto.original_filename}
+            />
             
             <div className="lightbox-info">
               <p className="lightbox-counter">
@@ -157,7 +157,7 @@ function WelcomePage({ event, onNavigate, accessToken }) {
           <input
             ref={fileInputRef}
             type="file"
-            accept="image/*"
+            accept="image/*,image/heic,image/heif,.heic,.heif"
             multiple
             onChange={handleFileChange}
             style={{ display: 'none' }}
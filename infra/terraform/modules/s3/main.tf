@@ -64,6 +64,20 @@ resource "aws_s3_bucket_lifecycle_configuration" "photos" {
     }
   }
 
+  # Backstop for resumable uploads the backend never completed or aborted
+  rule {
+    id     = "abort-incomplete-multipart-uploads"
+    status = "Enabled"
+
+    filter {
+      prefix = ""
+    }
+
+    abort_incomplete_multipart_upload {
+      days_after_initiation = 2
+    }
+  }
+
   rule {
     id     = "transition-to-glacier"
     status = var.enable_glacier ? "Enabled" : "Disabled"